@@ -0,0 +1,199 @@
+"""
+CSV and Excel exports, written as the rows are produced.
+
+An export is a list of column titles and an iterable of rows, usually a
+generator over a queryset .iterator(), so the rows are never all in
+memory. CSV goes out through the csv module (quoted as needed) in
+chunks while the rows are read. Excel files are built with xlwt, which
+can only write a workbook at the end; its rows are packed as they are
+added, and a sheet that reaches the 65536 rows of the format continues
+on the next one.
+
+Very large exports can run in the background instead (EXPORT_IN_BACKGROUND
+and celery): the file is written under EXPORT_ROOT and the user waits on
+a status page with a download link.
+
+Settings:
+    EXPORT_IN_BACKGROUND - write exports with celery (default False)
+    EXPORT_ROOT - directory of the background exports, not served by
+        the web server (default PROJECT_ROOT/exports)
+"""
+import os
+import csv
+import uuid
+import datetime
+from decimal import Decimal
+from cStringIO import StringIO
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.shortcuts import redirect
+from django.utils.encoding import smart_str
+
+# rows per chunk of a streamed csv
+CSV_CHUNK_ROWS = 500
+
+# rows per sheet of an excel file, titles included
+XLS_MAX_ROWS = 65536
+
+# rows added between two packings of an excel sheet
+XLS_FLUSH_ROWS = 1000
+
+# values xlwt writes as they are, the others are written as text
+XLS_TYPES = (basestring, bool, int, long, float, datetime.date, datetime.time)
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'xls': 'application/vnd.ms-excel',
+}
+
+
+def get_export_root():
+    return getattr(settings, 'EXPORT_ROOT', os.path.join(settings.PROJECT_ROOT, 'exports'))
+
+
+def get_format(filename):
+    if filename.lower().endswith('.csv'):
+        return 'csv'
+    return 'xls'
+
+
+def csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime.datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, datetime.date):
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, datetime.time):
+        return value.strftime('%H:%M:%S')
+    return smart_str(value)
+
+
+def csv_chunks(titles, rows):
+    """
+    Yields the csv of the rows in chunks of CSV_CHUNK_ROWS rows
+    """
+    output = StringIO()
+    writer = csv.writer(output)
+    writer.writerow([csv_value(title) for title in titles])
+
+    count = 0
+    for row in rows:
+        writer.writerow([csv_value(value) for value in row])
+        count += 1
+        if count % CSV_CHUNK_ROWS == 0:
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate()
+    yield output.getvalue()
+
+
+def write_xls(output, titles, rows, cell_style=None):
+    """
+    Writes the rows to an excel file. cell_style(column, value) may
+    return an xlwt style for a cell.
+    """
+    import xlwt
+
+    styles = {
+        datetime.datetime: xlwt.easyxf(num_format_str='M/D/YY h:mm'),
+        datetime.date: xlwt.easyxf(num_format_str='M/D/YY'),
+        datetime.time: xlwt.easyxf(num_format_str='h:mm:ss'),
+    }
+    default_style = xlwt.Style.default_style
+
+    book = xlwt.Workbook(encoding='utf-8')
+    sheets = 0
+    sheet = None
+    row_idx = XLS_MAX_ROWS
+
+    for row in rows:
+        if row_idx >= XLS_MAX_ROWS:
+            sheet = _add_sheet(book, sheets + 1, titles)
+            sheets += 1
+            row_idx = 1
+
+        for col_idx, value in enumerate(row):
+            if value is None or value == '':
+                continue
+            style = cell_style and cell_style(col_idx, value) or styles.get(type(value), default_style)
+            if isinstance(value, Decimal):
+                value = float(value)
+            elif not isinstance(value, XLS_TYPES):
+                value = unicode(value)
+            sheet.write(row_idx, col_idx, value, style)
+        row_idx += 1
+
+        if row_idx % XLS_FLUSH_ROWS == 0:
+            # pack the rows written so far
+            sheet.flush_row_data()
+
+    if sheet is None:
+        _add_sheet(book, 1, titles)
+    book.save(output)
+
+
+def _add_sheet(book, number, titles):
+    sheet = book.add_sheet('Sheet%d' % number)
+    for col_idx, title in enumerate(titles):
+        sheet.write(0, col_idx, title)
+    return sheet
+
+
+def export_response(filename, titles, rows, cell_style=None):
+    """
+    Returns a response with the export of the rows, as csv or excel
+    according to the extension of the filename
+    """
+    file_format = get_format(filename)
+    if file_format == 'csv':
+        response = HttpResponse(csv_chunks(titles, rows), mimetype=CONTENT_TYPES['csv'])
+    else:
+        response = HttpResponse(mimetype=CONTENT_TYPES['xls'])
+        write_xls(response, titles, rows, cell_style=cell_style)
+    response['Content-Disposition'] = 'attachment; filename=%s' % filename
+    return response
+
+
+def export_to_file(path, titles, rows, cell_style=None):
+    """
+    Writes the export of the rows to a file, as csv or excel
+    according to its extension
+    """
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    f = open(path + '.tmp', 'wb')
+    try:
+        if get_format(path) == 'csv':
+            for chunk in csv_chunks(titles, rows):
+                f.write(chunk)
+        else:
+            write_xls(f, titles, rows, cell_style=cell_style)
+    finally:
+        f.close()
+    os.rename(path + '.tmp', path)
+
+
+def export(request, filename, rows_func, *args, **kwargs):
+    """
+    The response to an export request. rows_func(*args) returns the
+    titles and the rows; it runs in the request and the file is
+    streamed, or with EXPORT_IN_BACKGROUND it runs in celery and the
+    user is sent to the status page of the export.
+    rows_func, its arguments and the cell_style of an excel file must
+    pickle for the background mode: pass module functions and ids.
+    """
+    cell_style = kwargs.get('cell_style')
+    if getattr(settings, 'EXPORT_IN_BACKGROUND', False) and settings.CELERY_IS_ACTIVE:
+        from base.tasks import ExportTask
+
+        # one directory per user, the download checks it
+        name = os.path.join(str(request.user.pk), uuid.uuid4().hex, os.path.basename(filename))
+        result = ExportTask.delay(name, rows_func, args, cell_style=cell_style)
+        return redirect('export_status', result.task_id)
+
+    titles, rows = rows_func(*args)
+    return export_response(filename, titles, rows, cell_style=cell_style)
@@ -1,5 +1,12 @@
-from django.http import HttpResponseForbidden
+import os
+import re
+import mimetypes
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, HttpResponseNotModified, Http404
 from django.template import loader
+from django.utils.http import http_date, urlquote
+from django.views.static import was_modified_since
 
 class Http403(Exception):
     pass
@@ -18,4 +25,213 @@ def render_to_403(*args, **kwargs):
     response = HttpResponseForbidden(loader.render_to_string(*args, **kwargs), **httpresponse_kwargs)
         
     return response
-        
\ No newline at end of file
+
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+def file_iterator(path, start=0, length=None, chunk_size=FILE_CHUNK_SIZE):
+    """
+    Reads a file in chunks, length bytes from start or up to the end
+    """
+    f = open(path, 'rb')
+    try:
+        f.seek(start)
+        remaining = length
+        while remaining is None or remaining > 0:
+            size = chunk_size
+            if remaining is not None:
+                size = min(chunk_size, remaining)
+            data = f.read(size)
+            if not data:
+                break
+            if remaining is not None:
+                remaining -= len(data)
+            yield data
+    finally:
+        f.close()
+
+
+def parse_range(header, size):
+    """
+    Returns the (first, last) byte of a single "bytes=" range, or None
+    when the header asks for something else and the whole file goes out.
+    Raises ValueError when the range lies outside the file.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+
+    # bytes=-500 is the last 500 bytes
+    if not first:
+        if int(last) == 0:
+            raise ValueError
+        return max(size - int(last), 0), size - 1
+
+    first = int(first)
+    if last:
+        last = int(last)
+        if last < first:
+            return None
+        last = min(last, size - 1)
+    else:
+        last = size - 1
+    if first >= size:
+        raise ValueError
+    return first, last
+
+
+def _sendfile_header(path):
+    """
+    The header that hands the file to the web server, if one is set up.
+
+    Settings:
+        SENDFILE_BACKEND - 'xsendfile' (apache, lighttpd) or 'nginx'
+        SENDFILE_ROOT - directory nginx serves internally (default MEDIA_ROOT)
+        SENDFILE_URL - the internal nginx location of SENDFILE_ROOT
+    """
+    backend = getattr(settings, 'SENDFILE_BACKEND', None)
+    if backend == 'xsendfile':
+        return 'X-Sendfile', path.encode('utf-8')
+    if backend == 'nginx':
+        root = os.path.abspath(getattr(settings, 'SENDFILE_ROOT', settings.MEDIA_ROOT))
+        path = os.path.abspath(path)
+        if path.startswith(root + os.sep):
+            url = getattr(settings, 'SENDFILE_URL', '/protected/').rstrip('/')
+            return 'X-Accel-Redirect', '%s/%s' % (url, urlquote(path[len(root) + 1:]))
+    return None
+
+
+def serve_file(request, path, mimetype=None, filename=None, attachment=False):
+    """
+    Returns a response with a file on disk, read in chunks as it is sent
+    instead of loaded in memory. Answers conditional requests
+    (If-None-Match, If-Modified-Since) and single byte ranges, or lets
+    the web server send the file when SENDFILE_BACKEND is set.
+    Check the permissions before calling it.
+    """
+    try:
+        stat = os.stat(path)
+    except (OSError, UnicodeEncodeError):
+        raise Http404
+
+    size = stat.st_size
+    mtime = int(stat.st_mtime)
+    etag = '"%x-%x"' % (mtime, size)
+    mimetype = mimetype or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        if if_none_match.strip() == '*' or etag in [tag.strip() for tag in if_none_match.split(',')]:
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
+    elif not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), mtime, size):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    sendfile = _sendfile_header(path)
+    if sendfile:
+        # the web server takes care of ranges and the transfer
+        response = HttpResponse(mimetype=mimetype)
+        response[sendfile[0]] = sendfile[1]
+    else:
+        byte_range = None
+        if 'HTTP_RANGE' in request.META:
+            # If-Range: only send a part of the version the client has
+            if_range = request.META.get('HTTP_IF_RANGE')
+            if not if_range or if_range in (etag, http_date(mtime)):
+                try:
+                    byte_range = parse_range(request.META['HTTP_RANGE'], size)
+                except ValueError:
+                    response = HttpResponse(status=416)
+                    response['Content-Range'] = 'bytes */%d' % size
+                    return response
+
+        if byte_range:
+            first, last = byte_range
+            length = last - first + 1
+        else:
+            first, length = 0, size
+
+        if request.method == 'HEAD':
+            content = ''
+        else:
+            content = file_iterator(path, first, length)
+        response = HttpResponse(content, mimetype=mimetype)
+        if byte_range:
+            response.status_code = 206
+            response['Content-Range'] = 'bytes %d-%d/%d' % (first, last, size)
+        response['Content-Length'] = str(length)
+        response['Accept-Ranges'] = 'bytes'
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(mtime)
+    if filename:
+        response['Content-Disposition'] = '%sfilename=%s' % (
+            attachment and 'attachment; ' or '', filename)
+    return response
+
+
+def _on_complete(content, callback, *args):
+    for data in content:
+        yield data
+    callback(*args)
+
+
+def serve_zip(request, archive, filename, on_complete=None):
+    """
+    Returns a response with a base.zipstream.ZipStream, built as it is
+    sent. When the crcs of the archive are known it is the same every
+    time, and conditional and range requests are answered like in
+    serve_file(). on_complete(archive) is called once the whole
+    archive went out, when its crcs are known.
+    """
+    size = len(archive)
+    byte_range = None
+    if archive.seekable:
+        etag = archive.etag()
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match and etag in [tag.strip() for tag in if_none_match.split(',')]:
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
+
+        if 'HTTP_RANGE' in request.META:
+            if_range = request.META.get('HTTP_IF_RANGE')
+            if not if_range or if_range == etag:
+                try:
+                    byte_range = parse_range(request.META['HTTP_RANGE'], size)
+                except ValueError:
+                    response = HttpResponse(status=416)
+                    response['Content-Range'] = 'bytes */%d' % size
+                    return response
+
+    if byte_range:
+        first, last = byte_range
+    else:
+        first, last = 0, size - 1
+
+    if request.method == 'HEAD':
+        content = ''
+    else:
+        content = archive.iter_range(first, last)
+        if on_complete and not byte_range:
+            content = _on_complete(content, on_complete, archive)
+
+    response = HttpResponse(content, mimetype='application/zip')
+    if byte_range:
+        response.status_code = 206
+        response['Content-Range'] = 'bytes %d-%d/%d' % (first, last, size)
+    response['Content-Length'] = str(last - first + 1)
+    if archive.seekable:
+        response['ETag'] = etag
+        response['Accept-Ranges'] = 'bytes'
+    else:
+        # the next download has the crcs up front, other bytes
+        response['Accept-Ranges'] = 'none'
+    response['Content-Disposition'] = 'attachment; filename=%s' % filename
+    return response
@@ -10,5 +10,7 @@ class Command(BaseCommand):
     option_list = BaseCommand.option_list + ClearCommand.base_options + UpdateCommand.base_options
     
     def handle(self, **options):
-        call_command('clear_index', **options)
+        # a resumed rebuild keeps what the interrupted one indexed
+        if not options.get('resume'):
+            call_command('clear_index', **options)
         call_command('update_index', **options)
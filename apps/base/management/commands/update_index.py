@@ -8,6 +8,7 @@ from django.core.exceptions import ImproperlyConfigured
 from django.core.management.base import AppCommand
 from django.db import reset_queries
 from django.utils.encoding import smart_str
+from django.utils import simplejson
 from haystack.query import SearchQuerySet
 try:
     from django.utils import importlib
@@ -15,8 +16,10 @@ except ImportError:
     from haystack.utils import importlib
 
 
-DEFAULT_BATCH_SIZE = getattr(settings, 'HAYSTACK_BATCH_SIZE', 100000)
+DEFAULT_BATCH_SIZE = getattr(settings, 'HAYSTACK_BATCH_SIZE', 1000)
 DEFAULT_AGE = None
+DEFAULT_CHECKPOINT = getattr(settings, 'HAYSTACK_CHECKPOINT_FILE',
+    os.path.join(settings.PROJECT_ROOT, 'update_index.checkpoint'))
 
 
 def worker(bits):
@@ -34,20 +37,13 @@ def worker(bits):
                 pass
     
     if bits[0] == 'do_update':
-        func, model, start, end, total, optional_site, age, verbosity = bits
-    elif bits[0] == 'do_remove':
-        func, model, pks_seen, start, upper_bound, optional_site, verbosity = bits
+        func, model, after_pk, last_pk, optional_site, scratch, age, verbosity = bits
     else:
         return
     
-    site = get_site(optional_site)
-    index = site.get_index(model)
-    
-    if func == 'do_update':
-        qs = build_queryset(index, model, age=age, verbosity=verbosity)
-        do_update(index, qs, start, end, total, verbosity=verbosity)
-    elif bits[0] == 'do_remove':
-        do_remove(index, model, pks_seen, start, upper_bound, verbosity=verbosity)
+    index = get_index(model, optional_site, scratch)
+    qs = build_queryset(index, model, age=age, verbosity=verbosity)
+    return do_update(index, qs, after_pk, last_pk, verbosity=verbosity)
 
 
 def get_site(optional_site=None):
@@ -68,6 +64,17 @@ def get_site(optional_site=None):
     return site
 
 
+def get_index(model, optional_site=None, scratch=None):
+    index = get_site(optional_site).get_index(model)
+
+    # if an alternate index is set use it
+    if scratch:
+        timeout = getattr(settings, 'HAYSTACK_SOLR_TIMEOUT', 10)
+        index.backend.conn = Solr(scratch, timeout=timeout)
+
+    return index
+
+
 def build_queryset(index, model, age=DEFAULT_AGE, verbosity=1):
     extra_lookup_kwargs = {}
     updated_field = index.get_updated_field()
@@ -95,39 +102,131 @@ def build_queryset(index, model, age=DEFAULT_AGE, verbosity=1):
     return index_qs.filter(**extra_lookup_kwargs).order_by(model._meta.pk.name)
 
 
-def do_update(index, qs, start, end, total, verbosity=1):
+def pk_ranges(qs, batch_size, after_pk=None):
+    """
+    Yields (after_pk, last_pk) for batches of batch_size objects,
+    walking the pk index instead of loading every pk. The first batch
+    starts after after_pk, or at the beginning if it is None.
+    """
+    pks = qs.values_list('pk', flat=True)
+    
+    while True:
+        batch = pks
+        if after_pk is not None:
+            batch = pks.filter(pk__gt=after_pk)
+        
+        last_pk = list(batch[batch_size - 1:batch_size])
+        if not last_pk:
+            # the last, partial batch
+            last_pk = list(batch.reverse()[:1])
+            if last_pk:
+                yield after_pk, last_pk[0]
+            return
+        
+        yield after_pk, last_pk[0]
+        after_pk = last_pk[0]
+
+
+def do_update(index, qs, after_pk, last_pk, verbosity=1):
     # Get a clone of the QuerySet so that the cache doesn't bloat up
     # in memory. Useful when reindexing large amounts of data.
-    small_cache_qs = qs.all()
-    current_qs = small_cache_qs[start:end]
+    current_qs = qs.filter(pk__lte=last_pk)
+    if after_pk is not None:
+        current_qs = current_qs.filter(pk__gt=after_pk)
     
     if verbosity >= 2:
         if os.getpid() == os.getppid():
-            print "  indexed %s - %d of %d." % (start+1, end, total)
+            print "  indexed %s - %s." % (after_pk, last_pk)
         else:
-            print "  indexed %s - %d of %d (by %s)." % (start+1, end, total, os.getpid())
+            print "  indexed %s - %s (by %s)." % (after_pk, last_pk, os.getpid())
     
     index.backend.update(index, current_qs)
     
     # Clear out the DB connections queries because it bloats up RAM.
     reset_queries()
+    
+    return last_pk
 
 
-def do_remove(index, model, pks_seen, start, upper_bound, verbosity=1):
-    # Fetch a list of results.
-    # Can't do pk range, because id's are strings (thanks comments
-    # & UUIDs!).
-    stuff_in_the_index = SearchQuerySet().models(model)[start:upper_bound]
+def do_remove(index, model, batch_size, verbosity=1):
+    """
+    Page through the documents of the model in the index and remove
+    the ones whose object is no longer indexable, checking one page
+    against the database at a time.
+    """
+    index_qs = build_queryset(index, model, verbosity=verbosity)
+    start = 0
     
-    # Iterate over those results.
-    for result in stuff_in_the_index:
-        # Be careful not to hit the DB.
-        if not smart_str(result.pk) in pks_seen:
-            # The id is NOT in the small_cache_qs, issue a delete.
-            if verbosity >= 2:
-                print "  removing %s." % result.pk
-            
-            index.backend.remove(".".join([result.app_label, result.model_name, str(result.pk)]))
+    while True:
+        # Can't do pk range, because id's are strings (thanks comments
+        # & UUIDs!).
+        results = list(SearchQuerySet().models(model)[start:start + batch_size])
+        if not results:
+            break
+        
+        pks = [smart_str(result.pk) for result in results]
+        existing = set([smart_str(pk) for pk in
+                        index_qs.filter(pk__in=pks).values_list('pk', flat=True)])
+        
+        removed = 0
+        for result in results:
+            if not smart_str(result.pk) in existing:
+                # The id is NOT in the database, issue a delete.
+                if verbosity >= 2:
+                    print "  removing %s." % result.pk
+                
+                index.backend.remove(".".join([result.app_label, result.model_name, str(result.pk)]))
+                removed += 1
+        
+        # the removed documents no longer take up a place in the results
+        start += len(results) - removed
+
+
+class Checkpoint(object):
+    """
+    Progress of an update, saved to a file after every batch so an
+    interrupted run can be resumed with --resume.
+    """
+    def __init__(self, path, options):
+        self.path = path
+        self.options = options
+        self.models = {}
+    
+    def load(self):
+        try:
+            f = open(self.path)
+            try:
+                data = simplejson.load(f)
+            finally:
+                f.close()
+        except (IOError, ValueError):
+            return False
+        
+        # progress made with other options does not apply
+        if data.get('options') != self.options:
+            return False
+        self.models = data.get('models', {})
+        return True
+    
+    def save(self):
+        f = open(self.path + '.tmp', 'w')
+        try:
+            simplejson.dump({'options': self.options, 'models': self.models}, f)
+        finally:
+            f.close()
+        os.rename(self.path + '.tmp', self.path)
+    
+    def clear(self):
+        self.models = {}
+        if os.path.exists(self.path):
+            os.remove(self.path)
+    
+    def get(self, model):
+        return self.models.get(smart_str(model._meta), {})
+    
+    def update(self, model, **kwargs):
+        self.models.setdefault(smart_str(model._meta), {}).update(kwargs)
+        self.save()
 
 
 class Command(AppCommand):
@@ -154,6 +253,13 @@ class Command(AppCommand):
         make_option('--scratch', action='store', dest='scratch',
             type='string', help='Use the scratch index specified'
         ),
+        make_option('--resume', action='store_true', dest='resume',
+            default=False, help='Continue an interrupted run from its checkpoint.'
+        ),
+        make_option('--checkpoint', action='store', dest='checkpoint',
+            default=DEFAULT_CHECKPOINT, type='string',
+            help='File to keep the progress in.'
+        ),
     )
     option_list = AppCommand.option_list + base_options
     
@@ -194,73 +300,74 @@ class Command(AppCommand):
                 except:
                     # No models, no problem.
                     pass
-            
-        return super(Command, self).handle(*apps, **options)
-    
-    def handle_app(self, app, **options):
-        from django.db.models import get_models
-        from haystack.exceptions import NotRegistered
         
-        site = get_site(self.site)
+        self.checkpoint = Checkpoint(options.get('checkpoint') or DEFAULT_CHECKPOINT, {
+            'apps': list(apps),
+            'age': self.age,
+            'site': self.site,
+            'scratch': self.scratch,
+        })
+        if not options.get('resume') or not self.checkpoint.load():
+            self.checkpoint.clear()
         
+        # one pool for all the models; its task queue is shared by the workers
+        self.pool = None
         if self.workers > 0:
             import multiprocessing
+            self.pool = multiprocessing.Pool(self.workers)
+        
+        try:
+            result = super(Command, self).handle(*apps, **options)
+        finally:
+            if self.pool:
+                self.pool.close()
+                self.pool.join()
+        
+        # everything is done, nothing left to resume
+        self.checkpoint.clear()
+        return result
+    
+    def handle_app(self, app, **options):
+        from django.db.models import get_models
+        from haystack.exceptions import NotRegistered
         
         for model in get_models(app):
             try:
-                index = site.get_index(model)
+                index = get_index(model, self.site, self.scratch)
             except NotRegistered:
                 if self.verbosity >= 2:
                     print "Skipping '%s' - no index." % model
                 continue
- 
-             # if an alternate index is set use it
-            if self.scratch:
-                timeout = getattr(settings, 'HAYSTACK_SOLR_TIMEOUT', 10)
-                index.backend.conn = Solr(self.scratch, timeout=timeout)
-               
-            qs = build_queryset(index, model, age=self.age, verbosity=self.verbosity)
-            total = qs.count()
-            
-            if self.verbosity >= 1:
-                print "Indexing %d %s." % (total, smart_str(model._meta.verbose_name_plural))
             
-            pks_seen = set([smart_str(pk) for pk in qs.values_list('pk', flat=True)])
+            progress = self.checkpoint.get(model)
+            if progress.get('done'):
+                if self.verbosity >= 1:
+                    print "Skipping %s - done before." % smart_str(model._meta.verbose_name_plural)
+                continue
             
-            if self.workers > 0:
-                ghetto_queue = []
+            qs = build_queryset(index, model, age=self.age, verbosity=self.verbosity)
+            after_pk = progress.get('last_pk')
             
-            for start in range(0, total, self.batchsize):
-                end = min(start + self.batchsize, total)
-                
-                if self.workers == 0:
-                    do_update(index, qs, start, end, total, self.verbosity)
+            if self.verbosity >= 1:
+                if after_pk is None:
+                    print "Indexing %d %s." % (qs.count(), smart_str(model._meta.verbose_name_plural))
                 else:
-                    ghetto_queue.append(('do_update', model, start, end, total, self.site, self.age, self.verbosity))
+                    print "Indexing %d %s, resuming after %s." % (qs.filter(pk__gt=after_pk).count(),
+                        smart_str(model._meta.verbose_name_plural), after_pk)
+            
+            ranges = pk_ranges(qs, self.batchsize, after_pk)
+            if self.pool:
+                # imap hands the batches back in order, so the checkpoint
+                # only moves past a batch once every batch before it is done
+                indexed = self.pool.imap(worker, (('do_update', model, first, last, self.site,
+                    self.scratch, self.age, self.verbosity) for first, last in ranges))
+            else:
+                indexed = (do_update(index, qs, first, last, self.verbosity) for first, last in ranges)
             
-            if self.workers > 0:
-                pool = multiprocessing.Pool(self.workers)
-                pool.map(worker, ghetto_queue)
+            for last_pk in indexed:
+                self.checkpoint.update(model, last_pk=last_pk)
             
             if self.remove:
-                if self.age or total <= 0:
-                    # They're using a reduced set, which may not incorporate
-                    # all pks. Rebuild the list with everything.
-                    qs = index.index_queryset().values_list('pk', flat=True)
-                    pks_seen = set([smart_str(pk) for pk in qs])
-                    total = len(pks_seen)
-                
-                if self.workers > 0:
-                    ghetto_queue = []
-                
-                for start in range(0, total, self.batchsize):
-                    upper_bound = start + self.batchsize
-                    
-                    if self.workers == 0:
-                        do_remove(index, model, pks_seen, start, upper_bound)
-                    else:
-                        ghetto_queue.append(('do_remove', model, pks_seen, start, upper_bound, self.site, self.verbosity))
-                
-                if self.workers > 0:
-                    pool = multiprocessing.Pool(self.workers)
-                    pool.map(worker, ghetto_queue)
+                do_remove(index, model, self.batchsize, verbosity=self.verbosity)
+            
+            self.checkpoint.update(model, done=True)
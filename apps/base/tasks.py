@@ -0,0 +1,16 @@
+import os
+
+from celery.task import Task
+from celery.registry import tasks
+
+from base.exports import get_export_root, export_to_file
+
+
+class ExportTask(Task):
+
+    def run(self, name, rows_func, args, cell_style=None, **kwargs):
+        titles, rows = rows_func(*args)
+        export_to_file(os.path.join(get_export_root(), name), titles, rows, cell_style=cell_style)
+        return name
+
+tasks.register(ExportTask)
@@ -5,4 +5,6 @@ urlpatterns = patterns('base',
     url(r'^feedback/$', 'views.feedback', name='tendenci_feedback'),
     url(r'^memcached-status/$', 'views.memcached_status', name='memcached_status'),
     url(r'^clear-cache/$', 'views.clear_cache', name='clear_cache'),
+    url(r'^exports/(?P<task_id>[-\w]+)/$', 'views.export_status', name='export_status'),
+    url(r'^exports/(?P<task_id>[-\w]+)/download/$', 'views.export_download', name='export_download'),
 )
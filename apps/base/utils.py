@@ -501,3 +501,47 @@ def fieldify(str):
 
 def slugify_fields(match):
     return '{{ %s }}' % (slugify(match.group(2))).replace('-', '_')
+
+def bulk_insert(model, instances, using=None, batch_size=None):
+    """Insert unsaved model instances with multi-row INSERT statements.
+
+        One statement per batch_size rows instead of one per row.
+        save() is not called and no signals are sent; fields with
+        auto_now/auto_now_add and defaults are filled in as usual.
+        The primary keys of the instances are not set.
+    """
+    from django.db import connections, router, transaction
+    from django.db.models import AutoField
+
+    instances = list(instances)
+    if not instances:
+        return 0
+
+    using = using or router.db_for_write(model)
+    connection = connections[using]
+    qn = connection.ops.quote_name
+
+    fields = [f for f in model._meta.local_fields if not isinstance(f, AutoField)]
+    if not batch_size:
+        # SQLite refuses statements with more than 999 variables
+        if 'sqlite' in connection.settings_dict['ENGINE']:
+            batch_size = max(1, 999 // len(fields))
+        else:
+            batch_size = 500
+    placeholder = '(%s)' % ', '.join(['%s'] * len(fields))
+
+    cursor = connection.cursor()
+    for i in xrange(0, len(instances), batch_size):
+        batch = instances[i:i + batch_size]
+        sql = 'INSERT INTO %s (%s) VALUES %s' % (
+            qn(model._meta.db_table),
+            ', '.join([qn(f.column) for f in fields]),
+            ', '.join([placeholder] * len(batch)))
+        params = []
+        for instance in batch:
+            params.extend([f.get_db_prep_save(f.pre_save(instance, True), connection=connection)
+                           for f in fields])
+        cursor.execute(sql, params)
+    transaction.commit_unless_managed(using=using)
+
+    return len(instances)
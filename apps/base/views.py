@@ -1,18 +1,23 @@
 # python
+import os
 import datetime
 import re
 import Image as Pil
 
 # django
 from django.http import HttpResponse, HttpResponseNotFound, Http404
+from django.contrib.auth.decorators import login_required
 from django.contrib.contenttypes.models import ContentType
 from django.core.cache import cache
 from django.template import RequestContext
 from django.shortcuts import redirect
 from django.conf import settings
+from djcelery.models import TaskMeta
 
 # local
 from base.cache import IMAGE_PREVIEW_CACHE
+from base.exports import get_export_root
+from base.http import serve_file
 from perms.utils import is_admin
 from theme.shortcuts import themed_response as render_to_response
 
@@ -241,3 +246,45 @@ def homepage(request, template_name="homepage.html"):
     })
 
     return render_to_response(template_name, {}, context_instance=RequestContext(request))
+
+
+def _get_export(request, task_id):
+    """
+    The task of an export and the path of its file, which only the
+    user who asked for it can get
+    """
+    try:
+        task = TaskMeta.objects.get(task_id=task_id)
+    except TaskMeta.DoesNotExist:
+        # tasks database entries are not created at once.
+        return None, None
+
+    if task.status != "SUCCESS":
+        return task, None
+
+    name = os.path.normpath(task.result)
+    if name.split(os.sep)[0] != str(request.user.pk):
+        raise Http404
+    return task, os.path.join(get_export_root(), name)
+
+
+@login_required
+def export_status(request, task_id, template_name="base/export-status.html"):
+    """
+    Waits for an export written in the background
+    """
+    task, path = _get_export(request, task_id)
+    return render_to_response(template_name, {
+        'task': task,
+        'task_id': task_id,
+        'filename': path and os.path.basename(path),
+        'datetime': datetime,
+    }, context_instance=RequestContext(request))
+
+
+@login_required
+def export_download(request, task_id):
+    task, path = _get_export(request, task_id)
+    if not path:
+        raise Http404
+    return serve_file(request, path, filename=os.path.basename(path), attachment=True)
@@ -0,0 +1,239 @@
+"""
+ZIP archives of files on disk, written as they are read.
+
+The files are stored as they are (photos and most documents do not
+compress), so the size and layout of the archive are known before the
+first byte goes out: the response gets a Content-Length and the files
+are read in chunks, with no temporary file and bounded memory.
+
+The CRC-32 of a file is only known once it has been read. The first
+download puts it after the data (a data descriptor); once an archive
+has been sent in full its CRCs can be kept and handed back, and the
+archive is then the same bytes every time and can be sent in ranges,
+so a broken download can be resumed.
+
+Archives over 4GB or with more than 65535 files use the ZIP64
+extensions.
+"""
+import os
+import time
+import zlib
+import struct
+
+from django.utils.encoding import smart_str
+from django.utils.hashcompat import md5_constructor
+
+from base.http import file_iterator
+
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP_FILECOUNT_LIMIT = 0xFFFF
+
+# general purpose flags
+FLAG_DATA_DESCRIPTOR = 0x08
+FLAG_UTF8 = 0x800
+
+# version needed to extract, made by unix
+VERSION = 20
+VERSION_ZIP64 = 45
+MADE_BY_UNIX = 3 << 8
+
+
+class ZipEntry(object):
+    def __init__(self, name, path):
+        self.name = smart_str(name)
+        self.path = path
+        stat = os.stat(path)
+        self.size = stat.st_size
+        self.mtime = int(stat.st_mtime)
+        self.offset = 0
+        self.crc = None
+        if not self.size:
+            # an empty file is never read
+            self.crc = 0
+
+        # dos date and time, which start in 1980
+        t = time.localtime(max(self.mtime, 315532800))
+        self.date = (t.tm_year - 1980) << 9 | t.tm_mon << 5 | t.tm_mday
+        self.time = t.tm_hour << 11 | t.tm_min << 5 | t.tm_sec // 2
+
+
+class ZipStream(object):
+    """
+    A stored ZIP archive of a list of (name in the archive, path).
+    Iterate over it, or over iter_range(), to get the archive in chunks.
+    Pass the crcs of a previous complete pass to get an archive that
+    can be sent in ranges.
+    """
+    def __init__(self, files, crcs=None):
+        self.entries = []
+        names = set()
+        for name, path in files:
+            name = unique_name(name, names)
+            names.add(name)
+            self.entries.append(ZipEntry(name, path))
+
+        if crcs and len(crcs) == len(self.entries):
+            for entry, crc in zip(self.entries, crcs):
+                entry.crc = crc
+            self.seekable = True
+        else:
+            self.seekable = False
+
+        self.parts = self._layout()
+        self.size = sum([length for length, part in self.parts])
+
+    def fingerprint(self):
+        """
+        Changes when a file is added, removed, renamed or modified
+        """
+        md5 = md5_constructor()
+        for entry in self.entries:
+            md5.update('%s\0%d\0%d\0' % (entry.name, entry.size, entry.mtime))
+        return md5.hexdigest()
+
+    def etag(self):
+        return '"%s-%x"' % (self.fingerprint(), self.size)
+
+    @property
+    def crcs(self):
+        """
+        The CRC-32 of the files, once they have all been read
+        """
+        crcs = [entry.crc for entry in self.entries]
+        if None in crcs:
+            return None
+        return crcs
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return self.iter_range(0, self.size - 1)
+
+    def iter_range(self, first, last):
+        """
+        Yields the bytes from first to last (inclusive) of the archive
+        """
+        position = 0
+        for length, part in self.parts:
+            end = position + length
+            if end <= first:
+                position = end
+                continue
+            if position > last:
+                break
+
+            start = max(first - position, 0)
+            stop = min(last + 1 - position, length)
+            if isinstance(part, ZipEntry):
+                for data in self._read(part, start, stop):
+                    yield data
+            else:
+                # headers that need the crcs are built once they are known
+                if callable(part):
+                    part = part()
+                yield part[start:stop]
+            position = end
+
+    def _read(self, entry, start, stop):
+        whole = start == 0 and stop == entry.size
+        crc = 0
+        read = 0
+        for data in file_iterator(entry.path, start, stop - start):
+            if whole and entry.crc is None:
+                crc = zlib.crc32(data, crc)
+            read += len(data)
+            yield data
+
+        if read != stop - start:
+            raise IOError('%s changed while it was read' % entry.path)
+        if whole and entry.crc is None:
+            entry.crc = crc & 0xFFFFFFFF
+
+    def _layout(self):
+        parts = []
+        offset = 0
+        for entry in self.entries:
+            entry.offset = offset
+            header = self._local_header(entry)
+            parts.append((len(header), header))
+            parts.append((entry.size, entry))
+            offset += len(header) + entry.size
+            if not self.seekable:
+                length = entry.size >= ZIP64_LIMIT and 24 or 16
+                parts.append((length, lambda entry=entry: self._data_descriptor(entry)))
+                offset += length
+
+        cd_offset = offset
+        cd_size = 0
+        for entry in self.entries:
+            length = len(self._central_header(entry))
+            parts.append((length, lambda entry=entry: self._central_header(entry)))
+            cd_size += length
+
+        end = self._end_records(len(self.entries), cd_offset, cd_size)
+        parts.append((len(end), end))
+        return parts
+
+    def _flags(self):
+        if self.seekable:
+            return FLAG_UTF8
+        return FLAG_UTF8 | FLAG_DATA_DESCRIPTOR
+
+    def _local_header(self, entry):
+        # the sizes are known, only the crc can come after the data
+        size, extra, version = entry.size, '', VERSION
+        if entry.size >= ZIP64_LIMIT:
+            size, version = ZIP64_LIMIT, VERSION_ZIP64
+            extra = struct.pack('<HHQQ', 1, 16, entry.size, entry.size)
+        return struct.pack('<IHHHHHIIIHH', 0x04034b50, version, self._flags(), 0,
+            entry.time, entry.date, entry.crc or 0, size, size,
+            len(entry.name), len(extra)) + entry.name + extra
+
+    def _data_descriptor(self, entry):
+        if entry.size >= ZIP64_LIMIT:
+            return struct.pack('<IIQQ', 0x08074b50, entry.crc or 0, entry.size, entry.size)
+        return struct.pack('<IIII', 0x08074b50, entry.crc or 0, entry.size, entry.size)
+
+    def _central_header(self, entry):
+        size, offset, zip64 = entry.size, entry.offset, []
+        if entry.size >= ZIP64_LIMIT:
+            size = ZIP64_LIMIT
+            zip64.extend([entry.size, entry.size])
+        if entry.offset >= ZIP64_LIMIT:
+            offset = ZIP64_LIMIT
+            zip64.append(entry.offset)
+
+        extra, version = '', VERSION
+        if zip64:
+            extra = struct.pack('<HH%dQ' % len(zip64), 1, 8 * len(zip64), *zip64)
+            version = VERSION_ZIP64
+        return struct.pack('<IHHHHHHIIIHHHHHII', 0x02014b50, MADE_BY_UNIX | version,
+            version, self._flags(), 0, entry.time, entry.date, entry.crc or 0, size, size,
+            len(entry.name), len(extra), 0, 0, 0, 0644 << 16, offset) + entry.name + extra
+
+    def _end_records(self, count, cd_offset, cd_size):
+        records = ''
+        if count >= ZIP_FILECOUNT_LIMIT or cd_offset >= ZIP64_LIMIT or cd_size >= ZIP64_LIMIT:
+            zip64_offset = cd_offset + cd_size
+            records += struct.pack('<IQHHIIQQQQ', 0x06064b50, 44, MADE_BY_UNIX | VERSION_ZIP64,
+                VERSION_ZIP64, 0, 0, count, count, cd_size, cd_offset)
+            records += struct.pack('<IIQI', 0x07064b50, 0, zip64_offset, 1)
+            count = min(count, ZIP_FILECOUNT_LIMIT)
+            cd_offset = min(cd_offset, ZIP64_LIMIT)
+            cd_size = min(cd_size, ZIP64_LIMIT)
+        return records + struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, count, count,
+            cd_size, cd_offset, 0)
+
+
+def unique_name(name, names):
+    """
+    photo.jpg, photo-2.jpg, photo-3.jpg...
+    """
+    if name not in names:
+        return name
+    root, ext = os.path.splitext(name)
+    i = 2
+    while '%s-%d%s' % (root, i, ext) in names:
+        i += 1
+    return '%s-%d%s' % (root, i, ext)
@@ -526,3 +526,63 @@ def last_n_month(n):
     now = datetime.now()
     last = datetime(day=1, month=(now.month-n)%12, year=now.year-(now.month-n)/12)
     return last
+
+
+def corp_membership_export_rows(corp_app_id):
+    """
+    The titles and the rows of the export of the corporate memberships
+    """
+    from corporate_memberships.models import CorpField
+
+    corp_fields = list(CorpField.objects.filter(corp_app=corp_app_id).exclude(
+        field_type__in=('section_break', 'page_break')).order_by('order'))
+    label_list = [corp_field.label for corp_field in corp_fields]
+    label_list.extend(['Dues reps', 'Join Date', 'Expiration Date', 'Status', 'Status Detail'])
+
+    return label_list, _corp_membership_export_rows(corp_fields)
+
+
+def _corp_membership_export_rows(corp_fields):
+    from corporate_memberships.models import (CorporateMembership, CorpFieldEntry,
+                                              CorporateMembershipRep, AuthorizedDomain)
+
+    extra_field_names = ['dues_reps', 'join_dt', 'expiration_dt', 'status', 'status_detail']
+
+    for corp_memb in CorporateMembership.objects.all().iterator():
+        data_row = []
+        field_entries = CorpFieldEntry.objects.filter(corporate_membership=corp_memb).values('field', 'value')
+        field_entries_d = {}
+        for entry in field_entries:
+            field_entries_d[entry['field']] = entry['value']
+        for corp_field in corp_fields:
+            value = ''
+            if corp_field.field_name and corp_field.object_type == 'corporate_membership':
+                if corp_field.field_name == "corporate_membership_type":
+                    value = corp_memb.corporate_membership_type.name
+                elif corp_field.field_name == "authorized_domains":
+                    auth_domains = AuthorizedDomain.objects.filter(corporate_membership=corp_memb)
+                    value = '; '.join([auth_domain.name for auth_domain in auth_domains])
+                elif corp_field.field_name == 'payment_method':
+                    if corp_memb.payment_method:
+                        value = corp_memb.payment_method.human_name
+                else:
+                    value = getattr(corp_memb, corp_field.field_name)
+            else:
+                if field_entries_d.has_key(corp_field.id):
+                    value = field_entries_d[corp_field.id]
+            data_row.append(value)
+
+        for field in extra_field_names:
+            value = ''
+            if field == 'dues_reps':
+                dues_reps = CorporateMembershipRep.objects.filter(corporate_membership=corp_memb,
+                                                                is_dues_rep=True)
+                if dues_reps:
+                    value = '; '.join(['%s (%s)' % (dues_rep.user.get_full_name(), dues_rep.user.username) for dues_rep in dues_reps])
+            else:
+                value = getattr(corp_memb, field)
+                if field == 'expiration_dt' and (not corp_memb.expiration_dt):
+                    value = 'never expire'
+            data_row.append(value)
+
+        yield data_row
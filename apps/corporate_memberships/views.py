@@ -16,7 +16,7 @@ from django.utils.encoding import smart_str
 from django.utils import simplejson
 from django.db.models import Q
 
-from imports.utils import render_excel
+from base.exports import export, export_response
 
 from base.http import Http403
 from perms.utils import has_perm, is_admin, is_member
@@ -43,7 +43,8 @@ from corporate_memberships.utils import (get_corporate_membership_type_choices,
                                          validate_import_file,
                                          new_corp_mems_from_csv,
                                          get_over_time_stats,
-                                         get_summary)
+                                         get_summary,
+                                         corp_membership_export_rows)
 #from memberships.models import MembershipType
 from memberships.models import Membership
 
@@ -1179,10 +1180,7 @@ def download_csv_import_template(request, file_ext='.csv'):
             
     corp_memb_field_names.extend(['authorized_domains', 'dues_rep'])
     
-            
-    data_row_list = []
-    
-    return render_excel(filename, corp_memb_field_names, data_row_list, file_ext)
+    return export_response(filename, corp_memb_field_names, [])
 
 @staff_member_required
 def corp_import_invalid_records_download(request):
@@ -1209,11 +1207,9 @@ def corp_import_invalid_records_download(request):
             item.append(value)
             
         if item:
-            item.append('\n')
             item.insert(0, corp_memb.err_msg)
             item_list.append(item)
             
-    title_fields.append('\n')
     title_fields.insert(0, 'Invalid Reason?')
     
     filebase, filename = os.path.split(file_path)
@@ -1223,7 +1219,7 @@ def corp_import_invalid_records_download(request):
     #del request.session['corp_memb.import.file_path']
     #del request.session['corp_memb.import.invalid_skipped']
     
-    return render_excel(filename, title_fields, item_list, '.csv')
+    return export_response(filename, title_fields, item_list)
 
 @login_required
 def corp_export(request):
@@ -1237,73 +1233,8 @@ def corp_export(request):
             corp_app = form.cleaned_data['corp_app']
             
             filename = "corporate_memberships_%d_export.csv" % corp_app.id
-            
-            corp_fields = CorpField.objects.filter(corp_app=corp_app).exclude(field_type__in=('section_break', 
-                                                               'page_break')).order_by('order')
-            label_list = [corp_field.label for corp_field in corp_fields]
-            extra_field_labels = ['Dues reps', 'Join Date', 'Expiration Date', 'Status', 'Status Detail']
-            extra_field_names = ['dues_reps', 'join_dt', 'expiration_dt', 'status', 'status_detail']
-            
-            label_list.extend(extra_field_labels)
-            label_list.append('\n')
-            
-            data_row_list = []
-            corp_membs = CorporateMembership.objects.all()
-            for corp_memb in corp_membs:
-                data_row = []
-                field_entries = CorpFieldEntry.objects.filter(corporate_membership=corp_memb).values('field', 'value')
-                field_entries_d = {}
-                for entry in field_entries:
-                    field_entries_d[entry['field']] = entry['value']
-                for corp_field in corp_fields:
-                    value = ''
-                    if corp_field.field_name and corp_field.object_type == 'corporate_membership':
-                        if corp_field.field_name in ['corporate_membership_type',
-                                                     'authorized_domains',
-                                                     'payment_method']:
-                            if corp_field.field_name == "corporate_membership_type":
-                                value = corp_memb.corporate_membership_type.name
-                            elif corp_field.field_name == "authorized_domains":
-                                auth_domains = AuthorizedDomain.objects.filter(corporate_membership=corp_memb)
-                                value = '; '.join([auth_domain.name for auth_domain in auth_domains])
-                            elif corp_field.field_name == 'payment_method':
-                                if corp_memb.payment_method:
-                                    value = corp_memb.payment_method.human_name
-                                
-                        else:
-                            value = getattr(corp_memb, corp_field.field_name)
-                        
-                    else:
-                        if field_entries_d.has_key(corp_field.id):
-                            value = field_entries_d[corp_field.id]
-                        
-                    if value == None:
-                        value = ''
-                    value_type = type(value)
-                    if (value_type is bool) or (value_type is long) or (value_type is int):
-                        value = str(value)
-                    data_row.append(value.replace(',', ' '))
-                
-                for field in extra_field_names:
-                    value = ''
-                    if field == 'dues_reps':
-                        dues_reps = CorporateMembershipRep.objects.filter(corporate_membership=corp_memb,
-                                                                        is_dues_rep=True)
-                        if dues_reps:
-                            value = '; '.join(['%s (%s)' % (dues_rep.user.get_full_name(), dues_rep.user.username) for dues_rep in dues_reps])
-                    else:
-                        value = getattr(corp_memb, field)
-                        if field == 'expiration_dt' and (not corp_memb.expiration_dt):
-                            value = 'never expire'
-                    value_type = type(value)
-                    if (value_type is bool) or (value_type is long) or (value_type is int):
-                        value = str(value)
-                    data_row.append(value)
-                    
-                data_row.append('\n')
-                data_row_list.append(data_row)
-                
-            return render_excel(filename, label_list, data_row_list, '.csv')
+
+            return export(request, filename, corp_membership_export_rows, corp_app.pk)
                     
     return render_to_response(template_name, {
             'form':form
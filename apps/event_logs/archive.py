@@ -0,0 +1,312 @@
+"""
+Archival and retention of the event log.
+
+Event logs older than EVENT_LOG_ARCHIVE_DAYS move from the live table to
+one archive table per month (event_logs_eventlog_YYYYMM), in small
+batches so the live table is never locked for long. The archive tables
+have the columns of the event log; EventLog.objects.search() and
+get_any() look in them as well.
+
+Archive tables older than EVENT_LOG_RETENTION_MONTHS are written to
+gzipped JSON-lines files in EVENT_LOG_ARCHIVE_DIR and dropped. Those
+files are kept for the record and are not searched.
+
+Settings:
+    EVENT_LOG_ARCHIVE_DAYS - archive event logs older than this (default: never)
+    EVENT_LOG_RETENTION_MONTHS - months of archive tables to keep (default: all)
+    EVENT_LOG_ARCHIVE_DIR - directory of the archive files
+"""
+import os
+import re
+import gzip
+import time
+from datetime import date, datetime
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import simplejson
+
+ARCHIVE_TABLE_PREFIX = 'event_logs_eventlog_'
+ARCHIVE_TABLE_RE = re.compile(r'^%s(\d{4})(\d{2})$' % ARCHIVE_TABLE_PREFIX)
+
+# event logs moved per transaction
+BATCH_SIZE = 900
+
+
+def get_archive_dir():
+    return getattr(settings, 'EVENT_LOG_ARCHIVE_DIR',
+        os.path.join(settings.PROJECT_ROOT, 'event_log_archive'))
+
+
+def _next_month(month):
+    if month.month == 12:
+        return date(month.year + 1, 1, 1)
+    return date(month.year, month.month + 1, 1)
+
+
+def archive_table(month):
+    return '%s%s' % (ARCHIVE_TABLE_PREFIX, month.strftime('%Y%m'))
+
+
+def archive_model(month):
+    """
+    A model on the archive table of a month. It has the fields and
+    methods of EventLog but is never created by syncdb.
+    """
+    from event_logs.models import EventLogBase
+
+    class Meta:
+        db_table = archive_table(month)
+        managed = False
+        app_label = 'event_logs'
+
+    # django hands back the registered class when it is asked again
+    return type('EventLogArchive%s' % month.strftime('%Y%m'), (EventLogBase,), {
+        '__module__': EventLogBase.__module__,
+        'Meta': Meta,
+    })
+
+
+def archive_months():
+    """
+    The months that have an archive table, newest first
+    """
+    months = []
+    for table in connection.introspection.table_names():
+        match = ARCHIVE_TABLE_RE.match(table)
+        if match:
+            months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    months.sort(reverse=True)
+    return months
+
+
+def archive_models(start_dt=None, end_dt=None):
+    """
+    The archive models of the months between start_dt and end_dt,
+    newest first
+    """
+    models = []
+    for month in archive_months():
+        month_start = datetime(month.year, month.month, 1)
+        month_end = datetime.combine(_next_month(month), datetime.min.time())
+        if end_dt and month_start > end_dt:
+            continue
+        if start_dt and month_end <= start_dt:
+            continue
+        models.append(archive_model(month))
+    return models
+
+
+def create_archive_table(month):
+    """
+    Create the archive table of a month unless it exists
+    """
+    from event_logs.models import EventLog
+
+    table = archive_table(month)
+    if table in connection.introspection.table_names():
+        return table
+
+    qn = connection.ops.quote_name
+    engine = connection.settings_dict['ENGINE']
+    cursor = connection.cursor()
+    if 'mysql' in engine:
+        # copies the columns and indexes, not the foreign keys
+        cursor.execute('CREATE TABLE %s LIKE %s' % (qn(table), qn(EventLog._meta.db_table)))
+    elif 'postgresql' in engine:
+        cursor.execute('CREATE TABLE %s (LIKE %s INCLUDING INDEXES)' % (
+            qn(table), qn(EventLog._meta.db_table)))
+    else:
+        cursor.execute('CREATE TABLE %s AS SELECT * FROM %s WHERE 1 = 0' % (
+            qn(table), qn(EventLog._meta.db_table)))
+        cursor.execute('CREATE UNIQUE INDEX %s ON %s (%s)' % (
+            qn('%s_id' % table), qn(table), qn('id')))
+    # searches always filter on the date
+    cursor.execute('CREATE INDEX %s ON %s (%s)' % (
+        qn('%s_create_dt' % table), qn(table), qn('create_dt')))
+    transaction.commit_unless_managed()
+    return table
+
+
+@transaction.commit_on_success
+def _archive_batch(by_month):
+    from event_logs.models import EventLog
+
+    qn = connection.ops.quote_name
+    columns = ', '.join([qn(f.column) for f in EventLog._meta.local_fields])
+    cursor = connection.cursor()
+    for month, ids in by_month.items():
+        placeholders = ', '.join(['%s'] * len(ids))
+        cursor.execute('INSERT INTO %s (%s) SELECT %s FROM %s WHERE %s IN (%s)' % (
+            qn(archive_table(month)), columns, columns,
+            qn(EventLog._meta.db_table), qn('id'), placeholders), ids)
+        cursor.execute('DELETE FROM %s WHERE %s IN (%s)' % (
+            qn(EventLog._meta.db_table), qn('id'), placeholders), ids)
+
+
+def archive_event_logs(before, batch_size=BATCH_SIZE, sleep=0, verbosity=0):
+    """
+    Move the event logs created before a datetime to the archive
+    tables, batch_size rows per transaction. Returns the number moved.
+    """
+    from event_logs.models import EventLog
+    from event_logs.rollups import rollup_event_logs, get_mark
+
+    # the rollups count from the live table; count everything first
+    # and never move what they have not seen
+    rollup_event_logs()
+    last_id = get_mark().last_id
+
+    total = 0
+    while True:
+        rows = EventLog.objects.filter(pk__lte=last_id, create_dt__lt=before)\
+                .order_by('pk').values_list('pk', 'create_dt')[:batch_size]
+
+        by_month = {}
+        for pk, create_dt in rows:
+            month = date(create_dt.year, create_dt.month, 1)
+            by_month.setdefault(month, []).append(pk)
+        if not by_month:
+            break
+
+        # outside the transaction, DDL commits on mysql
+        for month in by_month:
+            create_archive_table(month)
+        _archive_batch(by_month)
+
+        count = sum([len(ids) for ids in by_month.values()])
+        total += count
+        if verbosity >= 2:
+            print 'archived %d event logs' % count
+        if sleep:
+            time.sleep(sleep)
+    return total
+
+
+def expire_archives(before, directory=None, verbosity=0):
+    """
+    Write the archive tables of the months before a date to gzipped
+    JSON-lines files and drop them. Returns the file names.
+    """
+    directory = directory or get_archive_dir()
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    files = []
+    qn = connection.ops.quote_name
+    for month in archive_months():
+        if month >= before:
+            continue
+        model = archive_model(month)
+        path = os.path.join(directory, 'event_logs_%s.jsonl.gz' % month.strftime('%Y%m'))
+
+        f = gzip.open(path + '.tmp', 'wb')
+        last_id = 0
+        while True:
+            rows = list(model.objects.filter(pk__gt=last_id).order_by('pk').values()[:1000])
+            if not rows:
+                break
+            for row in rows:
+                f.write(simplejson.dumps(row, cls=DjangoJSONEncoder))
+                f.write('\n')
+            last_id = rows[-1]['id']
+        f.close()
+        os.rename(path + '.tmp', path)
+
+        cursor = connection.cursor()
+        cursor.execute('DROP TABLE %s' % qn(model._meta.db_table))
+        transaction.commit_unless_managed()
+
+        files.append(path)
+        if verbosity >= 1:
+            print 'wrote %s and dropped %s' % (path, model._meta.db_table)
+    return files
+
+
+@transaction.commit_on_success
+def _compact_batch(by_user_agent):
+    from event_logs.models import EventLog, EventLogUserAgent
+
+    for user_agent, ids in by_user_agent.items():
+        EventLog.objects.filter(pk__in=ids).update(http_user_agent=None,
+            user_agent=EventLogUserAgent.objects.get_id(user_agent))
+
+
+def compact_user_agents(batch_size=BATCH_SIZE, sleep=0, verbosity=0):
+    """
+    Move the user agent strings of the older event logs to the
+    lookup table. Returns the number of event logs compacted.
+    """
+    from event_logs.models import EventLog
+
+    total = 0
+    last_id = 0
+    while True:
+        rows = list(EventLog.objects.filter(pk__gt=last_id, user_agent__isnull=True,
+                    http_user_agent__isnull=False)
+                    .order_by('pk').values_list('pk', 'http_user_agent')[:batch_size])
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        by_user_agent = {}
+        for pk, user_agent in rows:
+            by_user_agent.setdefault(user_agent, []).append(pk)
+        _compact_batch(by_user_agent)
+
+        total += len(rows)
+        if verbosity >= 2:
+            print 'compacted %d event logs' % total
+        if sleep:
+            time.sleep(sleep)
+    return total
+
+
+class ArchiveSearchResults(object):
+    """
+    The results of a search in the live event log followed by the
+    archive tables, newest first. Counts and slices like a queryset,
+    so it can be paginated.
+    """
+    def __init__(self, querysets):
+        self.querysets = querysets
+        self._counts = None
+
+    def counts(self):
+        if self._counts is None:
+            self._counts = [queryset.count() for queryset in self.querysets]
+        return self._counts
+
+    def count(self):
+        return sum(self.counts())
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        for queryset in self.querysets:
+            for event_log in queryset.iterator():
+                yield event_log
+
+    def __getitem__(self, k):
+        if not isinstance(k, slice):
+            results = self[k:k + 1]
+            if not results:
+                raise IndexError
+            return results[0]
+
+        start = k.start or 0
+        stop = k.stop
+        if stop is None:
+            stop = self.count()
+
+        results = []
+        offset = 0
+        for queryset, count in zip(self.querysets, self.counts()):
+            if stop <= offset:
+                break
+            if start < offset + count:
+                results.extend(queryset[max(start - offset, 0):stop - offset])
+            offset += count
+        return results
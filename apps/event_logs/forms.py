@@ -27,6 +27,21 @@ class EventsFilterForm(forms.Form):
             queryset = queryset.filter(session_id=cd['session_id'])
         return queryset
 
+    def rollup_filters(self):
+        """
+        The filters as keyword arguments of event_logs.rollups.summarize,
+        or None if they need the event log itself (ip, session)
+        """
+        cd = self.cleaned_data
+        if cd['ip'] or cd['session_id']:
+            return None
+        filters = {}
+        if cd['event_id']:
+            filters['event_id'] = cd['event_id']
+        if cd['user_id']:
+            filters['user_id'] = cd['user_id']
+        return filters
+
 
 class EventLogSearchForm(BetterForm):
     start_dt = SplitDateTimeField(
@@ -0,0 +1,64 @@
+import time
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+from django.http import HttpRequest
+
+
+class Command(BaseCommand):
+    """
+    Compare the time EventLog.objects.log() takes inside a request
+    when saving every event against queuing it for a batched insert.
+    The rows written by the benchmark are deleted afterwards.
+
+    example: python manage.py event_logs_benchmark --count=2000
+    """
+    option_list = BaseCommand.option_list + (
+        make_option('--count', action='store', dest='count', default=1000,
+            help='Number of events to log in each mode'),
+    )
+
+    def handle(self, *args, **options):
+        from event_logs.models import EventLog
+        from event_logs.writer import EventLogWriter
+        import event_logs.managers
+
+        count = int(options['count'])
+        request = HttpRequest()
+        request.path = '/benchmark/'
+        request.META = {
+            'REMOTE_ADDR': '127.0.0.1',
+            'REQUEST_METHOD': 'GET',
+            'HTTP_USER_AGENT': 'Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/535.7 '
+                               '(KHTML, like Gecko) Chrome/16.0.912.75 Safari/535.7',
+        }
+        start_id = EventLog.objects.order_by('-pk').values_list('pk', flat=True)[:1]
+        start_id = start_id and start_id[0] or 0
+
+        default_writer = event_logs.managers.writer
+        try:
+            for mode in ('sync', 'buffered'):
+                writer = EventLogWriter(mode=mode, start_thread=False)
+                event_logs.managers.writer = writer
+
+                start = time.time()
+                for i in xrange(count):
+                    EventLog.objects.log(
+                        event_id=0,
+                        event_data='benchmark %s' % i,
+                        description='event log benchmark',
+                        request=request,
+                        source='event_logs',
+                    )
+                in_request = time.time() - start
+
+                start = time.time()
+                writer.flush()
+                flushed = time.time() - start
+
+                print '%-8s %8.3f ms per log() call, %8.3f ms to flush %d events' % (
+                    mode, in_request * 1000 / count, flushed * 1000, count)
+        finally:
+            event_logs.managers.writer = default_writer
+            EventLog.objects.filter(pk__gt=start_id, event_id=0,
+                description='event log benchmark').delete()
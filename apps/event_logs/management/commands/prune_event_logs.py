@@ -0,0 +1,63 @@
+from datetime import date, datetime, timedelta
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """
+    Keep the live event log small:
+
+    1. Move the user agent strings of older event logs to the lookup table
+    2. Move event logs older than EVENT_LOG_ARCHIVE_DAYS (or --days)
+       to monthly archive tables
+    3. Write archive tables older than EVENT_LOG_RETENTION_MONTHS
+       (or --months) to gzipped JSON-lines files and drop them
+
+    Rows are moved in small batches, each in its own transaction,
+    with --sleep seconds between batches. Run it from cron.
+
+    example: python manage.py prune_event_logs --days=90 --months=24 --sleep=0.1
+    """
+    option_list = BaseCommand.option_list + (
+        make_option('--days', action='store', dest='days',
+            default=getattr(settings, 'EVENT_LOG_ARCHIVE_DAYS', None),
+            help='Archive event logs older than this many days'),
+        make_option('--months', action='store', dest='months',
+            default=getattr(settings, 'EVENT_LOG_RETENTION_MONTHS', None),
+            help='Keep this many months of archive tables'),
+        make_option('--batch-size', action='store', dest='batch_size', default=None,
+            help='Number of event logs moved per transaction'),
+        make_option('--sleep', action='store', dest='sleep', default=0,
+            help='Seconds to pause between batches'),
+        make_option('--no-compact', action='store_false', dest='compact', default=True,
+            help='Leave the user agent strings where they are'),
+    )
+
+    def handle(self, *args, **options):
+        from event_logs.archive import (compact_user_agents, archive_event_logs,
+            expire_archives, BATCH_SIZE)
+
+        verbosity = int(options.get('verbosity', 1))
+        batch_size = int(options['batch_size'] or BATCH_SIZE)
+        sleep = float(options['sleep'])
+
+        if options['compact']:
+            count = compact_user_agents(batch_size=batch_size, sleep=sleep,
+                verbosity=verbosity)
+            if verbosity >= 1:
+                print 'compacted the user agents of %d event logs' % count
+
+        if options['days']:
+            before = datetime.now() - timedelta(days=int(options['days']))
+            count = archive_event_logs(before, batch_size=batch_size, sleep=sleep,
+                verbosity=verbosity)
+            if verbosity >= 1:
+                print 'archived %d event logs created before %s' % (count, before)
+
+        if options['months']:
+            today = date.today()
+            months = today.year * 12 + today.month - 1 - int(options['months'])
+            before = date(months / 12, months % 12 + 1, 1)
+            expire_archives(before, verbosity=verbosity)
@@ -0,0 +1,55 @@
+from datetime import date, timedelta
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """
+    Count the new event logs into the rollup tables read by the
+    event summary reports and collect_metrics. Run it from cron.
+
+    --rebuild  counts the whole event log again, archive tables
+               included (backfill)
+    --check    compares the rollups of the last --days days with
+               the event log, --repair counts the days that differ again
+
+    example: python manage.py rollup_event_logs --check --days=30 --repair
+    """
+    option_list = BaseCommand.option_list + (
+        make_option('--rebuild', action='store_true', dest='rebuild', default=False,
+            help='Drop the rollups and count the whole event log again'),
+        make_option('--check', action='store_true', dest='check', default=False,
+            help='Compare the rollups with the event log'),
+        make_option('--repair', action='store_true', dest='repair', default=False,
+            help='With --check, count the days that differ again'),
+        make_option('--days', action='store', dest='days', default=7,
+            help='Number of days to check'),
+        make_option('--chunk-size', action='store', dest='chunk_size', default=None,
+            help='Number of event logs counted per transaction'),
+    )
+
+    def handle(self, *args, **options):
+        from event_logs.rollups import (rollup_event_logs, rebuild_rollups,
+            check_rollups, rebuild_day, CHUNK_SIZE)
+
+        verbosity = int(options.get('verbosity', 1))
+        chunk_size = int(options['chunk_size'] or CHUNK_SIZE)
+
+        if options['rebuild']:
+            rebuild_rollups()
+
+        count = rollup_event_logs(chunk_size=chunk_size, verbosity=verbosity)
+        if verbosity >= 1:
+            print 'counted %d event logs' % count
+
+        if options['check']:
+            end_day = date.today()
+            start_day = end_day - timedelta(days=int(options['days']) - 1)
+            differences = check_rollups(start_day, end_day)
+            for day, event_logs, rollups in differences:
+                print '%s: %d event logs, %d in the rollups' % (day, event_logs, rollups)
+                if options['repair']:
+                    rebuild_day(day)
+            if verbosity >= 1 and not differences:
+                print 'rollups match the event log from %s to %s' % (start_day, end_day)
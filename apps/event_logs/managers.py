@@ -1,8 +1,9 @@
+import uuid
+from hashlib import md5
 from time import strptime
 from datetime import datetime, timedelta
 from operator import and_
 
-from socket import gethostbyname, gethostname
 from django.db.models import Manager
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.auth.models import AnonymousUser
@@ -10,6 +11,7 @@ from django.db.models import Q
 from django.conf import settings
 
 from robots.models import Robot
+from event_logs.writer import writer, get_server_ip
 
 from haystack.query import SearchQuerySet
 
@@ -25,6 +27,7 @@ default_keyword_args = (
     'description',
     'entity',
     'source',
+    'sync',
 )
 
 
@@ -74,9 +77,36 @@ class EventLogManager(Manager):
 
         event_logs = self.model.objects.filter(
             reduce(and_, qs)
-        )
+        ).select_related('user_agent')
 
-        return event_logs.order_by('-create_dt')
+        event_logs = event_logs.order_by('-create_dt')
+
+        # the older event logs live in monthly archive tables
+        from event_logs.archive import archive_models, ArchiveSearchResults
+        start_dt = f_data['start_dt'] or datetime.now() - timedelta(weeks=4)
+        end_dt = f_data['end_dt'] or datetime.now()
+        archives = [model.objects.filter(reduce(and_, qs)).select_related('user_agent')
+                    .order_by('-create_dt') for model in archive_models(start_dt, end_dt)]
+        if archives:
+            return ArchiveSearchResults([event_logs] + archives)
+        return event_logs
+
+    def get_any(self, pk):
+        """
+        The event log with this id, from the live table or an archive table.
+        Raises DoesNotExist if there is none.
+        """
+        from event_logs.archive import archive_models
+        try:
+            return self.get(pk=pk)
+        except self.model.DoesNotExist:
+            pass
+        for model in archive_models():
+            try:
+                return model.objects.get(pk=pk)
+            except model.DoesNotExist:
+                pass
+        raise self.model.DoesNotExist
 
     def log(self, **kwargs):
         """
@@ -90,6 +120,8 @@ class EventLogManager(Manager):
             event_type - defaults to 'information'
             source - defaults to app_label if instance is passed
             entity - entity object
+            sync - save the event log right away, whatever
+                   EVENT_LOG_WRITE_MODE is; for callers that need its pk
         Required keyword Arguments:
             event_id
             event_data
@@ -103,6 +135,10 @@ class EventLogManager(Manager):
             'description': 'article added'
         }
         EventLog.objects.log(**eventlog_defaults)
+
+        Returns the event log, which is not saved yet, and has no pk,
+        when it is queued (EVENT_LOG_WRITE_MODE 'buffered' or 'celery')
+        unless sync is True.
         """
         request, user, instance = None, None, None
         event_log = self.model()
@@ -186,19 +222,21 @@ class EventLogManager(Manager):
             if hasattr(request, 'META'):
                 event_log.user_ip_address = request.META.get('REMOTE_ADDR', '')
                 event_log.http_referrer = request.META.get('HTTP_REFERER', '')[:255]
-                event_log.http_user_agent = request.META.get('HTTP_USER_AGENT', '')
+                user_agent = request.META.get('HTTP_USER_AGENT', '')
                 event_log.request_method = request.META.get('REQUEST_METHOD', '')
                 event_log.query_string = request.META.get('QUERY_STRING', '')
 
+                # the string goes to the user agent lookup table
+                if user_agent:
+                    user_agent_model = self.model._meta.get_field('user_agent').rel.to
+                    event_log.user_agent_id = user_agent_model.objects.get_id(user_agent)
+
                 # take care of robots
-                robot = Robot.objects.get_by_agent(event_log.http_user_agent)
+                robot = Robot.objects.get_by_agent(user_agent)
                 if robot:
                     event_log.robot = robot
 
-            try:
-                event_log.server_ip_address = settings.INTERNAL_IPS[0]
-            except:
-                event_log.server_ip_address = gethostbyname(gethostname())
+            event_log.server_ip_address = get_server_ip()
 
             if hasattr(request, 'path'):
                 event_log.url = request.path or ''
@@ -218,6 +256,33 @@ class EventLogManager(Manager):
         if not event_log.source:
             event_log.source = ''
 
-        event_log.save()
+        # saved right away or queued for a multi-row insert,
+        # depending on EVENT_LOG_WRITE_MODE; see event_logs.writer
+        event_log.guid = str(uuid.uuid1())
+        return writer.write(event_log, sync=kwargs.get('sync', False))
+
+
+# hash: id of the user agents this process has seen
+_user_agent_ids = {}
+USER_AGENT_IDS_SIZE = 10000
 
-        return event_log
+
+class UserAgentManager(Manager):
+    def get_id(self, user_agent):
+        """
+        The id of a user agent string in the lookup table,
+        added if it is not there yet
+        """
+        if isinstance(user_agent, unicode):
+            user_agent = user_agent.encode('utf-8')
+        key = md5(user_agent).hexdigest()
+        if key in _user_agent_ids:
+            return _user_agent_ids[key]
+
+        pk = self.get_or_create(hash=key, defaults={
+            'user_agent': unicode(user_agent, errors='ignore')})[0].pk
+
+        if len(_user_agent_ids) >= USER_AGENT_IDS_SIZE:
+            _user_agent_ids.clear()
+        _user_agent_ids[key] = pk
+        return pk
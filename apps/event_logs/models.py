@@ -3,12 +3,30 @@ from django.db import models
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.auth.models import User
 
-from event_logs.managers import EventLogManager
+from event_logs.managers import EventLogManager, UserAgentManager
 from entities.models import Entity
 from robots.models import Robot
 from event_logs.colors import get_color
 
-class EventLog(models.Model):
+class EventLogUserAgent(models.Model):
+    """
+    Lookup table of user agent strings; an event log refers to
+    its user agent instead of storing the string on every row.
+    """
+    hash = models.CharField(max_length=32, unique=True)
+    user_agent = models.TextField()
+
+    objects = UserAgentManager()
+
+    def __unicode__(self):
+        return self.user_agent
+
+
+class EventLogBase(models.Model):
+    """
+    The columns of the event log, shared by the live table and
+    the monthly archive tables of event_logs.archive
+    """
     guid = models.CharField(max_length=40) 
     content_type = models.ForeignKey(ContentType, null=True)
     object_id = models.IntegerField(null=True)
@@ -29,16 +47,16 @@ class EventLog(models.Model):
     http_referrer = models.URLField(max_length=255, null=True)
     headline = models.CharField(max_length=50, null=True)
     description = models.CharField(max_length=120, null=True)
+    # older rows keep the string, newer ones refer to user_agent
     http_user_agent = models.TextField(null=True)
+    user_agent = models.ForeignKey(EventLogUserAgent, null=True)
     request_method = models.CharField(max_length=10, null=True)
     query_string = models.TextField(null=True)
     robot = models.ForeignKey(Robot, null=True)
     create_dt = models.DateTimeField(auto_now_add=True)
-    
-    objects = EventLogManager()
 
     class Meta:
-        permissions = (("view_eventlog","Can view eventlog"),)
+        abstract = True
 
     def color(self):
         return get_color(str(self.event_id))
@@ -47,14 +65,58 @@ class EventLog(models.Model):
         return ('event_log', [self.pk])
     get_absolute_url = models.permalink(get_absolute_url)
 
+    def get_user_agent(self):
+        if self.user_agent_id:
+            return self.user_agent.user_agent
+        return self.http_user_agent
+
+    def __unicode__(self):
+        return str(self.event_id)
+
+
+class EventLog(EventLogBase):
+    objects = EventLogManager()
+
+    class Meta:
+        permissions = (("view_eventlog","Can view eventlog"),)
+
     def save(self):
         if not self.id:
             self.guid = uuid.uuid1()
 
         super(EventLog, self).save()
 
+
+class EventLogRollup(models.Model):
+    """
+    Hourly event counts, kept up to date from the event log by
+    event_logs.rollups. The summary reports and metrics read these
+    instead of counting the raw event log.
+    """
+    day = models.DateField(db_index=True)
+    hour = models.SmallIntegerField()
+    event_id = models.IntegerField()
+    source = models.CharField(max_length=50, null=True)
+    description = models.CharField(max_length=120, null=True)
+    is_robot = models.BooleanField(default=False)
+    user = models.ForeignKey(User, null=True)
+    count = models.IntegerField(default=0)
+
     def __unicode__(self):
-        return str(self.event_id)
+        return '%s %s:00 %s' % (self.day, self.hour, self.event_id)
+
+
+class EventLogRollupMark(models.Model):
+    """
+    High-water mark of the rollups: every event log up to and
+    including last_id is counted in EventLogRollup.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    last_id = models.IntegerField(default=0)
+    update_dt = models.DateTimeField(auto_now=True)
+
+    def __unicode__(self):
+        return '%s: %s' % (self.name, self.last_id)
 
 
 class CachedColorModel(models.Model):
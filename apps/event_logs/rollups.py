@@ -0,0 +1,290 @@
+"""
+Incremental rollups of the event log.
+
+EventLogRollup holds event counts per hour, event_id, source,
+description, robot/non-robot and user. rollup_event_logs() counts the
+event logs added since the high-water mark (EventLogRollupMark) and
+adds them to the rollups, one id range per transaction. It runs from
+the rollup_event_logs management command.
+
+summarize() reads the rollups and adds a live count of the few event
+logs past the mark, so the reports are exact between two runs.
+"""
+from datetime import date, datetime, timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count, Sum, Min, F
+
+from base.utils import bulk_insert
+
+MARK_NAME = 'rollup'
+
+# event logs counted per transaction
+CHUNK_SIZE = 50000
+
+# event logs younger than this are left for the next run, so rows
+# still being inserted by a slow transaction are not skipped
+ROLLUP_DELAY = timedelta(minutes=5)
+
+# the columns of a rollup, in the order of the keys of count_event_logs
+KEY_FIELDS = ('day', 'hour', 'event_id', 'source', 'description', 'is_robot', 'user_id')
+
+
+class RollupConflict(Exception):
+    """
+    Another process moved the mark while this one was counting
+    """
+    pass
+
+
+def _to_date(value):
+    """
+    DATE() comes back as a string from sqlite
+    """
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+
+def get_mark():
+    from event_logs.models import EventLogRollupMark
+    mark, created = EventLogRollupMark.objects.get_or_create(name=MARK_NAME)
+    return mark
+
+
+def count_event_logs(queryset):
+    """
+    Count a queryset of event logs in the database, grouped by hour,
+    event_id, source, description, robot/non-robot and user.
+    Returns a dict of (day, hour, event_id, source, description,
+    is_robot, user_id): count
+    """
+    column = '%s.%s' % (connection.ops.quote_name(queryset.model._meta.db_table),
+                        connection.ops.quote_name('create_dt'))
+    rows = queryset.extra(select={
+                'day': 'DATE(%s)' % column,
+                'hour': connection.ops.date_extract_sql('hour', column),
+            })\
+            .values('day', 'hour', 'event_id', 'source', 'description', 'robot', 'user')\
+            .annotate(count=Count('pk'))\
+            .order_by()
+
+    counts = {}
+    for row in rows:
+        key = (_to_date(row['day']), int(row['hour']), row['event_id'], row['source'],
+               row['description'], row['robot'] is not None, row['user'])
+        # robots collapse into one is_robot group
+        counts[key] = counts.get(key, 0) + row['count']
+    return counts
+
+
+def add_counts(counts):
+    """
+    Add the counts of count_event_logs to the rollup rows
+    """
+    from event_logs.models import EventLogRollup
+
+    if not counts:
+        return
+
+    days = set([key[0] for key in counts])
+    hours = set([key[1] for key in counts])
+    existing = {}
+    for rollup in EventLogRollup.objects.filter(day__in=days, hour__in=hours):
+        existing[tuple([getattr(rollup, f) for f in KEY_FIELDS])] = rollup.pk
+
+    new = []
+    for key, count in counts.items():
+        if key in existing:
+            EventLogRollup.objects.filter(pk=existing[key]).update(count=F('count') + count)
+        else:
+            new.append(EventLogRollup(count=count, **dict(zip(KEY_FIELDS, key))))
+    bulk_insert(EventLogRollup, new)
+
+
+@transaction.commit_on_success
+def _rollup_range(first_id, last_id):
+    from event_logs.models import EventLog, EventLogRollupMark
+
+    # moving the mark first locks its row until the commit;
+    # a second process waits here and then finds the mark moved
+    moved = EventLogRollupMark.objects.filter(name=MARK_NAME,
+        last_id=first_id).update(last_id=last_id)
+    if not moved:
+        raise RollupConflict
+
+    counts = count_event_logs(EventLog.objects.filter(pk__gt=first_id, pk__lte=last_id))
+    add_counts(counts)
+    return sum(counts.values())
+
+
+def rollup_event_logs(chunk_size=CHUNK_SIZE, verbosity=0):
+    """
+    Count the event logs added since the last run into the rollups.
+    Returns the number of event logs counted.
+    """
+    from event_logs.models import EventLog
+
+    cutoff = datetime.now() - ROLLUP_DELAY
+    max_id = EventLog.objects.filter(create_dt__lte=cutoff)\
+                .order_by('-pk').values_list('pk', flat=True)[:1]
+    max_id = max_id and max_id[0] or 0
+
+    total = 0
+    while True:
+        first_id = get_mark().last_id
+        if first_id >= max_id:
+            break
+        last_id = min(first_id + chunk_size, max_id)
+        try:
+            total += _rollup_range(first_id, last_id)
+        except RollupConflict:
+            # somebody else is rolling up, leave it to them
+            break
+        if verbosity >= 2:
+            print 'counted event logs %s to %s' % (first_id + 1, last_id)
+    return total
+
+
+@transaction.commit_on_success
+def rebuild_rollups():
+    """
+    Count the event logs again: the archive tables right away, the
+    live event log from the next rollup_event_logs(). The rollups of
+    the days before the oldest event log left in the database are
+    kept, their archive tables were expired to files.
+    Returns the number of archived event logs counted.
+    """
+    from event_logs.models import EventLog, EventLogRollup, EventLogRollupMark
+    from event_logs.archive import archive_models
+
+    get_mark()
+    EventLogRollupMark.objects.filter(name=MARK_NAME).update(last_id=0)
+
+    models = archive_models()
+    first_dts = [model.objects.aggregate(first_dt=Min('create_dt'))['first_dt']
+        for model in [EventLog] + models]
+    first_dts = [first_dt for first_dt in first_dts if first_dt]
+    if not first_dts:
+        # nothing left to count them again from
+        return 0
+    EventLogRollup.objects.filter(day__gte=min(first_dts).date()).delete()
+
+    total = 0
+    for model in models:
+        counts = count_event_logs(model.objects.all())
+        add_counts(counts)
+        total += sum(counts.values())
+    return total
+
+
+@transaction.commit_on_success
+def rebuild_day(day):
+    """
+    Count one day again from the event log
+    """
+    from event_logs.models import EventLogRollup, EventLogRollupMark
+
+    # lock the mark so no rollup runs in between
+    get_mark()
+    EventLogRollupMark.objects.filter(name=MARK_NAME).update(last_id=F('last_id'))
+    last_id = get_mark().last_id
+
+    EventLogRollup.objects.filter(day=day).delete()
+    counts = {}
+    for model in _event_log_models(day, day):
+        for key, count in count_event_logs(model.objects.filter(pk__lte=last_id,
+                create_dt__gte=day, create_dt__lt=day + timedelta(days=1))).items():
+            counts[key] = counts.get(key, 0) + count
+    add_counts(counts)
+
+
+def _event_log_models(start_day, end_day):
+    """
+    The live event log and the archive tables of the days
+    """
+    from event_logs.models import EventLog
+    from event_logs.archive import archive_models
+
+    return [EventLog] + archive_models(datetime.combine(start_day, datetime.min.time()),
+        datetime.combine(end_day + timedelta(days=1), datetime.min.time()))
+
+
+def check_rollups(start_day, end_day):
+    """
+    Compare the rollups with a count of the event log, archive tables
+    included, up to the mark. Returns a list of (day, event log count,
+    rollup count) for the days that differ.
+    """
+    from event_logs.models import EventLogRollup
+
+    last_id = get_mark().last_id
+    rollups = EventLogRollup.objects.filter(day__gte=start_day, day__lte=end_day)\
+                .values('day').annotate(count=Sum('count')).order_by()
+    rollups = dict([(_to_date(row['day']), row['count']) for row in rollups])
+
+    models = _event_log_models(start_day, end_day)
+    differences = []
+    day = start_day
+    while day <= end_day:
+        count = sum([model.objects.filter(pk__lte=last_id, create_dt__gte=day,
+            create_dt__lt=day + timedelta(days=1)).count() for model in models])
+        if count != rollups.get(day, 0):
+            differences.append((day, count, rollups.get(day, 0)))
+        day += timedelta(days=1)
+    return differences
+
+
+def summarize(group_by, start_day, end_day, event_id=None, source=None,
+              is_robot=None, user_id=None):
+    """
+    Event counts from start_day to end_day (inclusive) grouped by some
+    of the rollup columns. Returns a list of dicts with the group_by
+    columns and a count, like values().annotate(count=Count('pk')).
+    """
+    from event_logs.models import EventLog, EventLogRollup
+
+    group_by = list(group_by)
+    filters = {}
+    for name, value in (('event_id', event_id), ('source', source),
+                        ('is_robot', is_robot), ('user', user_id)):
+        if value is not None:
+            filters[name] = value
+
+    last_id = get_mark().last_id
+    summary = {}
+
+    rollups = EventLogRollup.objects.filter(day__gte=start_day, day__lte=end_day, **filters)
+    for row in rollups.values(*group_by).annotate(count=Sum('count')).order_by():
+        if 'day' in row:
+            row['day'] = _to_date(row['day'])
+        key = tuple([row[f] for f in group_by])
+        summary[key] = summary.get(key, 0) + row['count']
+
+    # the event logs past the mark are not in the rollups yet
+    tail = EventLog.objects.filter(pk__gt=last_id, create_dt__gte=start_day,
+        create_dt__lt=end_day + timedelta(days=1))
+    if event_id is not None:
+        tail = tail.filter(event_id=event_id)
+    if source is not None:
+        tail = tail.filter(source=source)
+    if is_robot is not None:
+        tail = tail.filter(robot__isnull=not is_robot)
+    if user_id is not None:
+        tail = tail.filter(user=user_id)
+    fields = [KEY_FIELDS.index(f == 'user' and 'user_id' or f) for f in group_by]
+    for key, count in count_event_logs(tail).items():
+        key = tuple([key[i] for i in fields])
+        summary[key] = summary.get(key, 0) + count
+
+    return [dict(zip(group_by, key), count=count) for key, count in summary.items()]
+
+
+def count_events(start_day, end_day, **filters):
+    """
+    Number of events from start_day to end_day (inclusive),
+    takes the filters of summarize
+    """
+    return sum([row['count'] for row in summarize(('day',), start_day, end_day, **filters)])
@@ -0,0 +1,14 @@
+from celery.task import Task
+from celery.registry import tasks
+
+
+class WriteEventLogsTask(Task):
+
+    def run(self, event_logs, **kwargs):
+        """
+        Write a batch of queued event logs with multi-row inserts.
+        """
+        from event_logs.writer import write_event_logs
+        return write_event_logs(event_logs)
+
+tasks.register(WriteEventLogsTask)
@@ -4,10 +4,17 @@ unittest). These will both pass when you run "manage.py test".
 
 Replace these with more appropriate tests for your application.
 """
+from datetime import date, datetime, timedelta
+
 from django.test import TestCase, Client
 from django.contrib.auth.models import User
+from django.db.models import Count
 
-from event_logs.models import EventLog
+from event_logs.models import EventLog, EventLogRollup, EventLogUserAgent
+from event_logs.writer import EventLogWriter
+from event_logs import rollups, archive
+from robots.models import Robot
+from perms.tests import count_queries
 
 class EventLogTest(TestCase):
     def setUp(self):
@@ -118,4 +125,195 @@ class EventLogTest(TestCase):
         
         self.assertRaises(Exception, EventLog.objects.log(**event_log_defaults))       
         
-            
\ No newline at end of file
+            
+
+class EventLogWriterTest(TestCase):
+    def make_event_log(self, i):
+        return EventLog(event_id=111111, event_data='Event Data %s' % i,
+            description='unit testing', category='application',
+            event_name='application', event_type='information', source='')
+
+    def test_buffered_write(self):
+        """
+            Queued event logs cost no queries until they are flushed,
+            then they are written with one multi-row insert
+        """
+        writer = EventLogWriter(mode='buffered', buffer_size=100, start_thread=False)
+        before = EventLog.objects.count()
+
+        queries = count_queries(lambda: [writer.write(self.make_event_log(i)) for i in range(30)])
+        self.assertEquals(queries, 0)
+        self.assertEquals(EventLog.objects.count(), before)
+
+        queries = count_queries(writer.flush)
+        self.assertEquals(queries, 1)
+        self.assertEquals(EventLog.objects.count(), before + 30)
+
+    def test_sync_write(self):
+        writer = EventLogWriter(mode='buffered', start_thread=False)
+        self.assertEquals(writer.write(self.make_event_log(0)).pk, None)
+
+        event_log = writer.write(self.make_event_log(1), sync=True)
+        self.assertTrue(EventLog.objects.filter(pk=event_log.pk).exists())
+        self.assertEquals(len(writer.buffer), 1)
+
+    def test_overflow(self):
+        writer = EventLogWriter(mode='buffered', max_buffer=5, overflow='drop', start_thread=False)
+        for i in range(8):
+            writer.write(self.make_event_log(i))
+        self.assertEquals(len(writer.buffer), 5)
+        self.assertEquals(writer.dropped, 3)
+
+        writer = EventLogWriter(mode='buffered', max_buffer=5, overflow='block', start_thread=False)
+        before = EventLog.objects.count()
+        for i in range(8):
+            writer.write(self.make_event_log(i))
+        self.assertEquals(EventLog.objects.count(), before + 5)
+        self.assertEquals(len(writer.buffer), 3)
+
+
+class EventLogRollupTest(TestCase):
+    def setUp(self):
+        # count the event logs right away
+        self.delay = rollups.ROLLUP_DELAY
+        rollups.ROLLUP_DELAY = timedelta(0)
+        self.robot = Robot.objects.create(name='rollupbot', url='http://www.tendenci.com/',
+            version='1.0')
+        self.today = date.today()
+
+    def tearDown(self):
+        rollups.ROLLUP_DELAY = self.delay
+
+    def log(self, count, event_id=111111, source='pages', robot=None):
+        for i in range(count):
+            EventLog(event_id=event_id, event_data='Event Data %s' % i,
+                description='unit testing', category='application',
+                event_name='application', event_type='information',
+                source=source, robot=robot).save()
+
+    def raw_summary(self, **filters):
+        rows = EventLog.objects.filter(**filters).values('source').annotate(count=Count('pk'))
+        return dict([(row['source'], row['count']) for row in rows])
+
+    def summary(self, **filters):
+        rows = rollups.summarize(('source',), self.today, self.today, **filters)
+        return dict([(row['source'], row['count']) for row in rows])
+
+    def test_rollup_matches_event_log(self):
+        self.log(5)
+        self.log(3, source='events', event_id=222222)
+        self.log(2, robot=self.robot)
+
+        self.assertEquals(rollups.rollup_event_logs(chunk_size=4), 10)
+        self.assertEquals(self.summary(), self.raw_summary())
+        self.assertEquals(self.summary(is_robot=False), self.raw_summary(robot=None))
+        self.assertEquals(self.summary(event_id=222222), {'events': 3})
+        self.assertEquals(rollups.check_rollups(self.today, self.today), [])
+
+        # incremental: only the new event logs are counted
+        self.log(4)
+        self.assertEquals(rollups.rollup_event_logs(), 4)
+        self.assertEquals(self.summary(), self.raw_summary())
+        self.assertEquals(EventLogRollup.objects.filter(source='pages',
+            is_robot=False).count(), 1)
+
+    def test_summary_includes_tail(self):
+        self.log(3)
+        rollups.rollup_event_logs()
+        self.log(2)
+        # not rolled up yet, still counted
+        self.assertEquals(self.summary()['pages'], 5)
+        self.assertEquals(rollups.count_events(self.today, self.today), 5)
+
+    def test_check_and_repair(self):
+        self.log(3)
+        rollups.rollup_event_logs()
+        EventLogRollup.objects.all().update(count=1)
+
+        differences = rollups.check_rollups(self.today, self.today)
+        self.assertEquals(differences, [(self.today, 3, 1)])
+
+        rollups.rebuild_day(self.today)
+        self.assertEquals(rollups.check_rollups(self.today, self.today), [])
+
+    def test_rebuild(self):
+        self.log(3)
+        rollups.rollup_event_logs()
+        rollups.rebuild_rollups()
+        self.assertEquals(EventLogRollup.objects.count(), 0)
+        self.assertEquals(rollups.rollup_event_logs(), 3)
+        self.assertEquals(self.summary(), self.raw_summary())
+
+
+class SearchQuery(object):
+    """
+    Stands in for a valid EventLogSearchForm
+    """
+    def __init__(self, **data):
+        self.cleaned_data = dict([(field, None) for field in (
+            'start_dt', 'end_dt', 'request_method', 'event_id', 'source', 'object_id',
+            'user_ip_address', 'user_id', 'user_name', 'session_id')])
+        self.cleaned_data.update(data)
+
+
+class EventLogArchiveTest(TestCase):
+    def setUp(self):
+        self.old = datetime(2010, 3, 15, 12, 0)
+
+    def log(self, count, create_dt=None, user_agent=None):
+        ids = []
+        for i in range(count):
+            event_log = EventLog(event_id=333333, event_data='Event Data %s' % i,
+                description='unit testing', category='application',
+                event_name='application', event_type='information',
+                source='pages', http_user_agent=user_agent)
+            event_log.save()
+            ids.append(event_log.pk)
+        if create_dt:
+            EventLog.objects.filter(pk__in=ids).update(create_dt=create_dt)
+        return ids
+
+    def test_archive_and_search(self):
+        old_ids = self.log(3, create_dt=self.old)
+        old_ids += self.log(2, create_dt=self.old - timedelta(days=31))
+        new_ids = self.log(2)
+
+        moved = archive.archive_event_logs(datetime(2010, 4, 1), batch_size=2)
+        self.assertEquals(moved, 5)
+        self.assertEquals(set(EventLog.objects.values_list('pk', flat=True)), set(new_ids))
+        self.assertEquals(archive.archive_months(), [date(2010, 3, 1), date(2010, 2, 1)])
+
+        query = SearchQuery(start_dt=datetime(2010, 1, 1), end_dt=datetime.now())
+        results = EventLog.objects.search(query=query)
+        self.assertEquals(results.count(), 7)
+        self.assertEquals(set([e.pk for e in results[0:2]]), set(new_ids))
+        self.assertEquals(set([e.pk for e in results[2:10]]), set(old_ids))
+        self.assertEquals(len(results[3:6]), 3)
+
+        # only the months of the range are searched
+        query = SearchQuery(start_dt=datetime(2010, 3, 1), end_dt=datetime(2010, 3, 31))
+        self.assertEquals(EventLog.objects.search(query=query).count(), 3)
+
+        self.assertEquals(EventLog.objects.get_any(old_ids[0]).pk, old_ids[0])
+
+        # the rollups still count the archived event logs
+        self.assertEquals(rollups.check_rollups(self.old.date(), self.old.date()), [])
+
+    def test_rebuild_counts_archives(self):
+        self.log(3, create_dt=self.old)
+        archive.archive_event_logs(datetime(2010, 4, 1))
+        self.assertEquals(EventLogRollup.objects.filter(day=self.old.date()).count(), 1)
+
+        self.assertEquals(rollups.rebuild_rollups(), 3)
+        self.assertEquals(rollups.count_events(self.old.date(), self.old.date()), 3)
+        self.assertEquals(rollups.check_rollups(self.old.date(), self.old.date()), [])
+
+    def test_compact_user_agents(self):
+        ids = self.log(3, user_agent='Mozilla/5.0 (compatible; Googlebot/2.1)')
+        ids += self.log(2, user_agent='Mozilla/4.0 (compatible; MSIE 8.0)')
+
+        self.assertEquals(archive.compact_user_agents(batch_size=2), 5)
+        self.assertEquals(EventLogUserAgent.objects.count(), 2)
+        self.assertEquals(EventLog.objects.filter(http_user_agent__isnull=False).count(), 0)
+        self.assertEquals(EventLog.objects.get(pk=ids[0]).get_user_agent(),
+            'Mozilla/5.0 (compatible; Googlebot/2.1)')
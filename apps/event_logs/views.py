@@ -4,9 +4,9 @@ from os import mkdir
 from PIL import Image
 
 from django.contrib.auth.decorators import login_required
-from django.shortcuts import render_to_response, get_object_or_404
+from django.shortcuts import render_to_response
 from django.template import RequestContext
-from django.http import HttpResponseRedirect, HttpResponse
+from django.http import HttpResponseRedirect, HttpResponse, Http404
 from django.core.urlresolvers import reverse
 from django.conf import settings
 from django.db.models import Count
@@ -21,13 +21,17 @@ from event_logs.utils import day_bars, month_days,\
     request_month_range
 from event_logs.models import EventLog, EventLogBaseColor, EventLogColor
 from event_logs.forms import EventLogSearchForm, EventsFilterForm
+from event_logs.rollups import summarize
 from event_logs.colors import non_model_event_logs, get_color
 
 
 def index(request, id=None, template_name="event_logs/view.html"):
     if not id:
         return HttpResponseRedirect(reverse('event_log.search'))
-    event_log = get_object_or_404(EventLog, pk=id)
+    try:
+        event_log = EventLog.objects.get_any(id)
+    except EventLog.DoesNotExist:
+        raise Http404
 
     if has_perm(request.user, 'event_logs.view_eventlog'):
         return render_to_response(template_name, {'event_log': event_log},
@@ -77,7 +81,8 @@ def search(request, template_name="event_logs/search.html"):
             'create_dt__gte': start_dt,
             'create_dt__lte': end_dt
         }
-        event_logs = EventLog.objects.filter(**filters)
+        # the user agent of every row is shown
+        event_logs = EventLog.objects.filter(**filters).select_related('user_agent')
         event_logs = event_logs.order_by('-create_dt')
 
     return render_to_response(template_name, {
@@ -94,7 +99,10 @@ def search(request, template_name="event_logs/search.html"):
 
 
 def print_view(request, id, template_name="event_logs/print-view.html"):
-    event_log = get_object_or_404(EventLog, pk=id)
+    try:
+        event_log = EventLog.objects.get_any(id)
+    except EventLog.DoesNotExist:
+        raise Http404
 
     if has_perm(request.user, 'event_logs.view_eventlog'):
         return render_to_response(template_name, {'event_log': event_log},
@@ -141,26 +149,34 @@ def event_colors(data):
 
 @staff_member_required
 def event_summary_report(request):
-    queryset = EventLog.objects.all()
     form = EventsFilterForm(request.GET)
+    filters = {}
     if form.is_valid():
-        queryset = form.process_filter(queryset)
+        filters = form.rollup_filters()
 
     from_date, to_date = request_month_range(request)
-    next_day = to_date+timedelta(days=1)
-    queryset = queryset.filter(create_dt__gte=from_date, create_dt__lte=next_day)
-
-    chart_data = queryset\
-                .extra(select={'day': 'DATE(create_dt)'})\
-                .values('day', 'source')\
-                .annotate(count=Count('pk'))\
-                .order_by('day', '-count')
-    chart_data = day_bars(chart_data, from_date.year, from_date.month, 300, source_colors)
 
-    summary_data = queryset\
-                .values('source')\
-                .annotate(count=Count('pk'))\
-                .order_by('-count')
+    if filters is not None:
+        chart_data = summarize(('day', 'source'), from_date, to_date, **filters)
+        chart_data.sort(key=lambda x: (x['day'], -x['count']))
+        summary_data = summarize(('source',), from_date, to_date, **filters)
+        summary_data.sort(key=lambda x: -x['count'])
+    else:
+        queryset = form.process_filter(EventLog.objects.all())
+        next_day = to_date+timedelta(days=1)
+        queryset = queryset.filter(create_dt__gte=from_date, create_dt__lte=next_day)
+
+        chart_data = queryset\
+                    .extra(select={'day': 'DATE(create_dt)'})\
+                    .values('day', 'source')\
+                    .annotate(count=Count('pk'))\
+                    .order_by('day', '-count')
+        summary_data = queryset\
+                    .values('source')\
+                    .annotate(count=Count('pk'))\
+                    .order_by('-count')
+
+    chart_data = day_bars(chart_data, from_date.year, from_date.month, 300, source_colors)
     source_colors(summary_data)
 
     m = 1+len(summary_data)/3
@@ -176,26 +192,36 @@ def event_summary_report(request):
 
 @staff_member_required
 def event_source_summary_report(request, source):
-    queryset = EventLog.objects.filter(source=source)
     form = EventsFilterForm(request.GET)
+    filters = {}
     if form.is_valid():
-        queryset = form.process_filter(queryset)
+        filters = form.rollup_filters()
 
     from_date, to_date = request_month_range(request)
-    next_day = to_date+timedelta(days=1)
-    queryset = queryset.filter(create_dt__gte=from_date, create_dt__lte=next_day)
-
-    chart_data = queryset\
-                .extra(select={'day': 'DATE(create_dt)'})\
-                .values('day', 'event_id')\
-                .annotate(count=Count('pk'))\
-                .order_by('day', '-count')
-    chart_data = day_bars(chart_data, from_date.year, from_date.month, 300, event_colors)
 
-    summary_data = queryset\
-                .values('event_id', 'description')\
-                .annotate(count=Count('pk'))\
-                .order_by('-count')
+    if filters is not None:
+        chart_data = summarize(('day', 'event_id'), from_date, to_date,
+            source=source, **filters)
+        chart_data.sort(key=lambda x: (x['day'], -x['count']))
+        summary_data = summarize(('event_id', 'description'), from_date, to_date,
+            source=source, **filters)
+        summary_data.sort(key=lambda x: -x['count'])
+    else:
+        queryset = form.process_filter(EventLog.objects.filter(source=source))
+        next_day = to_date+timedelta(days=1)
+        queryset = queryset.filter(create_dt__gte=from_date, create_dt__lte=next_day)
+
+        chart_data = queryset\
+                    .extra(select={'day': 'DATE(create_dt)'})\
+                    .values('day', 'event_id')\
+                    .annotate(count=Count('pk'))\
+                    .order_by('day', '-count')
+        summary_data = queryset\
+                    .values('event_id', 'description')\
+                    .annotate(count=Count('pk'))\
+                    .order_by('-count')
+
+    chart_data = day_bars(chart_data, from_date.year, from_date.month, 300, event_colors)
     event_colors(summary_data)
 
     return render_to_response(
@@ -0,0 +1,162 @@
+"""
+Buffered event log writer.
+
+EventLog.objects.log() hands every event to the writer. In the default
+'sync' mode the event is saved right away, like it always was. In
+'buffered' mode the events are queued in-process and a background
+thread writes them with multi-row inserts once EVENT_LOG_BUFFER_SIZE
+events are waiting or every EVENT_LOG_FLUSH_INTERVAL seconds. The
+'celery' mode queues in the same way but ships each batch to a celery
+task instead of inserting it in the web process.
+
+Settings:
+    EVENT_LOG_WRITE_MODE - 'sync' (default), 'buffered' or 'celery'
+    EVENT_LOG_BUFFER_SIZE - flush when this many events wait (default 100)
+    EVENT_LOG_FLUSH_INTERVAL - flush at least every n seconds (default 5)
+    EVENT_LOG_MAX_BUFFER - most events to hold in memory (default 5000)
+    EVENT_LOG_OVERFLOW - what to do when the buffer is full:
+        'block' writes the buffer in the request (default),
+        'drop' discards the new event
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import transaction
+
+from base.utils import bulk_insert
+
+log = logging.getLogger(__name__)
+
+
+class EventLogWriter(object):
+    def __init__(self, mode=None, buffer_size=None, flush_interval=None,
+                 max_buffer=None, overflow=None, start_thread=True):
+        self.mode = mode or getattr(settings, 'EVENT_LOG_WRITE_MODE', 'sync')
+        self.buffer_size = buffer_size or getattr(settings, 'EVENT_LOG_BUFFER_SIZE', 100)
+        self.flush_interval = flush_interval or getattr(settings, 'EVENT_LOG_FLUSH_INTERVAL', 5)
+        self.max_buffer = max_buffer or getattr(settings, 'EVENT_LOG_MAX_BUFFER', 5000)
+        self.overflow = overflow or getattr(settings, 'EVENT_LOG_OVERFLOW', 'block')
+        self.start_thread = start_thread
+
+        self.buffer = deque()
+        self.dropped = 0
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+
+    def write(self, event_log, sync=False):
+        """
+        Save or queue an unsaved EventLog instance. With sync it is
+        saved right away in every mode.
+        """
+        if sync or self.mode == 'sync':
+            event_log.save()
+            return event_log
+
+        if len(self.buffer) >= self.max_buffer:
+            if self.overflow == 'drop':
+                self.dropped += 1
+                return event_log
+            # backpressure: the request that found the buffer full pays for the write
+            self.flush()
+
+        self.buffer.append(event_log)
+        self._ensure_thread()
+        if len(self.buffer) >= self.buffer_size:
+            self.wakeup.set()
+        return event_log
+
+    def flush(self):
+        """
+        Write everything in the buffer. Returns the number of events written.
+        """
+        with self.lock:
+            batch = []
+            while self.buffer:
+                batch.append(self.buffer.popleft())
+
+            if not batch:
+                return 0
+
+            try:
+                if self.mode == 'celery':
+                    from event_logs.tasks import WriteEventLogsTask
+                    WriteEventLogsTask.delay(batch)
+                else:
+                    write_event_logs(batch)
+            except Exception:
+                log.exception('Writing a batch of %d event logs failed, '
+                    'saving them one by one', len(batch))
+                save_event_logs(batch)
+            return len(batch)
+
+    def _ensure_thread(self):
+        if not self.start_thread:
+            return
+        if self.thread and self.thread.isAlive():
+            return
+        self.thread = threading.Thread(target=self._run, name='event-log-writer')
+        self.thread.setDaemon(True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                # never let a failure kill the writer, the next
+                # events are still written
+                log.exception('Flushing the event log buffer failed')
+
+
+def write_event_logs(event_logs):
+    """
+    Multi-row insert of unsaved EventLog instances
+    """
+    from event_logs.models import EventLog
+    return bulk_insert(EventLog, event_logs)
+
+
+def save_event_logs(event_logs):
+    """
+    Saves the events of a batch whose insert failed one at a time,
+    so one bad event does not lose the others
+    """
+    transaction.rollback_unless_managed()
+    lost = 0
+    for event_log in event_logs:
+        try:
+            event_log.save()
+        except Exception:
+            transaction.rollback_unless_managed()
+            lost += 1
+    if lost:
+        log.error('%d of a batch of %d event logs could not be saved', lost, len(event_logs))
+    return len(event_logs) - lost
+
+
+def get_server_ip():
+    """
+    The ip address of this server, resolved once per process
+    """
+    if 'server_ip' not in _server:
+        from socket import gethostbyname, gethostname
+        try:
+            _server['server_ip'] = settings.INTERNAL_IPS[0]
+        except IndexError:
+            try:
+                _server['server_ip'] = gethostbyname(gethostname())
+            except Exception:
+                _server['server_ip'] = None
+    return _server['server_ip']
+
+_server = {}
+
+writer = EventLogWriter()
+atexit.register(writer.flush)
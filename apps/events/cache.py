@@ -0,0 +1,67 @@
+from django.core.cache import cache
+from django.conf import settings
+from django.utils.hashcompat import md5_constructor
+
+EVENT_PRE_KEY = "events"
+
+# how long a cached calendar month lives. Stale months are never
+# read anyway, the version stamp takes care of invalidation.
+EVENT_CALENDAR_CACHE_TIMEOUT = 60 * 60 * 24
+
+# a VEVENT is cached until its event, place, organizers or speakers
+# are saved, which changes its key
+VEVENT_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
+# financial summaries are deleted whenever a registration,
+# a registrant or an invoice of the event changes
+EVENT_SUMMARY_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _key(*parts):
+    keys = [settings.CACHE_PRE_KEY, EVENT_PRE_KEY] + [str(p) for p in parts]
+    return '.'.join(keys)
+
+
+def get_calendar_version():
+    """
+    Version stamp of the cached calendar months
+    """
+    key = _key('calendar', 'version')
+    version = cache.get(key)
+    if version is None:
+        version = 1
+        cache.add(key, version)
+    return version
+
+
+def bump_calendar_version():
+    """
+    Invalidates every cached calendar month.
+    Called whenever an event, an event type or its colors are saved
+    or deleted.
+    """
+    key = _key('calendar', 'version')
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 2)
+
+
+def calendar_key(perm_key, type_slug, year, month):
+    return _key('calendar', get_calendar_version(), perm_key, type_slug or '', year, month)
+
+
+def vevent_key(event_id, update_dt, site_url):
+    return _key('vevent', event_id, update_dt.strftime('%Y%m%d%H%M%S%f'),
+        md5_constructor(site_url).hexdigest())
+
+
+def summary_key(event_id):
+    return _key('summary', event_id)
+
+
+def delete_event_summaries(event_ids):
+    """
+    Invalidates the cached financial summaries of events
+    """
+    cache.delete_many([summary_key(event_id) for event_id in event_ids])
@@ -0,0 +1,141 @@
+"""
+The iCalendar feed of the events.
+
+The VEVENT of an event is rendered once and cached under the pk and
+update_dt of the event, so saving an event renders it again. Saving
+its place, organizers or speakers bumps its update_dt too. The
+events missing from the cache are loaded in bulk along with their
+places, organizers and speakers.
+
+The feed is streamed. Its ETag comes from the pks and update_dt of the
+events in it, so a calendar client that polls it with If-None-Match
+gets a 304 until one of them changes, or an event leaves the feed. It
+has no Last-Modified: a deleted event, or one the user can no longer
+view, would not move it.
+"""
+import re
+from datetime import datetime
+
+from django.core.cache import cache
+from django.utils.hashcompat import md5_constructor
+
+from site_settings.utils import get_setting
+from perms.utils import get_query_filters
+from events.models import Event, Organizer, Speaker
+from events.cache import vevent_key, VEVENT_CACHE_TIMEOUT
+from events.utils import get_vevent
+
+# events loaded at a time when building the feed
+ICAL_CHUNK_SIZE = 200
+
+ICAL_HEADER = "BEGIN:VCALENDAR\n" \
+    "PRODID:-//Schipul Technologies//Schipul Codebase 5.0 MIMEDIR//EN\n" \
+    "VERSION:2.0\n" \
+    "METHOD:PUBLISH\n"
+
+ICAL_FOOTER = "END:VCALENDAR\n"
+
+
+def get_site_info():
+    """
+    The site url and domain name of the VEVENTs
+    """
+    d = {}
+    d['site_url'] = get_setting('site', 'global', 'siteurl')
+    match = re.search(r'http(s)?://(www.)?([^/]+)', d['site_url'])
+    if match:
+        d['domain_name'] = match.group(3)
+    else:
+        d['domain_name'] = ""
+    return d
+
+
+def get_feed_events(user):
+    """
+    Returns (pk, start_dt, update_dt) of the events of the feed of
+    the user: the events already started, ordered by start_dt
+    """
+    filters = get_query_filters(user, 'events.view_event')
+    events = Event.objects.filter(filters).filter(start_dt__lte=datetime.now()).distinct()
+    return list(events.order_by('start_dt').values_list('pk', 'start_dt', 'update_dt'))
+
+
+def _get_names(model, event_ids):
+    """
+    Returns a dict event id -> names of the organizers or speakers
+    of the events, with one query
+    """
+    names = dict([(event_id, []) for event_id in event_ids])
+    through = model.event.through
+    field_name = model._meta.object_name.lower()
+    for event_id, name in through.objects.filter(event__in=event_ids).order_by(
+        field_name).values_list('event', '%s__name' % field_name):
+        names[event_id].append(name)
+    return names
+
+
+def render_vevents(event_ids, d):
+    """
+    Returns a dict event id -> VEVENT of the events,
+    loaded with their places, organizers and speakers in bulk
+    """
+    organizers = _get_names(Organizer, event_ids)
+    speakers = _get_names(Speaker, event_ids)
+    vevents = {}
+    for event in Event.objects.filter(pk__in=event_ids).select_related('place'):
+        vevents[event.pk] = get_vevent(event, dict(d),
+            organizers[event.pk], speakers[event.pk])
+    return vevents
+
+
+def iter_vevents(events, d):
+    """
+    Yields the VEVENTs of the events, a list of (pk, start_dt,
+    update_dt), from the cache or rendered ICAL_CHUNK_SIZE at a time
+    """
+    for i in xrange(0, len(events), ICAL_CHUNK_SIZE):
+        chunk = events[i:i + ICAL_CHUNK_SIZE]
+        keys = dict([(pk, vevent_key(pk, update_dt, d['site_url']))
+            for pk, start_dt, update_dt in chunk])
+        vevents = cache.get_many(keys.values())
+
+        missing = [pk for pk, key in keys.items() if key not in vevents]
+        if missing:
+            rendered = render_vevents(missing, d)
+            cache.set_many(dict([(keys[pk], vevent) for pk, vevent in rendered.items()]),
+                VEVENT_CACHE_TIMEOUT)
+            for pk, vevent in rendered.items():
+                vevents[keys[pk]] = vevent
+
+        for pk, start_dt, update_dt in chunk:
+            # an event deleted in the meantime has no VEVENT
+            if keys[pk] in vevents:
+                yield vevents[keys[pk]]
+
+
+def iter_feed(events, d):
+    """
+    Yields the iCalendar feed of the events, a list of (pk, start_dt, update_dt)
+    """
+    yield ICAL_HEADER
+    for vevent in iter_vevents(events, d):
+        yield vevent
+    yield ICAL_FOOTER
+
+
+def get_feed(request):
+    """
+    The site info and the events of the feed, read once per request
+    """
+    if not hasattr(request, '_ical_feed'):
+        request._ical_feed = (get_site_info(), get_feed_events(request.user))
+    return request._ical_feed
+
+
+def feed_etag(request):
+    d, events = get_feed(request)
+    etag = md5_constructor(d['site_url'])
+    for pk, start_dt, update_dt in events:
+        etag.update('%s:%s;' % (pk, update_dt.isoformat()))
+    return etag.hexdigest()
+
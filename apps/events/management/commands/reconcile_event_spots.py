@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+class Command(BaseCommand):
+    """
+    Counts the spots taken in events again and fixes their counters.
+    example: python manage.py reconcile_event_spots [event_id event_id ...]
+    """
+    def handle(self, *event_ids, **options):
+        from events.models import Event
+        from events.utils import update_event_spots_taken
+
+        events = Event.objects.exclude(registration_configuration=None)
+        if event_ids:
+            events = events.filter(pk__in=event_ids)
+
+        for event in events.select_related('registration_configuration'):
+            update_event_spots_taken(event)
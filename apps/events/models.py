@@ -4,7 +4,6 @@ from datetime import datetime, timedelta
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.db import models
-from django.db.models.aggregates import Sum
 from django.utils.translation import ugettext_lazy as _
 from django.contrib.auth.models import User
 from django.template.defaultfilters import slugify
@@ -20,6 +19,7 @@ from perms.object_perms import ObjectPermission
 from perms.models import TendenciBaseModel
 from meta.models import Meta as MetaTags
 from events.module_meta import EventMeta
+from events.cache import bump_calendar_version, delete_event_summaries
 from user_groups.models import Group
 
 from invoices.models import Invoice
@@ -46,6 +46,15 @@ class TypeColorSet(models.Model):
     def __unicode__(self):
         return '%s #%s' % (self.pk, self.bg_color)
 
+    def save(self, *args, **kwargs):
+        super(TypeColorSet, self).save(*args, **kwargs)
+        # the cached months hold the colors of the types
+        bump_calendar_version()
+
+    def delete(self, *args, **kwargs):
+        super(TypeColorSet, self).delete(*args, **kwargs)
+        bump_calendar_version()
+
 
 class Type(models.Model):
 
@@ -78,6 +87,11 @@ class Type(models.Model):
     def save(self, *args, **kwargs):
         self.slug = slugify(self.name)
         super(Type, self).save(*args, **kwargs)
+        bump_calendar_version()
+
+    def delete(self, *args, **kwargs):
+        super(Type, self).delete(*args, **kwargs)
+        bump_calendar_version()
 
 
 class Place(models.Model):
@@ -357,7 +371,19 @@ class RegConfPricing(models.Model):
         if self.start_dt <= datetime.now() <= self.end_dt:
             return True
         return False
-    
+
+
+class SpotsTaken(models.Model):
+    """
+    The number of spots taken in an event. A counter kept apart from
+    the registration configuration, which its forms save whole, and
+    only changed with conditional updates. See events.utils.
+    Added along with its registration configuration.
+    """
+    reg_conf = models.OneToOneField(RegistrationConfiguration, related_name='spots')
+    spots_taken = models.IntegerField(default=0)
+
+
 class Registration(models.Model):
 
     guid = models.TextField(max_length=40, editable=False)
@@ -745,6 +771,7 @@ class Event(TendenciBaseModel):
             self.guid = str(uuid.uuid1())
         photo_upload = kwargs.pop('photo', None)
         super(Event, self).save(*args, **kwargs)
+        bump_calendar_version()
 
         if photo_upload and self.pk:
             image = EventPhoto(
@@ -763,6 +790,10 @@ class Event(TendenciBaseModel):
 
             self.save()
 
+    def delete(self, *args, **kwargs):
+        super(Event, self).delete(*args, **kwargs)
+        bump_calendar_version()
+
     def __unicode__(self):
         return self.title
 
@@ -781,26 +812,16 @@ class Event(TendenciBaseModel):
         """
         Total collected from this event
         """
-        total_sum = Registration.objects.filter(event=self).aggregate(
-            Sum('invoice__total'),
-        )['invoice__total__sum']
-
-        # total_sum is the amount of money received when all is said and done
-        return total_sum - self.money_outstanding
+        from events.summaries import get_event_summary
+        return get_event_summary(self)['collected']
 
     @property
     def money_outstanding(self):
         """
         Outstanding balance for this event
         """
-        figures = Registration.objects.filter(event=self).aggregate(
-            Sum('invoice__total'),
-            Sum('invoice__balance'),
-        )
-        balance_sum = figures['invoice__balance__sum']
-        total_sum = figures['invoice__total__sum']
-
-        return total_sum - balance_sum
+        from events.summaries import get_event_summary
+        return get_event_summary(self)['outstanding']
 
     def registrants(self, **kwargs):
         """
@@ -1080,3 +1101,63 @@ class RegAddonOption(models.Model):
     def __unicode__(self):
         return "%s: %s - %s" % (self.regaddon.pk, self.option.title, self.selected_option)
     
+
+
+def registration_summary_changed(sender, instance, **kwargs):
+    delete_event_summaries([instance.event_id])
+
+def registrant_summary_changed(sender, instance, **kwargs):
+    try:
+        registration = instance.registration
+    except Registration.DoesNotExist:
+        return  # deleted along with its registration
+    delete_event_summaries([registration.event_id])
+
+def invoice_summary_changed(sender, instance, **kwargs):
+    if instance.object_type_id != ContentType.objects.get_for_model(Registration).pk:
+        return
+    delete_event_summaries(Registration.objects.filter(pk=instance.object_id
+        ).values_list('event', flat=True))
+
+def touch_events(events):
+    """
+    Bumps the update_dt of the events, which renders their VEVENTs
+    again and changes the ETag of the iCalendar feed
+    """
+    events.update(update_dt=datetime.now())
+
+def place_changed(sender, instance, **kwargs):
+    touch_events(Event.objects.filter(place=instance))
+
+def people_changed(sender, instance, **kwargs):
+    # organizers and speakers, before a delete drops their events
+    touch_events(Event.objects.filter(pk__in=instance.event.values_list('pk', flat=True)))
+
+def people_events_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        touch_events(Event.objects.filter(pk=instance.pk))
+    elif pk_set is None:
+        touch_events(Event.objects.filter(pk__in=instance.event.values_list('pk', flat=True)))
+    else:
+        touch_events(Event.objects.filter(pk__in=pk_set))
+
+def add_spots_taken(sender, instance, created, **kwargs):
+    if created:
+        SpotsTaken.objects.create(reg_conf=instance)
+
+models.signals.post_save.connect(add_spots_taken, sender=RegistrationConfiguration)
+models.signals.post_save.connect(place_changed, sender=Place)
+models.signals.post_save.connect(people_changed, sender=Organizer)
+models.signals.pre_delete.connect(people_changed, sender=Organizer)
+models.signals.m2m_changed.connect(people_events_changed, sender=Organizer.event.through)
+models.signals.post_save.connect(people_changed, sender=Speaker)
+models.signals.pre_delete.connect(people_changed, sender=Speaker)
+models.signals.m2m_changed.connect(people_events_changed, sender=Speaker.event.through)
+models.signals.post_save.connect(registration_summary_changed, sender=Registration)
+models.signals.post_delete.connect(registration_summary_changed, sender=Registration)
+models.signals.post_save.connect(registrant_summary_changed, sender=Registrant)
+models.signals.post_delete.connect(registrant_summary_changed, sender=Registrant)
+models.signals.post_save.connect(invoice_summary_changed, sender=Invoice)
+models.signals.post_delete.connect(invoice_summary_changed, sender=Invoice)
@@ -1,11 +1,12 @@
 from datetime import datetime
 
 from django.contrib.auth.models import User, AnonymousUser
+from django.db import transaction
 
 from perms.utils import is_admin, is_member
 from site_settings.utils import get_setting
 
-from events.utils import get_event_spots_taken, update_event_spots_taken
+from events.utils import get_event_spots_taken, reserve_event_spots
 from events.models import Event, RegConfPricing, Registration, Registrant
 from events.registration.constants import REG_CLOSED, REG_FULL, REG_OPEN
 from events.forms import FormForCustomRegForm
@@ -191,10 +192,12 @@ def create_registrant(form, event, reg8n, **kwargs):
     
     return registrant
     
+@transaction.commit_on_success
 def process_registration(reg_form, reg_formset, addon_formset, **kwargs):
     """
     Create the registrants and the invoice for payment.
     reg_form and reg_formset MUST be validated first
+    Returns None if the event is full.
     """
     custom_reg_form = kwargs.get('custom_reg_form', None)
     
@@ -221,6 +224,10 @@ def process_registration(reg_form, reg_formset, addon_formset, **kwargs):
             total_price = admin_price
             admin_notes = "Price has been overriden for this registration."
 
+    # take the spots first, admins can go over the limit
+    if not reserve_event_spots(event, len(reg_formset.forms), ignore_limit=is_admin(user)):
+        return None
+
     # create registration
     reg8n_attrs = {
         "event": event,
@@ -258,7 +265,4 @@ def process_registration(reg_form, reg_formset, addon_formset, **kwargs):
                 invoice=invoice,
             )
     
-    # update the spots taken on this event
-    update_event_spots_taken(event)
-    
     return reg8n
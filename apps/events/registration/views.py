@@ -288,6 +288,9 @@ def multi_register(request, event_id, template_name="events/registration/multi_r
                 # process the registration
                 # this will create the registrants and apply the discount
                 reg8n = process_registration(reg_form, reg_formset,  addon_formset, custom_reg_form=custom_reg_form)
+                if not reg8n:
+                    messages.add_message(request, messages.ERROR, _('Registration is full.'))
+                    return redirect('event', event.pk)
                 
                 self_reg8n = get_setting('module', 'users', 'selfregistration')
                 is_credit_card_payment = (reg8n.payment_method and 
@@ -5,7 +5,7 @@ from django.db.models import signals
 from haystack import indexes
 from haystack import site
 from events.models import Event, Registrant
-from events.utils import count_event_spots_taken
+from events.utils import get_event_spots_taken
 from events.models import Type as EventType
 
 from perms.indexes import TendenciBaseSearchIndex
@@ -54,10 +54,7 @@ class EventIndex(TendenciBaseSearchIndex):
             return None
 
     def prepare_spots_taken(self, obj):
-        if hasattr(obj, 'spots_taken'):
-            return obj.spots_taken
-        else:
-            return count_event_spots_taken(obj)
+        return get_event_spots_taken(obj)
             
     def prepare_number_of_days(self, obj):
         return obj.number_of_days()
@@ -0,0 +1,113 @@
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection
+
+from invoices.models import Invoice
+from events.models import Registration, Registrant
+from events.cache import summary_key, EVENT_SUMMARY_CACHE_TIMEOUT
+
+# event ids per query, within the variable limit of sqlite
+SUMMARY_BATCH_SIZE = 200
+
+CENTS = Decimal('0.01')
+
+
+def _empty_summary():
+    summary = {'registrants': 0, 'registrants_paid': 0, 'registrants_owing': 0}
+    for key in ('total', 'balance', 'paid_total', 'paid_balance',
+        'owing_total', 'owing_balance', 'collected', 'outstanding'):
+        summary[key] = Decimal('0')
+    return summary
+
+
+def _query_summaries(event_ids):
+    """
+    Adds up the registrations of the events in one grouped query.
+    Cancelled registrations, with no registrant left, are left out.
+    A registration is paid once the balance of its invoice is down to 0.
+    """
+    qn = connection.ops.quote_name
+    paid = 'CASE WHEN i.%(balance)s <= 0 THEN 1 WHEN i.%(balance)s > 0 THEN 0 END' % {
+        'balance': qn('balance')}
+    sql = """
+        SELECT r.%(event_id)s, %(paid)s, SUM(i.%(total)s), SUM(i.%(balance)s), SUM(c.num)
+        FROM %(registration)s r
+        INNER JOIN (
+            SELECT %(registration_id)s AS registration_id, COUNT(*) AS num
+            FROM %(registrant)s WHERE %(cancel_dt)s IS NULL
+            GROUP BY %(registration_id)s
+        ) c ON c.registration_id = r.%(id)s
+        LEFT OUTER JOIN %(invoice)s i ON i.%(id)s = r.%(invoice_id)s
+        WHERE r.%(event_id)s IN (%(placeholders)s)
+        GROUP BY r.%(event_id)s, %(paid)s
+    """ % {
+        'event_id': qn('event_id'),
+        'paid': paid,
+        'total': qn('total'),
+        'balance': qn('balance'),
+        'registration': qn(Registration._meta.db_table),
+        'registration_id': qn('registration_id'),
+        'registrant': qn(Registrant._meta.db_table),
+        'cancel_dt': qn('cancel_dt'),
+        'id': qn('id'),
+        'invoice': qn(Invoice._meta.db_table),
+        'invoice_id': qn('invoice_id'),
+        'placeholders': ', '.join(['%s'] * len(event_ids)),
+    }
+    cursor = connection.cursor()
+    cursor.execute(sql, list(event_ids))
+
+    summaries = dict([(event_id, _empty_summary()) for event_id in event_ids])
+    for event_id, is_paid, total, balance, num in cursor.fetchall():
+        summary = summaries[event_id]
+        # sqlite adds up decimals as floats
+        total = Decimal(str(total or 0)).quantize(CENTS)
+        balance = Decimal(str(balance or 0)).quantize(CENTS)
+        summary['registrants'] += int(num)
+        summary['total'] += total
+        summary['balance'] += balance
+        if is_paid == 1:
+            summary['registrants_paid'] += int(num)
+            summary['paid_total'] += total
+            summary['paid_balance'] += balance
+        elif is_paid == 0:
+            summary['registrants_owing'] += int(num)
+            summary['owing_total'] += total
+            summary['owing_balance'] += balance
+
+    for summary in summaries.values():
+        summary['collected'] = summary['total'] - summary['balance']
+        summary['outstanding'] = summary['balance']
+    return summaries
+
+
+def get_event_summaries(event_ids):
+    """
+    The financial summaries of a set of events, a dict event id -> summary.
+    A summary holds the invoice totals and balances of the registrations
+    of the event (total, balance, collected, outstanding), the same split
+    between the paid and the owing registrations (paid_total, owing_total,
+    ...) and the number of registrants (registrants, registrants_paid,
+    registrants_owing). Summaries are cached per event; the missing ones
+    are added up together.
+    """
+    event_ids = list(set(event_ids))
+    keys = dict([(summary_key(event_id), event_id) for event_id in event_ids])
+    summaries = dict([(keys[key], summary) for key, summary
+        in cache.get_many(keys.keys()).items()])
+
+    missing = [event_id for event_id in event_ids if event_id not in summaries]
+    for i in range(0, len(missing), SUMMARY_BATCH_SIZE):
+        queried = _query_summaries(missing[i:i + SUMMARY_BATCH_SIZE])
+        cache.set_many(dict([(summary_key(event_id), summary) for event_id, summary
+            in queried.items()]), EVENT_SUMMARY_CACHE_TIMEOUT)
+        summaries.update(queried)
+    return summaries
+
+
+def get_event_summary(event):
+    """
+    The financial summary of one event
+    """
+    return get_event_summaries([event.pk])[event.pk]
@@ -10,12 +10,13 @@ from django.contrib.auth.models import AnonymousUser, User
 
 from base.template_tags import ListNode, parse_tag_kwargs
 from site_settings.utils import get_setting
-from perms.utils import get_query_filters
+from perms.utils import get_query_filters, _result_objects
 
 from events.models import Event, Registrant, Type, RegConfPricing
 from events.utils import get_pricing, registration_earliest_time
 from events.utils import registration_has_started, get_event_spots_taken
 from events.utils import registration_has_ended
+from events.summaries import get_event_summaries
 
 register = Library()
 
@@ -234,6 +235,43 @@ def is_registered_user(parser, token):
     return IsRegisteredUserNode(user, event, context_var)
 
 
+class EventSummariesNode(Node):
+
+    def __init__(self, events, event_ids=None):
+        self.events = Variable(events)
+        self.event_ids = event_ids and Variable(event_ids)
+
+    def render(self, context):
+        events = _result_objects(self.events.resolve(context))
+        events = [event for event in events if event is not None]
+        if self.event_ids:
+            event_ids = self.event_ids.resolve(context)
+            events = [event for event in events if event.pk in event_ids]
+
+        summaries = get_event_summaries([event.pk for event in events])
+        for event in events:
+            event.summary = summaries[event.pk]
+        return ''
+
+
+@register.tag
+def event_summaries(parser, token):
+    """
+    Sets the financial summary of each event of a list on
+    event.summary, use it on list pages after the pagination.
+    The optional second argument limits it to a set of event ids.
+    Example: {% event_summaries events %}
+             {% event_summaries events editable_events %}
+    """
+    bits = token.split_contents()
+
+    if len(bits) not in (2, 3):
+        message = '%s tag requires 1 or 2 arguments' % bits[0]
+        raise TemplateSyntaxError(message)
+
+    return EventSummariesNode(*bits[1:])
+
+
 class ListEventsNode(ListNode):
     model = Event
     
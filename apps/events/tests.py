@@ -5,7 +5,29 @@ unittest). These will both pass when you run "manage.py test".
 Replace these with more appropriate tests for your application.
 """
 
+import csv
+from datetime import datetime, date
+from decimal import Decimal
+
 from django.test import TestCase
+from django.conf import settings
+from django.contrib.auth.models import User, AnonymousUser
+
+from base import exports
+from perms.utils import has_perms_bulk
+from perms.tests import count_queries
+from django.core.urlresolvers import reverse
+
+from events.models import Event, Type, TypeColorSet, Place, Organizer, Speaker, \
+    RegistrationConfiguration, RegConfPricing, Registration, Registrant, \
+    SpotsTaken, CustomRegForm, CustomRegField, CustomRegFormEntry, \
+    CustomRegFieldEntry
+from events.utils import get_day_events, get_month_calendar, get_event_spots_taken, \
+    reserve_event_spots, cancel_event_registrant, update_event_spots_taken, \
+    registrant_custom_export_rows, get_custom_registrants_initials
+from events.ical import get_site_info, get_feed_events, iter_vevents
+from events.cache import delete_event_summaries
+from events.summaries import get_event_summaries, get_event_summary
 
 class SimpleTest(TestCase):
     def test_basic_addition(self):
@@ -14,6 +36,432 @@ class SimpleTest(TestCase):
         """
         self.failUnlessEqual(1 + 1, 2)
 
+
+class ExportTest(TestCase):
+    def test_csv_quoting(self):
+        rows = [
+            [u'Smith, John', 'say "hi"', None, Decimal('10.50')],
+            [u'Caf\xe9', 'two\nlines', date(2011, 3, 4), datetime(2011, 3, 4, 5, 6, 7)],
+        ]
+        output = ''.join(exports.csv_chunks(['name', 'note', 'date', 'amount'], rows))
+
+        read = list(csv.reader(output.splitlines(True)))
+        self.assertEqual(read[0], ['name', 'note', 'date', 'amount'])
+        self.assertEqual(read[1], ['Smith, John', 'say "hi"', '', '10.50'])
+        self.assertEqual(read[2], ['Caf\xc3\xa9', 'two\nlines', '2011-03-04', '2011-03-04 05:06:07'])
+
+    def test_csv_chunks(self):
+        read = []
+
+        def rows():
+            for i in range(exports.CSV_CHUNK_ROWS * 2 + 1):
+                read.append(i)
+                yield [i]
+
+        chunks = exports.csv_chunks(['n'], rows())
+        chunks.next()
+        # the first chunk goes out before all the rows are read
+        self.assertEqual(len(read), exports.CSV_CHUNK_ROWS)
+        self.assertEqual(len(list(chunks)), 2)
+
+    def test_response(self):
+        response = exports.export_response('export.csv', ['a', 'b'], iter([[1, 2]]))
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename=export.csv')
+        self.assertEqual(response.content, 'a,b\r\n1,2\r\n')
+
+class MonthCalendarTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('admin', 'admin@example.com', 'google')
+        self.anonymous = AnonymousUser()
+
+        color_set = TypeColorSet.objects.create(fg_color='000', bg_color='fff', border_color='ccc')
+        self.type = Type(name='Meetings', color_set=color_set)
+        self.type.save()
+
+    def add_event(self, title, start_dt, end_dt, **kwargs):
+        event = Event(title=title, start_dt=start_dt, end_dt=end_dt,
+            timezone=settings.TIME_ZONE, allow_anonymous_view=True,
+            creator=self.user, creator_username=self.user.username,
+            owner=self.user, owner_username=self.user.username, **kwargs)
+        event.save()
+        return event
+
+    def test_day_events(self):
+        # friday to monday
+        span = self.add_event('Span', datetime(2011, 4, 1, 9), datetime(2011, 4, 4, 17))
+        weekdays = self.add_event('Weekdays', datetime(2011, 4, 1, 10), datetime(2011, 4, 4, 17),
+            on_weekend=False, type=self.type)
+        late = self.add_event('Late', datetime(2011, 4, 3, 20), datetime(2011, 4, 3, 22))
+        self.add_event('Private', datetime(2011, 4, 2, 9), datetime(2011, 4, 2, 17),
+            allow_anonymous_view=False)
+
+        days = [date(2011, 3, 31), date(2011, 4, 1), date(2011, 4, 2), date(2011, 4, 3), date(2011, 4, 4)]
+        day_events = get_day_events(self.anonymous, days)
+        self.assertEquals(day_events[date(2011, 3, 31)], [])
+        self.assertEquals(day_events[date(2011, 4, 1)], [span, weekdays])
+        self.assertEquals(day_events[date(2011, 4, 2)], [span])
+        self.assertEquals(day_events[date(2011, 4, 3)], [span, late])
+        self.assertEquals(day_events[date(2011, 4, 4)], [span, weekdays])
+
+        day_events = get_day_events(self.anonymous, days, self.type.slug)
+        self.assertEquals(day_events[date(2011, 4, 1)], [weekdays])
+        self.assertEquals(day_events[date(2011, 4, 2)], [])
+
+        # an unknown type shows all the events
+        day_events = get_day_events(self.anonymous, days, 'no-such-type')
+        self.assertEquals(day_events[date(2011, 4, 1)], [span, weekdays])
+
+    def test_month_calendar(self):
+        event = self.add_event('Meeting', datetime(2011, 4, 12, 9), datetime(2011, 4, 12, 17))
+
+        weeks = get_month_calendar(self.anonymous, 2011, 4)
+        # the weeks start on sunday and cover the whole month
+        self.assertEquals(weeks[0][0], (date(2011, 3, 27), []))
+        self.assertEquals(weeks[-1][-1], (date(2011, 4, 30), []))
+        self.assertEquals(dict(sum(weeks, []))[date(2011, 4, 12)], [event])
+
+        # cached until an event is saved
+        self.assertEquals(count_queries(get_month_calendar, self.anonymous, 2011, 4), 0)
+        event.start_dt = datetime(2011, 4, 13, 9)
+        event.end_dt = datetime(2011, 4, 13, 17)
+        event.save()
+        days = dict(sum(get_month_calendar(self.anonymous, 2011, 4), []))
+        self.assertEquals(days[date(2011, 4, 12)], [])
+        self.assertEquals([e.pk for e in days[date(2011, 4, 13)]], [event.pk])
+
+    def test_colors_refresh_calendar(self):
+        event = self.add_event('Meeting', datetime(2011, 4, 12, 9), datetime(2011, 4, 12, 17),
+            type=self.type)
+        get_month_calendar(self.anonymous, 2011, 4)
+
+        color_set = self.type.color_set
+        color_set.bg_color = '000'
+        color_set.save()
+        days = dict(sum(get_month_calendar(self.anonymous, 2011, 4), []))
+        self.assertEquals(days[date(2011, 4, 12)][0].type.bg_color, '#000')
+
+    def test_month_query_count_is_constant(self):
+        """
+        Benchmark: a month is read with one query, whatever the number of events
+        """
+        for day in range(1, 29):
+            self.add_event('Event %s' % day, datetime(2011, 2, day, 9), datetime(2011, 2, day, 17),
+                type=self.type)
+        self.assertEquals(count_queries(get_day_events, self.anonymous,
+            [date(2011, 2, day) for day in range(1, 29)]), 1)
+
+
+class IcalFeedTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('admin', 'admin@example.com', 'google')
+        self.place = Place.objects.create(name='Town Hall', address='1 Main St', zip='77002')
+
+        self.event = self.add_event('Started', datetime(2011, 4, 1, 9))
+        self.add_event('Upcoming', datetime(2099, 4, 1, 9))
+        organizer = Organizer.objects.create(name='Jane Organizer')
+        organizer.event.add(self.event)
+        speaker = Speaker.objects.create(name='John Speaker')
+        speaker.event.add(self.event)
+
+    def add_event(self, title, start_dt):
+        event = Event(title=title, start_dt=start_dt, end_dt=start_dt.replace(hour=17),
+            timezone=settings.TIME_ZONE, place=self.place, allow_anonymous_view=True,
+            creator=self.user, creator_username=self.user.username,
+            owner=self.user, owner_username=self.user.username)
+        event.save()
+        return event
+
+    def test_vevents(self):
+        events = get_feed_events(AnonymousUser())
+        self.assertEquals([pk for pk, start_dt, update_dt in events], [self.event.pk])
+
+        vevents = ''.join(iter_vevents(events, get_site_info()))
+        self.assertTrue('UID:uid%d@' % self.event.pk in vevents)
+        self.assertTrue('ORGANIZER:Jane Organizer' in vevents)
+        self.assertTrue('Speaker: John Speaker' in vevents)
+
+        # rendered once, until the event is saved
+        d = get_site_info()
+        self.assertEquals(count_queries(lambda: list(iter_vevents(events, d))), 0)
+        self.event.title = 'Renamed'
+        self.event.save()
+        vevents = ''.join(iter_vevents(get_feed_events(AnonymousUser()), d))
+        self.assertTrue('SUMMARY:Renamed' in vevents)
+
+    def test_related_changes(self):
+        d = get_site_info()
+        list(iter_vevents(get_feed_events(AnonymousUser()), d))
+
+        # the place, organizers and speakers show in the VEVENT
+        self.place.name = 'City Hall'
+        self.place.save()
+        organizer = Organizer.objects.get(name='Jane Organizer')
+        organizer.name = 'Jane Doe'
+        organizer.save()
+        Speaker.objects.create(name='Mary Speaker').event.add(self.event)
+        vevents = ''.join(iter_vevents(get_feed_events(AnonymousUser()), d))
+        self.assertTrue('City Hall' in vevents)
+        self.assertTrue('ORGANIZER:Jane Doe' in vevents)
+        self.assertTrue('Mary Speaker' in vevents)
+
+        Speaker.objects.get(name='John Speaker').delete()
+        vevents = ''.join(iter_vevents(get_feed_events(AnonymousUser()), d))
+        self.assertFalse('John Speaker' in vevents)
+
+    def test_conditional_get(self):
+        url = reverse('event.ics')
+        response = self.client.get(url)
+        self.assertEquals(response.status_code, 200)
+        self.assertTrue(response.content.startswith('BEGIN:VCALENDAR'))
+        self.assertTrue(response.content.endswith('END:VCALENDAR\n'))
+
+        etag = response['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEquals(response.status_code, 304)
+
+        self.event.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEquals(response.status_code, 200)
+        self.assertNotEquals(response['ETag'], etag)
+
+        # a deleted event leaves the feed
+        etag = response['ETag']
+        self.assertFalse(response.has_header('Last-Modified'))
+        pk = self.event.pk
+        self.event.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEquals(response.status_code, 200)
+        self.assertFalse('UID:uid%d@' % pk in response.content)
+
+
+class SpotsTakenTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('admin', 'admin@example.com', 'google')
+        reg_conf = RegistrationConfiguration.objects.create(limit=3, enabled=True)
+        self.pricing = RegConfPricing.objects.create(reg_conf=reg_conf, title='Regular')
+        self.event = Event(title='Conference', start_dt=datetime(2099, 4, 1, 9),
+            end_dt=datetime(2099, 4, 1, 17), timezone=settings.TIME_ZONE,
+            registration_configuration=reg_conf,
+            creator=self.user, creator_username=self.user.username,
+            owner=self.user, owner_username=self.user.username)
+        self.event.save()
+
+    def add_registrant(self):
+        registration = Registration.objects.create(event=self.event,
+            reg_conf_price=self.pricing, amount_paid=0)
+        return Registrant.objects.create(registration=registration, pricing=self.pricing)
+
+    def test_reserve(self):
+        self.assertEquals(get_event_spots_taken(self.event), 0)
+        self.assertTrue(reserve_event_spots(self.event, 2))
+        self.assertTrue(reserve_event_spots(self.event, 1))
+        # the event is full
+        self.assertFalse(reserve_event_spots(self.event, 1))
+        self.assertTrue(reserve_event_spots(self.event, 1, ignore_limit=True))
+
+        self.assertEquals(get_event_spots_taken(self.event), 4)
+
+    def test_cancel(self):
+        registrant = self.add_registrant()
+        update_event_spots_taken(self.event)
+        self.assertEquals(get_event_spots_taken(self.event), 1)
+
+        self.assertTrue(cancel_event_registrant(registrant))
+        # already cancelled, the spot is not given back twice
+        self.assertFalse(cancel_event_registrant(registrant))
+        self.assertEquals(get_event_spots_taken(self.event), 0)
+
+    def test_reconcile(self):
+        # added without reserving their spots
+        self.add_registrant()
+        self.add_registrant()
+        self.assertEquals(get_event_spots_taken(self.event), 0)
+
+        self.assertEquals(update_event_spots_taken(self.event), 2)
+        self.assertEquals(get_event_spots_taken(self.event), 2)
+
+        # a missing counter is counted, then added again
+        SpotsTaken.objects.all().delete()
+        self.assertEquals(get_event_spots_taken(self.event), 2)
+        self.assertEquals(update_event_spots_taken(self.event), 2)
+        self.assertEquals(SpotsTaken.objects.get().spots_taken, 2)
+
+    def test_read_is_one_query(self):
+        get_event_spots_taken(self.event)
+        self.assertEquals(count_queries(get_event_spots_taken, self.event), 1)
+
+
+class RegistrantPermTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('admin', 'admin@example.com', 'google')
+        self.attendee = User.objects.create_user('attendee', 'attendee@example.com', 'google')
+        self.other = User.objects.create_user('other', 'other@example.com', 'google')
+        self.event = Event(title='Conference', start_dt=datetime(2099, 4, 1, 9),
+            end_dt=datetime(2099, 4, 1, 17), timezone=settings.TIME_ZONE,
+            creator=self.user, creator_username=self.user.username,
+            owner=self.user, owner_username=self.user.username)
+        self.event.save()
+        registration = Registration.objects.create(event=self.event, amount_paid=0)
+        self.registrant = Registrant.objects.create(registration=registration,
+            user=self.attendee)
+
+    def test_bound_user_can_view(self):
+        # the user of the registrant, as in its search index
+        for perm in ('events.view_registrant', 'registrants.view_registrant'):
+            self.assertTrue(self.attendee.has_perm(perm, self.registrant))
+            self.assertFalse(self.other.has_perm(perm, self.registrant))
+
+        self.assertEquals(has_perms_bulk(self.attendee, 'events.view_registrant',
+            [self.registrant]), set([self.registrant.pk]))
+        self.assertEquals(has_perms_bulk(self.other, 'events.view_registrant',
+            [self.registrant]), set())
+        self.assertFalse(self.attendee.has_perm('events.change_registrant', self.registrant))
+
+
+class EventSummaryTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('admin', 'admin@example.com', 'google')
+        self.events = [self.add_event('Event %s' % i) for i in range(3)]
+        # the ids of the events of other test runs are used again
+        delete_event_summaries([event.pk for event in self.events])
+
+    def add_event(self, title):
+        event = Event(title=title, start_dt=datetime(2099, 4, 1, 9),
+            end_dt=datetime(2099, 4, 1, 17), timezone=settings.TIME_ZONE,
+            creator=self.user, creator_username=self.user.username,
+            owner=self.user, owner_username=self.user.username)
+        event.save()
+        return event
+
+    def add_registration(self, event, amount, paid, registrants=1):
+        registration = Registration.objects.create(event=event, amount_paid=amount)
+        for i in range(registrants):
+            Registrant.objects.create(registration=registration)
+        invoice = registration.save_invoice()
+        if paid:
+            invoice.balance = Decimal(str(amount - paid))
+            invoice.save()
+        return registration
+
+    def test_summary(self):
+        event = self.events[0]
+        self.add_registration(event, 100, 100, registrants=2)
+        self.add_registration(event, 50, 20)
+        cancelled = self.add_registration(event, 30, 0)
+        cancelled.registrant_set.update(cancel_dt=datetime.now())
+        delete_event_summaries([event.pk])
+
+        summary = get_event_summary(event)
+        self.assertEquals((summary['registrants'], summary['registrants_paid'],
+            summary['registrants_owing']), (3, 2, 1))
+        self.assertEquals(summary['total'], Decimal('150.00'))
+        self.assertEquals(summary['collected'], Decimal('120.00'))
+        self.assertEquals(summary['outstanding'], Decimal('30.00'))
+        self.assertEquals(summary['owing_total'], Decimal('50.00'))
+        self.assertEquals(event.money_collected, Decimal('120.00'))
+
+        self.assertEquals(get_event_summary(self.events[1])['registrants'], 0)
+        self.assertEquals(get_event_summary(self.events[1])['collected'], Decimal('0'))
+
+    def test_invalidation(self):
+        event = self.events[0]
+        registration = self.add_registration(event, 80, 0)
+        self.assertEquals(get_event_summary(event)['outstanding'], Decimal('80.00'))
+        self.assertEquals(count_queries(get_event_summary, event), 0)
+
+        invoice = registration.invoice
+        invoice.balance = 0
+        invoice.save()
+        self.assertEquals(get_event_summary(event)['collected'], Decimal('80.00'))
+
+        Registrant.objects.create(registration=registration)
+        self.assertEquals(get_event_summary(event)['registrants'], 2)
+
+    def test_one_query(self):
+        """
+        Benchmark: the summaries of a set of events are added
+        up in one query
+        """
+        for event in self.events:
+            self.add_registration(event, 10, 10)
+        event_ids = [event.pk for event in self.events]
+        delete_event_summaries(event_ids)
+
+        self.assertEquals(count_queries(get_event_summaries, event_ids), 1)
+        self.assertEquals(count_queries(get_event_summaries, event_ids), 0)
+
+    def test_search_page(self):
+        self.user.is_superuser = True
+        self.user.save()
+        self.client.login(username='admin', password='google')
+
+        response = self.client.get(reverse('event.search'))
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response.context['editable_events'],
+            set([event.pk for event in self.events]))
+
+
+class RegistrantExportTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('admin', 'admin@example.com', 'google')
+        self.event = Event(title='Conference', start_dt=datetime(2099, 4, 1, 9),
+            end_dt=datetime(2099, 4, 1, 17), timezone=settings.TIME_ZONE,
+            creator=self.user, creator_username=self.user.username,
+            owner=self.user, owner_username=self.user.username)
+        self.event.save()
+
+        self.form = CustomRegForm.objects.create(name='Conference Form')
+        self.size = CustomRegField.objects.create(form=self.form, label='Shirt Size',
+            field_type='CharField', position=1)
+        self.meal = CustomRegField.objects.create(form=self.form, label='Meal',
+            field_type='CharField', position=0)
+
+    def add_registrant(self, first_name, values=None):
+        registration = Registration.objects.create(event=self.event, amount_paid=0)
+        entry = None
+        if values is not None:
+            entry = CustomRegFormEntry.objects.create(form=self.form, entry_time=datetime.now())
+            for field, value in values:
+                CustomRegFieldEntry.objects.create(entry=entry, field=field, value=value)
+        return Registrant.objects.create(registration=registration,
+            first_name=first_name, custom_reg_form_entry=entry)
+
+    def export(self):
+        titles, rows = registrant_custom_export_rows(self.event.pk)
+        return titles, list(rows)
+
+    def test_rows(self):
+        self.add_registrant('Jane', [(self.size, 'M'), (self.meal, 'Vegan')])
+        self.add_registrant('John', [(self.size, 'L')])
+        self.add_registrant('Plain')
+
+        titles, rows = self.export()
+        self.assertEquals(titles[-3:], ['balance', 'Meal', 'Shirt Size'])
+        self.assertEquals([(row[0], row[-2], row[-1]) for row in rows],
+            [('Jane', 'Vegan', 'M'), ('John', '', 'L'), ('Plain', '', '')])
+
+    def test_initials(self):
+        registrant = self.add_registrant('Jane', [(self.size, 'M'), (self.meal, 'Vegan')])
+        entries = [registrant.custom_reg_form_entry]
+        self.assertEquals(get_custom_registrants_initials(entries), [
+            {'field_%d' % self.size.pk: 'M', 'field_%d' % self.meal.pk: 'Vegan'}])
+
+    def test_export_query_count_is_constant(self):
+        """
+        Benchmark: the number of queries made by the export does not
+        grow with the number of registrants
+        """
+        counts = []
+        for start, end in ((0, 2), (2, 12)):
+            for i in range(start, end):
+                self.add_registrant('First%s' % i, [(self.size, 'S'), (self.meal, 'Fish')])
+            counts.append(count_queries(self.export))
+
+        self.assertEquals(len(self.export()[1]), 12)
+        self.assertEquals(counts[0], counts[1])
+
+
 __test__ = {"doctest": """
 Another way to test that 1 + 1 is equal to 2.
 
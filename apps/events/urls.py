@@ -116,6 +116,9 @@ urlpatterns = patterns('events',
     url(r'^pending/(?P<event_id>\d+)/approve/$', 'views.approve', name='event.approve'),
     
     url(r'^registrants/(?P<id>\d+)/$', 'views.registrant_details', name="event.registrant"),
+
+    # reports
+    url(r'^reports/financial/$', 'views.financial_report', name="reports-event-financials"),
     
     # email registrants
     url(r'^message/(?P<event_id>\d+)/$', 'views.message_add', name='event.message'),
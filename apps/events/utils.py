@@ -1,8 +1,10 @@
 import re
+import calendar
 from django.core.urlresolvers import reverse
 from django.utils.html import strip_tags
 from django.contrib.auth.models import User
-from django.db import connection
+from django.db import connection, transaction
+from django.db.models import F
 from datetime import datetime, timedelta
 from datetime import date
 from decimal import Decimal
@@ -11,6 +13,8 @@ from profiles.models import Profile
 from site_settings.utils import get_setting
 from events.models import Registration, Event, RegistrationConfiguration
 from events.models import Registrant, RegConfPricing, CustomRegForm
+from events.models import SpotsTaken, Type
+from events.models import CustomRegFormEntry, CustomRegField, CustomRegFieldEntry
 from events.forms import FormForCustomRegForm
 from user_groups.models import Group
 from perms.utils import is_member, is_admin, get_query_filters
@@ -64,43 +68,37 @@ def get_ACRF_queryset(event=None):
 
     return queryset
 
-def render_registrant_excel(sheet, rows_list, balance_index, styles, start=0):
-    for row, row_data in enumerate(rows_list):
-        for col, val in enumerate(row_data):
-            # styles the date/time fields
-            if isinstance(val, datetime):
-                style = styles['datetime_style']
-            elif isinstance(val, date):
-                style = styles['date_style']
-            else:
-                style = styles['default_style']
+def get_ievent(request, d, event_id):
+    from events.models import Event
+    
+    event = Event.objects.get(id=event_id)
+    return get_vevent(event, d)
 
-            # style the invoice balance column
-            if col == balance_index:
-                balance = val
-                if not val:
-                    balance = 0
-                if isinstance(balance, Decimal) and balance > 0:
-                    style = styles['balance_owed_style']
 
-            sheet.write(row+start, col, val, style=style)
+def get_vevents(request, d):
+    from events.ical import get_feed_events, iter_vevents
 
+    # past and current events, as the feed
+    return ''.join(iter_vevents(get_feed_events(request.user), d))
 
-def get_ievent(request, d, event_id):
+
+def get_vevent(event, d, organizers=None, speakers=None):
+    """
+    The VEVENT of an event. organizers and speakers are the lists
+    of their names, looked up when not given.
+    """
     from django.conf import settings
     from timezones.utils import adjust_datetime_to_timezone
-    from events.models import Event
     
-    site_url = get_setting('site', 'global', 'siteurl')
+    site_url = d.get('site_url') or get_setting('site', 'global', 'siteurl')
+    if organizers is None:
+        organizers = [organizer.name for organizer in event.organizer_set.all()]
     
-    event = Event.objects.get(id=event_id)
     e_str = "BEGIN:VEVENT\n"
     
     # organizer
-    organizers = event.organizer_set.all()
     if organizers:
-        organizer_name_list = [organizer.name for organizer in organizers]
-        e_str += "ORGANIZER:%s\n" % (', '.join(organizer_name_list))
+        e_str += "ORGANIZER:%s\n" % (', '.join(organizers))
     
     # date time 
     if event.start_dt:
@@ -126,9 +124,9 @@ def get_ievent(request, d, event_id):
     d['event_url'] = event_url
     
     # text description
-    e_str += "DESCRIPTION:%s\n" % (build_ical_text(event,d))
+    e_str += "DESCRIPTION:%s\n" % (build_ical_text(event, d, speakers))
     #  html description
-    e_str += "X-ALT-DESC;FMTTYPE=text/html:%s\n" % (build_ical_html(event,d))
+    e_str += "X-ALT-DESC;FMTTYPE=text/html:%s\n" % (build_ical_html(event, d, speakers))
     
     e_str += "SUMMARY:%s\n" % strip_tags(event.title)
     e_str += "PRIORITY:5\n"
@@ -143,70 +141,7 @@ def get_ievent(request, d, event_id):
     return e_str
 
 
-def get_vevents(request, d):
-    from django.conf import settings
-    from timezones.utils import adjust_datetime_to_timezone
-    from events.models import Event
-    
-    site_url = get_setting('site', 'global', 'siteurl')
-    
-    e_str = ""
-    # load only upcoming events by default
-    filters = get_query_filters(request.user, 'events.view_event')
-    events = Event.objects.filter(filters).filter(start_dt__lte=datetime.now())
-    events = events.order_by('start_dt')
-
-    for event in events:
-        e_str += "BEGIN:VEVENT\n"
-        
-        # organizer
-        organizers = event.organizer_set.all()
-        if organizers:
-            organizer_name_list = [organizer.name for organizer in organizers]
-            e_str += "ORGANIZER:%s\n" % (', '.join(organizer_name_list))
-        
-        # date time 
-        if event.start_dt:
-            start_dt = adjust_datetime_to_timezone(event.start_dt, settings.TIME_ZONE, 'GMT')
-            start_dt = start_dt.strftime('%Y%m%dT%H%M%SZ')
-            e_str += "DTSTART:%s\n" % (start_dt)
-        if event.end_dt:
-            end_dt = adjust_datetime_to_timezone(event.end_dt, settings.TIME_ZONE, 'GMT')
-            end_dt = end_dt.strftime('%Y%m%dT%H%M%SZ')
-            e_str += "DTEND:%s\n" % (end_dt)
-        
-        # location
-        if event.place:
-            e_str += "LOCATION:%s\n" % (event.place.name)
-            
-        e_str += "TRANSP:OPAQUE\n"
-        e_str += "SEQUENCE:0\n"
-        
-        # uid
-        e_str += "UID:uid%d@%s\n" % (event.pk, d['domain_name'])
-        
-        event_url = "%s%s" % (site_url, reverse('event', args=[event.pk]))
-        d['event_url'] = event_url
-        
-        # text description
-        e_str += "DESCRIPTION:%s\n" % (build_ical_text(event,d))
-        #  html description
-        e_str += "X-ALT-DESC;FMTTYPE=text/html:%s\n" % (build_ical_html(event,d))
-        
-        e_str += "SUMMARY:%s\n" % strip_tags(event.title)
-        e_str += "PRIORITY:5\n"
-        e_str += "CLASS:PUBLIC\n"
-        e_str += "BEGIN:VALARM\n"
-        e_str += "TRIGGER:-PT30M\n"
-        e_str += "ACTION:DISPLAY\n"
-        e_str += "DESCRIPTION:Reminder\n"
-        e_str += "END:VALARM\n"
-        e_str += "END:VEVENT\n"
-        
-    return e_str
-
-
-def build_ical_text(event, d):
+def build_ical_text(event, d, speakers=None):
     ical_text = "--- This iCal file does *NOT* confirm registration.\n"
     ical_text += "Event details subject to change. ---\n"
     ical_text += '%s\n\n' % d['event_url']
@@ -227,10 +162,10 @@ def build_ical_text(event, d):
 #        ical_text += 'Sponsor: %s\n' % (', '.join(sponsor_name_list))
     
     # speaker
-    speakers = event.speaker_set.all()
+    if speakers is None:
+        speakers = [speaker.name for speaker in event.speaker_set.all()]
     if speakers:
-        speaker_name_list = [speaker.name for speaker in speakers]
-        ical_text += 'Speaker: %s\n' % (', '.join(speaker_name_list))
+        ical_text += 'Speaker: %s\n' % (', '.join(speakers))
         
     # maps
     show_map_link = False
@@ -266,7 +201,7 @@ def build_ical_text(event, d):
     return ical_text
 
 
-def build_ical_html(event, d):
+def build_ical_html(event, d, speakers=None):
     # disclaimer: registration
     ical_html = "<div>--- This iCal file does *NOT* confirm registration."
     ical_html += "Event details subject to change. ---</div>"
@@ -286,10 +221,10 @@ def build_ical_html(event, d):
 #        ical_html += '<div>Sponsor: %s</div>' % (', '.join(sponsor_name_list))
     
     # speaker
-    speakers = event.speaker_set.all()
+    if speakers is None:
+        speakers = [speaker.name for speaker in event.speaker_set.all()]
     if speakers:
-        speaker_name_list = [speaker.name for speaker in speakers]
-        ical_html += '<div>Speaker: %s</div>' % (', '.join(speaker_name_list))
+        ical_html += '<div>Speaker: %s</div>' % (', '.join(speakers))
         
     ical_html += '<br />'
     
@@ -383,6 +318,83 @@ def prev_month(month, year):
     return (prev_month, prev_year)
 
 
+def get_calendar_perm_key(user):
+    """
+    The part of the cache key of a calendar month that stands for the
+    events the user can view, following get_query_filters
+    """
+    from perms.utils import is_developer, has_perm
+    from perms.cache import get_user_version, get_content_type_version
+    from django.contrib.contenttypes.models import ContentType
+
+    # impersonation
+    user = getattr(user, 'impersonated_user', user)
+
+    if not isinstance(user, User) or user.is_anonymous():
+        return 'anonymous'
+    if is_developer(user):
+        return 'developer'
+    if is_admin(user) or has_perm(user, 'events.view_event'):
+        return 'admin'
+
+    # the filters of the other users hold their own events and groups
+    content_type = ContentType.objects.get_for_model(Event)
+    return 'user.%s.%s.%s.%s' % (user.pk, bool(is_member(user)),
+        get_user_version(user.pk), get_content_type_version(content_type.pk))
+
+
+def get_day_events(user, days, type_slug=None):
+    """
+    Returns a dict day -> events of the events the user can view on
+    each of the consecutive days, ordered by start_dt, with one query,
+    and one more to look up the type of type_slug.
+    Events on saturdays and sundays need on_weekend.
+    """
+    # one day offset so we can get all the events on that day
+    bound = timedelta(hours=23, minutes=59)
+    first_dt = datetime(days[0].year, days[0].month, days[0].day)
+    last_dt = datetime(days[-1].year, days[-1].month, days[-1].day)
+
+    filters = get_query_filters(user, 'events.view_event')
+    events = Event.objects.filter(filters).filter(start_dt__lte=last_dt + bound,
+        end_dt__gte=first_dt).distinct().select_related('type__color_set')
+    # a slug with no type shows all the events
+    types = type_slug and list(Type.objects.filter(slug=type_slug)[:1])
+    if types:
+        events = events.filter(type=types[0])
+    events = events.order_by('start_dt')
+
+    day_events = dict([(day, []) for day in days])
+    for event in events:
+        day_dt = max(datetime(event.start_dt.year, event.start_dt.month, event.start_dt.day), first_dt)
+        while day_dt <= last_dt and day_dt <= event.end_dt:
+            if event.start_dt <= day_dt + bound and \
+                (event.on_weekend or day_dt.weekday() < 5):
+                day_events[day_dt.date()].append(event)
+            day_dt += timedelta(days=1)
+    return day_events
+
+
+def get_month_calendar(user, year, month, type_slug=None):
+    """
+    Returns the weeks of a month, sunday first, as lists of
+    (day, events) with the events the user can view on the day.
+    The month is cached per permission key, type and month.
+    """
+    from django.core.cache import cache
+    from events.cache import calendar_key, EVENT_CALENDAR_CACHE_TIMEOUT
+
+    weeks = calendar.Calendar(calendar.SUNDAY).monthdatescalendar(year, month)
+
+    key = calendar_key(get_calendar_perm_key(user), type_slug, year, month)
+    day_events = cache.get(key)
+    if day_events is None:
+        day_events = get_day_events(user, [day for week in weeks for day in week], type_slug)
+        cache.set(key, day_events, EVENT_CALENDAR_CACHE_TIMEOUT)
+
+    return [[(day, day_events[day]) for day in week] for week in weeks]
+
+
 def email_registrants(event, email, **kwargs):
 
     reg8ns = Registration.objects.filter(event=event)
@@ -530,6 +542,8 @@ def save_registration(*args, **kwargs):
 
         # create registrant
         registrant = reg8n.registrant_set.create(**registrant_set_defaults)
+        if event.registration_configuration:
+            reserve_event_spots(event, 1, ignore_limit=True)
         
         created = True
 
@@ -537,10 +551,12 @@ def save_registration(*args, **kwargs):
     return (reg8n, created)
 
 
+@transaction.commit_on_success
 def add_registration(*args, **kwargs):
     """
     Add the registration
     Args are split up below into the appropriate attributes
+    Returns (None, False) if the event is full.
     """
     # arguments were getting kinda long
     # moved them to an unpacked version
@@ -566,6 +582,12 @@ def add_registration(*args, **kwargs):
         reg8n_attrs['creator'] = request.user
         reg8n_attrs['owner'] = request.user
         
+    # take the spots first
+    forms = [form for form in registrant_formset.forms
+        if not form in registrant_formset.deleted_forms]
+    if not reserve_event_spots(event, len(forms)):
+        return (None, False)
+
     # create registration
     reg8n = Registration.objects.create(**reg8n_attrs)
     
@@ -836,48 +858,78 @@ def count_event_spots_taken(event):
     """
     Count the number of spots taken in an event
     """
-    registrations = Registration.objects.filter(event=event)
-    count = 0
-
-    for reg in registrations:
-        count += reg.registrant_set.filter(cancel_dt__isnull=True).count()
-    
-    return count
+    return Registrant.objects.filter(registration__event=event,
+        cancel_dt__isnull=True).count()
 
 
 def update_event_spots_taken(event):
     """
-    Update the index registration count for 
-    an event
+    Counts the spots taken in an event again and stores
+    them in its counter
     """
-    from events.search_indexes import EventIndex
-    from events.models import Event
-
-    event_index = EventIndex(Event)
-    event.spots_taken = count_event_spots_taken(event)
-    event_index.update_object(event)
+    reg_conf = event.registration_configuration
+    if not reg_conf:
+        return 0
 
-    return event.spots_taken
+    spots_taken = count_event_spots_taken(event)
+    if not SpotsTaken.objects.filter(reg_conf=reg_conf).update(spots_taken=spots_taken):
+        SpotsTaken.objects.create(reg_conf=reg_conf, spots_taken=spots_taken)
+    return spots_taken
 
 
 def get_event_spots_taken(event):
     """
-    Get the index registration count for
-    an event
+    Get the registration count of an event
+    from its counter
     """
-    from haystack.query import SearchQuerySet
-    from events.models import Event
-    sqs = SearchQuerySet().models(Event)
-    sqs = sqs.filter(primary_key=event.pk)
-
+    reg_conf = event.registration_configuration
+    if not reg_conf:
+        return 0
     try:
-        spots_taken = sqs[0].spots_taken
-        if not spots_taken:
-            spots_taken = update_event_spots_taken(event)
-        return spots_taken
+        return SpotsTaken.objects.filter(reg_conf=reg_conf).values_list(
+            'spots_taken', flat=True)[0]
     except IndexError:
-        return update_event_spots_taken(event)
-    return 0
+        # no counter yet, reconcile_event_spots adds it
+        return count_event_spots_taken(event)
+
+
+def reserve_event_spots(event, count, ignore_limit=False):
+    """
+    Takes count spots of an event with one conditional update,
+    so concurrent registrations cannot go over its limit.
+    Returns False, taking nothing, if there are not enough spots left.
+    Call it in the transaction that adds the registrants.
+    """
+    reg_conf = event.registration_configuration
+
+    spots = SpotsTaken.objects.filter(reg_conf=reg_conf)
+    if reg_conf.limit > 0 and not ignore_limit:
+        spots = spots.filter(spots_taken__lte=reg_conf.limit - count)
+    return bool(spots.update(spots_taken=F('spots_taken') + count))
+
+
+def release_event_spots(event, count):
+    """
+    Gives back the spots of cancelled registrants
+    """
+    SpotsTaken.objects.filter(reg_conf=event.registration_configuration).update(
+        spots_taken=F('spots_taken') - count)
+
+
+def cancel_event_registrant(registrant):
+    """
+    Cancels a registrant and gives back its spot.
+    Returns False if the registrant was already cancelled.
+    """
+    now = datetime.now()
+    if not Registrant.objects.filter(pk=registrant.pk, cancel_dt__isnull=True
+        ).update(cancel_dt=now):
+        return False
+
+    registrant.cancel_dt = now
+    registrant.save()
+    release_event_spots(registrant.registration.event, 1)
+    return True
 
 
 def registration_earliest_time(event, pricing=None):
@@ -1039,16 +1091,156 @@ def get_active_days(event):
     
     return day_list
 
+def get_custom_field_values(field_entries):
+    """
+    Pivots the values of custom registration form fields in one query.
+    Returns a dict entry id -> {field id: value}
+    """
+    values = {}
+    for entry_id, field_id, value in field_entries.values_list(
+        'entry', 'field', 'value').order_by().iterator():
+        values.setdefault(entry_id, {})[field_id] = value
+    return values
+
+
 def get_custom_registrants_initials(entries, **kwargs):
+    values = get_custom_field_values(CustomRegFieldEntry.objects.filter(entry__in=entries))
     initials = []
     for entry in entries:
         fields_d = {}
-        field_entries = entry.field_entries.all()
-        for field_entry in field_entries:
-            fields_d['field_%d' % field_entry.field.id] = field_entry.value
+        for field_id, value in values.get(entry.pk, {}).items():
+            fields_d['field_%d' % field_id] = value
         initials.append(fields_d)
     return initials
 
 
-                        
-        
+# the key is what the column will be in the
+# excel sheet. the value is the database lookup
+REGISTRANT_EXPORT_MAPPINGS = (
+    ('first_name', 'first_name'),
+    ('last_name', 'last_name'),
+    ('phone', 'phone'),
+    ('email', 'email'),
+    ('registration_id', 'registration__pk'),
+    ('price type', 'registration__reg_conf_price__title'),
+    ('invoice_id', 'registration__invoice__pk'),
+    ('registration price', 'registration__amount_paid'),
+    ('payment method', 'registration__payment_method__machine_name'),
+    ('balance', 'registration__invoice__balance'),
+    ('company', 'company_name'),
+    ('address', 'address'),
+    ('city', 'city'),
+    ('state', 'state'),
+    ('zip', 'zip'),
+    ('country', 'country'),
+    ('date', 'create_dt'),
+)
+REGISTRANT_EXPORT_BALANCE_COL = 9
+
+# the columns of the export with the custom registration forms,
+# the custom fields follow
+REGISTRANT_CUSTOM_EXPORT_MAPPINGS = (
+    ('first_name', 'first_name'),
+    ('last_name', 'last_name'),
+    ('phone', 'phone'),
+    ('email', 'email'),
+    ('company', 'company_name'),
+    ('address', 'address'),
+    ('city', 'city'),
+    ('state', 'state'),
+    ('zip', 'zip'),
+    ('country', 'country'),
+    ('date', 'create_dt'),
+    ('registration_id', 'registration__pk'),
+    ('price type', 'registration__reg_conf_price__title'),
+    ('invoice_id', 'registration__invoice__pk'),
+    ('registration price', 'registration__amount_paid'),
+    ('payment method', 'registration__payment_method__machine_name'),
+    ('balance', 'registration__invoice__balance'),
+)
+REGISTRANT_CUSTOM_EXPORT_BALANCE_COL = 16
+
+_balance_owed_style = None
+
+
+def get_roster_registrants(event, roster_view=''):
+    if roster_view == 'non-paid':
+        return event.registrants(with_balance=True)
+    elif roster_view == 'paid':
+        return event.registrants(with_balance=False)
+    return event.registrants()
+
+
+def registrant_export_rows(event_id, roster_view=''):
+    """
+    The titles and the rows of the export of the registrants of an event
+    """
+    registrants = get_roster_registrants(Event.objects.get(pk=event_id), roster_view)
+
+    titles = [title for title, lookup in REGISTRANT_EXPORT_MAPPINGS]
+    lookups = [lookup for title, lookup in REGISTRANT_EXPORT_MAPPINGS]
+    return titles, registrants.values_list(*lookups).iterator()
+
+
+def registrant_custom_export_rows(event_id, roster_view=''):
+    """
+    The titles and the rows of the export of the registrants of an event
+    with the fields of its custom registration forms, one column a field.
+    The field values of all the registrants are read in one query.
+    """
+    event = Event.objects.get(pk=event_id)
+    registrants = get_roster_registrants(event, roster_view)
+
+    form_ids = CustomRegFormEntry.objects.filter(
+        registrants__registration__event=event).values_list('form', flat=True).distinct()
+    fields = list(CustomRegField.objects.filter(form__in=form_ids).order_by(
+        'form__id', 'position', 'pk').values_list('pk', 'label', 'form__name'))
+    field_ids = [field_id for field_id, label, form_name in fields]
+
+    titles = [title for title, lookup in REGISTRANT_CUSTOM_EXPORT_MAPPINGS]
+    if len(set([form_name for field_id, label, form_name in fields])) > 1:
+        titles.extend(['%s: %s' % (form_name, label) for field_id, label, form_name in fields])
+    else:
+        titles.extend([label for field_id, label, form_name in fields])
+
+    lookups = [lookup for title, lookup in REGISTRANT_CUSTOM_EXPORT_MAPPINGS]
+    lookups.append('custom_reg_form_entry')
+
+    def rows():
+        values = {}
+        if field_ids:
+            values = get_custom_field_values(CustomRegFieldEntry.objects.filter(
+                entry__registrants__registration__event=event))
+        for row in registrants.values_list(*lookups).order_by('registration', 'pk').iterator():
+            entry_values = values.get(row[-1], {})
+            yield list(row[:-1]) + [entry_values.get(field_id, '') for field_id in field_ids]
+
+    return titles, rows()
+
+
+def _balance_style(value):
+    global _balance_owed_style
+    if isinstance(value, Decimal) and value > 0:
+        if _balance_owed_style is None:
+            import xlwt
+            _balance_owed_style = xlwt.easyxf('font: color-index red, bold on')
+        return _balance_owed_style
+    return None
+
+
+def registrant_export_style(col, value):
+    """
+    Shows the balances owed in red
+    """
+    if col == REGISTRANT_EXPORT_BALANCE_COL:
+        return _balance_style(value)
+    return None
+
+
+def registrant_custom_export_style(col, value):
+    """
+    Shows the balances owed in red
+    """
+    if col == REGISTRANT_CUSTOM_EXPORT_BALANCE_COL:
+        return _balance_style(value)
+    return None
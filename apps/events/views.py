@@ -19,11 +19,13 @@ from django.template.defaultfilters import date as date_filter
 from django.forms.formsets import formset_factory
 from django.forms.models import modelformset_factory, inlineformset_factory
 from django.forms.models import BaseModelFormSet
+from django.views.decorators.http import condition
 
 from haystack.query import SearchQuerySet
 from base.http import Http403
+from base.exports import export
 from site_settings.utils import get_setting
-from perms.utils import (has_perm, get_notice_recipients, is_admin,
+from perms.utils import (has_perm, has_perms_bulk, get_notice_recipients, is_admin,
     get_query_filters, update_perms_and_save, get_administrators, has_view_perm)
 from event_logs.models import EventLog
 from invoices.models import Invoice
@@ -44,9 +46,13 @@ from events.forms import (EventForm, Reg8nForm, Reg8nEditForm,
     FormForCustomRegForm, RegConfPricingBaseModelFormSet)
 from events.utils import (save_registration, email_registrants, 
     add_registration, registration_has_started, get_pricing, clean_price,
-    get_event_spots_taken, update_event_spots_taken, get_ievent,
+    get_event_spots_taken, cancel_event_registrant,
     copy_event, email_admins, get_active_days, get_ACRF_queryset,
-    get_custom_registrants_initials, render_registrant_excel)
+    get_custom_registrants_initials, registrant_export_rows,
+    registrant_export_style, registrant_custom_export_rows,
+    registrant_custom_export_style)
+from events.ical import iter_feed, feed_etag, get_feed, get_site_info
+from events.summaries import get_event_summary, get_event_summaries
 from events.addons.forms import RegAddonForm
 from events.addons.formsets import RegAddonBaseFormSet
 from events.addons.utils import (get_active_addons, get_available_addons, 
@@ -142,6 +148,10 @@ def month_redirect(request):
     return HttpResponseRedirect(reverse('event.month'))
 
 
+# the autopaginate of events/search.html
+EVENTS_PER_PAGE = 10
+
+
 def search(request, redirect=False, template_name="events/search.html"):
     """
     This page lists out all the upcoming events starting
@@ -181,6 +191,13 @@ def search(request, redirect=False, template_name="events/search.html"):
     events = events.order_by('start_dt')
     types = Type.objects.all().order_by('name')
 
+    # the events of the page the user can edit, they see their
+    # registration figures; this also loads the object permissions
+    # of the page for the has_perm checks of events/meta.html
+    page = max(request.page, 1)
+    editable_events = has_perms_bulk(request.user, 'events.change_event',
+        events[(page - 1) * EVENTS_PER_PAGE:page * EVENTS_PER_PAGE])
+
     EventLog.objects.log(
         event_id=174000,  # searched event
         event_data='%s searched by %s' % ('Event', request.user),
@@ -192,33 +209,17 @@ def search(request, redirect=False, template_name="events/search.html"):
 
     return render_to_response(
         template_name,
-        {'events': events,'types': types, 'now': datetime.now(), 'event_type': event_type, 'start_dt': start_dt},
+        {'events': events,'types': types, 'now': datetime.now(), 'event_type': event_type, 'start_dt': start_dt,
+         'editable_events': editable_events},
         context_instance=RequestContext(request)
     )
 
-def icalendar(request):
-    from events.utils import get_vevents
-    p = re.compile(r'http(s)?://(www.)?([^/]+)')
-    d = {}
-
-    d['site_url'] = get_setting('site', 'global', 'siteurl')
-    match = p.search(d['site_url'])
-    if match:
-        d['domain_name'] = match.group(3)
-    else:
-        d['domain_name'] = ""
-
-    ics_str = "BEGIN:VCALENDAR\n"
-    ics_str += "PRODID:-//Schipul Technologies//Schipul Codebase 5.0 MIMEDIR//EN\n"
-    ics_str += "VERSION:2.0\n"
-    ics_str += "METHOD:PUBLISH\n"
-    
-    # function get_vevents in events.utils
-    ics_str += get_vevents(request, d)
-    
-    ics_str += "END:VCALENDAR\n"
-    
-    response = HttpResponse(ics_str)
+def _ical_response(events, d):
+    """
+    Streams the iCalendar feed of the events as an .ics attachment
+    named after the domain of the site
+    """
+    response = HttpResponse(iter_feed(events, d))
     response['Content-Type'] = 'text/calendar'
     if d['domain_name']:
         file_name = '%s.ics' % (d['domain_name'])
@@ -227,39 +228,17 @@ def icalendar(request):
     response['Content-Disposition'] = 'attachment; filename=%s' % (file_name)
     return response
 
-def icalendar_single(request, id):
-    from events.utils import get_vevents
-    p = re.compile(r'http(s)?://(www.)?([^/]+)')
-    d = {}
+@condition(etag_func=feed_etag)
+def icalendar(request):
+    d, events = get_feed(request)
+    return _ical_response(events, d)
 
-    if not Event.objects.filter(pk=id).exists():
+def icalendar_single(request, id):
+    events = list(Event.objects.filter(pk=id).values_list('pk', 'start_dt', 'update_dt'))
+    if not events:
         raise Http404
 
-    d['site_url'] = get_setting('site', 'global', 'siteurl')
-    match = p.search(d['site_url'])
-    if match:
-        d['domain_name'] = match.group(3)
-    else:
-        d['domain_name'] = ""
-
-    ics_str = "BEGIN:VCALENDAR\n"
-    ics_str += "PRODID:-//Schipul Technologies//Schipul Codebase 5.0 MIMEDIR//EN\n"
-    ics_str += "VERSION:2.0\n"
-    ics_str += "METHOD:PUBLISH\n"
-    
-    # function get_vevents in events.utils
-    ics_str += get_ievent(request, d, id)
-    
-    ics_str += "END:VCALENDAR\n"
-    
-    response = HttpResponse(ics_str)
-    response['Content-Type'] = 'text/calendar'
-    if d['domain_name']:
-        file_name = '%s.ics' % (d['domain_name'])
-    else:
-        file_name = "event.ics"
-    response['Content-Disposition'] = 'attachment; filename=%s' % (file_name)
-    return response
+    return _ical_response(events, get_site_info())
 
 def print_view(request, id, template_name="events/print-view.html"):
     event = get_object_or_404(Event, pk=id)    
@@ -802,7 +781,9 @@ def delete(request, id, template_name="events/delete.html"):
                 description = '%s deleted' % event._meta.object_name,
                 user = request.user,
                 request = request,
-                instance = event
+                instance = event,
+                # its pk goes in the notice
+                sync = True
             )
 
             messages.add_message(request, messages.SUCCESS, 'Successfully deleted %s' % event)
@@ -1060,6 +1041,8 @@ def multi_register(request, event_id=0, template_name="events/reg8n/multi_regist
                     discount=discount,
                     custom_reg_form=custom_reg_form,
                 )
+                if not reg8n:
+                    return multi_register_redirect(request, event, _('Registration is full.'))
                 
                 site_label = get_setting('site', 'global', 'sitedisplayname')
                 site_url = get_setting('site', 'global', 'siteurl')
@@ -1070,8 +1053,6 @@ def multi_register(request, event_id=0, template_name="events/reg8n/multi_regist
                 and event_price > 0
                 
                 if reg8n_created:
-                    # update the spots taken on this event
-                    update_event_spots_taken(event)
                     registrants = reg8n.registrant_set.all().order_by('id')
                     for registrant in registrants:
                         #registrant.assign_mapped_fields()
@@ -1215,7 +1196,8 @@ def registration_edit(request, reg8n_id=0, hash='', template_name="events/reg8n/
             extra=0
         )
         entry_ids = reg8n.registrant_set.values_list('custom_reg_form_entry', flat=True).order_by('id')
-        entries = [CustomRegFormEntry.objects.get(id=id) for id in entry_ids]
+        entries = CustomRegFormEntry.objects.in_bulk(list(entry_ids))
+        entries = [entries[id] for id in entry_ids]
         params = {'prefix': 'registrant',
                   'custom_reg_form': custom_reg_form,
                   'entries': entries,
@@ -1333,8 +1315,8 @@ def cancel_registration(request, event_id, registration_id, hash='', template_na
                     if request.user.id == registrant.user.id:
                         user_is_registrant = True
 
-                registrant.cancel_dt = datetime.now()
-                registrant.save()
+                if not cancel_event_registrant(registrant):
+                    continue  # cancelled meanwhile
                 
                 # update the amount_paid in registration
                 if registrant.amount:
@@ -1363,9 +1345,6 @@ def cancel_registration(request, event_id, registration_id, hash='', template_na
                         'registrant':registrant,
                         'user_is_registrant': user_is_registrant,
                     })
-            
-            # update the spots taken on this event
-            update_event_spots_taken(event)
 
         return HttpResponseRedirect(
             reverse('event.registration_confirmation', 
@@ -1426,14 +1405,11 @@ def cancel_registrant(request, event_id=0, registrant_id=0, hash='', template_na
 
     if request.method == "POST":
         # check if already canceled. if so, do nothing
-        if not registrant.cancel_dt:
+        if cancel_event_registrant(registrant):
             user_is_registrant = False
             if request.user.is_authenticated() and registrant.user:
                 if request.user == registrant.user:
                     user_is_registrant = True
-
-            registrant.cancel_dt = datetime.now()
-            registrant.save()
             
             # update the amount_paid in registration
             if registrant.amount:
@@ -1463,9 +1439,6 @@ def cancel_registrant(request, event_id=0, registrant_id=0, hash='', template_na
                     'user_is_registrant': user_is_registrant,
                 })
 
-            # update the spots taken on this event
-            update_event_spots_taken(event)
-
         # back to invoice
         return HttpResponseRedirect(
             reverse('event.registration_confirmation', args=[event.pk, registrant.hash]))
@@ -1485,7 +1458,7 @@ def cancel_registrant(request, event_id=0, registrant_id=0, hash='', template_na
 
 def month_view(request, year=None, month=None, type=None, template_name='events/month-view.html'):
     from datetime import date
-    from events.utils import next_month, prev_month
+    from events.utils import next_month, prev_month, get_month_calendar
 
     if type: # redirect to /events/month/ if type does not exist
         if not Type.objects.filter(slug=type).exists():
@@ -1501,7 +1474,6 @@ def month_view(request, year=None, month=None, type=None, template_name='events/
         raise Http404
 
     calendar.setfirstweekday(calendar.SUNDAY)
-    Calendar = calendar.Calendar
 
     next_month, next_year = next_month(month, year)
     prev_month, prev_year = prev_month(month, year)
@@ -1515,7 +1487,8 @@ def month_view(request, year=None, month=None, type=None, template_name='events/
 
     month_names = calendar.month_name[month-1:month+2]
     weekdays = calendar.weekheader(10).split()
-    cal = Calendar(calendar.SUNDAY).monthdatescalendar(year, month)
+    # weeks of (day, events)
+    cal = get_month_calendar(request.user, year, month, type)
 
     types = Type.objects.all().order_by('name')
 
@@ -1653,7 +1626,6 @@ def registrant_search(request, event_id=0, template_name='events/registrants/sea
 @login_required
 def registrant_roster(request, event_id=0, roster_view='', template_name='events/registrants/roster.html'):
     # roster_view in ['total', 'paid', 'non-paid']
-    from django.db.models import Sum
     event = get_object_or_404(Event, pk=event_id)
     query = ''
 
@@ -1693,19 +1665,20 @@ def registrant_roster(request, event_id=0, roster_view='', template_name='events
                     reg.last_name = reg.custom_reg_form_entry.__unicode__()
             registrants.append(reg)
 
-    total_sum = float(0)
-    balance_sum = float(0)
-
     # get total and balance (sum)
-    for reg8n in registrations:
-        if not reg8n.canceled:  # not cancelled
-            if reg8n.invoice != None:
-                if roster_view != 'paid':
-                    total_sum += float(reg8n.invoice.total)
-                balance_sum += float(reg8n.invoice.balance)
+    summary = get_event_summary(event)
+    if roster_view == 'paid':
+        total_sum = 0
+        balance_sum = summary['paid_balance']
+    elif roster_view == 'non-paid':
+        total_sum = summary['owing_total']
+        balance_sum = summary['owing_balance']
+    else:
+        total_sum = summary['total']
+        balance_sum = summary['balance']
 
-    num_registrants_who_paid = event.registrants(with_balance=False).count()
-    num_registrants_who_owe = event.registrants(with_balance=True).count()
+    num_registrants_who_paid = summary['registrants_paid']
+    num_registrants_who_owe = summary['registrants_owing']
 
     return render_to_response(template_name, {
         'event':event, 
@@ -1718,6 +1691,21 @@ def registrant_roster(request, event_id=0, roster_view='', template_name='events
         },
         context_instance=RequestContext(request))
 
+@login_required
+def financial_report(request, template_name='reports/event_financials.html'):
+    """
+    Registrants, money collected and outstanding balance of
+    the events with registration, newest first.
+    """
+    if not is_admin(request.user):
+        raise Http403
+
+    events = Event.objects.exclude(registration_configuration=None).order_by('-start_dt')
+
+    return render_to_response(template_name, {
+        'events': events,
+        }, context_instance=RequestContext(request))
+
 @login_required
 def registrant_details(request, id=0, hash='', template_name='events/registrants/details.html'):
     registrant = get_object_or_404(Registrant, pk=id)
@@ -1871,6 +1859,16 @@ def message_add(request, event_id, form_class=MessageAddForm, template_name='eve
         },context_instance=RequestContext(request))
 
 
+def registrant_export_filename(event, roster_view, ext='xls'):
+    file_name = event.title.strip().replace(' ','-')
+    file_name = re.sub(r'[^a-zA-Z0-9._]+', '', file_name)
+    if roster_view == 'non-paid':
+        return 'Event-%s-Non-Paid.%s' % (file_name, ext)
+    elif roster_view == 'paid':
+        return 'Event-%s-Paid.%s' % (file_name, ext)
+    return 'Event-%s-Total.%s' % (file_name, ext)
+
+
 def registrant_export(request, event_id, roster_view=''):
     """
     Export all registration for a specific event
@@ -1881,281 +1879,27 @@ def registrant_export(request, event_id, roster_view=''):
     if not has_perm(request.user,'events.change_event',event):
         raise Http403
 
-    import xlwt
-    from ordereddict import OrderedDict
-    from decimal import Decimal
-
-    # create the excel book and sheet
-    book = xlwt.Workbook(encoding='utf8')
-    sheet = book.add_sheet('Registrants')
-
-    if roster_view == 'non-paid':
-        registrants = event.registrants(with_balance=True)
-        file_name = event.title.strip().replace(' ','-')
-        file_name = 'Event-%s-Non-Paid.xls' % re.sub(r'[^a-zA-Z0-9._]+', '', file_name)
-    elif roster_view == 'paid':
-        registrants = event.registrants(with_balance=False)
-        file_name = event.title.strip().replace(' ','-')
-        file_name = 'Event-%s-Paid.xls' % re.sub(r'[^a-zA-Z0-9._]+', '', file_name)
-    else:
-        registrants = event.registrants()
-        file_name = event.title.strip().replace(' ','-')
-        file_name = 'Event-%s-Total.xls' % re.sub(r'[^a-zA-Z0-9._]+', '', file_name)
-
-    # the key is what the column will be in the
-    # excel sheet. the value is the database lookup
-    # Used OrderedDict to maintain the column order
-    registrant_mappings = OrderedDict([
-        ('first_name', 'first_name'),
-        ('last_name', 'last_name'),
-        ('phone', 'phone'),
-        ('email', 'email'),
-        ('registration_id', 'registration__pk'),
-        ('price type', 'registration__reg_conf_price__title'),
-        ('invoice_id', 'registration__invoice__pk'),
-        ('registration price', 'registration__amount_paid'),
-        ('payment method', 'registration__payment_method__machine_name'),
-        ('balance', 'registration__invoice__balance'),
-        ('company', 'company_name'),
-        ('address', 'address'),
-        ('city', 'city'),
-        ('state', 'state'),
-        ('zip', 'zip'),
-        ('country', 'country'),
-        ('date', 'create_dt'),
-    ])
-    registrant_lookups = registrant_mappings.values()
-
-    # Append the heading to the list of values that will
-    # go into the excel sheet
-    values_list = []
-    values_list.insert(0, registrant_mappings.keys())
-
-    # excel date styles
-    balance_owed_style = xlwt.easyxf('font: color-index red, bold on')
-    default_style = xlwt.Style.default_style
-    datetime_style = xlwt.easyxf(num_format_str='mm/dd/yyyy hh:mm')
-    date_style = xlwt.easyxf(num_format_str='mm/dd/yyyy')
-
-#    if registrations:
-#        # bulk of the work happens here
-#        # loop through all the registrations and append the output
-#        # of values_list django method to the values_list list
-#        for registration in registrations:
-#            registrants = registration.registrant_set.all()
-#            registrants = registrants.exclude(cancel_dt__isnull=False)
-#            registrants = registrants.values_list(*registrant_lookups)
-#            for registrant in registrants:
-#                values_list.append(registrant)
-
-    for registrant in registrants.values_list(*registrant_lookups):
-        values_list.append(registrant)
-
-    # Write the data enumerated to the excel sheet
-    for row, row_data in enumerate(values_list):
-        for col, val in enumerate(row_data):
-            # styles the date/time fields
-            if isinstance(val, datetime):
-                style = datetime_style
-            elif isinstance(val, date):
-                style = date_style
-            else:
-                style = default_style
-                
-            # style the invoice balance column
-            if col == 7:
-                balance = val
-                if not val:
-                    balance = 0
-                if val is None:
-                    balance = 0
-                if isinstance(balance,Decimal) and balance > 0:
-                    style = balance_owed_style
-
-            sheet.write(row, col, val, style=style)
-
-    response = HttpResponse(mimetype='application/vnd.ms-excel')
-    response['Content-Disposition'] = 'attachment; filename=%s' % file_name
-    book.save(response)
-    return response
+    file_name = registrant_export_filename(event, roster_view)
+    return export(request, file_name, registrant_export_rows, event.pk, roster_view,
+        cell_style=registrant_export_style)
 
 
 def registrant_export_with_custom(request, event_id, roster_view=''):
     """
-    Export all registration for a specific event with or without custom registration forms
+    Export all registration for a specific event with or without custom registration forms.
+    ?format=csv exports a csv file instead of an excel file.
     """
-    from django.db import connection
     event = get_object_or_404(Event, pk=event_id)
 
     # if they can edit it, they can export it
     if not has_perm(request.user,'events.change_event',event):
         raise Http403
 
-    import xlwt
-    from ordereddict import OrderedDict
-    from decimal import Decimal
-
-    # create the excel book and sheet
-    book = xlwt.Workbook(encoding='utf8')
-    sheet = book.add_sheet('Registrants')
-    
-        # excel date styles
-    styles = {
-        'balance_owed_style': xlwt.easyxf('font: color-index red, bold on'),
-        'default_style': xlwt.Style.default_style,
-        'datetime_style': xlwt.easyxf(num_format_str='mm/dd/yyyy hh:mm'),
-        'date_style': xlwt.easyxf(num_format_str='mm/dd/yyyy')
-    }
+    ext = request.GET.get('format') == 'csv' and 'csv' or 'xls'
+    file_name = registrant_export_filename(event, roster_view, ext)
+    return export(request, file_name, registrant_custom_export_rows, event.pk, roster_view,
+        cell_style=registrant_custom_export_style)
 
-    if roster_view == 'non-paid':
-        registrants = event.registrants(with_balance=True)
-        file_name = event.title.strip().replace(' ','-')
-        file_name = 'Event-%s-Non-Paid.xls' % re.sub(r'[^a-zA-Z0-9._]+', '', file_name)
-    elif roster_view == 'paid':
-        registrants = event.registrants(with_balance=False)
-        file_name = event.title.strip().replace(' ','-')
-        file_name = 'Event-%s-Paid.xls' % re.sub(r'[^a-zA-Z0-9._]+', '', file_name)
-    else:
-        registrants = event.registrants()
-        file_name = event.title.strip().replace(' ','-')
-        file_name = 'Event-%s-Total.xls' % re.sub(r'[^a-zA-Z0-9._]+', '', file_name)
-
-    # the key is what the column will be in the
-    # excel sheet. the value is the database lookup
-    # Used OrderedDict to maintain the column order
-    registrant_mappings = OrderedDict([
-        ('first_name', 'first_name'),
-        ('last_name', 'last_name'),
-        ('phone', 'phone'),
-        ('email', 'email'),
-        ('company', 'company_name'),
-        ('address', 'address'),
-        ('city', 'city'),
-        ('state', 'state'),
-        ('zip', 'zip'),
-        ('country', 'country'),
-        ('date', 'create_dt'),
-        ('registration_id', 'registration__pk'),
-        ('price type', 'registration__reg_conf_price__title'),
-        ('invoice_id', 'registration__invoice__pk'),
-        ('registration price', 'registration__amount_paid'),
-        ('payment method', 'registration__payment_method__machine_name'),
-        ('balance', 'registration__invoice__balance'),
-    ])
-    registrant_lookups = registrant_mappings.values()
-
-    # Append the heading to the list of values that will
-    # go into the excel sheet
-    values_list = []
-
-    # registrants with regular reg form
-    non_custom_registrants = registrants.filter(custom_reg_form_entry=None)
-    non_custom_registrants = non_custom_registrants.values_list(*registrant_lookups)
-    if non_custom_registrants:
-        values_list.insert(0, registrant_mappings.keys())
-        for registrant in non_custom_registrants:
-            values_list.append(registrant)
-        values_list.append(['\n'])
-
-    # Write the data enumerated to the excel sheet
-    balance_index = 16
-    start_row = 0
-    render_registrant_excel(sheet, values_list, balance_index, styles, start=start_row)
-    start_row += len(values_list)
-            
-    # ***now check for the custom registration forms***
-    custom_reg_exists = Registrant.objects.filter(
-                                    registration__event=event
-                                    ).exclude(custom_reg_form_entry=None
-                                              ).exists()
-
-    if custom_reg_exists:
-        # get a list of custom registration forms
-        sql = """
-            SELECT form_id 
-            FROM events_customregformentry 
-            WHERE id IN ( 
-                SELECT custom_reg_form_entry_id 
-                FROM events_registrant 
-                WHERE (custom_reg_form_entry_id is not NULL) 
-                AND registration_id IN ( 
-                    SELECT id FROM events_registration 
-                    WHERE event_id=%d))
-            ORDER BY id
-        """  % event.id
-        cursor = connection.cursor()
-        cursor.execute(sql)
-        rows = cursor.fetchall()
-        # list of form ids
-        form_ids = list(set([row[0] for row in rows]))
-        
-        # remove some fields from registrant_mappings because they are
-        # stored in the field entries
-        fields_to_remove = ['first_name', 'last_name', 'phone', 
-                            'email', 'company', 'address', 'city', 
-                            'state', 'zip', 'country']
-        for field in fields_to_remove:
-            del registrant_mappings[field]
-        
-       
-        registrant_lookups = registrant_mappings.values()
-        registrant_lookups.append('custom_reg_form_entry')
-        
-        # loop through all custom registration forms
-        for form_id in form_ids:
-            rows_list = []
-            custom_reg_form = CustomRegForm.objects.get(id=form_id)
-            
-            # get a list of fields in the type (id, label) and store in 
-            # an ordered dict
-            fields = CustomRegField.objects.filter(form=custom_reg_form
-                                                   ).order_by(
-                                                    'position'
-                                                    ).values_list('id', 'label')
-            fields_dict = OrderedDict(fields)
-            field_ids = fields_dict.keys()
-            # field header row - all the field labels in the form + registrant_mappings.keys
-            labels = fields_dict.values()
-            labels.extend(registrant_mappings.keys())
-            
-            rows_list.append([custom_reg_form.name])
-            rows_list.append(labels)
-            
-            # get the registrants for this form
-            custom_registrants = registrants.filter(custom_reg_form_entry__form=custom_reg_form)
-            custom_registrants = custom_registrants.values_list(*registrant_lookups)
-            for registrant in custom_registrants:
-                entry_id = registrant[-1]
-                sql = """
-                        SELECT field_id, value
-                        FROM events_customregfieldentry
-                        WHERE field_id IN (%s)
-                        AND entry_id=%d
-                    """ % (','.join([str(id) for id in field_ids]), entry_id)
-                cursor.execute(sql)
-                entry_rows = cursor.fetchall()
-                values_dict = dict(entry_rows)
-                
-                custom_values_list = []
-                for field_id in field_ids:
-                    custom_values_list.append(values_dict.get(field_id, ''))
-                custom_values_list.extend(list(registrant[:-1]))
-                
-                rows_list.append(custom_values_list)
-            rows_list.append(['\n'])
-            
-            balance_index =  len(field_ids) + len(registrant_lookups) - 1
-            
-            # write to spread sheet
-            render_registrant_excel(sheet, rows_list, balance_index, styles, start=start_row)
-            start_row += len(rows_list)
-             
-
-    response = HttpResponse(mimetype='application/vnd.ms-excel')
-    response['Content-Disposition'] = 'attachment; filename=%s' % file_name
-    book.save(response)
-    return response        
-        
 
 @login_required
 def delete_speaker(request, id):
@@ -1 +1,2 @@
-FILE_IMAGE_PRE_KEY = "file_image"
\ No newline at end of file
+FILE_IMAGE_PRE_KEY = "file_image"
+FILE_CLICKS_PRE_KEY = "file_clicks"
@@ -0,0 +1,189 @@
+"""
+View and download counters of files.
+
+files.views.details() calls record() for every view or download. The
+hits are added up in memory and written to FileCounter every
+FILE_COUNTER_FLUSH_INTERVAL seconds by a background thread, one update
+per file and day instead of one write per hit. After a flush the search
+index of a file is refreshed only when its total has moved by at least
+FILE_COUNTER_REINDEX_RATIO since it was last indexed.
+
+Settings:
+    FILE_COUNTER_FLUSH_INTERVAL - seconds between flushes (default 30)
+    FILE_COUNTER_MAX_PENDING - flush right away when this many
+        file/day pairs are waiting (default 1000)
+    FILE_COUNTER_REINDEX_RATIO - relative change of the total that
+        refreshes the index (default 0.1)
+"""
+import atexit
+import logging
+import threading
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction, IntegrityError
+from django.db.models import F, Sum
+
+from files.cache import FILE_CLICKS_PRE_KEY
+
+log = logging.getLogger(__name__)
+
+
+def _indexed_key(file_id):
+    keys = [settings.CACHE_PRE_KEY, FILE_CLICKS_PRE_KEY, 'indexed', str(file_id)]
+    return '.'.join(keys)
+
+
+class FileCounterBuffer(object):
+    def __init__(self, flush_interval=None, max_pending=None, start_thread=True):
+        self.flush_interval = flush_interval or getattr(settings, 'FILE_COUNTER_FLUSH_INTERVAL', 30)
+        self.max_pending = max_pending or getattr(settings, 'FILE_COUNTER_MAX_PENDING', 1000)
+        self.start_thread = start_thread
+
+        # (file_id, day): [views, downloads]
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+
+    def record(self, file, download=False):
+        """
+        Count a view or a download of a file
+        """
+        with self.lock:
+            counts = self.pending.setdefault((file.pk, date.today()), [0, 0])
+            counts[download and 1 or 0] += 1
+            full = len(self.pending) >= self.max_pending
+
+        self._ensure_thread()
+        if full:
+            self.wakeup.set()
+
+    def flush(self):
+        """
+        Write the pending counts and refresh the index of the files
+        whose totals changed enough. Returns the number of hits written.
+        """
+        with self.lock:
+            pending, self.pending = self.pending, {}
+
+        if not pending:
+            return 0
+
+        items = pending.items()
+        written = []
+        for i, ((file_id, day), (views, downloads)) in enumerate(items):
+            try:
+                add_counts(file_id, day, views, downloads)
+            except Exception:
+                # the counts of that file and day are lost, the ones
+                # not written yet wait for the next flush
+                log.exception('Adding %d views and %d downloads of file %s on %s failed',
+                    views, downloads, file_id, day)
+                transaction.rollback_unless_managed()
+                self._requeue(items[i + 1:])
+                break
+            written.append((file_id, views + downloads))
+        reindex_files(set([file_id for file_id, hits in written]))
+
+        return sum([hits for file_id, hits in written])
+
+    def _requeue(self, items):
+        with self.lock:
+            for key, (views, downloads) in items:
+                counts = self.pending.setdefault(key, [0, 0])
+                counts[0] += views
+                counts[1] += downloads
+
+    def _ensure_thread(self):
+        if not self.start_thread:
+            return
+        if self.thread and self.thread.isAlive():
+            return
+        self.thread = threading.Thread(target=self._run, name='file-counter')
+        self.thread.setDaemon(True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                # the counts of that flush are lost, keep counting
+                log.exception('Flushing the file counters failed')
+
+
+def add_counts(file_id, day, views, downloads):
+    """
+    Add to the counter row of a file and day
+    """
+    from files.models import FileCounter
+
+    counters = FileCounter.objects.filter(file=file_id, day=day)
+    if counters.update(views=F('views') + views, downloads=F('downloads') + downloads):
+        return
+
+    sid = transaction.savepoint()
+    try:
+        FileCounter.objects.create(file_id=file_id, day=day, views=views, downloads=downloads)
+        transaction.savepoint_commit(sid)
+    except IntegrityError:
+        # created by another process in the meantime
+        transaction.savepoint_rollback(sid)
+        counters.update(views=F('views') + views, downloads=F('downloads') + downloads)
+
+
+def get_clicks(file_ids=None, start_day=None, end_day=None):
+    """
+    Returns a dict of file_id: views and downloads of the files (all
+    of them if file_ids is None), all time or from start_day to
+    end_day (inclusive)
+    """
+    from files.models import FileCounter
+
+    counters = FileCounter.objects.all()
+    if file_ids is not None:
+        counters = counters.filter(file__in=file_ids)
+    if start_day:
+        counters = counters.filter(day__gte=start_day)
+    if end_day:
+        counters = counters.filter(day__lte=end_day)
+    counters = counters.values('file').annotate(views=Sum('views'), downloads=Sum('downloads'))
+    return dict([(row['file'], row['views'] + row['downloads']) for row in counters.order_by()])
+
+
+def reindex_files(file_ids):
+    """
+    Refresh the search index of the files whose totals moved by at
+    least FILE_COUNTER_REINDEX_RATIO since they were last indexed
+    """
+    from files.models import File
+    from files.search_indexes import FileIndex
+
+    ratio = getattr(settings, 'FILE_COUNTER_REINDEX_RATIO', 0.1)
+    clicks = get_clicks(file_ids)
+    indexed = cache.get_many([_indexed_key(file_id) for file_id in file_ids])
+
+    changed = []
+    for file_id, total in clicks.items():
+        last = indexed.get(_indexed_key(file_id), 0)
+        if total - last >= max(1, last * ratio):
+            changed.append(file_id)
+
+    if changed:
+        file_index = FileIndex(File)
+        for file in File.objects.filter(pk__in=changed):
+            file_index.update_object(file)
+            cache.set(_indexed_key(file.pk), clicks[file.pk])
+    return changed
+
+
+buffer = FileCounterBuffer()
+atexit.register(buffer.flush)
+
+
+def record(file, download=False):
+    buffer.record(file, download=download)
@@ -0,0 +1,68 @@
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+# days per delete, within the variable limit of sqlite
+BATCH_SIZE = 200
+
+
+class Command(BaseCommand):
+    """
+    Count the file views (186000) and downloads (185000) of the event
+    log into FileCounter. Run once after the upgrade; the counts of
+    the days found in the event log are replaced, in one transaction.
+    Today is left to the live counters, which are still adding to it,
+    and the days whose logs were archived keep their counts.
+
+    example: python manage.py backfill_file_counters
+    """
+    option_list = BaseCommand.option_list + (
+        make_option('--days', action='store', dest='days', default=0,
+            help='Only the last number of days (default: all)'),
+    )
+
+    def handle(self, *args, **options):
+        from datetime import date, datetime, timedelta
+        from django.db import connection, transaction
+        from django.db.models import Count
+        from event_logs.models import EventLog
+        from base.utils import bulk_insert
+        from files.models import File, FileCounter
+
+        event_logs = EventLog.objects.filter(event_id__in=(185000, 186000),
+            object_id__isnull=False, create_dt__lt=date.today())
+        days = int(options['days'])
+        if days:
+            start_day = date.today() - timedelta(days=days)
+            event_logs = event_logs.filter(create_dt__gte=start_day)
+
+        column = '%s.%s' % (connection.ops.quote_name(EventLog._meta.db_table),
+                            connection.ops.quote_name('create_dt'))
+        rows = event_logs.extra(select={'day': 'DATE(%s)' % column})\
+                .values('object_id', 'day', 'event_id')\
+                .annotate(count=Count('pk')).order_by()
+
+        file_ids = set(File.objects.values_list('pk', flat=True))
+        counts = {}
+        for row in rows:
+            if row['object_id'] not in file_ids:
+                continue
+            day = row['day']
+            if not isinstance(day, date):
+                day = datetime.strptime(str(day)[:10], '%Y-%m-%d').date()
+            views_downloads = counts.setdefault((row['object_id'], day), [0, 0])
+            views_downloads[row['event_id'] == 185000 and 1 or 0] += row['count']
+
+        @transaction.commit_on_success
+        def replace_counters():
+            recounted_days = sorted(set([day for file_id, day in counts]))
+            for i in range(0, len(recounted_days), BATCH_SIZE):
+                FileCounter.objects.filter(day__in=recounted_days[i:i + BATCH_SIZE]).delete()
+
+            bulk_insert(FileCounter, [FileCounter(file_id=file_id, day=day,
+                views=views, downloads=downloads)
+                for (file_id, day), (views, downloads) in counts.items()])
+
+        replace_counters()
+
+        print 'counted %d file/day pairs' % len(counts)
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """
+    Remove the resized images of originals that were deleted or
+    replaced, and the leftovers of resizes that never finished.
+    Run it from cron, daily is plenty.
+
+    example: python manage.py collect_renditions --verbosity=2
+    """
+
+    def handle(self, *args, **options):
+        from files.renditions import collect_renditions
+
+        verbosity = int(options.get('verbosity', 1))
+        removed = collect_renditions(verbosity=verbosity)
+        if verbosity >= 1:
+            print 'removed %d renditions' % removed
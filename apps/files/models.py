@@ -142,3 +142,26 @@ class File(TendenciBaseModel):
 
     def __unicode__(self):
         return self.name
+
+
+class FileCounter(models.Model):
+    """
+    Views and downloads of a file per day, written by files.counters
+    """
+    file = models.ForeignKey(File)
+    day = models.DateField()
+    views = models.IntegerField(default=0)
+    downloads = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = (('file', 'day'),)
+
+    def __unicode__(self):
+        return '%s %s' % (self.file_id, self.day)
+
+
+def delete_file_renditions(sender, instance, **kwargs):
+    from files.renditions import delete_renditions
+    delete_renditions(instance.file)
+
+models.signals.post_delete.connect(delete_file_renditions, sender=File)
@@ -0,0 +1,288 @@
+"""
+Resized copies (renditions) of images, stored on disk.
+
+A rendition is built once and written to RENDITIONS_ROOT, in a directory
+named after the original (its path under MEDIA_ROOT) and a file named
+after the size, crop, quality and modification time of the original:
+
+    renditions/photos/beach.jpg/100x100_crop_q90_1294851570.jpg
+
+The views send that file as it is. When the original changes the name
+changes with it; the old renditions, and those of deleted originals,
+are removed by collect_renditions().
+
+While one request builds a rendition, the others asking for it wait
+for that build instead of resizing the original again.
+
+The sizes come from urls, so only a bounded number of them is stored
+per original: the views store the sizes the pages use, and every
+original holds at most RENDITIONS_PER_ORIGINAL renditions. Any other
+size is resized on each request and not written to disk.
+
+Settings:
+    RENDITIONS_ROOT - directory of the renditions (default MEDIA_ROOT/renditions)
+    RENDITION_LOCK_TIMEOUT - seconds after which the lock of a build that
+        never finished is broken (default 60)
+    RENDITIONS_PER_ORIGINAL - most renditions stored for one original (default 30)
+"""
+import os
+import re
+import time
+import errno
+import shutil
+
+from django.conf import settings
+from django.http import HttpResponse
+
+from base.http import serve_file
+from files.utils import build_image, validate_image_size
+
+RENDITION_RE = re.compile(r'^(\d+)x(\d+)(_crop)?_q(\d+)_(\d+)\.jpg$')
+
+# seconds between two looks at a build of another request
+WAIT_INTERVAL = 0.05
+
+
+def get_root():
+    return getattr(settings, 'RENDITIONS_ROOT', os.path.join(settings.MEDIA_ROOT, 'renditions'))
+
+
+def rendition_dir(file):
+    """
+    The directory of the renditions of an original
+    """
+    name = os.path.normpath(file.name).lstrip(os.sep)
+    if name.startswith(os.pardir):
+        raise ValueError('%s is outside of MEDIA_ROOT' % file.name)
+    return os.path.join(get_root(), name)
+
+
+def rendition_path(file, size, crop=False, quality=90):
+    size = validate_image_size(size)
+    name = '%dx%d%s_q%d_%d.jpg' % (size[0], size[1], crop and '_crop' or '',
+        int(quality), int(os.stat(file.path).st_mtime))
+    return os.path.join(rendition_dir(file), name)
+
+
+def get_rendition(file, size, crop=False, quality=90, store=True):
+    """
+    Path of the rendition of an image, built if it does not exist yet.
+    Returns None if the original is missing or is not an image, or if
+    the rendition is not stored yet and store is False or the original
+    already has RENDITIONS_PER_ORIGINAL renditions; render() builds
+    those in memory. store can be a function, only called when the
+    rendition is missing.
+    """
+    try:
+        quality = int(quality)
+    except (TypeError, ValueError):
+        quality = 90
+
+    if not hasattr(file, 'path') or not os.path.isfile(file.path):
+        return None
+
+    path = rendition_path(file, size, crop, quality)
+    if os.path.exists(path):
+        return path
+    if callable(store):
+        store = store()
+    if not store or not _has_room(file):
+        return None
+    return _build(file, size, crop, quality, path)
+
+
+def render(file, size, crop=False, quality=90):
+    """
+    The JPEG of an image resized without storing it, or None if the
+    original is missing or is not an image
+    """
+    if not hasattr(file, 'path') or not os.path.isfile(file.path):
+        return None
+    try:
+        return build_image(file, validate_image_size(size), None, crop=crop, quality=quality)
+    except IOError:
+        # not an image
+        return None
+
+
+def rendition_response(request, file, size, crop=False, quality=90,
+                       filename=None, attachment=False, store=True):
+    """
+    Sends the rendition of an image from the store, or resized in
+    memory when it is not stored. Returns None if the image can not
+    be resized.
+    """
+    path = get_rendition(file, size, crop=crop, quality=quality, store=store)
+    if path:
+        return serve_file(request, path, mimetype='image/jpeg',
+            filename=filename, attachment=attachment)
+
+    binary = render(file, size, crop=crop, quality=quality)
+    if not binary:
+        return None
+    response = HttpResponse(binary, mimetype='image/jpeg')
+    if filename:
+        response['Content-Disposition'] = '%sfilename=%s' % (
+            attachment and 'attachment; ' or '', filename)
+    return response
+
+
+def _has_room(file):
+    """
+    Whether the original has fewer than RENDITIONS_PER_ORIGINAL renditions
+    """
+    limit = getattr(settings, 'RENDITIONS_PER_ORIGINAL', 30)
+    try:
+        names = os.listdir(rendition_dir(file))
+    except OSError:
+        return True
+    return len([name for name in names if RENDITION_RE.match(name)]) < limit
+
+
+def _build(file, size, crop, quality, path):
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            # made by another request
+            pass
+
+    lock = path + '.lock'
+    while True:
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except OSError, e:
+            if e.errno != errno.EEXIST:
+                raise
+        if _wait(path, lock):
+            return path
+
+    try:
+        # built while we were waiting for the lock
+        if os.path.exists(path):
+            return path
+
+        try:
+            binary = build_image(file, validate_image_size(size), None, crop=crop, quality=quality)
+        except IOError:
+            # not an image
+            binary = None
+        if not binary:
+            return None
+
+        tmp = '%s.%d.tmp' % (path, os.getpid())
+        f = open(tmp, 'wb')
+        try:
+            f.write(binary)
+        finally:
+            f.close()
+        # readers never see half a file
+        os.rename(tmp, path)
+        return path
+    finally:
+        os.close(fd)
+        try:
+            os.remove(lock)
+        except OSError:
+            # broken by a request that waited too long
+            pass
+
+
+def _wait(path, lock):
+    """
+    Wait for the build of another request. True when the rendition
+    is there, False when the lock is gone and we should build it.
+    """
+    timeout = getattr(settings, 'RENDITION_LOCK_TIMEOUT', 60)
+    while True:
+        if os.path.exists(path):
+            return True
+        try:
+            age = time.time() - os.stat(lock).st_mtime
+        except OSError:
+            # the build failed or the lock was broken
+            return False
+        if age > timeout:
+            try:
+                os.remove(lock)
+            except OSError:
+                pass
+            return False
+        time.sleep(WAIT_INTERVAL)
+
+
+def generate_renditions(file, sizes):
+    """
+    Build the renditions of an image for a list of (size, crop, quality),
+    skipping those that are up to date. Returns the number built.
+    """
+    built = 0
+    for size, crop, quality in sizes:
+        if os.path.exists(rendition_path(file, size, crop, quality)):
+            continue
+        if get_rendition(file, size, crop=crop, quality=quality):
+            built += 1
+    return built
+
+
+def delete_renditions(file):
+    """
+    Remove all the renditions of an original
+    """
+    try:
+        shutil.rmtree(rendition_dir(file), ignore_errors=True)
+    except ValueError:
+        pass
+
+
+def collect_renditions(verbosity=0):
+    """
+    Remove the renditions of originals that are gone or have changed
+    since, and the leftovers of builds that never finished.
+    Returns the number of files removed.
+    """
+    root = get_root()
+    timeout = getattr(settings, 'RENDITION_LOCK_TIMEOUT', 60)
+    removed = 0
+
+    for directory, dirnames, filenames in os.walk(root, topdown=False):
+        original = os.path.join(settings.MEDIA_ROOT, os.path.relpath(directory, root))
+        try:
+            mtime = int(os.stat(original).st_mtime)
+        except OSError:
+            mtime = None
+
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            match = RENDITION_RE.match(filename)
+            if match:
+                stale = mtime is None or int(match.group(5)) != mtime
+            else:
+                # .lock and .tmp files of a build that died
+                try:
+                    stale = time.time() - os.stat(path).st_mtime > timeout
+                except OSError:
+                    continue
+            if stale:
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                removed += 1
+                if verbosity >= 2:
+                    print 'removed %s' % path
+
+        if directory != root and not os.listdir(directory):
+            _remove_dir(directory)
+
+    return removed
+
+
+def _remove_dir(directory):
+    try:
+        os.rmdir(directory)
+    except OSError:
+        # a rendition was added in the meantime
+        pass
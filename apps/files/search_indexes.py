@@ -27,13 +27,11 @@ class FileIndex(TendenciBaseSearchIndex):
         Return integer of views/downloads per file
         We do a calculation for all files except images.
         """
-        from django.contrib.contenttypes.models import ContentType
-        from event_logs.models import EventLog
+        from files.counters import get_clicks
 
         # calculate click if not image
         if obj.type() != 'image':
-            content_type = ContentType.objects.get_for_model(File)
-            return EventLog.objects.filter(content_type=content_type, object_id=obj.pk).count()
+            return get_clicks([obj.pk]).get(obj.pk, 0)
 
         return int()  # return 0; data type integer
 
@@ -0,0 +1,15 @@
+from celery.task import Task
+from celery.registry import tasks
+
+
+class RenditionTask(Task):
+
+    def run(self, instance, field_name, sizes, **kwargs):
+        """
+        Build the renditions of the image in a field of a model instance.
+        sizes is a list of (size, crop, quality).
+        """
+        from files.renditions import generate_renditions
+        return generate_renditions(getattr(instance, field_name), sizes)
+
+tasks.register(RenditionTask)
@@ -27,7 +27,7 @@ def file_search(context):
 @register.inclusion_tag('files/reports/most-viewed-result.html', takes_context=True)
 def most_viewed_result(context):
     event_log = context['event_log']
-    context['file'] = File.objects.get(pk=event_log['object_id'])
+    context['file'] = event_log.get('file') or File.objects.get(pk=event_log['object_id'])
     return context
 
 class FilesForModelNode(Node):
@@ -4,8 +4,26 @@ unittest). These will both pass when you run "manage.py test".
 
 Replace these with more appropriate tests for your application.
 """
+import os
+import time
+import shutil
+import tempfile
+import threading
+from datetime import date, timedelta
 
+from django.conf import settings
 from django.test import TestCase
+from django.http import HttpRequest
+from django.utils.http import http_date
+
+from django.core.cache import cache
+from django.contrib.auth.models import User
+
+from base.http import serve_file
+from files.models import File, FileCounter
+from files import renditions
+from files.counters import FileCounterBuffer, get_clicks, reindex_files, _indexed_key
+from perms.tests import count_queries
 
 class SimpleTest(TestCase):
     def test_basic_addition(self):
@@ -14,6 +32,220 @@ class SimpleTest(TestCase):
         """
         self.failUnlessEqual(1 + 1, 2)
 
+class ServeFileTest(TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.pdf')
+        os.write(fd, ''.join([chr(i % 256) for i in range(200000)]))
+        os.close(fd)
+        self.data = open(self.path, 'rb').read()
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def get(self, **meta):
+        request = HttpRequest()
+        request.method = 'GET'
+        request.META.update(meta)
+        return serve_file(request, self.path, filename='report.pdf', attachment=True)
+
+    def test_streamed(self):
+        response = self.get()
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response['Content-Type'], 'application/pdf')
+        self.assertEquals(response['Content-Length'], str(len(self.data)))
+        self.assertEquals(response['Content-Disposition'], 'attachment; filename=report.pdf')
+        # the body is an iterator of chunks, not one string
+        chunks = list(response)
+        self.assertTrue(len(chunks) > 1)
+        self.assertEquals(''.join(chunks), self.data)
+
+    def test_ranges(self):
+        response = self.get(HTTP_RANGE='bytes=100-199')
+        self.assertEquals(response.status_code, 206)
+        self.assertEquals(response['Content-Range'], 'bytes 100-199/%d' % len(self.data))
+        self.assertEquals(''.join(response), self.data[100:200])
+
+        response = self.get(HTTP_RANGE='bytes=-10')
+        self.assertEquals(''.join(response), self.data[-10:])
+
+        response = self.get(HTTP_RANGE='bytes=199990-')
+        self.assertEquals(''.join(response), self.data[199990:])
+
+        response = self.get(HTTP_RANGE='bytes=300000-')
+        self.assertEquals(response.status_code, 416)
+
+        # a stale If-Range gets the whole file
+        response = self.get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEquals(response.status_code, 200)
+
+    def test_conditional(self):
+        etag = self.get()['ETag']
+        self.assertEquals(self.get(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEquals(self.get(HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+        mtime = os.stat(self.path).st_mtime
+        self.assertEquals(self.get(HTTP_IF_MODIFIED_SINCE=http_date(mtime)).status_code, 304)
+        self.assertEquals(self.get(HTTP_IF_MODIFIED_SINCE=http_date(mtime - 60)).status_code, 200)
+
+class FileCounterTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='file_counter')
+        self.file = File.objects.create(file='files/report.pdf', name='report',
+            creator=self.user, creator_username=self.user.username,
+            owner=self.user, owner_username=self.user.username)
+        cache.delete(_indexed_key(self.file.pk))
+
+    def test_buffered_counts(self):
+        """
+            Hits cost no queries until they are flushed, then one
+            counter row is written per file and day
+        """
+        buffer = FileCounterBuffer(start_thread=False)
+        queries = count_queries(lambda: [buffer.record(self.file) for i in range(5)])
+        self.assertEquals(queries, 0)
+        buffer.record(self.file, download=True)
+        self.assertEquals(FileCounter.objects.count(), 0)
+
+        self.assertEquals(buffer.flush(), 6)
+        counter = FileCounter.objects.get(file=self.file, day=date.today())
+        self.assertEquals((counter.views, counter.downloads), (5, 1))
+
+        buffer.record(self.file)
+        buffer.flush()
+        self.assertEquals(FileCounter.objects.count(), 1)
+        self.assertEquals(get_clicks([self.file.pk]), {self.file.pk: 7})
+
+    def test_clicks_by_day(self):
+        yesterday = date.today() - timedelta(days=1)
+        FileCounter.objects.create(file=self.file, day=yesterday, views=3)
+        FileCounter.objects.create(file=self.file, day=date.today(), downloads=2)
+
+        self.assertEquals(get_clicks()[self.file.pk], 5)
+        self.assertEquals(get_clicks(start_day=date.today()), {self.file.pk: 2})
+        self.assertEquals(get_clicks(end_day=yesterday), {self.file.pk: 3})
+
+    def test_reindex_threshold(self):
+        FileCounter.objects.create(file=self.file, day=date.today(), views=100)
+        self.assertEquals(reindex_files([self.file.pk]), [self.file.pk])
+
+        # less than 10% more since the last index update
+        FileCounter.objects.filter(file=self.file).update(views=105)
+        self.assertEquals(reindex_files([self.file.pk]), [])
+
+        FileCounter.objects.filter(file=self.file).update(views=110)
+        self.assertEquals(reindex_files([self.file.pk]), [self.file.pk])
+
+
+class Original(object):
+    """
+    Stands in for the FieldFile of an image
+    """
+    def __init__(self, name):
+        self.name = name
+        self.path = os.path.join(settings.MEDIA_ROOT, name)
+
+
+class RenditionTest(TestCase):
+    def setUp(self):
+        import Image
+        self.media_root = settings.MEDIA_ROOT
+        settings.MEDIA_ROOT = tempfile.mkdtemp()
+        os.makedirs(os.path.join(settings.MEDIA_ROOT, 'photos'))
+        self.original = Original('photos/beach.png')
+        Image.new('RGB', (400, 300), (0, 128, 255)).save(self.original.path)
+
+    def tearDown(self):
+        shutil.rmtree(settings.MEDIA_ROOT)
+        settings.MEDIA_ROOT = self.media_root
+
+    def test_built_once(self):
+        path = renditions.get_rendition(self.original, (100, 75))
+        self.assertEquals(os.path.dirname(path),
+            os.path.join(settings.MEDIA_ROOT, 'renditions', 'photos', 'beach.png'))
+        data = open(path, 'rb').read()
+        self.assertEquals(data[:2], '\xff\xd8')  # jpeg
+
+        os.utime(path, (0, 0))
+        self.assertEquals(renditions.get_rendition(self.original, (100, 75)), path)
+        # not written again
+        self.assertEquals(os.stat(path).st_mtime, 0)
+
+        self.assertNotEquals(renditions.get_rendition(self.original, (100, 75), crop=True), path)
+        self.assertEquals(renditions.get_rendition(Original('photos/missing.png'), (100, 75)), None)
+
+    def test_stored_renditions_are_capped(self):
+        limit = getattr(settings, 'RENDITIONS_PER_ORIGINAL', None)
+        settings.RENDITIONS_PER_ORIGINAL = 2
+        try:
+            self.assertTrue(renditions.get_rendition(self.original, (100, 75)))
+            self.assertEquals(renditions.get_rendition(self.original, (50, 50), store=False), None)
+            self.assertTrue(renditions.get_rendition(self.original, (50, 50)))
+            # full, other sizes are resized in memory
+            self.assertEquals(renditions.get_rendition(self.original, (20, 20)), None)
+            self.assertEquals(renditions.render(self.original, (20, 20))[:2], '\xff\xd8')
+            self.assertEquals(len(os.listdir(renditions.rendition_dir(self.original))), 2)
+
+            response = renditions.rendition_response(HttpRequest(), self.original, (20, 20),
+                filename='beach.jpg', attachment=True)
+            self.assertEquals(response['Content-Type'], 'image/jpeg')
+            self.assertEquals(response['Content-Disposition'], 'attachment; filename=beach.jpg')
+        finally:
+            if limit is None:
+                del settings.RENDITIONS_PER_ORIGINAL
+            else:
+                settings.RENDITIONS_PER_ORIGINAL = limit
+
+    def test_generate_skips_up_to_date(self):
+        sizes = [((100, 75), False, 90), ((50, 50), True, 90)]
+        self.assertEquals(renditions.generate_renditions(self.original, sizes), 2)
+        self.assertEquals(renditions.generate_renditions(self.original, sizes), 0)
+
+    def test_waits_for_build(self):
+        path = renditions.rendition_path(self.original, (100, 75))
+        os.makedirs(os.path.dirname(path))
+        open(path + '.lock', 'w').close()
+
+        def build():
+            time.sleep(0.2)
+            open(path, 'wb').write('built by another request')
+            os.remove(path + '.lock')
+        thread = threading.Thread(target=build)
+        thread.start()
+
+        self.assertEquals(renditions.get_rendition(self.original, (100, 75)), path)
+        thread.join()
+        self.assertEquals(open(path, 'rb').read(), 'built by another request')
+
+    def test_stale_lock(self):
+        path = renditions.rendition_path(self.original, (100, 75))
+        os.makedirs(os.path.dirname(path))
+        open(path + '.lock', 'w').close()
+        os.utime(path + '.lock', (0, 0))
+
+        self.assertEquals(renditions.get_rendition(self.original, (100, 75)), path)
+        self.assertFalse(os.path.exists(path + '.lock'))
+
+    def test_collect(self):
+        old = renditions.get_rendition(self.original, (100, 75))
+        other = Original('photos/other.png')
+        shutil.copy(self.original.path, other.path)
+        gone = renditions.get_rendition(other, (100, 75))
+
+        # the original changes, then the other one is deleted
+        mtime = os.stat(self.original.path).st_mtime + 10
+        os.utime(self.original.path, (mtime, mtime))
+        new = renditions.get_rendition(self.original, (100, 75))
+        os.remove(other.path)
+
+        self.assertEquals(renditions.collect_renditions(), 2)
+        self.assertTrue(os.path.exists(new))
+        self.assertFalse(os.path.exists(old))
+        self.assertFalse(os.path.exists(os.path.dirname(gone)))
+
+        renditions.delete_renditions(self.original)
+        self.assertFalse(os.path.exists(os.path.dirname(new)))
+
+
 __test__ = {"doctest": """
 Another way to test that 1 + 1 is equal to 2.
 
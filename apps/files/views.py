@@ -10,7 +10,7 @@ from django.core.urlresolvers import reverse
 from django.contrib import messages
 from django.middleware.csrf import get_token as csrf_get_token
 
-from base.http import Http403
+from base.http import Http403, serve_file
 from site_settings.utils import get_setting
 from perms.decorators import admin_required
 from perms.object_perms import ObjectPermission
@@ -19,14 +19,13 @@ from perms.utils import (update_perms_and_save, has_perm, has_view_perm,
 from event_logs.models import EventLog
 from theme.shortcuts import themed_response as render_to_response
 
-from files.cache import FILE_IMAGE_PRE_KEY
+from files import counters
 from files.models import File
-from files.utils import get_image
+from files.renditions import rendition_response
 from files.forms import FileForm, MostViewedForm
 
 
 def details(request, id=None, size=None, crop=False, quality=90, download=False, template_name="files/details.html"):
-    from files.search_indexes import FileIndex
     if not id: return HttpResponseRedirect(reverse('file.search'))
 
     # if string and digit convert to integer
@@ -42,17 +41,13 @@ def details(request, id=None, size=None, crop=False, quality=90, download=False,
         if not request.user.is_authenticated():
             raise Http403
 
-    # get image binary
-    try:
-        data = file.file.read()
-        file.file.close()
-    except IOError:  # no such file or directory
+    # no such file or directory
+    if not os.path.isfile(file.file.path):
         raise Http404
 
     # log downloads and views
     if download:
         # if filew download
-        attachment = 'attachment;'
         log_defaults = {
             'event_id' : 185000,
             'event_data': '%s %s (%d) dowloaded by %s' % (file.type(), file._meta.object_name, file.pk, request.user),
@@ -62,9 +57,8 @@ def details(request, id=None, size=None, crop=False, quality=90, download=False,
             'instance': file,
         }
         EventLog.objects.log(**log_defaults)
+        counters.record(file, download=True)
     else:
-        attachment = ''
-
         if file.type() != 'image':
 
             # log file view
@@ -76,32 +70,30 @@ def details(request, id=None, size=None, crop=False, quality=90, download=False,
                 'request': request,
                 'instance': file,
             })
+            counters.record(file)
 
-    # update index
-    if file.type() != 'image':
-        file_index = FileIndex(File)
-        file_index.update_object(file)
+    # the search index is refreshed by files.counters
+    # once the clicks have changed enough
 
     # if image size specified
     if file.type()=='image' and size:  # if size specified
         size= [int(s) for s in size.split('x')]  # convert to list
-        # gets resized image from cache or rebuilds
-        image = get_image(file.file, size, FILE_IMAGE_PRE_KEY, cache=True, unique_key=None)
-        image = get_image(file.file, size, FILE_IMAGE_PRE_KEY, cache=True, crop=crop, quality=quality, unique_key=None)
-        response = HttpResponse(mimetype='image/jpeg')
-        response['Content-Disposition'] = '%s filename=%s'% (attachment, file.get_name())
-        image.save(response, "JPEG", quality=quality)
+        # resized once, then sent from the rendition store, up to
+        # RENDITIONS_PER_ORIGINAL sizes; the others on each request
+        response = rendition_response(request, file.file, size, crop=crop,
+            quality=quality, filename=file.get_name(), attachment=download)
+        if not response:
+            raise Http404
 
         return response
 
     # set mimetype
-    if file.mime_type():
-        response = HttpResponse(data, mimetype=file.mime_type())
-    else: raise Http404
+    if not file.mime_type():
+        raise Http404
 
-    # return response
-    response['Content-Disposition'] = '%s filename=%s'% (attachment, file.get_name())
-    return response
+    # streamed in chunks, or sent by the web server
+    return serve_file(request, file.file.path, mimetype=file.mime_type(),
+        filename=file.get_name(), attachment=download)
 
 def search(request, template_name="files/search.html"):
     """
@@ -341,7 +333,6 @@ def report_most_viewed(request, form_class=MostViewedForm, template_name="files/
     """
     Displays a table of files sorted by views/downloads.
     """
-    from django.db.models import Count
     from datetime import date
     from datetime import timedelta
     from dateutil.relativedelta import relativedelta
@@ -364,13 +355,16 @@ def report_most_viewed(request, form_class=MostViewedForm, template_name="files/
             end_dt = form.cleaned_data['end_dt']
             file_type = form.cleaned_data['file_type']
 
-    event_logs = EventLog.objects.values('object_id').filter(
-        event_id__in=(185000,186000), create_dt__range=(start_dt, end_dt))
-
-    if file_type != 'all':
-        event_logs = event_logs.filter(event_data__icontains=file_type)
+    clicks = counters.get_clicks(start_day=start_dt, end_day=end_dt)
+    files = File.objects.in_bulk(clicks.keys())
 
-    event_logs = event_logs.annotate(count=Count('object_id')).order_by('-count')
+    event_logs = []
+    for file_id, count in clicks.items():
+        file = files.get(file_id)
+        if not file or (file_type != 'all' and file.type() != file_type):
+            continue
+        event_logs.append({'object_id': file_id, 'count': count, 'file': file})
+    event_logs.sort(key=lambda x: -x['count'])
 
     return render_to_response(template_name, {
         'form': form,
@@ -0,0 +1,84 @@
+from django.db import models
+from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import simplejson
+
+from user_groups.models import Group
+
+
+class UserImport(models.Model):
+    """
+    A user import: the uploaded file, its settings and its progress.
+    The rows of the file are staged in UserImportRow.
+    """
+    STATUS_CHOICES = (
+        ('preview', 'Preview'),
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    )
+
+    file_name = models.CharField(max_length=260)
+    key = models.CharField(max_length=50)
+    interactive = models.BooleanField(default=False)
+    override = models.BooleanField(default=False)
+    group = models.ForeignKey(Group, null=True)
+    clear_group_membership = models.BooleanField(default=False)
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='preview')
+    task_id = models.CharField(max_length=255, blank=True)
+    total = models.IntegerField(default=0)
+    total_done = models.IntegerField(default=0)
+    count_insert = models.IntegerField(default=0)
+    count_update = models.IntegerField(default=0)
+    count_invalid = models.IntegerField(default=0)
+
+    creator = models.ForeignKey(User, related_name='user_imports')
+    create_dt = models.DateTimeField(auto_now_add=True)
+    update_dt = models.DateTimeField(auto_now=True)
+
+    def __unicode__(self):
+        return self.file_name
+
+    @property
+    def is_completed(self):
+        return self.status == 'completed'
+
+    @property
+    def str_update(self):
+        if self.override:
+            return 'Override All Fields'
+        return 'Update Blank Fields'
+
+
+class UserImportRow(models.Model):
+    """
+    A row of the file of a user import. The action is set once
+    the row has been imported.
+    """
+    ACTION_CHOICES = (
+        ('', 'Pending'),
+        ('insert', 'Insert'),
+        ('update', 'Update'),
+        ('invalid', 'Invalid'),
+    )
+
+    user_import = models.ForeignKey(UserImport, related_name='rows')
+    row_num = models.IntegerField()
+    data = models.TextField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES, default='', blank=True)
+    error = models.CharField(max_length=255, blank=True)
+    user = models.ForeignKey(User, null=True)
+
+    class Meta:
+        ordering = ('row_num',)
+
+    def __unicode__(self):
+        return '%s #%s' % (self.user_import, self.row_num)
+
+    def get_data(self):
+        return simplejson.loads(self.data)
+
+    def set_data(self, data):
+        self.data = simplejson.dumps(data, cls=DjangoJSONEncoder)
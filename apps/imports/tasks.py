@@ -0,0 +1,19 @@
+from celery.task import Task
+from celery.registry import tasks
+
+from imports.models import UserImport
+from imports.utils import run_user_import
+
+
+class ImportUsersTask(Task):
+
+    def run(self, user_import_id, **kwargs):
+        user_import = UserImport.objects.get(pk=user_import_id)
+        try:
+            run_user_import(user_import)
+        except:
+            UserImport.objects.filter(pk=user_import_id).update(status='failed')
+            raise
+        return user_import_id
+
+tasks.register(ImportUsersTask)
@@ -0,0 +1,106 @@
+import os
+import csv
+import tempfile
+
+from django.test import TestCase
+from django.contrib.auth.models import User
+
+from profiles.models import Profile
+from user_groups.models import Group, GroupMembership
+from imports.models import UserImport
+from imports.utils import stage_user_import, preview_user_import, \
+    process_user_import_batch, run_user_import
+
+
+class UserImportTest(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', 'admin@example.com', 'google')
+        self.owner = {
+            'creator': self.admin,
+            'creator_username': self.admin.username,
+            'owner': self.admin,
+            'owner_username': self.admin.username,
+        }
+        self.john = User.objects.create_user('jsmith', 'john@example.com', 'google')
+        Profile.objects.create(user=self.john, email=self.john.email, **self.owner)
+
+        self.group = Group(name='Imported', **self.owner)
+        self.group.save()
+
+    def make_import(self, rows, **kwargs):
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        f = os.fdopen(fd, 'w')
+        writer = csv.writer(f)
+        writer.writerow(['first_name', 'last_name', 'email', 'company'])
+        writer.writerows(rows)
+        f.close()
+
+        user_import = UserImport.objects.create(file_name=os.path.basename(path),
+            key=kwargs.get('key', 'email'), group=kwargs.get('group'), creator=self.admin)
+        try:
+            stage_user_import(user_import, path)
+        finally:
+            os.remove(path)
+        return user_import
+
+    def test_stage(self):
+        user_import = self.make_import([('Jane', 'Doe', 'jane@example.com', 'Initech')])
+        self.assertEquals(user_import.total, 1)
+
+        row = user_import.rows.get()
+        self.assertEquals(row.row_num, 2)
+        self.assertEquals(row.action, '')
+        self.assertEquals(row.get_data()['email'], 'jane@example.com')
+
+    def test_import(self):
+        user_import = self.make_import([
+            ('John', 'Smith', 'john@example.com', 'Acme'),
+            ('Jane', 'Doe', 'jane@example.com', 'Initech'),
+            # the same person again
+            ('Jane', 'Doe', 'jane@example.com', 'Initrode'),
+            ('No', 'Email', '', ''),
+        ], group=self.group)
+
+        counts, users_list = preview_user_import(user_import)
+        self.assertEquals(counts, {'insert': 1, 'update': 2, 'invalid': 1})
+        self.assertEquals([row.get('ACTION') for row in users_list],
+            ['update', 'insert', 'update', None])
+
+        run_user_import(user_import)
+        user_import = UserImport.objects.get(pk=user_import.pk)
+        self.assertEquals(user_import.status, 'completed')
+        self.assertEquals((user_import.count_insert, user_import.count_update,
+            user_import.count_invalid, user_import.total_done), (1, 2, 1, 4))
+
+        jane = User.objects.get(email='jane@example.com')
+        self.assertEquals(jane.username, 'jane@example.com')
+        self.assertEquals(jane.first_name, 'Jane')
+        # only the blank fields are filled
+        self.assertEquals(jane.get_profile().company, 'Initech')
+        self.assertEquals(User.objects.get(pk=self.john.pk).first_name, 'John')
+        self.assertEquals(self.john.get_profile().company, 'Acme')
+
+        self.assertEquals(set(GroupMembership.objects.filter(group=self.group
+            ).values_list('member', flat=True)), set([self.john.pk, jane.pk]))
+        self.assertEquals(list(user_import.rows.values_list('action', 'user')), [
+            ('update', self.john.pk), ('insert', jane.pk), ('update', jane.pk), ('invalid', None)])
+
+    def test_batches(self):
+        user_import = self.make_import([('User', str(i), 'user%s@example.com' % i, '')
+            for i in range(5)])
+
+        self.assertEquals(process_user_import_batch(user_import, batch_size=2), 2)
+        self.assertEquals(process_user_import_batch(user_import, batch_size=2), 2)
+        self.assertEquals(UserImport.objects.get(pk=user_import.pk).total_done, 4)
+        self.assertEquals(process_user_import_batch(user_import, batch_size=2), 1)
+        self.assertEquals(process_user_import_batch(user_import, batch_size=2), 0)
+
+        self.assertEquals(UserImport.objects.get(pk=user_import.pk).status, 'completed')
+        self.assertEquals(User.objects.filter(email__endswith='@example.com').count(), 7)
+
+    def test_unique_usernames(self):
+        User.objects.create_user('dup@example.com', 'other@example.com', 'google')
+        user_import = self.make_import([('Dup', 'Licate', 'dup@example.com', '')])
+        run_user_import(user_import)
+
+        self.assertEquals(User.objects.get(email='dup@example.com').username, 'dup@example.com1')
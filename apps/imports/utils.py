@@ -2,21 +2,38 @@ import os
 import datetime
 import uuid
 import re
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db import models
-from django.http import HttpResponse
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import F
 from django.db.models.fields import AutoField, FieldDoesNotExist
-from django.utils.encoding import smart_str
+from django.utils import simplejson
+from django.utils.encoding import smart_str, smart_unicode
 from django.core.validators import email_re
 
 import xlrd
-from xlwt import Workbook, XFStyle
+from base.utils import bulk_insert
+from event_logs.models import EventLog
+from imports.models import UserImport, UserImportRow
+from search.models import UnindexedItem
 from user_groups.models import Group, GroupMembership
 from profiles.models import Profile
 
 
-# number rows to process per request
-ROWS_TO_PROCESS = 10 
+IMPORT_DIR = os.path.join(settings.MEDIA_ROOT, 'imports')
+
+# rows imported at a time, the lookups of a batch stay under the
+# 999 variables sqlite allows
+IMPORT_BATCH_SIZE = 200
+
+# rows written to the staging table at a time
+STAGE_BATCH_SIZE = 1000
+
+# rows described on the preview page
+PREVIEW_ROWS = 100
+
+USERNAME_MAX_LENGTH = User._meta.get_field('username').max_length
 
 # field.__class__.__name__
 # DateTimeField
@@ -40,375 +57,364 @@ def handle_uploaded_file(f, file_path):
         destination.write(chunk)
     destination.close()
     
-def get_user_import_settings(request, id):
-    if not request.session.has_key(id):
-        return None
-    
-    d = {}
-
-    d['file_name'] = (request.session[id]).get('file_name', '')
-    d['interactive'] = request.session[id].get('interactive', '')
-    d['override'] = request.session[id].get('override', '')
-    d['key'] = request.session[id].get('key', '')
-    d['group'] = request.session[id].get('group', '')
-    d['clear_group_membership'] = request.session[id].get('clear_group_membership', '')
-    
-    try:
-        d['interactive'] = int(d['interactive'])
-        if d['interactive'] == 1:
-            d['interactive'] = True
-        else:
-            d['interactive'] = False
-    except:
-        d['interactive'] = False
-        
-    try:
-        d['override'] = int(d['override'])
-        if d['override'] == 1:
-            d['override'] = True
-        else:
-            d['override'] = False
-    except:
-        d['override'] = False
-    if d['override']:
-        d['str_update'] = 'Override All Fields'
-    else:
-        d['str_update'] = 'Update Blank Fields'
-        
-    try:
-        d['clear_group_membership'] = int(d['clear_group_membership'])
-        if d['clear_group_membership'] == 1:
-            d['clear_group_membership'] = True
-        else:
-            d['clear_group_membership'] = False
-    except:
-        d['clear_group_membership'] = False
-    
-            
-    return d
-
-def render_excel(filename, title_list, data_list, file_extension='.xls'):
-    if file_extension == '.csv':
-        str_out = ','.join(title_list)
-        
-        for row_item_list in data_list:
-            for i in range (0, len(row_item_list)):
-                if row_item_list[i]:
-                    if isinstance(row_item_list[i], datetime.datetime):
-                        row_item_list[i] = row_item_list[i].strftime('%Y-%m-%d %H:%M:%S')
-                    elif isinstance(row_item_list[i], datetime.date):
-                        row_item_list[i] = row_item_list[i].strftime('%Y-%m-%d')
-                    elif isinstance(row_item_list[i], datetime.time):
-                        row_item_list[i] = row_item_list[i].strftime('%H:%M:%S')
-            str_out += ','.join(row_item_list)
-        
-        content_type = "application/text"
-    else:
-        import StringIO
-        output = StringIO.StringIO()
-        export_wb = Workbook()
-        export_sheet = export_wb.add_sheet('Sheet1')
-        col_idx = 0
-        for col_title in title_list:
-            export_sheet.write(0, col_idx, col_title)
-            col_idx += 1
-        row_idx = 1
-        for row_item_list in data_list:
-            col_idx = 0
-            for cell_value in row_item_list:
-                if cell_value:
-                    cell_value_is_date = False
-                    if isinstance(cell_value, datetime.datetime):
-                        cell_value = xlrd.xldate.xldate_from_datetime_tuple((cell_value.year, cell_value.month, \
-                                                        cell_value.day, cell_value.hour, cell_value.minute, \
-                                                        cell_value.second), 0)
-                        cell_value_is_date = True
-                    elif isinstance(cell_value, datetime.date):
-                        cell_value = xlrd.xldate.xldate_from_date_tuple((cell_value.year, cell_value.month, \
-                                                        cell_value.day), 0)
-                        cell_value_is_date = True
-                    elif isinstance(cell_value, datetime.time):
-                        cell_value = xlrd.xldate.xldate_from_time_tuple((cell_value.hour, cell_value.minute, \
-                                                        cell_value.second))
-                        cell_value_is_date = True
-                    elif isinstance(cell_value, models.Model):
-                        cell_value = str(cell_value)
-                    if cell_value_is_date:
-                        s = XFStyle()
-                        s.num_format_str = 'M/D/YY'
-                        export_sheet.write(row_idx, col_idx, cell_value, s)
-                    else:
-                        export_sheet.write(row_idx, col_idx, cell_value)
-                col_idx += 1
-            row_idx += 1
-        export_wb.save(output)
-        output.seek(0)
-        str_out = output.getvalue()
-        content_type = 'application/vnd.ms-excel'
-        
-    response = HttpResponse(str_out)
-    response['Content-Type'] = content_type
-    response['Content-Disposition'] = 'attachment; filename='+filename
-    return response
+def stage_user_import(user_import, file_path):
+    """
+    Reads the file of an import once into its staging rows.
+    Returns the number of rows.
+    """
+    rows = []
+    total = 0
+    for data in extract_from_excel(file_path):
+        row = UserImportRow(user_import=user_import, row_num=data.pop('ROW_NUM'))
+        row.set_data(data)
+        rows.append(row)
+        if len(rows) >= STAGE_BATCH_SIZE:
+            total += bulk_insert(UserImportRow, rows)
+            rows = []
+    total += bulk_insert(UserImportRow, rows)
+
+    user_import.total = total
+    user_import.save()
+    return total
+
+
+def get_identity(data, key_list):
+    """
+    The values of the keys of a row, as compared to those of the
+    users, or None if one of them is blank
+    """
+    identity = []
+    for key in key_list:
+        value = data.get(key, '')
+        if value == '' or value is None:
+            return None
+        identity.append(smart_unicode(value).lower())
+    return tuple(identity)
 
 
-def user_import_process(request, setting_dict, preview=True, id=''):
-    """ This function processes each row and store the data in the user_object_dict. 
-        Then it updates the database if preview=False.
+def match_users(key_list, data_list):
     """
-    key_list = setting_dict['key'].split(',')
-    # key(s)- user field(s) or profile fields(s)? that is import to identify
-    key_user_list = [key for key in key_list if key in user_field_names]
-    key_profile_list = [key for key in key_list if key in profile_field_names]
-    
-    setting_dict['total'] = request.session[id].get('total',  0)
-    setting_dict['count_insert'] = 0
-    setting_dict['count_update'] = 0
-    setting_dict['count_invalid'] = 0
-    
-    data_dict_list = request.session[id].get('data_dict_list',  [])
-    data_dict_list_len = len(data_dict_list)
-    
-    user_obj_list = []
-    invalid_list = []
-    
-    start = 0
-    if not preview:
-        finish = start + ROWS_TO_PROCESS
-        if finish > data_dict_list_len:
-            finish = data_dict_list_len
+    The existing users of a batch of rows, as {identity: user},
+    in one query.
+    The keys can be fields of the User, of the Profile or of both;
+    a key on both has to match on both.
+    """
+    user_keys = [key for key in key_list if key in user_field_names]
+    profile_keys = [key for key in key_list if key in profile_field_names]
+
+    values = dict([(key, set()) for key in key_list])
+    for data in data_list:
+        if get_identity(data, key_list):
+            for key in key_list:
+                values[key].add(smart_unicode(data[key]))
+    if not values or not values[key_list[0]]:
+        return {}
+
+    filters = {}
+    if profile_keys:
+        queryset = Profile.objects.select_related('user')
+        for key in user_keys:
+            filters['user__%s__in' % key] = list(values[key])
+        for key in profile_keys:
+            filters['%s__in' % key] = list(values[key])
     else:
-        finish = data_dict_list_len
-        
-    
-    for r in  range(start, finish):
-        user_object_dict = {}
-        if not preview:
-            user_import_dict = {}
-        identity_user_dict = {} # used to look up the User
-        identity_profile_dict = {} # used to look up the Profile
-        missing_keys = []
-        
-        data_dict = data_dict_list[r]
-        
-        missing_keys = [key for key in data_dict.keys() if key in key_list and data_dict[key]=='']
-        
-        for key in data_dict.keys():
-            user_object_dict[key] = data_dict[key]
-            
-            if key in key_list and data_dict[key] <> '':
-                if key in key_user_list:
-                    identity_user_dict[key] =  data_dict[key]
-                if key in key_profile_list:
-                    identity_profile_dict[key] =  data_dict[key]
-        
-        user_object_dict['ROW_NUM'] = data_dict['ROW_NUM'] 
-            
-        if missing_keys:
-            user_object_dict['ERROR'] = 'Missing key: %s.' % (', '.join(missing_keys))
-            user_object_dict['IS_VALID'] = False
-            setting_dict['count_invalid'] += 1
-            if not preview:
-                invalid_list.append({'ROW_NUM':user_object_dict['ROW_NUM'],
-                                     'ERROR':user_object_dict['ERROR']})
+        queryset = User.objects.all()
+        for key in user_keys:
+            filters['%s__in' % key] = list(values[key])
+
+    matched = {}
+    for obj in queryset.filter(**filters).order_by('pk'):
+        if profile_keys:
+            user, profile = obj.user, obj
         else:
-            user_object_dict['IS_VALID'] = True
-            
-            # the keys could be the fields in both User and Profile tables
-            user = get_user_by_key(identity_user_dict, identity_profile_dict)
-            if user:
-                if preview:
-                    user_object_dict['ACTION'] = 'update'
-                else:
-                    user_import_dict['ACTION'] = 'update'
-                setting_dict['count_update'] += 1
-                
-                if preview:
-                    populate_user_dict(user, user_object_dict, setting_dict)
-            else:
-                #user = None
-                if preview:
-                    user_object_dict['ACTION'] = 'insert'
-                else:
-                    user_import_dict['ACTION'] = 'insert'
-                setting_dict['count_insert'] += 1
-                
-            if not preview:
-                user = do_user_import(request, user, user_object_dict, setting_dict)
-                user_import_dict['user'] = user
-                user_import_dict['ROW_NUM'] = user_object_dict['ROW_NUM']
-                user_obj_list.append(user_import_dict)
-
-        if preview:
-            user_obj_list.append(user_object_dict)
-            
-    if not preview:
-        if finish < data_dict_list_len:
-            # not finished yet, store some data in the session
-            count_insert = request.session[id].get('count_insert',  0) + setting_dict['count_insert']
-            count_update = request.session[id].get('count_update',  0) + setting_dict['count_update']
-            
-            setting_dict['is_completed'] = False
-            
-          
-            for r in  range(start, finish):
-                # remove those already processed rows
-                data_dict_list.remove(data_dict_list[0])
-                
-            d = request.session[id]
-            d.update({'is_completed': False,
-                      'count_insert': count_insert,
-                      'count_update': count_update,
-                      'data_dict_list':data_dict_list})
-            request.session[id] = d
+            user, profile = obj, None
+
+        identity = []
+        for key in key_list:
+            value = None
+            if key in user_keys:
+                value = smart_unicode(getattr(user, key)).lower()
+            if key in profile_keys:
+                profile_value = smart_unicode(getattr(profile, key)).lower()
+                if value is not None and value != profile_value:
+                    break
+                value = profile_value
+            identity.append(value)
         else:
-            setting_dict['is_completed'] = True
-            setting_dict['count_insert'] += request.session[id].get('count_insert',  0)
-            setting_dict['count_update'] += request.session[id].get('count_update',  0)
-            d = request.session[id]
-            d.update({'is_completed': True})
-            request.session[id] = d
-                
-    return user_obj_list, invalid_list
-
-def get_user_by_key(identity_user_dict, identity_profile_dict):
-    user = None  
-    
-    if identity_user_dict and identity_profile_dict:
-        users = User.objects.filter(**identity_user_dict)
-        profiles = Profile.objects.filter(user__in=users).filter(**identity_profile_dict)
-        if profiles:
-            user = profiles[0].user
-    elif identity_user_dict:
-        users = User.objects.filter(**identity_user_dict)
-        if users:
-            user = users[0]
-    else:
-        profiles = Profile.objects.filter(**identity_profile_dict)
-        if profiles:
-            user = profiles[0].user
-            
-    return user
+            # the first one, as a lookup by the keys would return
+            matched.setdefault(tuple(identity), user)
+    return matched
 
-def do_user_import(request, user, user_object_dict, setting_dict):
-    """
-        the real work is here - do the insert or update
-    """
 
-    insert = not bool(user)  # insert or update
-    user = user or User()  # existing or new user
-    override = setting_dict['override']  # update ALL fields
-
-    # insert/update user
+def fill_user(user, data, user_import, insert):
+    override = user_import.override
     for field in user_field_names:
-        if field == 'password' or field == 'username' or (not insert and field in setting_dict['key']):
+        if field == 'password' or field == 'username' or (not insert and field in user_import.key):
             continue
-        if user_object_dict.has_key(field):
-            if override:
-                setattr(user, field, user_object_dict[field])
-            else:
-                # fill out the blank field only
-                if getattr(user, field) == '':
-                    setattr(user, field, user_object_dict[field])
+        if data.has_key(field):
+            # fill out the blank fields only, unless override
+            if override or getattr(user, field) == '':
+                setattr(user, field, data[field])
 
-    if insert:
-        if 'username' in user_object_dict:  # set username
-            user.username = user_object_dict['username']
-
-        # generate if not username
-        user.username = get_unique_username(user)
-
-    if 'password' in user_object_dict and (insert or override):
-        user.set_password(user_object_dict['password'])
+    if 'password' in data and (insert or override):
+        user.set_password(data['password'])
 
     if not user.password:
         user.set_password(User.objects.make_random_password(length=8))
 
-    user.is_active = bool(setting_dict['interactive'])
+    user.is_active = bool(user_import.interactive)
 
     if not bool(email_re.match(user.email)):
         user.email = ''  # if not valid; empty it out
 
-    # loop through user properties; truncate at max_length
+    # truncate at max_length
     for key, value in user.__dict__.items():
         try: max_length = User._meta.get_field_by_name(key)[0].max_length
-        except FieldDoesNotExist as e: max_length = None
-        if max_length:  # truncate per max_length field attribute
+        except FieldDoesNotExist: max_length = None
+        if max_length and isinstance(value, basestring):
             setattr(user, key, value[:max_length])
 
-    # username and email required
-    if user.username and user.email:
-
-        # insert/update record
-        if insert: user.save(force_insert=True)
-        else: user.save(force_update=True)
-
-        try:  # get or create
-            profile = user.get_profile()
-        except Profile.DoesNotExist:
-            profile = Profile.objects.create(user=user, 
-               creator=request.user, 
-               creator_username=request.user.username,
-               owner=request.user, 
-               owner_username=request.user.username, 
-               email=user.email
-            )
-
-        for field in profile_field_names:
-            if user_object_dict.has_key(field):
-
-                if override:
-                    setattr(profile, field, user_object_dict[field])
-                else:
-                    # fill out the blank field only
-                    if getattr(profile, field) == '':
-                        setattr(profile, field, user_object_dict[field])
 
-        profile.save()
+def fill_profile(profile, data, user_import):
+    for field in profile_field_names:
+        if data.has_key(field):
+            # fill out the blank fields only, unless override
+            if user_import.override or getattr(profile, field) == '':
+                setattr(profile, field, data[field])
 
-        # add to group
-        if setting_dict['group']:
-            try:
-                gm = GroupMembership.objects.get(group=setting_dict['group'], member=user)
-            except GroupMembership.DoesNotExist:
-                gm = GroupMembership()
-                gm.member = user
-                gm.group = setting_dict['group']
-                gm.creator_id = request.user.id
-                gm.creator_username = request.user.username
-                gm.owner_id =  request.user.id
-                gm.owner_username = request.user.username
-                gm.status =1
-                gm.status_detail = 'active'
-                gm.save()
-
-    return user
-
-def get_unique_username(user):
-
-    if not user.username:
+
+def assign_usernames(users):
+    """
+    Gives unique usernames to new users with one query, and one more
+    for each username that is already taken
+    """
+    p = re.compile(r'[^\w.@+-]+', re.IGNORECASE)
+    for user in users:
+        if not user.username:
+            if user.email:
+                user.username = user.email
+            elif user.first_name and user.last_name:
+                user.username = '%s%s' % (user.first_name[0], user.last_name)
+        user.username = p.sub('', user.username or '')[:USERNAME_MAX_LENGTH]
+
+    names = [user.username for user in users if user.username]
+    taken = set([username.lower() for username in
+        User.objects.filter(username__in=names).values_list('username', flat=True)])
+
+    for user in users:
+        if not user.username:
+            continue
+        if user.username.lower() in taken:
+            existing = User.objects.filter(username__istartswith=user.username
+                ).values_list('username', flat=True)
+            t_list = set([username[len(user.username):] for username in existing] +
+                [username[len(user.username):] for username in taken
+                 if username.startswith(user.username.lower())])
+            num = 1
+            while str(num) in t_list:
+                num += 1
+            user.username = '%s%s' % (user.username[:USERNAME_MAX_LENGTH - len(str(num))], num)
+        taken.add(user.username.lower())
+
+
+@transaction.commit_on_success
+def process_user_import_batch(user_import, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Imports the next batch of pending rows. The existing users are
+    matched in one query, the new users, their profiles and group
+    memberships are added with multi-row inserts.
+    Returns the number of rows processed, 0 once the import is done.
+    """
+    rows = list(UserImportRow.objects.filter(user_import=user_import, action=''
+        ).order_by('pk')[:batch_size])
+    if not rows:
+        finish_user_import(user_import)
+        return 0
+
+    key_list = user_import.key.split(',')
+    data_list = [row.get_data() for row in rows]
+    matched = match_users(key_list, data_list)
+    creator = user_import.creator
+
+    # identity -> the user of an earlier row of the batch
+    batch_users = {}
+    new_users = []
+    updated_users = []
+    row_users = []
+    for row, data in zip(rows, data_list):
+        identity = get_identity(data, key_list)
+        if identity is None:
+            missing_keys = [key for key in key_list if data.get(key, '') in ('', None)]
+            row.action, row.error = 'invalid', 'Missing key: %s.' % ', '.join(missing_keys)
+            row_users.append(None)
+            continue
+
+        user = batch_users.get(identity) or matched.get(identity)
+        if user:
+            row.action = 'update'
+            fill_user(user, data, user_import, insert=False)
+            if user.pk and user not in updated_users:
+                updated_users.append(user)
+        else:
+            row.action = 'insert'
+            user = User()
+            if 'username' in data:
+                user.username = smart_unicode(data['username'])
+            fill_user(user, data, user_import, insert=True)
+            new_users.append(user)
+        batch_users[identity] = user
+        row_users.append(user)
+
+    # username and email required
+    assign_usernames(new_users)
+    for row, user in zip(rows, row_users):
+        if user and not (user.username and user.email):
+            row.action, row.error = 'invalid', 'Missing username or email.'
+    new_users = [user for user in new_users if user.username and user.email]
+
+    bulk_insert(User, new_users)
+    pks = dict(User.objects.filter(username__in=[user.username for user in new_users]
+        ).values_list('username', 'pk'))
+    for user in new_users:
+        user.id = pks[user.username]
+    for user in updated_users:
         if user.email:
-            user.username = user.email
+            user.save(force_update=True)
+
+    users = [user for user in new_users + updated_users if user.pk and user.email]
+    profiles = dict([(profile.user_id, profile) for profile in
+        Profile.objects.filter(user__in=[user.pk for user in users])])
+    new_profiles = {}
+    for row, data, user in zip(rows, data_list, row_users):
+        if row.action == 'invalid' or not user.pk:
+            continue
+        profile = profiles.get(user.pk) or new_profiles.get(user.pk)
+        if not profile:
+            profile = Profile(user=user, guid=str(uuid.uuid1()),
+                creator=creator, creator_username=creator.username,
+                owner=creator, owner_username=creator.username,
+                email=user.email)
+            new_profiles[user.pk] = profile
+        fill_profile(profile, data, user_import)
+
+    for profile in profiles.values():
+        profile.save()
+    for profile in new_profiles.values():
+        profile.allow_anonymous_view = not profile.hide_in_search
+    bulk_insert(Profile, new_profiles.values())
+    if new_profiles:
+        # what the post_save of the search index would have done
+        content_type = ContentType.objects.get_for_model(Profile)
+        bulk_insert(UnindexedItem, [UnindexedItem(content_type=content_type, object_id=pk)
+            for pk in Profile.objects.filter(user__in=new_profiles.keys()
+                ).values_list('pk', flat=True)])
+
+    # add to group
+    group = user_import.group
+    if group:
+        members = set(GroupMembership.objects.filter(group=group,
+            member__in=[user.pk for user in users]).values_list('member', flat=True))
+        bulk_insert(GroupMembership, [GroupMembership(group=group, member=user,
+            creator_id=creator.pk, creator_username=creator.username,
+            owner_id=creator.pk, owner_username=creator.username,
+            status=True, status_detail='active')
+            for user in users if user.pk not in members])
+
+    counts = {'insert': 0, 'update': 0, 'invalid': 0}
+    for row, user in zip(rows, row_users):
+        counts[row.action] += 1
+        UserImportRow.objects.filter(pk=row.pk).update(action=row.action,
+            error=row.error, user=(user and user.pk and user or None))
+
+    UserImport.objects.filter(pk=user_import.pk).update(status='processing',
+        total_done=F('total_done') + len(rows),
+        count_insert=F('count_insert') + counts['insert'],
+        count_update=F('count_update') + counts['update'],
+        count_invalid=F('count_invalid') + counts['invalid'])
+    return len(rows)
+
+
+def finish_user_import(user_import):
+    user_import = UserImport.objects.get(pk=user_import.pk)
+    if user_import.status == 'completed':
+        return
+    user_import.status = 'completed'
+    user_import.save()
+
+    EventLog.objects.log(**{
+        'event_id' : 129005,
+        'event_data': 'User import: %s<br>INSERTS:%d<br>UPDATES:%d<br>INVALID:%d<br>TOTAL:%d' % (
+            user_import.file_name, user_import.count_insert, user_import.count_update,
+            user_import.count_invalid, user_import.total),
+        'description': 'user import',
+        'user': user_import.creator,
+        'source': 'auth',
+    })
+
+    # remove the imported file
+    file_path = os.path.join(IMPORT_DIR, user_import.file_name)
+    if os.path.isfile(file_path):
+        os.remove(file_path)
+
+
+def run_user_import(user_import):
+    """
+    Imports all the pending rows, batch after batch
+    """
+    while process_user_import_batch(user_import):
+        pass
 
-    if not user.username:
-        if user.first_name and user.last_name:
-            user.username = '%s%s' % (user.first_name[0], user.last_name)
 
-    p = re.compile(r'[^\w.@+-]+', re.IGNORECASE)
-    user.username = p.sub('', user.username)
+def preview_user_import(user_import, preview_rows=PREVIEW_ROWS):
+    """
+    Counts the inserts, updates and invalid rows of an import, and
+    describes its first rows for the preview page
+    """
+    key_list = user_import.key.split(',')
+    counts = {'insert': 0, 'update': 0, 'invalid': 0}
+    users_list = []
+    # the identities of the rows to insert; their later rows
+    # update the user, as process_user_import_batch does
+    inserted = set()
+
+    last_pk = 0
+    while True:
+        rows = list(UserImportRow.objects.filter(user_import=user_import, pk__gt=last_pk
+            ).order_by('pk').values_list('pk', 'row_num', 'data')[:IMPORT_BATCH_SIZE])
+        if not rows:
+            break
+        last_pk = rows[-1][0]
+
+        data_list = [simplejson.loads(row[2]) for row in rows]
+        matched = match_users(key_list, data_list)
+        for (pk, row_num, raw), data in zip(rows, data_list):
+            user_object_dict = dict(data)
+            user_object_dict['ROW_NUM'] = row_num
+
+            identity = get_identity(data, key_list)
+            if identity is None:
+                missing_keys = [key for key in key_list if data.get(key, '') in ('', None)]
+                user_object_dict['ERROR'] = 'Missing key: %s.' % (', '.join(missing_keys))
+                user_object_dict['IS_VALID'] = False
+                counts['invalid'] += 1
+            else:
+                user_object_dict['IS_VALID'] = True
+                user = matched.get(identity)
+                if user:
+                    user_object_dict['ACTION'] = 'update'
+                    populate_user_dict(user, user_object_dict, {'override': user_import.override})
+                elif identity in inserted:
+                    user_object_dict['ACTION'] = 'update'
+                else:
+                    user_object_dict['ACTION'] = 'insert'
+                    inserted.add(identity)
+                counts[user_object_dict['ACTION']] += 1
 
-    # check if this username already exists
-    users = User.objects.filter(username__istartswith=user.username)
+            if len(users_list) < preview_rows:
+                users_list.append(user_object_dict)
 
-    if users:
-        t_list = [u.username[len(user.username):] for u in users]
-        num = 1
-        while str(num) in t_list:
-            num += 1
-        user.username = '%s%s' % (user.username, str(num))
+    return counts, users_list
 
-    return user.username
-                     
 
 # populate user object to its dictionary, so we can display to the preview page
 def populate_user_dict(user, user_dict, import_setting_list):
@@ -465,6 +471,9 @@ def get_header_list_from_content(file_content, file_name):
 
 
 def extract_from_excel(file_path):
+    """
+    Yields the rows of a spreadsheet as dictionaries
+    """
     if not os.path.isfile(file_path):
         raise NameError, "%s is not a valid file." % file_path
     
@@ -473,7 +482,6 @@ def extract_from_excel(file_path):
         raise NameError, "%s is not a valid file type (should be either .csv or .xls)." % file_path
     
     fields = []
-    data_list = []
     
     if file_ext == '.csv':
         import csv
@@ -489,10 +497,13 @@ def extract_from_excel(file_path):
         for row in data:
             item = dict(zip(fields, row))
             for key in item.keys():
-                if field_type_dict.has_key(key) and field_type_dict[key] == 'DateTimeField':
-                    item[key] = dparser.parser(item[key])
+                if field_type_dict.has_key(key) and field_type_dict[key] == 'DateTimeField' and item[key]:
+                    try:
+                        item[key] = dparser.parse(item[key])
+                    except ValueError:
+                        pass
             item['ROW_NUM'] = r + 1
-            data_list.append(item)
+            yield item
             r += 1
     else:
         book = xlrd.open_workbook(file_path)
@@ -524,17 +535,4 @@ def extract_from_excel(file_path):
                    
             item = dict(zip(fields, row))
             item['ROW_NUM'] = r + 1
-            data_list.append(item)
-      
-    return data_list
-                    
-                
-                
-                
-                
-        
-                
-            
-        
- 
-    
+            yield item
@@ -1,7 +1,5 @@
 import os
-import time
-import cPickle
-from django.shortcuts import render_to_response
+from django.shortcuts import render_to_response, get_object_or_404
 from django.template import RequestContext
 from django.contrib.auth.decorators import login_required
 from django.http import HttpResponseRedirect, HttpResponse, Http404
@@ -9,13 +7,13 @@ from django.core.urlresolvers import reverse
 from django.conf import settings
 from perms.utils import is_admin
 from base.http import Http403
+from base.exports import export_response
 from imports.forms import UserImportForm
-from imports.utils import extract_from_excel, render_excel, handle_uploaded_file, get_user_import_settings, user_import_process
-from event_logs.models import EventLog
-from user_groups.models import Group, GroupMembership
-
-
-IMPORT_DIR = os.path.join(settings.MEDIA_ROOT, 'imports')
+from imports.models import UserImport
+from imports.tasks import ImportUsersTask
+from imports.utils import (IMPORT_DIR, handle_uploaded_file, stage_user_import,
+    preview_user_import, process_user_import_batch)
+from user_groups.models import GroupMembership
 
 
 @login_required
@@ -35,30 +33,19 @@ def user_upload_add(request, form_class=UserImportForm, template_name="imports/u
             file_path = os.path.join(file_dir, file_name)
             handle_uploaded_file(f, file_path)
             
-            interactive = form.cleaned_data['interactive']
-            override = form.cleaned_data['override']
-            key = form.cleaned_data['key']
-            group = form.cleaned_data['group']
-            clear_group_membership = form.cleaned_data['clear_group_membership']
-            
-            # read the spreadsheet into a dictionary
-            data_dict_list = extract_from_excel(file_path)
-            
-            # generate a unique id for this import
-            id = str(int(time.time()))
-            
-            # store the infor in the session to pass to the next page
-            request.session[id] = {'file_name': file_name,
-                                   'interactive':interactive, 
-                                   'override': override,
-                                   'key': key,
-                                   'group': group,
-                                   'clear_group_membership': clear_group_membership,
-                                   'total': len(data_dict_list),
-                                   'data_dict_list': data_dict_list}
-            
+            user_import = UserImport.objects.create(
+                file_name=file_name,
+                interactive=form.cleaned_data['interactive'] == '1',
+                override=form.cleaned_data['override'] == '1',
+                key=form.cleaned_data['key'],
+                group=form.cleaned_data['group'],
+                clear_group_membership=form.cleaned_data['clear_group_membership'],
+                creator=request.user)
+
+            # read the spreadsheet once into the staging table
+            stage_user_import(user_import, file_path)
             
-            return HttpResponseRedirect(reverse('imports.views.user_upload_preview', args=[id]))
+            return HttpResponseRedirect(reverse('imports.views.user_upload_preview', args=[user_import.pk]))
     else:
         form = form_class()
     return render_to_response(template_name, {'form':form}, 
@@ -68,226 +55,126 @@ def user_upload_add(request, form_class=UserImportForm, template_name="imports/u
 def user_upload_preview(request, id, template_name="imports/users_preview.html"):
     if not is_admin(request.user):raise Http403   # admin only page
     
-    id = str(id)
-        
-    import_dict = get_user_import_settings(request, id)
-    import_dict['file_dir'] = IMPORT_DIR
-    
-    if not os.path.isfile(os.path.join(import_dict['file_dir'], import_dict['file_name'])):
-        return HttpResponseRedirect(reverse('imports.views.user_upload_add'))
+    user_import = get_object_or_404(UserImport, pk=id)
+    if user_import.status != 'preview':
+        return HttpResponseRedirect(reverse('imports.views.user_upload_process', args=[user_import.pk]))
 
-    users_list, invalid_list = user_import_process(request, import_dict, preview=True, id=id)
-    import_dict['users_list'] = users_list
-    import_dict['id'] = id
-    import_dict['total'] =  request.session[id].get('total',  0)
-    
-    #d = request.session[id]
-    #d.update({'total': import_dict['total'] - import_dict['count_invalid']})
-    #request.session[id] = d
-    #d = None
-    
-    return render_to_response(template_name, import_dict, 
-        context_instance=RequestContext(request))
+    counts, users_list = preview_user_import(user_import)
+    
+    return render_to_response(template_name, {
+        'id': user_import.pk,
+        'file_name': user_import.file_name,
+        'key': user_import.key,
+        'interactive': user_import.interactive,
+        'group': user_import.group,
+        'str_update': user_import.str_update,
+        'total': user_import.total,
+        'count_insert': counts['insert'],
+        'count_update': counts['update'],
+        'count_invalid': counts['invalid'],
+        'users_list': users_list,
+        }, context_instance=RequestContext(request))
     
     
 @login_required
 def user_upload_process(request, id, template_name="imports/users_process.html"):
     if not is_admin(request.user): raise Http403   # admin only page
 
-    id = str(id)
-    import_dict = get_user_import_settings(request, id)
-    if not import_dict:
-        return HttpResponseRedirect(reverse('imports.views.user_upload_add'))
-    
-    import_dict['file_dir'] = IMPORT_DIR
-    import_dict['id'] = id
-    
-    if not os.path.isfile(os.path.join(import_dict['file_dir'], import_dict['file_name'])):
-        return HttpResponseRedirect(reverse('imports.views.user_upload_add'))
-    
-    #reset group - delete all members in the group
-    if import_dict['clear_group_membership'] and import_dict['group']:
-        GroupMembership.objects.filter(group=import_dict['group']).delete()
+    user_import = get_object_or_404(UserImport, pk=id)
 
-    d = request.session[id]
-    d.update({
-        'is_completed': False,
-        'count_insert': 0,
-        'count_update': 0,
-        'total_done':0
-    })
+    if user_import.status == 'preview':
+        #reset group - delete all members in the group
+        if user_import.clear_group_membership and user_import.group:
+            GroupMembership.objects.filter(group=user_import.group).delete()
 
-    request.session[id] = d
-    d = None
-    
-    
-    return render_to_response(template_name, import_dict, 
-        context_instance=RequestContext(request))
+        # mark the import pending before the worker starts writing its
+        # progress, and never save the whole row again afterwards
+        user_import.status = 'pending'
+        user_import.save()
+        if settings.CELERY_IS_ACTIVE:
+            result = ImportUsersTask.delay(user_import.pk)
+            UserImport.objects.filter(pk=user_import.pk).update(task_id=result.task_id)
+    
+    return render_to_response(template_name, {
+        'id': user_import.pk,
+        'file_name': user_import.file_name,
+        }, context_instance=RequestContext(request))
     
 @login_required
-def user_upload_subprocess(request, id, template_name="imports/users_subprocess.html"):
+def user_upload_status(request, id, template_name="imports/users_status.html"):
+    """
+    The progress of an import. Without celery, each call imports
+    the next batch of rows.
+    """
     if not is_admin(request.user):raise Http403   # admin only page
 
-    id = str(id)
-    import_dict = get_user_import_settings(request, id)
-    if not import_dict:
-        return HttpResponse('')
-    
-    import_dict['file_dir'] = IMPORT_DIR
-    
-    if not os.path.isfile(os.path.join(import_dict['file_dir'], import_dict['file_name'])):
-        return HttpResponse('')
+    user_import = get_object_or_404(UserImport, pk=id)
 
-    
-    users_list, invalid_list = user_import_process(request, import_dict, preview=False, id=id)
-    import_dict['users_list'] = users_list
-    
-    # recalculate the total
-    import_dict['total_done'] = request.session[id]['total_done']
-    import_dict['total_done'] += import_dict['count_insert'] + import_dict['count_update']
-    request.session[id]['total_done'] = import_dict['total_done']
-    
-    d = request.session[id]
-    d.update({'total_done': import_dict['total_done']})
-    request.session[id] = d
-    d = None
-    
-    import_dict['is_completed'] = request.session[id]['is_completed']
-    
-    # store the recap - so we can retrieve it later
-    recap_file_name = '%s_recap.txt' % id
-    recap_path = os.path.join(import_dict['file_dir'], recap_file_name)
-    
-    if os.path.isfile(recap_path):
-        fd = open(recap_path, 'r')
-        content = fd.read()
-        fd.close()
-        recap_dict = cPickle.loads(content)
-        recap_dict.update({'users_list':recap_dict['users_list']+import_dict['users_list'],
-                           'invalid_list':recap_dict['invalid_list']+invalid_list,
-                           'total':import_dict['total'],
-                           'total_done':import_dict['total_done'],
-                           'count_insert':recap_dict['count_insert']+import_dict['count_insert'],
-                           'count_update':recap_dict['count_update']+import_dict['count_update'],
-                           'count_invalid':recap_dict['count_invalid']+import_dict['count_invalid']
-                           })
-        import_dict['count_invalid'] = recap_dict['count_invalid']
-    else:
-        recap_dict = {'users_list':import_dict['users_list'],
-                       'invalid_list':invalid_list,
-                       'total':import_dict['total'],
-                       'total_done':import_dict['total_done'],
-                       'count_insert':import_dict['count_insert'],
-                       'count_update':import_dict['count_update'],
-                       'count_invalid':import_dict['count_invalid'],
-                       'file_name':import_dict['file_name']}
-    
-    
-    fd = open(recap_path, 'w')
-    cPickle.dump(recap_dict, fd)
-    fd.close()
-    # clear the recap_dict
-    recap_dict = None
-    
-    
-    if import_dict['is_completed']:
-        # log an event
-        log_defaults = {
-            'event_id' : 129005,
-            'event_data': 'User import: %s<br>INSERTS:%d<br>UPDATES:%d<br>INVALID:%d<br>TOTAL:%d' % (import_dict['file_name'], 
-                                                                                       import_dict['count_insert'],
-                                                                                       import_dict['count_update'], 
-                                                                                       import_dict['count_invalid'],
-                                                                                       import_dict['total']),
-            'description': 'user import',
-            'user': request.user,
-            'request': request,
-            'source': 'auth',
-        }
-        EventLog.objects.log(**log_defaults)
-        
-        # clear up the session
-        del request.session[id]
-        
-        # remove the imported file
-        os.remove(os.path.join(import_dict['file_dir'], import_dict['file_name']))
-    
-    import_dict['id'] = id
-    return render_to_response(template_name, import_dict, 
-        context_instance=RequestContext(request))
+    if not settings.CELERY_IS_ACTIVE and user_import.status in ('pending', 'processing'):
+        process_user_import_batch(user_import)
+        user_import = UserImport.objects.get(pk=user_import.pk)
+
+    return render_to_response(template_name, {
+        'id': user_import.pk,
+        'user_import': user_import,
+        }, context_instance=RequestContext(request))
  
 @login_required   
 def user_upload_recap(request, id):
     if not is_admin(request.user):raise Http403   # admin only page
     
-    recap_file_name = '%s_recap.txt' % str(id)
-    recap_path = os.path.join(IMPORT_DIR, recap_file_name)
-    
-    if os.path.isfile(recap_path):
-        import StringIO
-        from django.template.defaultfilters import slugify
-        from xlwt import Workbook, XFStyle
-        
-        # restore the recap_dict
-        fd = open(recap_path, 'r')
-        content = fd.read()
-        fd.close()
-        
-        recap_dict = cPickle.loads(content)
+    user_import = get_object_or_404(UserImport, pk=id)
+
+    from django.template.defaultfilters import slugify
+    from xlwt import Workbook
+
+    export_wb = Workbook()
+    sheet1 = export_wb.add_sheet('Recap')
+    # title
+    sheet1.write(0, 0, 'action')
+    sheet1.write(0, 1, 'original row#')
+    sheet1.write(0, 2, 'username')
+    sheet1.write(0, 3, 'frist_name')
+    sheet1.write(0, 4, 'last_name')
+    sheet1.write(0, 5, 'email')
+    
+    # data
+    rows = user_import.rows.filter(action__in=('insert', 'update'), user__isnull=False)
+    row_idx = 1
+    for row in rows.select_related('user').order_by('pk').iterator():
+        sheet1.write(row_idx, 0, row.action)
+        sheet1.write(row_idx, 1, str(row.row_num))
+        sheet1.write(row_idx, 2, row.user.username)
+        sheet1.write(row_idx, 3, row.user.first_name)
+        sheet1.write(row_idx, 4, row.user.last_name)
+        sheet1.write(row_idx, 5, row.user.email)
         
-        output = StringIO.StringIO()
-        export_wb = Workbook()
-        sheet1 = export_wb.add_sheet('Recap')
+        row_idx += 1
+    
+    # create another sheet for invalid list    
+    invalid_rows = user_import.rows.filter(action='invalid').order_by('pk')
+    if invalid_rows.exists():
+        sheet2 = export_wb.add_sheet('Invalid records')
         # title
-        sheet1.write(0, 0, 'action')
-        sheet1.write(0, 1, 'original row#')
-        sheet1.write(0, 2, 'username')
-        sheet1.write(0, 3, 'frist_name')
-        sheet1.write(0, 4, 'last_name')
-        sheet1.write(0, 5, 'email')
+        sheet2.write(0, 0, 'invalid?')
+        sheet2.write(0, 1, 'original row#')
+        sheet2.write(0, 2, 'reason')
         
-        # data
         row_idx = 1
-        for item_dict in recap_dict['users_list']:
-            sheet1.write(row_idx, 0, '%s' % item_dict['ACTION'])
-            sheet1.write(row_idx, 1, str(item_dict['ROW_NUM']))
-            sheet1.write(row_idx, 2, item_dict['user'].username)
-            sheet1.write(row_idx, 3, item_dict['user'].first_name)
-            sheet1.write(row_idx, 4, item_dict['user'].last_name)
-            sheet1.write(row_idx, 5, item_dict['user'].email)
-            
-            row_idx += 1
-        
-        # create another sheet for invalid list    
-        if recap_dict['invalid_list']:
-            sheet2 = export_wb.add_sheet('Invalid records')
-            # title
-            sheet2.write(0, 0, 'invalid?')
-            sheet2.write(0, 1, 'original row#')
-            sheet2.write(0, 2, 'reason')
-            
-        row_idx = 1
-        for invalid_dict in recap_dict['invalid_list']:
+        for row_num, error in invalid_rows.values_list('row_num', 'error').iterator():
             sheet2.write(row_idx, 0, 'invalid')
-            sheet2.write(row_idx, 1, invalid_dict['ROW_NUM'])
-            sheet2.write(row_idx, 2, invalid_dict['ERROR'])
+            sheet2.write(row_idx, 1, row_num)
+            sheet2.write(row_idx, 2, error)
             row_idx += 1
-            
-        export_wb.save(output)
-        output.seek(0)
-        str_out = output.getvalue()
-        response = HttpResponse(str_out)
-        response['Content-Type'] = 'application/vnd.ms-excel'
-        if recap_dict['file_name'] and len(recap_dict['file_name'])>5:
-            recap_name = '%s_recap.xls' % slugify((recap_dict['file_name'])[:-4])
-        else:
-            recap_name = "user_import_recap.xls"
-        response['Content-Disposition'] = 'attachment; filename=%s' % (recap_name)
         
-        recap_dict = None
-        return response
+    response = HttpResponse(mimetype='application/vnd.ms-excel')
+    if user_import.file_name and len(user_import.file_name)>5:
+        recap_name = '%s_recap.xls' % slugify(user_import.file_name[:-4])
     else:
-        raise Http404 
+        recap_name = "user_import_recap.xls"
+    response['Content-Disposition'] = 'attachment; filename=%s' % (recap_name)
+    export_wb.save(response)
+    return response
    
 @login_required
 def download_user_upload_template(request, file_ext='.xls'):
@@ -303,6 +190,5 @@ def download_user_upload_template(request, file_ext='.xls'):
                          'work_phone', 'mobile_phone', 'fax', 'url', 'dob', 'spouse', 'department',
                          'direct_mail', 'notes', 'admin_notes', 
                          'username', 'password', 'member_number']
-    data_row_list = []
     
-    return render_excel(filename, import_field_list, data_row_list, file_ext)
\ No newline at end of file
+    return export_response(filename, import_field_list, [])
\ No newline at end of file
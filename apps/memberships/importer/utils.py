@@ -1,29 +1,86 @@
 import re
+import uuid
 from datetime import datetime
 from dateutil.parser import parse as dt_parse
 
 from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.template.defaultfilters import slugify
+from django.utils.hashcompat import md5_constructor
 
-from memberships.models import Membership, MembershipType
+from base.utils import bulk_insert
+from profiles.models import Profile
+from search.models import UnindexedItem
+from user_groups.models import GroupMembership
+from corporate_memberships.models import CorporateMembership
+from memberships.models import AppEntry, AppField, AppFieldEntry, Membership, MembershipType
 from memberships.utils import csv_to_dict
 
+# rows looked up and written at a time, in one transaction;
+# the lookups of a batch stay under the 999 variables sqlite allows
+IMPORT_BATCH_SIZE = 200
+
+# tendenci 4 null date: 1951-01-01
+TENDENCI4_NULL_DATE = datetime(1951,1,1,0,0,0)
+
+# csv column -> profile field, the blank ones are not imported
+PROFILE_FIELDS = (
+    ('company', 'company'),
+    ('positiontitle', 'position_title'),
+    ('mailingaddress', 'address'),
+    ('address2', 'address2'),
+    ('city', 'city'),
+    ('state', 'state'),
+    ('zipcode', 'zipcode'),
+    ('county', 'county'),
+    ('addresstype', 'address_type'),
+    ('workphone', 'work_phone'),
+    ('homephone', 'home_phone'),
+    ('mobilephone', 'mobile_phone'),
+    ('email2', 'email2'),
+    ('website', 'url'),
+)
+
 def clean_username(un):
     # clean username
     un = re.sub(r'[^a-zA-Z0-9._@]+', '', un)
-    
+
     # soft truncate
     if len(un) > 30:
         un = un.split('@')[0]  # pray for email address
 
     # hard truncate
     return un[:30]
-    
+
 def clean_field_name(name):
     name = name.lower()
     name = name.replace('-', '_')
     name = name.replace(' ', '_')
     return name
 
+def get_users(usernames):
+    """
+    Returns a dict lowercased username -> user of the users with the
+    usernames, or with their cleaned usernames, in one query. The
+    usernames match regardless of case where the database collation
+    does, as on mysql.
+    """
+    usernames = set(usernames)
+    usernames.update([clean_username(username) for username in usernames])
+    return dict([(user.username.lower(), user) for user in
+        User.objects.filter(username__in=list(usernames))])
+
+def find_user(users, username):
+    return users.get(username.lower()) or users.get(clean_username(username).lower())
+
+def get_membership_types():
+    """
+    Returns a dict name -> membership type of all the membership types
+    """
+    return dict([(membership_type.name, membership_type)
+        for membership_type in MembershipType.objects.all()])
+
 def parse_mems_from_csv(file_path, mapping, parse_range=None):
     """
     Parse membership entries from a csv file.
@@ -31,107 +88,90 @@ def parse_mems_from_csv(file_path, mapping, parse_range=None):
     parse_range is the range of rows to be parsed from the csv.
     Entries without a Membership Type will be marked as skipped.
     Entries that are already in the database will be marked as skipped.
+    The users and memberships are looked up IMPORT_BATCH_SIZE rows at a time.
     """
+    csv_dicts = csv_to_dict(file_path, machine_name=True)
+    if parse_range:
+        csv_dicts = csv_dicts[parse_range[0]:parse_range[1]]
 
-    print 'mapping', mapping.keys()
+    membership_types = get_membership_types()
 
     membership_dicts = []
     skipped = 0
-    for csv_dict in csv_to_dict(file_path, machine_name=True):  # field mapping
+    for i in xrange(0, len(csv_dicts), IMPORT_BATCH_SIZE):
+        batch = []
+        for csv_dict in csv_dicts[i:i + IMPORT_BATCH_SIZE]:  # field mapping
+            m = {}
+            for app_field, csv_field in mapping.items():
+                if csv_field:  # skip blank option
+                    # membership['username'] = 'charliesheen'
+                    m[clean_field_name(app_field)] = csv_dict.get(csv_field, '')
+            batch.append(m)
 
-        m = {}
-        for app_field, csv_field in mapping.items():
-            if csv_field:  # skip blank option
-                # membership['username'] = 'charliesheen'
-                m[clean_field_name(app_field)] = csv_dict.get(csv_field, '')
+        users = get_users([m['username'] for m in batch])
+        # (user, membership type) of the memberships already there
+        existing = set(Membership.objects.filter(
+            user__in=[user.pk for user in users.values()]
+            ).values_list('user', 'membership_type'))
 
-        username = m['username']
-        try:
-            user = User.objects.get(username=username)
-        except User.DoesNotExist:
+        for m in batch:
+            user = find_user(users, m['username'])
 
-            username = clean_username(username)
+            # update full name and email
+            if user:
+                m['fullname'] = user.get_full_name()
+                m['email'] = user.email
+            else:
+                first_name = m.get('firstname')
+                last_name = m.get('lastname')
+                if first_name or last_name:
+                    m['fullname'] = "%s %s" % (first_name, last_name)
+                m['email'] = m.get('email')
 
-            try:
-                user = User.objects.get(username=username)
-            except User.DoesNotExist:
-                user = None
-        
-        # update full name and email
-        if user:
-            first_name = user.first_name
-            last_name = user.last_name
-            email = user.email
-        else:
-            first_name = m.get('firstname')
-            last_name = m.get('lastname')
-            email = m.get('email')
-        
-        if user:
-            m['fullname'] = user.get_full_name()
-        else:
-            if first_name or last_name:
-                m['fullname'] = "%s %s" % (first_name, last_name)
-        m['email'] = email
-
-        # skip importing a record if
-        # membership type does not exist
-        # membership record already exists
-
-        #check if should be skipped or not
-        m['skipped'] = False
-        try:
-            membership_type = MembershipType.objects.get(name = m['membershiptype'])
-        except:
-            # no memtype
-            membership_type = None
-            m['skipped'] = True
-            skipped = skipped + 1
-        
-        if membership_type and user:
-            # already exists
-            mem_type_exists = Membership.objects.filter(user=user, membership_type=membership_type).exists()
-            if mem_type_exists:
-                m['skipped'] = True
+            # skip importing a record if
+            # membership type does not exist
+            # membership record already exists
+            membership_type = membership_types.get(m.get('membershiptype'))
+            m['skipped'] = not membership_type or \
+                bool(user and (user.pk, membership_type.pk) in existing)
+            if m['skipped']:
                 skipped = skipped + 1
-        
-        # detect if renewal
-        m['renewal'] = bool(m.get('renewdate'))
-
-        #update the dates
-        try:
-            join_dt = dt_parse(m['joindate'])
-        except:
-            join_dt = None
-        try:
-            renew_dt = dt_parse(m['renewdate'])
-        except:
-            renew_dt = None
-        
-        # tendenci 4 null date: 1951-01-01
-        tendenci4_null_date = datetime(1951,1,1,0,0,0)
-        if join_dt and join_dt <= tendenci4_null_date:
-            join_dt = None
-        if renew_dt and renew_dt <= tendenci4_null_date:
-            renew_dt = None
-        
-        subscribe_dt = join_dt or datetime.now()
-        
-        try:
-            expire_dt = dt_parse(m['expiredate'])
-        except:
-            if membership_type:
-                expire_dt = membership_type.get_expiration_dt(join_dt=join_dt, renew_dt=renew_dt, renewal=m.get('renewal'))
-            else:
-                expire_dt = None
-        
-        m['joindt'] = join_dt
-        m['renewdt'] = renew_dt
-        m['expiredt'] = expire_dt
-        m['subscribedt'] = subscribe_dt
-        
-        membership_dicts.append(m)
-    
+
+            # detect if renewal
+            m['renewal'] = bool(m.get('renewdate'))
+
+            #update the dates
+            try:
+                join_dt = dt_parse(m['joindate'])
+            except:
+                join_dt = None
+            try:
+                renew_dt = dt_parse(m['renewdate'])
+            except:
+                renew_dt = None
+
+            if join_dt and join_dt <= TENDENCI4_NULL_DATE:
+                join_dt = None
+            if renew_dt and renew_dt <= TENDENCI4_NULL_DATE:
+                renew_dt = None
+
+            subscribe_dt = join_dt or datetime.now()
+
+            try:
+                expire_dt = dt_parse(m['expiredate'])
+            except:
+                if membership_type:
+                    expire_dt = membership_type.get_expiration_dt(join_dt=join_dt, renew_dt=renew_dt, renewal=m.get('renewal'))
+                else:
+                    expire_dt = None
+
+            m['joindt'] = join_dt
+            m['renewdt'] = renew_dt
+            m['expiredt'] = expire_dt
+            m['subscribedt'] = subscribe_dt
+
+            membership_dicts.append(m)
+
     total = len(membership_dicts)
     stats = {
         'all': total,
@@ -139,4 +179,257 @@ def parse_mems_from_csv(file_path, mapping, parse_range=None):
         'added': total-skipped,
         }
     return membership_dicts, stats
-    
+
+def get_payment_method_id(m):
+    """
+    The id of the payment method of the row.
+    This assumes that the default payment methods are used.
+    """
+    payment_method = slugify(m.get('paymentmethod', '')).replace('-','')
+    if payment_method in ('cc','credit','creditcard'):
+        return 1
+    if payment_method in ('check',):
+        return 2
+    if payment_method in ('cash',):
+        return 3
+    return None
+
+def update_profile(profile, user, m):
+    for key, field_name in PROFILE_FIELDS:
+        setattr(profile, field_name, m.get(key) or getattr(profile, field_name))
+    profile.email = user.email
+    if m.get('dob'):
+        profile.dob = dt_parse(m.get('dob')) or datetime.now()
+
+def add_unindexed_items(model, pks):
+    """
+    What the post_save of the search index does, for rows added with bulk_insert
+    """
+    content_type = ContentType.objects.get_for_model(model)
+    bulk_insert(UnindexedItem, [UnindexedItem(content_type=content_type, object_id=pk)
+        for pk in pks])
+
+def import_memberships(app, mems, fields, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Imports the rows parsed by parse_mems_from_csv that are not skipped.
+    The membership types and the app fields are loaded once, the rest
+    batch_size rows at a time.
+    Returns the number of memberships imported.
+    """
+    membership_types = get_membership_types()
+    membership_types_by_pk = dict([(membership_type.pk, membership_type)
+        for membership_type in membership_types.values()])
+
+    # field name -> first app field, as AppField.objects.filter(...)[0]
+    app_fields = {}
+    for app_field in AppField.objects.filter(app=app, field_name__in=fields.keys()):
+        app_fields.setdefault(app_field.field_name, app_field)
+
+    mems = [m for m in mems if not m['skipped']]
+    for i in xrange(0, len(mems), batch_size):
+        import_membership_batch(app, mems[i:i + batch_size], fields, app_fields,
+            membership_types, membership_types_by_pk)
+    return len(mems)
+
+@transaction.commit_on_success
+def import_membership_batch(app, mems, fields, app_fields, membership_types, membership_types_by_pk):
+    """
+    Imports a batch of rows: the users and their profiles, the
+    memberships, their entries and entry fields are added with multi-row
+    inserts. The existing users, profiles and memberships are updated
+    one at a time.
+    """
+    # users
+    users = get_users([m['username'] for m in mems])
+    new_users = {}
+    updated_users = {}
+    row_users = []
+    for m in mems:
+        user = find_user(users, m['username'])
+        if user and user.pk:
+            updated_users[user.pk] = user
+        elif not user:
+            # Maybe we should set a password here too?
+            user = User(username=clean_username(m['username']))
+            new_users[user.username] = user
+            users[user.username.lower()] = user
+
+        # update user
+        user.first_name = m.get('firstname') or user.first_name
+        user.last_name = m.get('lastname') or user.last_name
+        user.email = m.get('email') or user.email
+        row_users.append(user)
+
+    bulk_insert(User, new_users.values())
+    for username, pk in User.objects.filter(username__in=new_users.keys()
+        ).values_list('username', 'pk'):
+        new_users[username].id = pk
+    for user in updated_users.values():
+        user.save()
+    user_pks = [user.pk for user in row_users]
+
+    # profiles
+    profiles = dict([(profile.user_id, profile) for profile in
+        Profile.objects.filter(user__in=user_pks)])
+    new_profiles = {}
+    for m, user in zip(mems, row_users):
+        profile = profiles.get(user.pk) or new_profiles.get(user.pk)
+        if not profile:
+            profile = Profile(
+                user=user,
+                guid=str(uuid.uuid1()),
+                creator=user,
+                owner=user,
+                owner_username = user.username,
+            )
+            new_profiles[user.pk] = profile
+        update_profile(profile, user, m)
+
+    for profile in profiles.values():
+        profile.save()
+    for profile in new_profiles.values():
+        profile.allow_anonymous_view = not profile.hide_in_search
+    bulk_insert(Profile, new_profiles.values())
+    if new_profiles:
+        add_unindexed_items(Profile, Profile.objects.filter(
+            user__in=new_profiles.keys()).values_list('pk', flat=True))
+
+    # corporate memberships: name -> (pk, membership type)
+    corp_membs = dict([(name, (pk, membership_types_by_pk.get(membership_type_id)))
+        for name, pk, membership_type_id in CorporateMembership.objects.filter(
+            name__in=[m['corpmembershipname'] for m in mems if m.get('corpmembershipname')]
+        ).values_list('name', 'pk', 'corporate_membership_type__membership_type')])
+
+    # member numbers: one per entry, as AppEntry.objects.count() + 1000
+    # right after the entry of the row is added
+    next_number = AppEntry.objects.count() + 1000
+
+    # memberships
+    # relation does not hold unique constraints
+    # so we assume the first hit is the correct membership
+    # if it exists.
+    memberships = {}
+    for membership in Membership.objects.filter(user__in=user_pks,
+        membership_type__in=membership_types_by_pk.keys()).order_by('pk'):
+        memberships.setdefault((membership.user_id, membership.membership_type_id), membership)
+
+    new_memberships = []
+    updated_memberships = {}
+    row_memberships = []
+    for m, user in zip(mems, row_users):
+        next_number += 1
+        # get membership type.
+        # this should not throw DNE errors
+        # otherwise it should have been marked skipped.
+        membership_type = membership_types[m['membershiptype']]
+        membership = memberships.get((user.pk, membership_type.pk))
+        changed = False
+        if not membership:
+            membership = Membership()
+            membership.guid = str(uuid.uuid1())
+            membership.ma = app
+            membership.user = user
+            membership.membership_type = membership_type
+            membership.member_number = m.get('membernumber') or 0
+            membership.owner = user
+            membership.owner_username = user.username
+            membership.creator = user
+            membership.creator_username = user.username
+            membership.subscribe_dt = m['subscribedt']
+            membership.payment_method_id = get_payment_method_id(m)
+            membership.renewal = m.get('renewal')
+            membership.status = m.get('status') or True
+            membership.status_detail = m.get('statusdetail') or 'Active'
+            membership.expire_dt = m['expiredt']
+            memberships[(user.pk, membership_type.pk)] = membership
+            new_memberships.append(membership)
+
+        # bind corporate membership with membership if it exists
+        corp_memb = corp_membs.get(m.get('corpmembershipname'))
+        if corp_memb:
+            membership.corporate_membership_id, membership.membership_type = corp_memb
+            changed = True
+
+        # update membership number
+        if not membership.member_number:
+            membership.member_number = next_number
+            changed = True
+
+        if membership.pk and changed:
+            updated_memberships[membership.pk] = membership
+        row_memberships.append(membership)
+
+    bulk_insert(Membership, new_memberships)
+    guids = dict(Membership.objects.filter(user__in=user_pks,
+        guid__in=[membership.guid for membership in new_memberships]).values_list('guid', 'pk'))
+    for membership in new_memberships:
+        membership.id = guids[membership.guid]
+    add_unindexed_items(Membership, guids.values())
+    for membership in updated_memberships.values():
+        membership.save()
+
+    # entries
+    entries = []
+    for membership in row_memberships:
+        entries.append(AppEntry(
+            app = app,
+            user_id = membership.user_id,
+            entry_time = datetime.now(),
+            membership = membership,
+            hash = md5_constructor(str(uuid.uuid1())).hexdigest(),
+            is_renewal = membership.renewal,
+            is_approved = True,
+            decision_dt = membership.subscribe_dt,
+            judge_id = membership.creator_id,
+            creator_id=membership.creator_id,
+            creator_username=membership.creator_username,
+            owner_id=membership.owner_id,
+            owner_username=membership.owner_username,
+            allow_anonymous_view=False,
+        ))
+    bulk_insert(AppEntry, entries)
+    hashes = dict(AppEntry.objects.filter(
+        membership__in=[membership.pk for membership in row_memberships],
+        hash__in=[entry.hash for entry in entries]).values_list('hash', 'pk'))
+    for entry in entries:
+        entry.id = hashes[entry.hash]
+    add_unindexed_items(AppEntry, hashes.values())
+
+    # entry fields
+    field_entries = []
+    for m, entry in zip(mems, entries):
+        for key in fields.keys():
+            if key in app_fields and m.get(key):
+                try:
+                    value = unicode(m.get(unicode(key)))
+                except (UnicodeDecodeError) as e:
+                    value = ''
+                field_entries.append(AppFieldEntry(
+                    entry=entry,
+                    field=app_fields[key],
+                    value=value,
+                ))
+    bulk_insert(AppFieldEntry, field_entries)
+
+    # add users to the groups of their membership types
+    members = set()
+    for membership in row_memberships:
+        group_id = membership_types_by_pk[membership.membership_type_id].group_id
+        if group_id:
+            members.add((group_id, membership.user_id))
+    members.difference_update(GroupMembership.objects.filter(
+        group__in=list(set([group_id for group_id, user_id in members])), member__in=user_pks
+        ).values_list('group', 'member'))
+    usernames = dict([(user.pk, user.username) for user in row_users])
+    bulk_insert(GroupMembership, [GroupMembership(
+        group_id=group_id,
+        member_id=user_id,
+        creator_id=user_id,
+        creator_username=usernames[user_id],
+        owner_id=user_id,
+        owner_username=usernames[user_id],
+        status=True,
+        status_detail='active',
+    ) for group_id, user_id in members])
+
+    return len(mems)
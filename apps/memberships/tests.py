@@ -0,0 +1,207 @@
+import os
+import csv
+import tempfile
+from datetime import datetime
+
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+
+from perms.tests import count_queries
+from profiles.models import Profile
+from user_groups.models import Group, GroupMembership
+from memberships.models import App, AppField, AppEntry, AppFieldEntry, \
+    Membership, MembershipType
+from memberships.utils import iter_membership_entry_items, membership_export_rows
+from memberships.importer.utils import parse_mems_from_csv, import_memberships, \
+    get_users, find_user
+
+
+class MembershipExportTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('admin', 'admin@example.com', 'google')
+        self.owner = {
+            'creator': self.user,
+            'creator_username': self.user.username,
+            'owner': self.user,
+            'owner_username': self.user.username,
+        }
+
+        group = Group(name='Members', **self.owner)
+        group.save()
+        self.membership_type = MembershipType(name='Regular', group=group, **self.owner)
+        self.membership_type.save()
+
+        self.app = App(name='Join', slug='join', confirmation_text='', **self.owner)
+        self.app.save()
+        AppField(app=self.app, label='First Name', field_type='first-name', position=0).save()
+        self.company = AppField(app=self.app, label='Company Name', field_type='text', position=1)
+        self.company.save()
+
+    def add_membership(self, i):
+        user = User.objects.create_user('member%s' % i, 'member%s@example.com' % i, 'google')
+        user.first_name = 'First%s' % i
+        user.save()
+
+        membership = Membership(member_number=str(i), membership_type=self.membership_type,
+            user=user, subscribe_dt=datetime.now(), ma=self.app, **self.owner)
+        membership.save()
+
+        # only the approved entry counts
+        for is_approved, company in ((False, 'Declined %s'), (True, 'Company %s')):
+            entry = AppEntry(app=self.app, user=user, membership=membership,
+                entry_time=datetime.now(), is_approved=is_approved,
+                decision_dt=datetime.now(), **self.owner)
+            entry.save()
+            AppFieldEntry(entry=entry, field=self.company, value=company % i).save()
+        return membership
+
+    def export(self):
+        titles, rows = membership_export_rows(self.app.pk)
+        return titles, list(rows)
+
+    def test_entry_items(self):
+        memberships = [self.add_membership(i) for i in range(3)]
+        # a membership without an entry
+        Membership(member_number='none', membership_type=self.membership_type,
+            user=self.user, subscribe_dt=datetime.now(), ma=self.app, **self.owner).save()
+
+        loaded = list(iter_membership_entry_items(self.app))
+        self.assertEquals(len(loaded), 4)
+        for membership, items in loaded:
+            self.assertEquals(items, membership.entry_items)
+        self.assertEquals(loaded[0][1], {'company_name': 'Company 0'})
+        self.assertEquals(loaded[0][0].pk, memberships[0].pk)
+
+    def test_export_rows(self):
+        self.add_membership(1)
+
+        titles, rows = self.export()
+        self.assertEquals(titles[:3], ['First Name', 'Company Name', 'User Name'])
+        self.assertEquals(rows[0][:4], ['First1', 'Company 1', 'member1', '1'])
+
+    def test_export_query_count_is_constant(self):
+        """
+        Benchmark: the number of queries made by the export does not
+        grow with the number of memberships
+        """
+        counts = []
+        for start, end in ((0, 2), (2, 12)):
+            for i in range(start, end):
+                self.add_membership(i)
+            counts.append(count_queries(self.export))
+
+        self.assertEquals(len(self.export()[1]), 12)
+        self.assertEquals(counts[0], counts[1])
+
+
+class MembershipImportTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('admin', 'admin@example.com', 'google')
+        self.owner = {
+            'creator': self.user,
+            'creator_username': self.user.username,
+            'owner': self.user,
+            'owner_username': self.user.username,
+        }
+
+        self.group = Group(name='Members', **self.owner)
+        self.group.save()
+        self.membership_type = MembershipType(name='Regular', group=self.group, **self.owner)
+        self.membership_type.save()
+
+        self.app = App(name='Join', slug='join', confirmation_text='', **self.owner)
+        self.app.save()
+        self.company = AppField(app=self.app, label='Company Name', field_name='companyname',
+            field_type='text', position=0)
+        self.company.save()
+
+        self.mapping = {
+            'username': 'username',
+            'membershiptype': 'membershiptype',
+            'membernumber': 'membernumber',
+            'firstname': 'firstname',
+            'email': 'email',
+            'companyname': 'companyname',
+            'joindate': '',
+        }
+
+    def write_csv(self, rows):
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        f = os.fdopen(fd, 'w')
+        writer = csv.writer(f)
+        writer.writerow(['User Name', 'Membership Type', 'Member Number',
+            'First Name', 'Email', 'Company Name'])
+        writer.writerows(rows)
+        f.close()
+        return path
+
+    def run_import(self, rows):
+        path = self.write_csv(rows)
+        try:
+            mems, stats = parse_mems_from_csv(path, self.mapping)
+            import_memberships(self.app, mems, self.mapping)
+        finally:
+            os.remove(path)
+        return stats
+
+    def test_import(self):
+        member = User.objects.create_user('member', 'member@example.com', 'google')
+        Membership(member_number='1', membership_type=self.membership_type,
+            user=member, subscribe_dt=datetime.now(), ma=self.app, **self.owner).save()
+
+        stats = self.run_import([
+            # already a member
+            ('member', 'Regular', '', 'Member', 'member@example.com', 'Acme'),
+            # no such membership type
+            ('nobody', 'Gold', '', 'Nobody', 'nobody@example.com', ''),
+            ('jane', 'Regular', '77', 'Jane', 'jane@example.com', 'Initech'),
+            ('john doe', 'Regular', '', 'John', 'john@example.com', ''),
+        ])
+        self.assertEquals(stats, {'all': 4, 'skipped': 2, 'added': 2})
+
+        jane = User.objects.get(username='jane')
+        john = User.objects.get(username='johndoe')
+        self.assertEquals((jane.first_name, jane.email), ('Jane', 'jane@example.com'))
+        self.assertEquals(Profile.objects.get(user=john).email, 'john@example.com')
+        self.assertFalse(User.objects.filter(username='nobody').exists())
+
+        # the member numbers not in the file follow the entries
+        self.assertEquals(Membership.objects.get(user=jane).member_number, '77')
+        john_membership = Membership.objects.get(user=john)
+        self.assertEquals(john_membership.member_number, str(AppEntry.objects.count() + 1000))
+
+        entry = AppEntry.objects.get(membership__user=jane)
+        self.assertTrue(entry.is_approved)
+        self.assertEquals(list(entry.fields.values_list('field', 'value')),
+            [(self.company.pk, 'Initech')])
+        self.assertFalse(AppFieldEntry.objects.filter(entry__membership=john_membership).exists())
+
+        self.assertEquals(set(GroupMembership.objects.filter(group=self.group
+            ).values_list('member', flat=True)), set([jane.pk, john.pk]))
+
+    def test_find_user_ignores_case(self):
+        jane = User.objects.create_user('Jane.Doe', 'jane@example.com', 'google')
+        users = get_users(['Jane.Doe'])
+        self.assertEquals(find_user(users, 'jane.doe'), jane)
+        self.assertEquals(find_user(users, 'JANE DOE'), None)
+        self.assertEquals(find_user(users, 'JANE.DOE '), jane)
+
+    def test_import_query_count_is_constant(self):
+        """
+        Benchmark: the number of queries made by the import does not
+        grow with the number of rows
+        """
+        # content types are cached after their first lookup
+        for model in (Profile, Membership, AppEntry):
+            ContentType.objects.get_for_model(model)
+
+        counts = []
+        for start, end in ((0, 2), (2, 12)):
+            rows = [('member%s' % i, 'Regular', '', 'First%s' % i,
+                'member%s@example.com' % i, 'Company %s' % i) for i in range(start, end)]
+            counts.append(count_queries(self.run_import, rows))
+
+        self.assertEquals(Membership.objects.count(), 12)
+        self.assertEquals(AppFieldEntry.objects.count(), 12)
+        self.assertEquals(counts[0], counts[1])
@@ -12,7 +12,7 @@ from django.template.defaultfilters import slugify
 from django.db.models import Q
 
 from perms.utils import has_perm, is_admin
-from memberships.models import App, AppField, Membership, MembershipType
+from memberships.models import App, AppField, AppFieldEntry, Membership, MembershipType
 from corporate_memberships.models import CorporateMembership
 
 
@@ -374,3 +374,105 @@ def get_notice_token_help_text(notice=None):
     
     
 
+
+
+def membership_export_rows(app_id):
+    """
+    The titles and the rows of the export of the memberships of an app
+    """
+    app = App.objects.get(pk=app_id)
+    exclude_params = (
+        'horizontal-rule',
+        'header',
+    )
+    fields = list(AppField.objects.filter(app=app, exportable=True).exclude(
+        field_type__in=exclude_params).order_by('position'))
+
+    label_list = [field.label for field in fields]
+    label_list.extend(['User Name','Member Number','Join Date','Renew Date','Expiration Date','Status','Status Detail'])
+
+    return label_list, _membership_export_rows(app, fields)
+
+
+def iter_membership_entry_items(app):
+    """
+    Yields (membership, entry items) for the memberships of an app, with
+    the items of their approved entry as Membership.entry_items has them.
+    The memberships come with their user, type and payment method, and
+    the items of all the entries are read in the same pass, so the
+    number of queries does not grow with the number of memberships.
+    """
+    memberships = Membership.objects.filter(ma=app).select_related(
+        'user', 'membership_type', 'payment_method').order_by('pk')
+
+    # the values of the approved entries, grouped by membership and
+    # in the order Membership.get_entry() picks the entry
+    values = AppFieldEntry.objects.filter(entry__membership__ma=app,
+        entry__is_approved=True).order_by('entry__membership', 'entry__decision_dt',
+        'entry').values_list('entry__membership', 'entry', 'field__label', 'value')
+    values = values.iterator()
+
+    keys = {}
+    row = next(values, None)
+    for memb in memberships.iterator():
+        while row and row[0] < memb.pk:
+            row = next(values, None)
+
+        items = {}
+        entry_id = row and row[0] == memb.pk and row[1]
+        while row and row[0] == memb.pk:
+            membership_id, row_entry_id, label, value = row
+            if row_entry_id == entry_id:
+                if label not in keys:
+                    keys[label] = slugify(label).replace('-','_')
+                items[keys[label]] = value
+            row = next(values, None)
+
+        yield memb, items
+
+
+def _membership_export_rows(app, fields):
+    extra_field_names = ['user','member_number','join_dt','renew_dt','expire_dt','status','status_detail']
+
+    for memb, field_entry_d in iter_membership_entry_items(app):
+        data_row = []
+        for field in fields:
+            field_name = slugify(field.label).replace('-','_')
+            value = ''
+
+            if field.field_type == 'first-name':
+                value = memb.user.first_name
+            elif field.field_type == 'last-name':
+                value = memb.user.last_name
+            elif field.field_type == 'email':
+                value = memb.user.email
+            elif field.field_type == 'membership-type':
+                value = memb.membership_type.name
+            elif field.field_type == 'payment-method':
+                if memb.payment_method:
+                    value = memb.payment_method.human_name
+            elif field.field_type == 'corporate_membership_id':
+                value = memb.corporate_membership_id
+
+            if field_entry_d.has_key(field_name):
+                value = field_entry_d[field_name]
+
+            data_row.append(value)
+
+        for field in extra_field_names:
+            if field == 'user':
+                value = memb.user.username
+            elif field == 'join_dt':
+                if memb.renewal: value = ''
+                else: value = memb.subscribe_dt
+            elif field == 'renew_dt':
+                if memb.renewal: value = memb.subscribe_dt
+                else: value = ''
+            elif field == 'expire_dt':
+                value = memb.expire_dt or 'never expire'
+            else:
+                value = getattr(memb, field, '')
+
+            data_row.append(value)
+
+        yield data_row
@@ -34,7 +34,7 @@ class Command(BaseCommand):
         metric = Metric()
         metric.users = len(self.users)
         metric.members = len(self.members)
-        metric.visits = len(self.get_visits())
+        metric.visits = self.get_visits()
         metric.disk_usage = self.get_site_size()
 
         if verbosity >= 2:
@@ -63,23 +63,18 @@ class Command(BaseCommand):
 
     def get_visits(self):
         """
-        Get all visits that are not bots from event_logs
+        Count the visits that are not bots from the event log rollups
 
-        1. Filter the visits by this month only
-        2. Filter the visits by non-bots
+        1. Count the visits of yesterday only
+        2. Count the visits of non-bots
         """
-        from event_logs.models import EventLog
+        from event_logs.rollups import count_events
         today = date.today()
         
         # if the script runs today, we collect the data from yesterday
         yesterday = today - timedelta(days=1)
 
-        filters = {
-            'robot__exact': None,
-            'create_dt__range': (yesterday, today)
-        }
-
-        return EventLog.objects.filter(**filters)
+        return count_events(yesterday, yesterday, is_robot=False)
 
     def get_site_size(self):
         """
@@ -3,7 +3,8 @@ from django.contrib.auth.models import User, Permission
 from django.db.models.base import Model
 
 from perms.object_perms import ObjectPermission
-from perms.utils import is_member, can_view
+from perms.utils import is_member, is_bound_user
+from perms.cache import get_object_perms
 
 
 class ObjectPermBackend(object):
@@ -67,39 +68,35 @@ class ObjectPermBackend(object):
         return user_obj._perm_cache
 
     def get_group_object_permissions(self, user_obj, obj):
-        app_label = obj._meta.app_label
-        user_obj_attr = '_%s_%d_group_object_perm_cache' % (
-            app_label,
-            obj.pk
-        )
-        if not hasattr(user_obj, user_obj_attr):
-            content_type = ContentType.objects.get_for_model(obj)
-            filters = {
-               'group__members': user_obj,
-               'content_type': content_type,
-               'object_id': obj.pk
-            }
-            group_object_perms = ObjectPermission.objects.filter(**filters)
-            user_obj._group_object_perm_cache = set([u"%s.%s.%s" % (p.object_id, p.content_type.app_label, p.codename) for p in group_object_perms])
-        return user_obj._group_object_perm_cache
+        """
+        Returns a set of "object_id.app_label.codename" strings that
+        this user has on obj through his/her groups.
+        """
+        content_type = ContentType.objects.get_for_model(obj)
+        group_object_perms = ObjectPermission.objects.filter(
+            group__members=user_obj,
+            content_type=content_type,
+            object_id=obj.pk).values_list('codename', flat=True)
+        return set([u"%s.%s.%s" % (obj.pk, content_type.app_label, codename)
+                    for codename in group_object_perms])
 
     def get_all_object_permissions(self, user_obj, obj):
-        app_label = obj._meta.app_label
-        user_obj_attr = '_%s_%d_object_perm_cache' % (
-            app_label,
-            obj.pk
-        )
-        if not hasattr(user_obj, user_obj_attr):
-            content_type = ContentType.objects.get_for_model(obj)
-            filters = {
-                'content_type': content_type,
-                'object_id': obj.pk,
-                'user': user_obj
-            }
-            perms = ObjectPermission.objects.filter(**filters)
-            user_obj._object_perm_cache = set([u"%s.%s.%s" % (p.object_id, p.content_type.app_label, p.codename) for p in perms])
-            user_obj._object_perm_cache.update(self.get_group_object_permissions(user_obj, obj))
-        return user_obj._object_perm_cache
+        """
+        Returns a set of "object_id.app_label.codename" strings that
+        this user has on obj, directly or through his/her groups.
+        Served from the permission cache, see perms.cache.
+        """
+        content_type = ContentType.objects.get_for_model(obj)
+        codenames = get_object_perms(user_obj, content_type.pk, [obj.pk])[obj.pk]
+        return set([u"%s.%s.%s" % (obj.pk, content_type.app_label, codename)
+                    for codename in codenames])
+
+    def has_object_perm(self, user_obj, codename, obj):
+        """
+        Checks a single codename against the cached object permissions
+        """
+        content_type = ContentType.objects.get_for_model(obj)
+        return codename in get_object_perms(user_obj, content_type.pk, [obj.pk])[obj.pk]
 
     def has_perm(self, user, perm, obj=None):
         # check codename, return false if its a malformed codename
@@ -153,22 +150,17 @@ class ObjectPermBackend(object):
         if not isinstance(obj, Model):
             return False
 
-        # lets check the search index for view permissions
-        # before we ever hit the database, faster
-        if 'view' in perm:
-            try:  # test for an index and make the query
-                from haystack import site
-                index = site.get_index(obj.__class__)
-                if can_view(user, obj):
-                    return True
-            except:
-                pass
-
-        # check the permissions on the object level of groups or user
-        perm = '%s.%s' % (obj.pk, perm)
-        if perm in self.get_all_object_permissions(user, obj):
+        # the search index also lets the user bound to some records
+        # view them, the registrant of a registration for one
+        if perm_type == 'view' and is_bound_user(user, obj):
             return True
 
+        # check the permissions on the object level of groups or user.
+        # the users_can_view and groups_can_view fields of the search
+        # index are otherwise built from the same rows, so there is
+        # no need to ask the search engine.
+        return self.has_object_perm(user, codename, obj)
+
     def has_module_perms(self, user_obj, app_label):
         """
         Returns True if user_obj has any permissions in the given app_label.
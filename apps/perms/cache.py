@@ -0,0 +1,150 @@
+from django.core.cache import cache
+from django.conf import settings
+from django.db.models import Q
+
+PERM_PRE_KEY = "perms"
+
+# how long a cached permission decision lives. Stale entries are
+# never read anyway, the version stamps take care of invalidation.
+PERM_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _key(*parts):
+    keys = [settings.CACHE_PRE_KEY, PERM_PRE_KEY] + [str(p) for p in parts]
+    return '.'.join(keys)
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        version = 1
+        cache.add(key, version)
+    return version
+
+
+def _bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 2)
+
+
+def get_content_type_version(content_type_id):
+    """
+    Version stamp of the object permissions on a content type
+    """
+    return _get_version(_key('version', 'ct', content_type_id))
+
+
+def bump_content_type_version(content_type_id):
+    """
+    Invalidates every cached object permission on a content type.
+    Called whenever ObjectPermission rows are added or removed.
+    """
+    _bump_version(_key('version', 'ct', content_type_id))
+
+
+def get_user_version(user_id):
+    """
+    Version stamp of a user's group memberships
+    """
+    return _get_version(_key('version', 'user', user_id))
+
+
+def bump_user_version(user_id):
+    """
+    Invalidates every cached object permission of a user.
+    Called whenever the user joins or leaves a group.
+    """
+    _bump_version(_key('version', 'user', user_id))
+
+
+def _versions(user_obj, content_type_id):
+    """
+    Read the version stamps once per request; they are kept
+    on the user object which only lives as long as the request.
+    """
+    if not hasattr(user_obj, '_perm_versions'):
+        user_obj._perm_versions = {'user': get_user_version(user_obj.pk)}
+    versions = user_obj._perm_versions
+    if content_type_id not in versions:
+        versions[content_type_id] = get_content_type_version(content_type_id)
+    return versions['user'], versions[content_type_id]
+
+
+def _object_key(user_obj, content_type_id, object_id):
+    user_version, ct_version = _versions(user_obj, content_type_id)
+    return _key(user_obj.pk, user_version, content_type_id, ct_version, object_id)
+
+
+def _request_cache(user_obj):
+    if not hasattr(user_obj, '_object_perm_cache'):
+        user_obj._object_perm_cache = {}
+    return user_obj._object_perm_cache
+
+
+def get_object_perms(user_obj, content_type_id, object_ids):
+    """
+    Returns a dict of object_id: set of codenames the user holds on
+    each object, either directly or through one of their groups.
+
+    Looks in the per-request cache on the user object first, then in
+    the cross-request cache, and fetches whatever is left with a
+    single query.
+    """
+    from perms.object_perms import ObjectPermission
+
+    local = _request_cache(user_obj)
+    perms = {}
+    missing = []
+    for object_id in object_ids:
+        if (content_type_id, object_id) in local:
+            perms[object_id] = local[(content_type_id, object_id)]
+        else:
+            missing.append(object_id)
+
+    if missing:
+        keys = dict([(_object_key(user_obj, content_type_id, object_id), object_id)
+                     for object_id in missing])
+        cached = cache.get_many(keys.keys())
+        for key, codenames in cached.items():
+            perms[keys[key]] = codenames
+        missing = [object_id for key, object_id in keys.items() if key not in cached]
+
+    if missing:
+        fetched = dict([(object_id, set()) for object_id in missing])
+        rows = ObjectPermission.objects.filter(
+            Q(user=user_obj) | Q(group__members=user_obj),
+            content_type=content_type_id,
+            object_id__in=missing,
+        ).values_list('object_id', 'codename')
+        for object_id, codename in rows:
+            fetched[object_id].add(codename)
+
+        cache.set_many(dict([(_object_key(user_obj, content_type_id, object_id), codenames)
+                             for object_id, codenames in fetched.items()]),
+                       PERM_CACHE_TIMEOUT)
+        perms.update(fetched)
+
+    for object_id, codenames in perms.items():
+        local[(content_type_id, object_id)] = codenames
+    return perms
+
+
+def prefetch_object_perms(user_obj, objects):
+    """
+    Loads the object permissions of the user for a list of objects,
+    one query per model at most. Use on list pages before calling
+    has_perm for each row.
+    """
+    from django.contrib.contenttypes.models import ContentType
+
+    if not user_obj or user_obj.is_anonymous():
+        return
+
+    by_model = {}
+    for obj in objects:
+        by_model.setdefault(obj.__class__, []).append(obj.pk)
+    for model, object_ids in by_model.items():
+        content_type = ContentType.objects.get_for_model(model)
+        get_object_perms(user_obj, content_type.pk, object_ids)
@@ -1,6 +1,8 @@
 import operator
+from datetime import datetime
 
-from django.db import models
+from django.db import models, connections, router, transaction
+from django.db.models import Q
 from django.db.models.query import QuerySet
 from django.contrib.auth.models import Permission
 from django.contrib.contenttypes.models import ContentType
@@ -9,6 +11,8 @@ from django.contrib.auth.models import User, AnonymousUser
 from haystack.query import SearchQuerySet
 from haystack.backends import SQ
 
+from perms.cache import bump_content_type_version
+
 
 class ObjectPermissionManager(models.Manager):
     def users_with_perms(self, perm, instance):
@@ -86,7 +90,7 @@ class ObjectPermissionManager(models.Manager):
         -- group_or_groups: can be a single group object, list, queryset
         or tuple. Although tuples may work differently:
         You can pass permissions individual permissions along with the tuple
-        like so: ((instance,'view',),(instance,'change',))
+        like so: ((group,'view',),(group,'change',))
 
         -- object: is the instance of a model class
 
@@ -94,106 +98,34 @@ class ObjectPermissionManager(models.Manager):
            leave blank for all permissions.
            Note: If you are using the tuple/perm approach this does nothing.
         """
-        multi_group = False
-        group_with_perms = False
-
         # nobody to give permissions too
         if not group_or_groups:
             return
         # check perms
         if not isinstance(perms, list):
             perms = None
-        # check for multi_groups
-        if isinstance(group_or_groups, list):
-            multi_group = True
-        if isinstance(group_or_groups, QuerySet):
-            multi_group = True
-        if isinstance(group_or_groups, tuple):
-            multi_group = True
-            if len(group_or_groups[0]) == 2:
-                group_with_perms = True
+
+        groups = _as_list(group_or_groups)
 
         # treat the tuples differently. They are passed in as
         # ((group,perm,),(group,perm,) ..... (group,perm.))
-        if group_with_perms:
-            from user_groups.models import Group
-            for group, perm in group_or_groups:
-                if isinstance(group, unicode):
-                    if group.isdigit():
-                        try:
-                            group = Group.objects.get(pk=group)
-                        except:
-                            group = None
-
-                codename = '%s_%s' % (perm, object._meta.object_name.lower())
-                content_type = ContentType.objects.get_for_model(object)
-
-                perm = Permission.objects.get(codename=codename,
-                                              content_type=content_type)
-
-                defaults = {
-                    "codename": codename,
-                    "object_id": object.pk,
-                    "content_type": perm.content_type,
-                    "group": group,
-                }
-                self.get_or_create(**defaults)
+        if _is_pair(groups[0]):
+            content_type = ContentType.objects.get_for_model(object)
+            model_name = object._meta.object_name.lower()
+            rows = []
+            for group, perm in groups:
+                group_id = _pk_or_none(group)
+                if group_id is None:
+                    continue
+                # accept either 'view' or a full codename like 'view_photoset'
+                codename = '%s_%s' % (perm.split('_')[0], model_name)
+                rows.append((content_type.pk, object.pk, codename, None, group_id))
+
+            self._validate_codenames(content_type, set([r[2] for r in rows]))
+            self._grant_rows(rows)
             return  # get out
 
-        if multi_group:
-            for group in group_or_groups:
-                if perms:
-                    for perm in perms:
-                        codename = '%s_%s' % (perm, object._meta.object_name.lower())
-                        content_type = ContentType.objects.get_for_model(object)
-
-                        perm = Permission.objects.get(codename=codename,
-                                                      content_type=content_type)
-
-                        defaults = {
-                            "codename": codename,
-                            "object_id": object.pk,
-                            "content_type": perm.content_type,
-                            "group": group,
-                        }
-                        self.get_or_create(**defaults)
-                else:  # all default permissions
-                    content_type = ContentType.objects.get_for_model(object)
-                    perms = Permission.objects.filter(content_type=content_type)
-                    for perm in perms:
-                        defaults = {
-                            "codename": perm.codename,
-                            "object_id": object.pk,
-                            "content_type": content_type,
-                            "group": group,
-                        }
-                        self.get_or_create(**defaults)
-        else:  # not multi_group
-            if perms:
-                for perm in perms:
-                    codename = '%s_%s' % (perm, object._meta.object_name.lower())
-                    content_type = ContentType.objects.get_for_model(object)
-
-                    perm = Permission.objects.get(codename=codename,
-                                                  content_type=content_type)
-                    defaults = {
-                        "codename": codename,
-                        "object_id": object.pk,
-                        "content_type": perm.content_type,
-                        "group": group_or_groups,
-                    }
-                    self.get_or_create(**defaults)
-            else:  # all default permissions
-                content_type = ContentType.objects.get_for_model(object)
-                perms = Permission.objects.filter(content_type=content_type)
-                for perm in perms:
-                    defaults = {
-                        "codename": perm.codename,
-                        "object_id": object.pk,
-                        "content_type": content_type,
-                        "group": group_or_groups,
-                    }
-                    self.get_or_create(**defaults)
+        self.grant([object], groups=groups, perms=perms)
 
     def assign(self, user_or_users, object, perms=None):
         """
@@ -208,101 +140,263 @@ class ObjectPermissionManager(models.Manager):
         -- perms: a list of individual permissions to assign to each user
            leave blank for all permissions.
         """
-        multi_user = False
-
         # nobody to give permissions too
         if not user_or_users:
             return
         # check perms
         if not isinstance(perms, list):
             perms = None
-        # check for multi_users
-        if isinstance(user_or_users, list):
-            multi_user = True
-        if isinstance(user_or_users, QuerySet):
-            multi_user = True
-        if isinstance(user_or_users, tuple):
-            multi_user = True
-
-        if multi_user:
-            for user in user_or_users:
-                if perms:
-                    for perm in perms:
-                        codename = '%s_%s' % (perm, object._meta.object_name.lower())
-                        content_type = ContentType.objects.get_for_model(object)
-
-                        perm = Permission.objects.get(codename=codename,
-                                                      content_type=content_type)
-
-                        defaults = {
-                            "codename": codename,
-                            "object_id": object.pk,
-                            "content_type": perm.content_type,
-                            "user": user,
-                        }
-                        try:
-                            self.get_or_create(**defaults)
-                        except self.model.MultipleObjectsReturned as e:
-                            pass
-
-                else:  # all default permissions
-                    content_type = ContentType.objects.get_for_model(object)
-                    perms = Permission.objects.filter(content_type=content_type)
-                    for perm in perms:
-                        defaults = {
-                            "codename": perm.codename,
-                            "object_id": object.pk,
-                            "content_type": content_type,
-                            "user": user,
-                        }
-                        try:
-                            self.get_or_create(**defaults)
-                        except self.model.MultipleObjectsReturned as e:
-                            pass
-
-        else:  # not muli_user
+
+        self.grant([object], users=_as_list(user_or_users), perms=perms)
+
+    def grant(self, objects, groups=None, users=None, perms=None):
+        """
+        Set-based permission assignment.
+        grant(self, objects, groups=None, users=None, perms=None)
+
+        Gives every group in groups and every user in users
+        the perms on every object in objects, e.g.
+        ObjectPermission.objects.grant(articles, groups=groups, perms=['view'])
+
+        -- objects: model instances; may be of mixed models
+        -- groups, users: instances or primary keys
+        -- perms: a list of individual permissions ('view', 'change')
+           leave blank for all permissions of each model.
+
+        The number of queries does not depend on how many groups, users
+        or objects are passed: per content type there is one query to
+        resolve the codenames, one to diff against the existing rows
+        and one multi-row insert.
+        """
+        group_ids = [_pk_or_none(g) for g in _as_list(groups or [])]
+        group_ids = [pk for pk in group_ids if pk is not None]
+        user_ids = [_pk_or_none(u) for u in _as_list(users or [])]
+        user_ids = [pk for pk in user_ids if pk is not None]
+        if not group_ids and not user_ids:
+            return
+
+        rows = []
+        for model, instances in _by_model(objects).items():
+            content_type = ContentType.objects.get_for_model(model)
+            codenames = self._resolve_codenames(content_type, model, perms)
+            for instance in instances:
+                for codename in codenames:
+                    for group_id in group_ids:
+                        rows.append((content_type.pk, instance.pk, codename, None, group_id))
+                    for user_id in user_ids:
+                        rows.append((content_type.pk, instance.pk, codename, user_id, None))
+
+        self._grant_rows(rows)
+
+    def revoke(self, objects, groups=None, users=None, perms=None):
+        """
+        Set-based permission removal, the opposite of grant.
+        Leave groups and users blank to remove the perms for everybody,
+        leave perms blank to remove every permission.
+        One delete per content type.
+        """
+        group_ids = [_pk_or_none(g) for g in _as_list(groups or [])]
+        user_ids = [_pk_or_none(u) for u in _as_list(users or [])]
+
+        for model, instances in _by_model(objects).items():
+            content_type = ContentType.objects.get_for_model(model)
+            codenames = None
             if perms:
-                for perm in perms:
-                    codename = '%s_%s' % (perm, object._meta.object_name.lower())
-                    content_type = ContentType.objects.get_for_model(object)
-
-                    perm = Permission.objects.get(codename=codename,
-                                                  content_type=content_type)
-                    defaults = {
-                        "codename": codename,
-                        "object_id": object.pk,
-                        "content_type": perm.content_type,
-                        "user": user_or_users,
-                    }
-                    try:
-                        self.get_or_create(**defaults)
-                    except self.model.MultipleObjectsReturned as e:
-                        pass
-
-            else:  # all default permissions
-                content_type = ContentType.objects.get_for_model(object)
-                perms = Permission.objects.filter(content_type=content_type)
-                for perm in perms:
-                    defaults = {
-                        "codename": perm.codename,
-                        "object_id": object.pk,
-                        "content_type": content_type,
-                        "user": user_or_users,
-                    }
-                    try:
-                        self.get_or_create(**defaults)
-                    except self.model.MultipleObjectsReturned as e:
-                        pass
+                model_name = model._meta.object_name.lower()
+                codenames = ['%s_%s' % (perm, model_name) for perm in perms]
+            self._delete_rows(content_type, [i.pk for i in instances],
+                codenames=codenames,
+                group_ids=[pk for pk in group_ids if pk is not None],
+                user_ids=[pk for pk in user_ids if pk is not None])
 
     def remove_all(self, object):
         """
             Remove all permissions on object (instance)
+            or on a list of objects
+        """
+        self.revoke(_as_list(object))
+
+    # Private functions
+    def _resolve_codenames(self, content_type, model, perms):
+        """
+        Turn ['view', 'change'] into the codenames for model.
+        Leave perms blank for all of the permissions of the model.
+        """
+        if perms:
+            model_name = model._meta.object_name.lower()
+            codenames = set(['%s_%s' % (perm, model_name) for perm in perms])
+            self._validate_codenames(content_type, codenames)
+            return codenames
+
+        return set(Permission.objects.filter(
+            content_type=content_type).values_list('codename', flat=True))
+
+    def _validate_codenames(self, content_type, codenames):
+        """
+        Raise Permission.DoesNotExist if any of the codenames
+        is not a permission of the content type.
+        """
+        if not codenames:
+            return
+        found = set(Permission.objects.filter(
+            content_type=content_type,
+            codename__in=list(codenames)).values_list('codename', flat=True))
+        missing = set(codenames) - found
+        if missing:
+            raise Permission.DoesNotExist(
+                "Permission matching query does not exist: %s" % ', '.join(missing))
+
+    def _grant_rows(self, rows):
+        """
+        Insert the (content_type_id, object_id, codename, user_id, group_id)
+        rows that are not in the table yet.
         """
-        content_type = ContentType.objects.get_for_model(object)
-        perms = self.filter(content_type=content_type,
-                            object_id=object.pk)
-        for perm in perms:
-            perm.delete()
+        by_content_type = {}
+        for row in set(rows):
+            by_content_type.setdefault(row[0], []).append(row)
+
+        using = router.db_for_write(self.model)
+        new_rows = []
+        for content_type_id, ct_rows in by_content_type.items():
+            object_ids = list(set([r[1] for r in ct_rows]))
+            codenames = list(set([r[2] for r in ct_rows]))
+            user_ids = list(set([r[3] for r in ct_rows if r[3]]))
+            group_ids = list(set([r[4] for r in ct_rows if r[4]]))
+
+            holder_q = Q()
+            if user_ids:
+                holder_q = holder_q | Q(user__in=user_ids)
+            if group_ids:
+                holder_q = holder_q | Q(group__in=group_ids)
+
+            existing = set()
+            for chunk in _chunks(object_ids, _in_clause_size(using)):
+                existing.update(self.using(using).filter(holder_q,
+                    content_type=content_type_id,
+                    object_id__in=chunk,
+                    codename__in=codenames,
+                ).values_list('content_type', 'object_id', 'codename', 'user', 'group'))
+
+            new_rows.extend([r for r in ct_rows if r not in existing])
+
+        self._bulk_insert(new_rows, using)
+
+    def _bulk_insert(self, rows, using):
+        """
+        Multi-row INSERT of the object permission rows
+        """
+        if not rows:
+            return
+
+        connection = connections[using]
+        qn = connection.ops.quote_name
+        columns = ('content_type_id', 'object_id', 'codename',
+                   'user_id', 'group_id', 'create_dt')
+        create_dt = connection.ops.value_to_db_datetime(datetime.now())
+        placeholder = '(%s)' % ', '.join(['%s'] * len(columns))
+
+        cursor = connection.cursor()
+        for chunk in _chunks(rows, _in_clause_size(using) // len(columns)):
+            sql = 'INSERT INTO %s (%s) VALUES %s' % (
+                qn(self.model._meta.db_table),
+                ', '.join([qn(c) for c in columns]),
+                ', '.join([placeholder] * len(chunk)))
+            params = []
+            for row in chunk:
+                params.extend(row)
+                params.append(create_dt)
+            cursor.execute(sql, params)
+        transaction.commit_unless_managed(using=using)
+
+        for content_type_id in set([row[0] for row in rows]):
+            bump_content_type_version(content_type_id)
+
+    def _delete_rows(self, content_type, object_ids, codenames=None,
+                     group_ids=None, user_ids=None):
+        """
+        Single DELETE of the object permission rows on object_ids
+        """
+        if not object_ids:
+            return
+
+        using = router.db_for_write(self.model)
+        connection = connections[using]
+        qn = connection.ops.quote_name
+
+        for chunk in _chunks(object_ids, _in_clause_size(using)):
+            where = ['%s = %%s' % qn('content_type_id'),
+                     '%s IN (%s)' % (qn('object_id'), ', '.join(['%s'] * len(chunk)))]
+            params = [content_type.pk] + list(chunk)
+            if codenames:
+                where.append('%s IN (%s)' % (qn('codename'), ', '.join(['%s'] * len(codenames))))
+                params.extend(codenames)
+            holders = []
+            if group_ids:
+                holders.append('%s IN (%s)' % (qn('group_id'), ', '.join(['%s'] * len(group_ids))))
+                params.extend(group_ids)
+            if user_ids:
+                holders.append('%s IN (%s)' % (qn('user_id'), ', '.join(['%s'] * len(user_ids))))
+                params.extend(user_ids)
+            if holders:
+                where.append('(%s)' % ' OR '.join(holders))
+
+            sql = 'DELETE FROM %s WHERE %s' % (
+                qn(self.model._meta.db_table), ' AND '.join(where))
+            connection.cursor().execute(sql, params)
+        transaction.commit_unless_managed(using=using)
+
+        bump_content_type_version(content_type.pk)
+
+
+def _as_list(value):
+    """
+    Single instance, list, tuple or queryset to a list
+    """
+    if isinstance(value, (list, tuple, QuerySet)):
+        return list(value)
+    return [value]
+
+
+def _is_pair(value):
+    return isinstance(value, (list, tuple)) and len(value) == 2
+
+
+def _pk_or_none(value):
+    """
+    Instance or (unicode) primary key to a primary key
+    """
+    if hasattr(value, 'pk'):
+        return value.pk
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _by_model(objects):
+    """
+    Group a list of instances by their model class
+    """
+    models_dict = {}
+    for instance in _as_list(objects):
+        models_dict.setdefault(instance.__class__, []).append(instance)
+    return models_dict
+
+
+def _chunks(seq, size):
+    seq = list(seq)
+    for i in xrange(0, len(seq), size):
+        yield seq[i:i + size]
+
+
+def _in_clause_size(using):
+    """
+    The number of query parameters we are willing to send in one
+    statement. SQLite refuses more than 999 variables.
+    """
+    if 'sqlite' in connections[using].settings_dict['ENGINE']:
+        return 900
+    return 10000
 
 
 class TendenciBaseManager(models.Manager):
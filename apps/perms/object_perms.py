@@ -1,9 +1,11 @@
 from django.db import models
+from django.db.models.signals import post_save, post_delete
 from django.contrib.contenttypes import generic
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.auth.models import User
 from perms.managers import ObjectPermissionManager
-from user_groups.models import Group
+from perms.cache import bump_content_type_version, bump_user_version
+from user_groups.models import Group, GroupMembership
 
 
 class ObjectPermission(models.Model):
@@ -23,3 +25,18 @@ class ObjectPermission(models.Model):
     object = generic.GenericForeignKey('content_type', 'object_id')
 
     objects = ObjectPermissionManager()
+
+
+def post_change_object_permission(sender, instance=None, **kwargs):
+    if instance:
+        bump_content_type_version(instance.content_type_id)
+
+
+def post_change_group_membership(sender, instance=None, **kwargs):
+    if instance:
+        bump_user_version(instance.member_id)
+
+post_save.connect(post_change_object_permission, sender=ObjectPermission)
+post_delete.connect(post_change_object_permission, sender=ObjectPermission)
+post_save.connect(post_change_group_membership, sender=GroupMembership)
+post_delete.connect(post_change_group_membership, sender=GroupMembership)
@@ -1,4 +1,4 @@
-from django.template import Library, Node, Variable
+from django.template import Library, Node, Variable, TemplateSyntaxError
 from django.contrib.auth.models import User
 from perms import utils
 from perms.fields import groups_with_perms
@@ -66,6 +66,76 @@ def has_perm(parser, token):
     
     return HasPermNode(user, perm, object, context_var=context_var)
 
+class HasPermsBulkNode(Node):
+    def __init__(self, user, perm, objects, context_var):
+        self.user = Variable(user)
+        self.perm = perm
+        self.objects = Variable(objects)
+        self.context_var = context_var
+
+    def render(self, context):
+        user = self.user.resolve(context)
+        objects = self.objects.resolve(context)
+
+        permitted = set()
+        if isinstance(user, User):
+            # return everything for admins
+            if utils.is_admin(user):
+                permitted = set([o.pk for o in utils._result_objects(objects)
+                                 if o is not None])
+            else:
+                permitted = utils.has_perms_bulk(user, self.perm, objects)
+
+        context[self.context_var] = permitted
+        return ''
+
+@register.tag
+def has_perms_bulk(parser, token):
+    """
+        Checks a permission on a whole list at once, use it on list
+        pages instead of has_perm on every row.
+        The context variable is the set of permitted primary keys.
+
+        {% has_perms_bulk user perm objects as context %}
+        {% if object.pk in context %}
+    """
+    bits = token.split_contents()
+
+    if len(bits) != 6 or bits[4] != 'as':
+        raise TemplateSyntaxError("%r tag requires: user perm objects as context" % bits[0])
+
+    return HasPermsBulkNode(bits[1], bits[2], bits[3], bits[5])
+
+class FilterViewableNode(Node):
+    def __init__(self, user, objects, context_var):
+        self.user = Variable(user)
+        self.objects = Variable(objects)
+        self.context_var = context_var
+
+    def render(self, context):
+        user = self.user.resolve(context)
+        objects = self.objects.resolve(context)
+
+        if isinstance(user, User) and utils.is_admin(user):
+            context[self.context_var] = objects
+        else:
+            context[self.context_var] = utils.filter_viewable(user, objects)
+        return ''
+
+@register.tag
+def filter_viewable(parser, token):
+    """
+        Keeps the objects of a list the user can view
+
+        {% filter_viewable user objects as context %}
+    """
+    bits = token.split_contents()
+
+    if len(bits) != 5 or bits[3] != 'as':
+        raise TemplateSyntaxError("%r tag requires: user objects as context" % bits[0])
+
+    return FilterViewableNode(bits[1], bits[2], bits[4])
+
 class IsAdminNode(Node):
     def __init__(self, user, context_var):
         self.user = user
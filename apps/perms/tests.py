@@ -0,0 +1,215 @@
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+
+from haystack.models import SearchResult
+
+from perms.object_perms import ObjectPermission
+from perms.utils import is_member, has_perms_bulk, filter_viewable
+from perms.cache import (bump_content_type_version, bump_user_version,
+    prefetch_object_perms)
+from user_groups.models import Group
+
+
+def count_queries(func, *args, **kwargs):
+    """
+    Run func and return the number of queries it made
+    """
+    debug = settings.DEBUG
+    settings.DEBUG = True
+    connection.queries = []
+    try:
+        func(*args, **kwargs)
+        return len(connection.queries)
+    finally:
+        settings.DEBUG = debug
+
+
+class BulkObjectPermissionTest(TestCase):
+    def setUp(self):
+        self.user = User(username='admin')
+        self.user.set_password('google')
+        self.user.is_active = True
+        self.user.save()
+
+        # warm the content type cache so it does not skew the counts
+        ContentType.objects.get_for_model(Group)
+
+    def make_groups(self, prefix, count):
+        groups = []
+        for i in range(count):
+            group = Group(name='%s %s' % (prefix, i),
+                creator=self.user, creator_username=self.user.username,
+                owner=self.user, owner_username=self.user.username)
+            group.save()
+            groups.append(group)
+        return groups
+
+    def test_grant(self):
+        groups = self.make_groups('holder', 3)
+        objects = self.make_groups('object', 4)
+
+        ObjectPermission.objects.grant(objects, groups=groups, perms=['view'])
+        self.assertEquals(ObjectPermission.objects.filter(codename='view_group').count(), 12)
+
+        # granting again does not duplicate the rows
+        ObjectPermission.objects.grant(objects, groups=groups, perms=['view'])
+        self.assertEquals(ObjectPermission.objects.filter(codename='view_group').count(), 12)
+
+        ObjectPermission.objects.remove_all(objects)
+        self.assertEquals(ObjectPermission.objects.count(), 0)
+
+    def test_assign_group_pairs(self):
+        groups = self.make_groups('holder', 2)
+        obj = self.make_groups('object', 1)[0]
+        pairs = ((groups[0], 'view'), (groups[1].pk, 'change_group'))
+
+        ObjectPermission.objects.assign_group(pairs, obj)
+        codenames = ObjectPermission.objects.filter(
+            object_id=obj.pk).values_list('group', 'codename')
+        self.assertEquals(set(codenames),
+            set([(groups[0].pk, 'view_group'), (groups[1].pk, 'change_group')]))
+
+    def test_revoke(self):
+        groups = self.make_groups('holder', 2)
+        objects = self.make_groups('object', 2)
+
+        ObjectPermission.objects.grant(objects, groups=groups, users=[self.user])
+        ObjectPermission.objects.revoke(objects, groups=groups[:1], perms=['view'])
+
+        self.assertFalse(ObjectPermission.objects.filter(
+            group=groups[0], codename='view_group').exists())
+        self.assertTrue(ObjectPermission.objects.filter(
+            group=groups[1], codename='view_group').exists())
+        self.assertTrue(ObjectPermission.objects.filter(
+            user=self.user, codename='view_group').exists())
+
+    def test_grant_query_count_is_constant(self):
+        """
+        Benchmark: the number of queries made by grant does not grow
+        with the number of groups or objects
+        """
+        counts = []
+        for size in (2, 8):
+            groups = self.make_groups('holder %s' % size, size)
+            objects = self.make_groups('object %s' % size, size + 2)
+            counts.append(count_queries(ObjectPermission.objects.grant,
+                objects, groups=groups, perms=['view', 'change']))
+
+        self.assertEquals(counts[0], counts[1])
+
+        objects = list(Group.objects.all())
+        self.assertEquals(count_queries(ObjectPermission.objects.remove_all, objects), 1)
+
+
+class ObjectPermissionCacheTest(TestCase):
+    def setUp(self):
+        self.user = User(username='member')
+        self.user.set_password('google')
+        self.user.is_active = True
+        self.user.save()
+
+        self.groups = []
+        for i in range(10):
+            group = Group(name='cached %s' % i,
+                creator=self.user, creator_username=self.user.username,
+                owner=self.user, owner_username=self.user.username,
+                allow_anonymous_view=False)
+            group.save()
+            self.groups.append(group)
+
+        # start from fresh version stamps, the cache outlives the test database
+        content_type = ContentType.objects.get_for_model(Group)
+        bump_content_type_version(content_type.pk)
+        bump_user_version(self.user.pk)
+
+    def fresh_user(self):
+        return User.objects.get(pk=self.user.pk)
+
+    def test_has_perm_per_object(self):
+        self.groups[0].add_user(self.user)
+        ObjectPermission.objects.grant(self.groups[1:2], groups=self.groups[:1], perms=['view'])
+
+        user = self.fresh_user()
+        self.assertTrue(user.has_perm('user_groups.view_group', self.groups[1]))
+        # a second object must not reuse the answer of the first one
+        self.assertFalse(user.has_perm('user_groups.view_group', self.groups[2]))
+
+    def test_invalidation(self):
+        user = self.fresh_user()
+        self.assertFalse(user.has_perm('user_groups.view_group', self.groups[1]))
+
+        ObjectPermission.objects.grant(self.groups[1:2], users=[self.user], perms=['view'])
+        self.assertTrue(self.fresh_user().has_perm('user_groups.view_group', self.groups[1]))
+
+        ObjectPermission.objects.remove_all(self.groups[1])
+        self.assertFalse(self.fresh_user().has_perm('user_groups.view_group', self.groups[1]))
+
+        ObjectPermission.objects.grant(self.groups[1:2], groups=self.groups[:1], perms=['view'])
+        self.assertFalse(self.fresh_user().has_perm('user_groups.view_group', self.groups[1]))
+        self.groups[0].add_user(self.user)
+        self.assertTrue(self.fresh_user().has_perm('user_groups.view_group', self.groups[1]))
+
+    def test_list_query_count(self):
+        """
+        Benchmark: after a prefetch, checking every row of a list
+        costs no further permission queries
+        """
+        ObjectPermission.objects.grant(self.groups[::2], users=[self.user], perms=['view'])
+        user = self.fresh_user()
+        # load the model level permissions and membership status
+        user.has_perm('user_groups.view_group')
+        is_member(user)
+
+        def check_list():
+            prefetch_object_perms(user, self.groups)
+            for group in self.groups:
+                user.has_perm('user_groups.view_group', group)
+
+        self.assertEquals(count_queries(check_list), 1)
+        self.assertEquals(count_queries(check_list), 0)
+
+
+class HasPermsBulkTest(ObjectPermissionCacheTest):
+    def test_has_perms_bulk(self):
+        ObjectPermission.objects.grant(self.groups[:3], users=[self.user], perms=['view'])
+        public = self.groups[5]
+        public.allow_anonymous_view = True
+        public.save()
+
+        permitted = has_perms_bulk(self.fresh_user(), 'user_groups.view_group', self.groups)
+        self.assertEquals(permitted, set([g.pk for g in self.groups[:3]] + [public.pk]))
+
+        viewable = filter_viewable(self.fresh_user(), Group.objects.order_by('pk'))
+        self.assertEquals([g.pk for g in viewable], sorted(permitted))
+
+    def test_has_perms_bulk_query_count(self):
+        """
+        Benchmark: the number of queries does not grow with the list
+        """
+        ObjectPermission.objects.grant(self.groups, users=[self.user], perms=['view'])
+        counts = []
+        for size in (2, 10):
+            user = self.fresh_user()
+            is_member(user)
+            counts.append(count_queries(has_perms_bulk,
+                user, 'user_groups.view_group', self.groups[:size]))
+        self.assertEquals(counts[0], counts[1])
+
+    def test_search_results_query_count(self):
+        """
+        The objects of search results are loaded together
+        """
+        ObjectPermission.objects.grant(self.groups, users=[self.user], perms=['view'])
+        counts = []
+        for size in (2, 10):
+            user = self.fresh_user()
+            is_member(user)
+            results = [SearchResult('user_groups', 'group', str(group.pk), 1)
+                for group in self.groups[:size]]
+            counts.append(count_queries(filter_viewable, user, results))
+            self.assertEquals([r.object.pk for r in filter_viewable(user, results)],
+                [g.pk for g in self.groups[:size]])
+        self.assertEquals(counts[0], counts[1])
@@ -8,8 +8,7 @@ from django.db.models import Q
 from profiles.models import Profile
 from perms.object_perms import ObjectPermission
 
-from haystack.query import SearchQuerySet
-from haystack.backends import SQ
+from haystack.models import SearchResult
 
 
 PUBLIC_FILTER = {'status':True,'status_detail':"active",'allow_anonymous_view':True}
@@ -328,29 +327,184 @@ def _specific_view(user, obj):
     +
     (groups_can_view contains one of user's groups)
     """
-    sqs = SearchQuerySet()
-    sqs = sqs.models(obj.__class__)
+    from perms.cache import get_object_perms
 
-    groups = [g.pk for g in user.group_set.all()]
+    content_type = ContentType.objects.get_for_model(obj)
+    codename = 'view_%s' % obj._meta.object_name.lower()
+    codenames = get_object_perms(user, content_type.pk, [obj.pk])[obj.pk]
 
-    q_primary_key = SQ(primary_key=obj.pk)
-    q_groups = SQ(groups_can_view__in=groups)
-    q_users = SQ(users_can_view__in=[user.pk])
+    return codename in codenames
 
-    if groups:
-        sqs = sqs.filter(q_primary_key & (q_groups | q_users))
-    else:
-        sqs = sqs.filter(q_primary_key & q_users)
 
-    if sqs:
-        return True
+# the models whose search index lets the user bound to a record view
+# it, as events.search_indexes.RegistrantIndex.prepare_users_can_view
+BOUND_USER_VIEW_MODELS = ('events.registrant',)
 
-    return False
+
+def is_bound_user(user, obj):
+    """
+    Whether the object is a record of the user, like the registrant
+    of their registration, which they can view
+    """
+    label = '%s.%s' % (obj._meta.app_label, obj._meta.object_name.lower())
+    return label in BOUND_USER_VIEW_MODELS and \
+        getattr(obj, 'user_id', None) is not None and obj.user_id == user.pk
 
 
 def can_view(user, obj):
     """
     Checks for tendenci specific permissions to viewing objects
-    through the search index
     """
     return _specific_view(user, obj)
+
+
+def has_perms_bulk(user, perm, objects):
+    """
+        The vectorized version of has_perm for list pages.
+        Returns the set of primary keys of the objects the user
+        has perm on.
+
+        The allow_* bits are resolved in memory and the object
+        permissions of the user and their groups are fetched for
+        all of the objects in one query per model.
+    """
+    objects = [o for o in _result_objects(objects) if o is not None]
+    if not objects:
+        return set()
+
+    # check to see if there is impersonation
+    if hasattr(user, 'impersonated_user'):
+        if isinstance(user.impersonated_user, User):
+            return _has_perms_bulk(user, perm, objects) & \
+                _has_perms_bulk(user.impersonated_user, perm, objects)
+        return set()
+
+    return _has_perms_bulk(user, perm, objects)
+
+
+def _has_perms_bulk(user, perm, objects):
+    """
+    Mirrors django's User.has_perm and perms.backend.ObjectPermBackend.has_perm
+    """
+    from django.db.models.base import Model
+    from perms.backend import ObjectPermBackend
+    from perms.cache import get_object_perms
+
+    all_pks = set([obj.pk for obj in objects])
+
+    if user.is_authenticated():
+        if not user.is_active:
+            return set()
+        if user.is_superuser:
+            return all_pks
+
+    # check codename, return false if its a malformed codename
+    try:
+        perm_type = perm.split('.')[-1].split('_')[0]
+        codename = perm.split('.')[1]
+    except IndexError:
+        return set()
+
+    backend = ObjectPermBackend()
+    if perm in backend.get_all_permissions(user):
+        return all_pks
+
+    if perm_type == 'view':
+        bits = ('allow_anonymous_view', 'allow_user_view', 'allow_member_view')
+    elif perm_type == 'change':
+        bits = ('allow_anonymous_edit', 'allow_user_edit', 'allow_member_edit')
+    else:
+        bits = None
+
+    allowed = set()
+    remaining = {}
+    member = None
+    for obj in objects:
+        # they are non-admin, should not view any content with status=0
+        if hasattr(obj, "status") and obj.status == 0:
+            continue
+
+        if bits and all([hasattr(obj, bit) for bit in bits]):
+            anon_bit, user_bit, member_bit = [getattr(obj, bit) for bit in bits]
+            if anon_bit:
+                allowed.add(obj.pk)
+                continue
+            if user.is_authenticated() and user_bit:
+                allowed.add(obj.pk)
+                continue
+            if member_bit:
+                if member is None:
+                    member = is_member(user)
+                if member:
+                    allowed.add(obj.pk)
+                    continue
+
+        if not isinstance(obj, Model):
+            continue
+
+        if perm_type == 'view' and user.is_authenticated() and is_bound_user(user, obj):
+            allowed.add(obj.pk)
+            continue
+
+        remaining.setdefault(obj.__class__, []).append(obj.pk)
+
+    # no anonymous user currently
+    if not user.is_authenticated():
+        return allowed
+
+    for model, object_ids in remaining.items():
+        content_type = ContentType.objects.get_for_model(model)
+        object_perms = get_object_perms(user, content_type.pk, object_ids)
+        allowed.update([pk for pk in object_ids if codename in object_perms[pk]])
+
+    return allowed
+
+
+def filter_viewable(user, objects, perm=None):
+    """
+        Returns the list of objects (or queryset rows) the user can view,
+        keeping their order. perm defaults to app_label.view_modelname.
+    """
+    objects = list(objects)
+    results = [(o, instance) for o, instance
+        in zip(objects, _result_objects(objects)) if instance is not None]
+    if not results:
+        return []
+
+    if not perm:
+        obj = results[0][1]
+        perm = '%s.view_%s' % (obj._meta.app_label, obj._meta.object_name.lower())
+
+    permitted = has_perms_bulk(user, perm, [instance for o, instance in results])
+    return [o for o, instance in results if instance.pk in permitted]
+
+
+def _result_objects(objects):
+    """
+    Model instances behind a list of objects and search results, in
+    order, None where the object of a result is gone. The objects of
+    the search results are loaded with one query per model and kept
+    on the results.
+    """
+    objects = list(objects)
+
+    pks = {}
+    for obj in objects:
+        if isinstance(obj, SearchResult) and obj._object is None and obj.model:
+            pks.setdefault(obj.model, set()).add(obj.pk)
+
+    loaded = {}
+    for model, model_pks in pks.items():
+        # search results hold their pk as a string
+        for pk, instance in model._default_manager.in_bulk(list(model_pks)).items():
+            loaded[(model, unicode(pk))] = instance
+
+    instances = []
+    for obj in objects:
+        if isinstance(obj, SearchResult):
+            if obj._object is None and obj.model:
+                obj._object = loaded.get((obj.model, unicode(obj.pk)))
+            instances.append(obj._object)
+        else:
+            instances.append(obj)
+    return instances
@@ -1 +1,3 @@
-PHOTO_PRE_KEY = "photo"
\ No newline at end of file
+PHOTO_PRE_KEY = "photo"
+PHOTOSET_NEIGHBORS_PRE_KEY = "photoset_neighbors"
+PHOTOSET_ZIP_PRE_KEY = "photoset_zip"
@@ -0,0 +1,175 @@
+import os
+import time
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import simplejson
+
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_CHECKPOINT = os.path.join(settings.PROJECT_ROOT, 'generate_renditions.checkpoint')
+
+
+def worker(bits):
+    # the processes must not share the connection of the parent
+    from django.db import connections
+
+    for alias, info in connections.databases.items():
+        # wiping out sqlite connections destroys in-memory databases
+        if not 'sqlite3' in info['ENGINE']:
+            try:
+                del(connections._connections[alias])
+            except KeyError:
+                pass
+
+    return render_photos(*bits)
+
+
+def render_photos(after_pk, last_pk, photoset_id=None):
+    """
+    Build the standard renditions of the photos in a pk range.
+    Returns (last_pk, photos, renditions built).
+    """
+    from photos.models import Image
+    from photos.utils import render_photo
+
+    photos = Image.objects.filter(pk__gt=after_pk, pk__lte=last_pk)
+    if photoset_id:
+        photos = photos.filter(photoset=photoset_id)
+
+    count, built = 0, 0
+    for photo in photos.order_by('pk'):
+        if not photo.file_exists():
+            continue
+        try:
+            built += render_photo(photo)
+        except IOError:
+            # not an image
+            continue
+        count += 1
+    return last_pk, count, built
+
+
+def pk_ranges(photos, batch_size, after_pk=None):
+    """
+    Yields (after_pk, last_pk) of batches of photos in pk order
+    """
+    after_pk = after_pk or 0
+    while True:
+        pks = list(photos.filter(pk__gt=after_pk).order_by('pk')
+                   .values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            break
+        yield after_pk, pks[-1]
+        after_pk = pks[-1]
+
+
+class Command(BaseCommand):
+    """
+    Resize the photos to the photologue sizes and the standard renditions
+    ahead of the first visitors, with a pool of processes. Sizes that are
+    up to date are skipped, and an interrupted run picks up where it
+    stopped with --resume.
+
+    example: python manage.py generate_renditions --photoset=12 --processes=4
+    """
+    option_list = BaseCommand.option_list + (
+        make_option('--photoset', action='store', dest='photoset', default=None,
+            help='Only the photos of this photo set'),
+        make_option('--processes', action='store', dest='processes', default=None,
+            help='Number of worker processes (default: number of cpus, 0 for none)'),
+        make_option('--batch-size', action='store', dest='batch_size', default=DEFAULT_BATCH_SIZE,
+            help='Number of photos handed to a process at a time'),
+        make_option('--resume', action='store_true', dest='resume', default=False,
+            help='Continue after the last batch of an interrupted run'),
+        make_option('--checkpoint', action='store', dest='checkpoint', default=DEFAULT_CHECKPOINT,
+            help='File that keeps the progress of a run'),
+    )
+
+    def handle(self, *args, **options):
+        import multiprocessing
+        from photos.models import Image, PhotoSet
+
+        verbosity = int(options.get('verbosity', 1))
+        batch_size = int(options['batch_size'])
+        processes = options['processes']
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        processes = int(processes)
+
+        photos = Image.objects.all()
+        photoset_id = options['photoset']
+        if photoset_id:
+            try:
+                photoset_id = PhotoSet.objects.get(pk=photoset_id).pk
+            except (PhotoSet.DoesNotExist, ValueError):
+                raise CommandError('Photo set %s does not exist' % photoset_id)
+            photos = photos.filter(photoset=photoset_id)
+
+        checkpoint = options['checkpoint']
+        after_pk = None
+        if options['resume']:
+            after_pk = self.load_checkpoint(checkpoint, photoset_id)
+        if verbosity >= 1:
+            remaining = photos.filter(pk__gt=after_pk or 0).count()
+            if after_pk:
+                print 'Rendering %d photos, resuming after %s.' % (remaining, after_pk)
+            else:
+                print 'Rendering %d photos.' % remaining
+
+        ranges = pk_ranges(photos, batch_size, after_pk)
+        pool = None
+        if processes > 0:
+            pool = multiprocessing.Pool(processes)
+            # imap hands the batches back in order, so the checkpoint
+            # only moves past a batch once every batch before it is done
+            results = pool.imap(worker, ((first, last, photoset_id) for first, last in ranges))
+        else:
+            results = (render_photos(first, last, photoset_id) for first, last in ranges)
+
+        start = time.time()
+        total, total_built = 0, 0
+        try:
+            for last_pk, count, built in results:
+                total += count
+                total_built += built
+                self.save_checkpoint(checkpoint, photoset_id, last_pk)
+                if verbosity >= 2:
+                    print '  up to photo %s: %d photos, %.1f photos/s' % (
+                        last_pk, total, total / max(time.time() - start, 0.001))
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+
+        # everything is done, nothing left to resume
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+
+        if verbosity >= 1:
+            elapsed = time.time() - start
+            print '%d photos, %d renditions built in %.1fs (%.1f photos/s).' % (
+                total, total_built, elapsed, total / max(elapsed, 0.001))
+
+    def load_checkpoint(self, path, photoset_id):
+        try:
+            f = open(path)
+            try:
+                data = simplejson.load(f)
+            finally:
+                f.close()
+        except (IOError, ValueError):
+            return None
+
+        # the progress of another photo set does not apply
+        if data.get('photoset') != photoset_id:
+            return None
+        return data.get('last_pk')
+
+    def save_checkpoint(self, path, photoset_id, last_pk):
+        f = open(path + '.tmp', 'w')
+        try:
+            simplejson.dump({'photoset': photoset_id, 'last_pk': last_pk}, f)
+        finally:
+            f.close()
+        os.rename(path + '.tmp', path)
@@ -5,6 +5,7 @@ from django.db import models
 from django.contrib.auth.models import User, AnonymousUser
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes import generic
+from django.core.cache import cache
 from django.utils.translation import ugettext_lazy as _
 from django.core.urlresolvers import reverse
 
@@ -17,6 +18,7 @@ from perms.utils import is_admin, is_member, is_developer, get_query_filters
 from photos.managers import PhotoManager, PhotoSetManager
 from meta.models import Meta as MetaTags
 from photos.module_meta import PhotoMeta
+from photos.cache import PHOTOSET_NEIGHBORS_PRE_KEY
 from haystack.query import SearchQuerySet
 
 
@@ -193,24 +195,48 @@ class Image(ImageModel, TendenciBaseModel):
             return True
         return False
 
-    def get_next(self, set=None):
-        # decide which set to pull from
-        if set: images = Image.objects.filter(photoset=set, id__lt=self.id)
-        else: images = Image.objects.filter(id__lt=self.id)
-        images = images.values_list("id", flat=True)
-        images = images.order_by('-id')
-        try: return Image.objects.get(id=max(images))
-        except ValueError: return None
-
-    def get_prev(self, set=None):
-        # decide which set to pull from
-        if set: images = Image.objects.filter(photoset=set, id__gt=self.id)
-        else: images = Image.objects.filter(id__gt=self.id)
-        images = images.values_list("id", flat=True)
-        images = images.order_by('-id')
-        try: return Image.objects.get(id=min(images))
-        except ValueError: return None
-        
+    def get_next(self, set=None, user=None):
+        """
+        The photo before this one (the next lower id), in the photo set
+        if given, among the photos the user can view if given
+        """
+        return self.get_neighbor(set=set, user=user, older=True)
+
+    def get_prev(self, set=None, user=None):
+        """
+        The photo after this one (the next higher id), in the photo set
+        if given, among the photos the user can view if given
+        """
+        return self.get_neighbor(set=set, user=user, older=False)
+
+    def get_neighbor(self, set=None, user=None, older=True):
+        # slideshows of anonymous visitors go through the neighbor index
+        if set and user is not None and not user.is_authenticated() \
+                and getattr(settings, 'PHOTOSET_NEIGHBOR_INDEX', False):
+            neighbors = get_photoset_neighbors(set)
+            if self.pk in neighbors:
+                pk = neighbors[self.pk][older and 0 or 1]
+                if pk is None:
+                    return None
+                try:
+                    return Image.objects.get(pk=pk)
+                except Image.DoesNotExist:
+                    pass
+
+        images = Image.objects.all()
+        if user is not None:
+            images = images.filter(get_query_filters(user, 'photologue.view_photo'))
+        if set:
+            images = images.filter(photoset=set)
+
+        # one row off the id index instead of every id
+        if older:
+            images = images.filter(id__lt=self.id).order_by('-id')
+        else:
+            images = images.filter(id__gt=self.id).order_by('id')
+        images = list(images[:1])
+        return images and images[0] or None
+
     def get_license(self):
         if self.license:
             return self.license
@@ -272,3 +298,61 @@ class AlbumCover(models.Model):
     
     def __unicode__(self):
         return self.photo.title
+
+
+def delete_photo_renditions(sender, instance, **kwargs):
+    from files.renditions import delete_renditions
+    delete_renditions(instance.image)
+
+models.signals.post_delete.connect(delete_photo_renditions, sender=Image)
+
+
+def photoset_neighbors_key(set_id):
+    keys = [settings.CACHE_PRE_KEY, PHOTOSET_NEIGHBORS_PRE_KEY, str(set_id)]
+    return '.'.join(keys)
+
+
+def get_photoset_neighbors(set_id):
+    """
+    The neighbor index of a photo set: a dict of photo id: (id of the
+    photo before, id of the photo after) over the photos anonymous
+    visitors can view, built with one query and kept in the cache
+    until a photo of the set changes.
+    """
+    key = photoset_neighbors_key(set_id)
+    neighbors = cache.get(key)
+    if neighbors is None:
+        filters = get_query_filters(AnonymousUser(), 'photologue.view_photo')
+        ids = list(Image.objects.filter(filters).filter(photoset=set_id)
+                   .order_by('id').values_list('id', flat=True).distinct())
+        neighbors = {}
+        for i, pk in enumerate(ids):
+            before = i > 0 and ids[i - 1] or None
+            after = i + 1 < len(ids) and ids[i + 1] or None
+            neighbors[pk] = (before, after)
+        cache.set(key, neighbors)
+    return neighbors
+
+
+def clear_photoset_neighbors(set_ids):
+    cache.delete_many([photoset_neighbors_key(set_id) for set_id in set_ids])
+
+
+def photo_neighbors_changed(sender, instance, **kwargs):
+    clear_photoset_neighbors(instance.photoset.values_list('pk', flat=True))
+
+
+def photoset_photos_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_') and action != 'pre_clear':
+        return
+    if reverse:
+        # photo_set.image_set.add(...)
+        clear_photoset_neighbors([instance.pk])
+    elif action == 'pre_clear':
+        photo_neighbors_changed(sender, instance)
+    elif pk_set:
+        clear_photoset_neighbors(pk_set)
+
+models.signals.post_save.connect(photo_neighbors_changed, sender=Image)
+models.signals.pre_delete.connect(photo_neighbors_changed, sender=Image)
+models.signals.m2m_changed.connect(photoset_photos_changed, sender=Image.photoset.through)
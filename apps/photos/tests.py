@@ -4,8 +4,21 @@ unittest). These will both pass when you run "manage.py test".
 
 Replace these with more appropriate tests for your application.
 """
+import os
+import shutil
+import tempfile
+import zipfile
+from cStringIO import StringIO
 
+from django.conf import settings
 from django.test import TestCase
+from django.contrib.auth.models import User, AnonymousUser
+from django.http import HttpRequest
+
+from photos.models import Image, PhotoSet, get_photoset_neighbors, clear_photoset_neighbors
+from perms.tests import count_queries
+from base.http import serve_zip
+from base.zipstream import ZipStream
 
 class SimpleTest(TestCase):
     def test_basic_addition(self):
@@ -14,6 +27,128 @@ class SimpleTest(TestCase):
         """
         self.failUnlessEqual(1 + 1, 2)
 
+class PhotoNeighborTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='neighbors')
+        self.photo_set = self.create(PhotoSet, name='slideshow', author=self.user)
+        clear_photoset_neighbors([self.photo_set.pk])
+
+        self.photos = []
+        for i in range(5):
+            photo = self.create(Image, title='photo %s' % i, title_slug='photo-%s' % i,
+                image='photos/photo-%s.jpg' % i)
+            self.photo_set.image_set.add(photo)
+            self.photos.append(photo)
+        # not in the set
+        self.create(Image, title='other', title_slug='other', image='photos/other.jpg')
+
+        # only the owner sees the fourth photo
+        Image.objects.filter(pk=self.photos[3].pk).update(allow_anonymous_view=False)
+
+        self.index = getattr(settings, 'PHOTOSET_NEIGHBOR_INDEX', False)
+
+    def tearDown(self):
+        settings.PHOTOSET_NEIGHBOR_INDEX = self.index
+
+    def create(self, model, **kwargs):
+        return model.objects.create(creator=self.user, creator_username=self.user.username,
+            owner=self.user, owner_username=self.user.username, **kwargs)
+
+    def test_neighbors(self):
+        photos = self.photos
+        self.assertEquals(photos[2].get_next(set=self.photo_set.pk), photos[1])
+        self.assertEquals(photos[2].get_prev(set=self.photo_set.pk), photos[3])
+        self.assertEquals(photos[0].get_next(set=self.photo_set.pk), None)
+        self.assertEquals(photos[4].get_prev(set=self.photo_set.pk), None)
+
+        # the photo outside of the set comes after the last one
+        self.assertNotEquals(photos[4].get_prev(), None)
+
+        # one query per neighbor
+        self.assertEquals(count_queries(lambda: photos[2].get_next(set=self.photo_set.pk)), 1)
+
+    def test_permissions(self):
+        anonymous = AnonymousUser()
+        self.assertEquals(self.photos[2].get_prev(set=self.photo_set.pk, user=anonymous),
+            self.photos[4])
+        self.assertEquals(self.photos[4].get_next(set=self.photo_set.pk, user=anonymous),
+            self.photos[2])
+
+    def test_neighbor_index(self):
+        settings.PHOTOSET_NEIGHBOR_INDEX = True
+        anonymous = AnonymousUser()
+        photos = self.photos
+
+        self.assertEquals(photos[2].get_prev(set=self.photo_set.pk, user=anonymous), photos[4])
+        neighbors = get_photoset_neighbors(self.photo_set.pk)
+        self.assertEquals(neighbors[photos[4].pk], (photos[2].pk, None))
+        self.assertFalse(photos[3].pk in neighbors)
+
+        # cached: only the photo itself is fetched
+        self.assertEquals(count_queries(
+            lambda: photos[2].get_next(set=self.photo_set.pk, user=anonymous)), 1)
+
+        # a new photo in the set shows up
+        photo = self.create(Image, title='new', title_slug='new', image='photos/new.jpg')
+        self.photo_set.image_set.add(photo)
+        self.assertEquals(photos[4].get_prev(set=self.photo_set.pk, user=anonymous), photo)
+
+
+class ZipStreamTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.files = []
+        for i, size in enumerate((0, 10, 200000)):
+            path = os.path.join(self.directory, 'photo-%s.jpg' % i)
+            open(path, 'wb').write(''.join([chr(j % 256) for j in range(size)]))
+            self.files.append(('photo.jpg', path))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def get(self, archive, **meta):
+        request = HttpRequest()
+        request.method = 'GET'
+        request.META.update(meta)
+        self.completed = None
+        def on_complete(archive):
+            self.completed = archive.crcs
+        return serve_zip(request, archive, 'photos.zip', on_complete=on_complete)
+
+    def test_streamed(self):
+        archive = ZipStream(self.files)
+        response = self.get(archive)
+        self.assertEquals(response['Accept-Ranges'], 'none')
+
+        data = ''.join(response)
+        self.assertEquals(int(response['Content-Length']), len(data))
+        archive_file = zipfile.ZipFile(StringIO(data))
+        self.assertEquals(archive_file.testzip(), None)
+        self.assertEquals(archive_file.namelist(), ['photo.jpg', 'photo-2.jpg', 'photo-3.jpg'])
+        self.assertEquals(archive_file.read('photo-3.jpg'), open(self.files[2][1], 'rb').read())
+
+        # the crcs are handed back once everything went out
+        self.assertEquals(len(self.completed), 3)
+
+    def test_resumable(self):
+        crcs = ZipStream(self.files)
+        ''.join(crcs)
+        archive = ZipStream(self.files, crcs.crcs)
+        data = ''.join(self.get(archive))
+        self.assertEquals(zipfile.ZipFile(StringIO(data)).testzip(), None)
+
+        response = self.get(archive, HTTP_RANGE='bytes=100-', HTTP_IF_RANGE=archive.etag())
+        self.assertEquals(response.status_code, 206)
+        self.assertEquals(''.join(response), data[100:])
+
+        response = self.get(archive, HTTP_IF_NONE_MATCH=archive.etag())
+        self.assertEquals(response.status_code, 304)
+
+        # another photo, another archive
+        os.utime(self.files[1][1], (0, 0))
+        self.assertNotEquals(ZipStream(self.files).etag(), archive.etag())
+
+
 __test__ = {"doctest": """
 Another way to test that 1 + 1 is equal to 2.
 
@@ -15,3 +15,53 @@ def get_privacy_settings(instance):
 		'status': instance.status,
 		'status_detail': instance.status_detail
 	}
+
+
+def get_rendition_sizes(photo):
+	"""
+	The renditions of a photo that the pages ask for, as a list of
+	(size, crop, quality): the photologue sizes, scaled the way the
+	sizes page links to them, and PHOTO_RENDITION_SIZES, a list of
+	(width, height, crop) used by the templates of the site.
+	"""
+	from django.conf import settings
+	from photologue.models import PhotoSize
+
+	# the default quality of photos.views.photo_size()
+	quality = 90
+	width, height = photo.image.width, photo.image.height
+
+	sizes = []
+	for photo_size in PhotoSize.objects.all():
+		if photo_size.crop:
+			sizes.append(((photo_size.width, photo_size.height), True, quality))
+		elif photo_size.width and photo_size.height:
+			ratio = min(float(photo_size.width) / width, float(photo_size.height) / height)
+			if ratio > 1 and not photo_size.upscale:
+				ratio = 1
+			size = (int(round(width * ratio)), int(round(height * ratio)))
+			sizes.append((size, False, quality))
+
+	for size_width, size_height, crop in getattr(settings, 'PHOTO_RENDITION_SIZES', ()):
+		sizes.append(((size_width, size_height), crop, quality))
+
+	return sizes
+
+
+def render_photo(photo):
+	"""
+	Build the photologue sizes of a photo and its renditions for
+	photos.views.photo_size() ahead of the first visitor, skipping
+	those that are up to date. Returns the number built.
+	"""
+	from photologue.models import PhotoSize
+	from files.renditions import generate_renditions
+
+	built = 0
+	for photo_size in PhotoSize.objects.all():
+		# the gallery pages ask photologue for these
+		if not photo.size_exists(photo_size):
+			photo.create_size(photo_size)
+			built += 1
+
+	return built + generate_renditions(photo.image, get_rendition_sizes(photo))
@@ -4,7 +4,6 @@ import re
 from django.shortcuts import get_object_or_404, redirect
 from django.http import HttpResponseRedirect, HttpResponse, Http404
 from django.utils.translation import ugettext_lazy as _
-from django.utils import simplejson as json
 from django.template import RequestContext
 from django.db.models import Q
 from django.db.models.query import QuerySet
@@ -19,19 +18,19 @@ from django.forms.models import modelformset_factory
 from django.middleware.csrf import get_token as csrf_get_token
 
 from theme.shortcuts import themed_response as render_to_response
-from base.http import Http403
+from base.http import Http403, serve_file, serve_zip
 from perms.utils import has_perm, update_perms_and_save, is_admin, get_query_filters, has_view_perm
 from site_settings.utils import get_setting
 from event_logs.models import EventLog
-from files.utils import get_image
-from djcelery.models import TaskMeta
+from files.renditions import rendition_response
+from files.utils import validate_image_size
+from files.tasks import RenditionTask
 
-from photos.cache import PHOTO_PRE_KEY
 from photos.search_indexes import PhotoSetIndex
 from photos.models import Image, Pool, PhotoSet, AlbumCover, License
 from photos.forms import PhotoUploadForm, PhotoEditForm, PhotoSetAddForm, PhotoSetEditForm
-from photos.utils import get_privacy_settings
-from photos.tasks import ZipPhotoSetTask
+from photos.utils import get_privacy_settings, get_rendition_sizes
+from photos.cache import PHOTOSET_ZIP_PRE_KEY
 
 def search(request, template_name="photos/search.html"):
     """ Photos search """
@@ -122,8 +121,8 @@ def photo(request, id, set_id=0, partial=False, template_name="photos/details.ht
 
     if set_id:
         photo_set = get_object_or_404(PhotoSet, id=set_id)
-        photo_prev = photo.get_prev(set=set_id)
-        photo_next = photo.get_next(set=set_id)            
+        photo_prev = photo.get_prev(set=set_id, user=request.user)
+        photo_next = photo.get_next(set=set_id, user=request.user)
 
         if photo_prev: photo_prev_url = reverse("photo", args= [photo_prev.id, set_id])
         if photo_next: photo_next_url = reverse("photo", args= [photo_next.id, set_id])
@@ -135,8 +134,8 @@ def photo(request, id, set_id=0, partial=False, template_name="photos/details.ht
         else:
             set_id = 0
     else:
-        photo_prev = photo.get_prev()
-        photo_next = photo.get_next()
+        photo_prev = photo.get_prev(user=request.user)
+        photo_next = photo.get_next(user=request.user)
 
         if photo_prev: photo_prev_url = reverse("photo", args= [photo_prev.id])
         if photo_next: photo_next_url = reverse("photo", args= [photo_next.id])  
@@ -166,7 +165,7 @@ def photo_size(request, id, size, crop=False, quality=90, download=False):
     """
     Renders image and returns response
     Does not use template
-    Saves resized image within cache system
+    Saves the standard sizes within the rendition store
     Returns 404 if if image rendering fails
     """
 
@@ -180,21 +179,20 @@ def photo_size(request, id, size, crop=False, quality=90, download=False):
     if not has_perm(request.user,'photologue.view_photo',photo):
         raise Http403
 
-    attachment = ''
-    if download: 
-        attachment = 'attachment;'
-    
-    # gets resized image from cache or rebuild
-    image = get_image(photo.image, size, PHOTO_PRE_KEY, crop=crop, quality=quality, unique_key=str(photo.pk))
+    # the sizes the pages use are resized once, then sent from the
+    # rendition store; the others are resized on each request
+    def store():
+        return (tuple(validate_image_size(size)), bool(crop), quality) in [
+            (tuple(validate_image_size(s)), c, q) for s, c, q in get_rendition_sizes(photo)]
+
+    response = rendition_response(request, photo.image, size, crop=bool(crop),
+        quality=quality, filename=os.path.basename(photo.image.name),
+        attachment=download, store=store)
 
     # if image not rendered; quit
-    if not image:
+    if not response:
         raise Http404
 
-    response = HttpResponse(mimetype='image/jpeg')
-    response['Content-Disposition'] = '%s filename=%s'% (attachment, photo.image.file.name)
-    image.save(response, "JPEG", quality=quality)
-
     return response
 
 def photo_original(request, id):
@@ -203,13 +201,12 @@ def photo_original(request, id):
     """
     photo = get_object_or_404(Image, id=id)
     
-    image_data = open(photo.image.file.name, "rb").read()
     try:
-        ext = photo.image.file.name.split('.')[-1]
+        ext = photo.image.path.split('.')[-1]
     except IndexError:
         ext = "png"
     
-    return HttpResponse(image_data, mimetype="image/%s" % ext)
+    return serve_file(request, photo.image.path, mimetype="image/%s" % ext)
 
 @login_required
 def memberphotos(request, username, template_name="photos/memberphotos.html", group_slug=None, bridge=None):
@@ -569,7 +566,9 @@ def photos_batch_add(request, photoset_id=0):
 
                 photo.save()  # real time search index hooked to save method
 
-                print 'i waited'
+                # resize to the standard sizes before they are asked for
+                if settings.CELERY_IS_ACTIVE:
+                    RenditionTask.delay(photo, 'image', get_rendition_sizes(photo))
 
                 # photo group perms = album group perms
                 group_perms = photo_set.perms.filter(group__isnull=False).values_list('group','codename')
@@ -708,39 +707,35 @@ def photoset_details(request, id, template_name="photos/photo-set/details.html")
         "photo_set": photo_set,
     }, context_instance=RequestContext(request))
 
-def photoset_zip(request, id, template_name="photos/photo-set/zip.html"):
-    """ Generate zip file for the entire photo set
+def photoset_zip(request, id):
+    """ Download the entire photo set as a zip file
     for admins only.
+    Streamed as it is read; a repeat download can be resumed.
     """
-    
+    from django.core.cache import cache
+    from django.template.defaultfilters import slugify
+    from base.zipstream import ZipStream
+
     photo_set = get_object_or_404(PhotoSet, id=id)
     
     #admin only
     if not is_admin(request.user):
         raise Http403
-    
-    file_path = ""
-    task_id = ""
-    if not settings.CELERY_IS_ACTIVE:
-        task = ZipPhotoSetTask()
-        file_path = task.run(photo_set)        
-    else:
-        task = ZipPhotoSetTask.delay(photo_set)
-        task_id = task.task_id
-    
-    return render_to_response(template_name, {
-        "photo_set": photo_set,
-        "task_id":task_id,
-        "file_path":file_path,
-    }, context_instance=RequestContext(request))
 
-def photoset_zip_status(request, id, task_id):
-    try:
-        task = TaskMeta.objects.get(task_id=task_id)
-    except TaskMeta.DoesNotExist:
-        task = None
-    
-    if task and task.status == "SUCCESS":
-        file_path = task.result
-        return HttpResponse(json.dumps(file_path), mimetype='application/json')
-    return HttpResponse(json.dumps('DNE'), mimetype='application/json')
+    files = []
+    for image in photo_set.image_set.order_by('pk'):
+        if image.file_exists():  # skip missing files
+            files.append((os.path.basename(image.image.name), image.image.path))
+
+    archive = ZipStream(files)
+    # the crcs of the last complete download make the archive resumable
+    key = '.'.join([settings.CACHE_PRE_KEY, PHOTOSET_ZIP_PRE_KEY, str(photo_set.pk), archive.fingerprint()])
+    crcs = cache.get(key)
+    if crcs:
+        archive = ZipStream(files, crcs)
+
+    def save_crcs(archive):
+        cache.set(key, archive.crcs, 60*60*24*30)
+
+    return serve_zip(request, archive, '%s.zip' % (slugify(photo_set.name) or photo_set.pk),
+        on_complete=save_crcs)
@@ -0,0 +1,69 @@
+import time
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+# the mix of agents a site sees: mostly browsers, a fair share of crawlers
+USER_AGENTS = (
+    'Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/535.7 (KHTML, like Gecko) '
+    'Chrome/16.0.912.75 Safari/535.7',
+    'Mozilla/5.0 (Windows NT 6.1; rv:9.0.1) Gecko/20100101 Firefox/9.0.1',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_7_2) AppleWebKit/534.52.7 '
+    '(KHTML, like Gecko) Version/5.1.2 Safari/534.52.7',
+    'Mozilla/4.0 (compatible; MSIE 8.0; Windows NT 5.1; Trident/4.0; '
+    '.NET CLR 2.0.50727; .NET CLR 3.0.4506.2152; .NET CLR 3.5.30729)',
+    'Mozilla/5.0 (compatible; MSIE 9.0; Windows NT 6.1; WOW64; Trident/5.0)',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 5_0_1 like Mac OS X) AppleWebKit/534.46 '
+    '(KHTML, like Gecko) Version/5.1 Mobile/9A405 Safari/7534.48.3',
+    'Mozilla/5.0 (Linux; U; Android 2.3.6; en-us; Nexus S Build/GRK39F) '
+    'AppleWebKit/533.1 (KHTML, like Gecko) Version/4.0 Mobile Safari/533.1',
+    'Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)',
+    'Mozilla/5.0 (compatible; bingbot/2.0; +http://www.bing.com/bingbot.htm)',
+    'Mozilla/5.0 (compatible; Yahoo! Slurp; http://help.yahoo.com/help/us/ysearch/slurp)',
+    'Mozilla/5.0 (compatible; Baiduspider/2.0; +http://www.baidu.com/search/spider.html)',
+    'msnbot/2.0b (+http://search.msn.com/msnbot.htm)',
+    'facebookexternalhit/1.1 (+http://www.facebook.com/externalhit_uatext.php)',
+    'Wget/1.12 (linux-gnu)',
+)
+
+
+class Command(BaseCommand):
+    """
+    Time Robot.objects.get_by_agent() against the linear scan it
+    replaced, over a corpus of common browser and crawler agents.
+
+    example: python manage.py robots_benchmark --count=10000
+    """
+    option_list = BaseCommand.option_list + (
+        make_option('--count', action='store', dest='count', default=10000,
+            help='Number of lookups in each run'),
+    )
+
+    def handle(self, *args, **options):
+        from robots.models import Robot
+        from robots.managers import RobotMatcher
+
+        count = int(options['count'])
+        robots = list(Robot.objects.all())
+        corpus = [USER_AGENTS[i % len(USER_AGENTS)] for i in xrange(count)]
+        # every agent different, so nothing comes from the memo
+        unique = ['%s %d' % (corpus[i], i) for i in xrange(count)]
+
+        def scan(user_agent):
+            for robot in robots:
+                if robot.name.lower() in user_agent.lower():
+                    return robot
+            return None
+
+        def run(label, func, agents):
+            start = time.time()
+            for user_agent in agents:
+                func(user_agent)
+            elapsed = time.time() - start
+            print '%-22s %8.2f us per lookup' % (label, elapsed * 1000000 / count)
+
+        print '%d robots, %d lookups' % (len(robots), count)
+        run('scan', scan, corpus)
+        run('matcher, no memo', RobotMatcher(robots).match, unique)
+        run('matcher, memo', RobotMatcher(robots).match, corpus)
+        run('get_by_agent', Robot.objects.get_by_agent, corpus)
@@ -1,25 +1,141 @@
+import re
+import threading
+import time
+
 from django.db.models import Manager
 from django.core.cache import cache
+from django.core.signals import request_started
 from django.conf import settings
 
+from ordereddict import OrderedDict
+
 from robots.cache import CACHE_PRE_KEY, cache_all_robots
 
+# number of recent user agents whose robot is remembered
+USER_AGENT_MEMO_SIZE = 1000
+
+# python's re module allows at most 100 groups per pattern
+NAMES_PER_PATTERN = 99
+
+
+class RobotMatcher(object):
+    """
+    Finds the robot of a user agent with one compiled regex instead of
+    testing every robot name against it.
+
+    Every robot name is an alternative inside a lookahead, ordered like
+    the robot list, so at each position of the user agent the regex
+    reports the first robot (in list order) whose name starts there.
+    The robot with the lowest position in the list wins, which is what
+    the old "first robot whose name is in the user agent" loop returned.
+
+    Results are remembered for the most recent user agents, crawlers
+    tend to send the same few strings over and over.
+    """
+    def __init__(self, robots):
+        self.robots = list(robots)
+        names = [re.escape(robot.name.lower()) for robot in self.robots]
+
+        # (offset of the first robot, compiled pattern)
+        self.patterns = []
+        for offset in range(0, len(names), NAMES_PER_PATTERN):
+            chunk = names[offset:offset + NAMES_PER_PATTERN]
+            pattern = re.compile('(?=(?:%s))' % '|'.join(
+                ['(%s)' % name for name in chunk]), re.UNICODE)
+            self.patterns.append((offset, pattern))
+
+        self.memo = OrderedDict()
+        self.lock = threading.Lock()
+
+    def match(self, user_agent):
+        with self.lock:
+            if user_agent in self.memo:
+                # move to the end; least recently used is at the front
+                robot = self.memo.pop(user_agent)
+                self.memo[user_agent] = robot
+                return robot
+
+        robot = self._match(user_agent)
+
+        with self.lock:
+            self.memo[user_agent] = robot
+            if len(self.memo) > USER_AGENT_MEMO_SIZE:
+                self.memo.popitem(last=False)
+        return robot
+
+    def _match(self, user_agent):
+        user_agent = user_agent.lower()
+        for offset, pattern in self.patterns:
+            best = None
+            for match in pattern.finditer(user_agent):
+                # group n is the robot at index n - 1 of this chunk
+                index = match.lastindex - 1
+                if best is None or index < best:
+                    best = index
+                    if best == 0:
+                        break
+            # any match in an earlier chunk beats the later chunks
+            if best is not None:
+                return self.robots[offset + best]
+        return None
+
+
+_matcher = {
+    'matcher': None,
+    'version': None,
+    'checked': False,
+}
+
+
+def _version_key():
+    keys = [settings.CACHE_PRE_KEY, CACHE_PRE_KEY, 'version']
+    return '.'.join(keys)
+
+
+def reset_robot_matcher():
+    """
+    Tells every worker to rebuild its matcher from the robot table
+    """
+    cache_all_robots()
+    cache.set(_version_key(), time.time())
+    _matcher['checked'] = False
+
+
+def _reset_version_check(sender, **kwargs):
+    _matcher['checked'] = False
+
+request_started.connect(_reset_version_check)
+
+
 class RobotManager(Manager):
+    def get_matcher(self):
+        """
+        The matcher of this process, rebuilt when the robots change.
+        The version key is read at most once per request.
+        """
+        if not _matcher['checked'] or not _matcher['matcher']:
+            version = cache.get(_version_key())
+            if version is None:
+                version = time.time()
+                cache.add(_version_key(), version)
+            if version != _matcher['version'] or not _matcher['matcher']:
+                keys = [settings.CACHE_PRE_KEY, CACHE_PRE_KEY, 'all']
+                key = '.'.join(keys)
+
+                robots = cache.get(key)
+                if not robots:
+                    cache_all_robots()
+                    robots = cache.get(key, [])
+
+                _matcher['matcher'] = RobotMatcher(robots)
+                _matcher['version'] = version
+            _matcher['checked'] = True
+        return _matcher['matcher']
+
     def get_by_agent(self, user_agent):
-        
-        keys = [settings.CACHE_PRE_KEY, CACHE_PRE_KEY, 'all']
-        key = '.'.join(keys)
-        
-        robots = cache.get(key)
-        if not robots:
-            cache_all_robots()
-            robots = cache.get(key, [])
-        
         # UnicodeDecodeError: 'ascii' codec can't decode byte 0xf3
         # http://stackoverflow.com/questions/2392732/sqlite-python-unicode-and-non-utf-data
-        user_agent = unicode(user_agent, errors='ignore')
+        if not isinstance(user_agent, unicode):
+            user_agent = unicode(user_agent, errors='ignore')
 
-        for robot in robots:
-            if robot.name.lower() in user_agent.lower():
-                return robot
-        return None
+        return self.get_matcher().match(user_agent)
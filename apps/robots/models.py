@@ -1,6 +1,7 @@
 from django.db import models
+from django.db.models.signals import post_save, post_delete
 
-from robots.managers import RobotManager
+from robots.managers import RobotManager, reset_robot_matcher
 
 STATUS_CHOICES = (('active','Active'),('inactive','Inactive'),)
 
@@ -14,4 +15,11 @@ class Robot(models.Model):
     objects = RobotManager()
     
     def __unicode__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+
+def robot_changed(sender, **kwargs):
+    reset_robot_matcher()
+
+post_save.connect(robot_changed, sender=Robot)
+post_delete.connect(robot_changed, sender=Robot)
@@ -0,0 +1,64 @@
+from django.test import TestCase
+
+from robots.models import Robot
+from robots.managers import RobotMatcher, NAMES_PER_PATTERN
+
+USER_AGENTS = (
+    'Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)',
+    'Mozilla/5.0 (compatible; bingbot/2.0; +http://www.bing.com/bingbot.htm)',
+    'Mozilla/5.0 (compatible; Yahoo! Slurp; http://help.yahoo.com/help/us/ysearch/slurp)',
+    'msnbot/2.0b (+http://search.msn.com/msnbot.htm)',
+    'Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/535.7 (KHTML, like Gecko) '
+    'Chrome/16.0.912.75 Safari/535.7',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.7; rv:9.0.1) Gecko/20100101 Firefox/9.0.1',
+    'Mozilla/4.0 (compatible; MSIE 8.0; Windows NT 5.1; Trident/4.0)',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 5_0_1 like Mac OS X) AppleWebKit/534.46 '
+    '(KHTML, like Gecko) Version/5.1 Mobile/9A405 Safari/7534.48.3',
+    '',
+)
+
+
+def scan(robots, user_agent):
+    """
+    The linear scan the matcher replaces
+    """
+    for robot in robots:
+        if robot.name.lower() in user_agent.lower():
+            return robot
+    return None
+
+
+class RobotMatcherTest(TestCase):
+    def test_matches_like_scan(self):
+        robots = list(Robot.objects.all())
+        matcher = RobotMatcher(robots)
+        for user_agent in USER_AGENTS:
+            self.assertEquals(matcher.match(user_agent), scan(robots, user_agent))
+            # and again from the memo
+            self.assertEquals(matcher.match(user_agent), scan(robots, user_agent))
+
+    def test_first_robot_wins(self):
+        robots = [Robot(name='Slurp'), Robot(name='Yahoo'), Robot(name='bot')]
+        matcher = RobotMatcher(robots)
+        self.assertEquals(matcher.match('Yahoo! Slurp'), robots[0])
+        self.assertEquals(matcher.match('yahoo robot'), robots[1])
+        self.assertEquals(matcher.match('some BOT'), robots[2])
+        self.assertEquals(matcher.match('a browser'), None)
+
+    def test_many_robots(self):
+        robots = [Robot(name='robot%03d' % i) for i in range(NAMES_PER_PATTERN * 2 + 5)]
+        matcher = RobotMatcher(robots)
+        for robot in robots[::17]:
+            user_agent = 'agent %s/1.0' % robot.name
+            self.assertEquals(matcher.match(user_agent), scan(robots, user_agent))
+
+    def test_rebuilt_on_change(self):
+        user_agent = 'Mozilla/5.0 (compatible; Tendencibot/1.0)'
+        self.assertEquals(Robot.objects.get_by_agent(user_agent), None)
+
+        robot = Robot.objects.create(name='Tendencibot', url='http://www.tendenci.com/',
+            version='1.0')
+        self.assertEquals(Robot.objects.get_by_agent(user_agent), robot)
+
+        robot.delete()
+        self.assertEquals(Robot.objects.get_by_agent(user_agent), None)
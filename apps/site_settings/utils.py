@@ -1,70 +1,154 @@
+import time
+
 # django
 from django.core.cache import cache
+from django.core.signals import request_started
 from django.conf import settings as d_settings
 
 # local
 from site_settings.models import Setting
 from site_settings.cache import SETTING_PRE_KEY
 
+# Every setting lives in a per-process dict, loaded with one query.
+# A single version key in the shared cache tells the workers when to
+# reload; it is read at most once per request (or once every
+# SETTINGS_VERSION_CHECK_INTERVAL seconds outside of requests).
+SETTINGS_VERSION_CHECK_INTERVAL = 5
+
+_local = {
+    'version': None,
+    'checked_at': 0,
+    'settings': {},  # (scope, scope_category, name): Setting
+    'values': {},    # (scope, scope_category, name): decoded value
+    'context': {},   # SCOPE_SCOPECATEGORY_NAME: value, for the context processor
+}
+
+
+def _version_key():
+    keys = [d_settings.CACHE_PRE_KEY, SETTING_PRE_KEY, 'version']
+    return '.'.join(keys)
+
+
+def get_settings_version():
+    version = cache.get(_version_key())
+    if version is None:
+        version = int(time.time())
+        if not cache.add(_version_key(), version):
+            version = cache.get(_version_key())
+    return version
+
+
+def bump_settings_version():
+    """
+    Tells every worker to reload the settings
+    """
+    try:
+        cache.incr(_version_key())
+    except ValueError:
+        cache.set(_version_key(), int(time.time()))
+    _local['checked_at'] = 0
+
+
+def _reset_version_check(sender, **kwargs):
+    _local['checked_at'] = 0
+
+request_started.connect(_reset_version_check)
+
+
+def decode_value(setting):
+    """
+    Converts the stored string to the data type of the setting.
+    File settings are resolved separately, in bulk.
+    """
+    value = setting.value.strip()
+    if setting.data_type == 'boolean':
+        value = value[:1].lower() == 't'
+    if setting.data_type == 'int':
+        if value: value = int(value)
+        else: value = 0 # default to 0
+    return value
+
+
+def load_settings():
+    """
+    Loads every setting into the per-process cache, with one query
+    for the settings and one for the files they point to.
+    """
+    from files.models import File as TFile
+
+    version = get_settings_version()
+    settings = list(Setting.objects.all())
+
+    file_ids = [s.value.strip() for s in settings
+                if s.data_type == 'file' and s.value.strip().isdigit()]
+    files = TFile.objects.in_bulk(file_ids) if file_ids else {}
+
+    settings_dict, values, context = {}, {}, {}
+    for setting in settings:
+        key = (setting.scope, setting.scope_category, setting.name)
+        value = decode_value(setting)
+        context['_'.join(key).upper()] = value
+        if setting.data_type == 'file':
+            value = value.isdigit() and files.get(int(value)) or None
+
+        settings_dict[key] = setting
+        values[key] = value
+
+    _local.update({
+        'version': version,
+        'checked_at': time.time(),
+        'settings': settings_dict,
+        'values': values,
+        'context': context,
+    })
+
+
+def _ensure_loaded():
+    if time.time() - _local['checked_at'] < SETTINGS_VERSION_CHECK_INTERVAL:
+        return
+    if get_settings_version() != _local['version']:
+        load_settings()
+    else:
+        _local['checked_at'] = time.time()
+
+
+def get_settings_context():
+    """
+    Every setting keyed as SCOPE_SCOPECATEGORY_NAME,
+    for the settings context processor
+    """
+    _ensure_loaded()
+    return dict(_local['context'])
+
+
 def delete_all_settings_cache():
-    keys = [d_settings.CACHE_PRE_KEY, SETTING_PRE_KEY, 'all']
-    key = '.'.join(keys)
-    cache.delete(key)
+    bump_settings_version()
     
 def cache_setting(scope, scope_category, name, value):
     """Caches a single setting within a scope
     and scope category
     """
-    keys = [d_settings.CACHE_PRE_KEY, SETTING_PRE_KEY, scope, 
-            scope_category, name]
-    key = '.'.join(keys)   
-    is_set = cache.add(key, value)
-    if not is_set:
-        cache.set(key, value)
+    bump_settings_version()
     
 def cache_settings(scope, scope_category):
     """Caches all settings within a scope
     and scope category
     """
-    filters = {
-        'scope': scope,
-        'scope_category': scope_category,
-    }
-    settings = Setting.objects.filter(**filters)
-    if settings:
-        for setting in settings:
-            keys = [d_settings.CACHE_PRE_KEY, SETTING_PRE_KEY,
-                    setting.scope, setting.scope_category, setting.name]
-            key = '.'.join(keys)
-            is_set = cache.add(key, setting.value)
-            if not is_set:
-                cache.set(key, setting.value)
+    bump_settings_version()
 
 def delete_setting_cache(scope, scope_category, name):
     """
         Deletes a single setting within a
         scope and scope category
     """
-    keys = [d_settings.CACHE_PRE_KEY, SETTING_PRE_KEY, scope, 
-            scope_category, name]
-    key = '.'.join(keys)
-    cache.delete(key)
+    bump_settings_version()
     
 def delete_settings_cache(scope, scope_category):
     """
         Deletes all settings within a scope
         and scope category
     """
-    filters = {
-        'scope': scope,
-        'scope_category': scope_category,
-    }
-    settings = Setting.objects.filter(**filters)
-    for setting in settings:
-        keys = [d_settings.CACHE_PRE_KEY, SETTING_PRE_KEY, 
-                setting.scope, setting.scope_category, setting.name]
-        key = '_'.join(keys)
-        cache.delete(key)
+    bump_settings_version()
         
 def get_setting(scope, scope_category, name):
     """
@@ -73,62 +157,17 @@ def get_setting(scope, scope_category, name):
         Returns the value of the setting if it exists
         otherwise it returns an empty string
     """
-    keys = [d_settings.CACHE_PRE_KEY, SETTING_PRE_KEY, scope,
-            scope_category, name]
-    key = '.'.join(keys)
-    
-    setting = cache.get(key)
-    
-    if not setting:
-        #setting is not in the cache
-        try:
-            #try to get the setting and cache it
-            filters = {
-                'scope': scope,
-                'scope_category': scope_category,
-                'name': name
-            }
-            setting = Setting.objects.get(**filters)
-            cache_setting(setting.scope, setting.scope_category, setting.name, setting)
-        except Exception, e:
-            setting = None
-    
-    #check if the setting has been set and evaluate the value
-    if setting:
-        value = setting.value.strip()
-        # convert data types
-        if setting.data_type == 'boolean':
-            value = value[0].lower() == 't'
-        if setting.data_type == 'int':
-            if value.strip(): value = int(value.strip())
-            else: value = 0 # default to 0
-        if setting.data_type == 'file':
-            from files.models import File as TFile
-            try:
-                tfile = TFile.objects.get(pk=value)
-            except TFile.DoesNotExist:
-                tfile = None
-            value = tfile
-        return value
-    
+    _ensure_loaded()
+    key = (scope, scope_category, name)
+    if key in _local['values']:
+        return _local['values'][key]
+
     #return empty string as default
     return u''
 
 def check_setting(scope, scope_category, name):
-    #check cache first
-    keys = [d_settings.CACHE_PRE_KEY, SETTING_PRE_KEY, scope,
-            scope_category, name]
-    key = '.'.join(keys)
-    
-    setting = cache.get(key)
-    if setting:
-        return True
-    
-    #check the db if it is not in the cache
-    exists = Setting.objects.filter(scope=scope, 
-        scope_category=scope_category, name=name).exists()
-    
-    return exists
+    _ensure_loaded()
+    return (scope, scope_category, name) in _local['settings']
 
 def get_form_list(user):
     """
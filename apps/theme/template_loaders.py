@@ -2,16 +2,82 @@
 Wrapper for loading template based on a selected Theme.
 """
 import os
+import time
 
 from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import request_started
 from django.template import TemplateDoesNotExist
 from django.template.loader import (BaseLoader, get_template_from_string,
     find_template_loader, make_origin)
 from django.utils._os import safe_join
-from theme.utils import get_theme_root
+from theme.utils import get_theme, get_theme_root
+
+THEME_LOADER = 'theme.template_loaders.load_template_source'
+CACHED_LOADER = 'theme.template_loaders.CachedLoader'
+TEMPLATE_CACHE_PRE_KEY = "theme.templates"
 
 non_theme_source_loaders = None
 
+# compiled templates are kept per process. A version key in the shared
+# cache, read at most once per request, tells the workers to drop them.
+_template_cache = {
+    'version': None,
+    'checked': False,
+    'themed': {},   # (theme, template_name, template_dirs): (template, filepath) or None
+    'default': {},  # template_name: (template, filepath)
+}
+
+
+def _version_key():
+    keys = [settings.CACHE_PRE_KEY, TEMPLATE_CACHE_PRE_KEY, 'version']
+    return '.'.join(keys)
+
+
+def reset_template_cache():
+    """
+    Drops the compiled templates of every worker.
+    Call this when a theme file is saved, uploaded, copied or deleted.
+    """
+    cache.set(_version_key(), time.time())
+    _template_cache['themed'].clear()
+    _template_cache['default'].clear()
+    _template_cache['checked'] = False
+
+
+def _check_version():
+    if _template_cache['checked']:
+        return
+    version = cache.get(_version_key())
+    if version is None:
+        version = time.time()
+        cache.add(_version_key(), version)
+    if version != _template_cache['version']:
+        _template_cache['themed'].clear()
+        _template_cache['default'].clear()
+        _template_cache['version'] = version
+    _template_cache['checked'] = True
+
+
+def _reset_version_check(sender, **kwargs):
+    _template_cache['checked'] = False
+
+request_started.connect(_reset_version_check)
+
+
+def _check_mtime():
+    return getattr(settings, 'THEME_TEMPLATE_CACHE_CHECK_MTIME', settings.DEBUG)
+
+
+def _is_fresh(filepath, loaded_at):
+    """
+    False when the file changed on disk since it was compiled
+    """
+    try:
+        return os.path.getmtime(filepath) <= loaded_at
+    except (OSError, TypeError):
+        return True
+
 class Loader(BaseLoader):
     """Loader that includes a theme's templates files that enables 
     template overriding similar to how a project's templates dir overrides
@@ -69,6 +135,99 @@ def load_template_source(template_name, template_dirs=None):
     return _loader.load_template_source(template_name, template_dirs)
 load_template_source.is_usable = True
 
+
+class CachedLoader(BaseLoader):
+    """Theme aware version of django's cached template loader.
+    Keeps the compiled Template objects keyed by (theme, template_name),
+    including the lookups that did not find the template, so a theme
+    missing a template falls back to get_default_template without
+    touching the disk again.
+
+    Set THEME_TEMPLATE_CACHE_CHECK_MTIME (defaults to DEBUG) to recompile
+    templates that changed on disk.
+
+    TEMPLATE_LOADERS = (
+        ('theme.template_loaders.CachedLoader', (
+            'theme.template_loaders.load_template_source',
+            'django.template.loaders.filesystem.load_template_source',
+            'django.template.loaders.app_directories.load_template_source',
+        )),
+    )
+    """
+    is_usable = True
+
+    def __init__(self, loaders):
+        self._loaders = loaders
+        self._cached_loaders = []
+
+    @property
+    def loaders(self):
+        # Resolve loaders on demand to avoid circular imports
+        if not self._cached_loaders:
+            for loader in self._loaders:
+                self._cached_loaders.append(find_template_loader(loader))
+        return self._cached_loaders
+
+    def find_template(self, name, dirs=None):
+        for loader in self.loaders:
+            try:
+                template, display_name = loader(name, dirs)
+                return (template, make_origin(display_name, loader, name, dirs))
+            except TemplateDoesNotExist:
+                pass
+        raise TemplateDoesNotExist(name)
+
+    def load_template(self, template_name, template_dirs=None):
+        _check_version()
+        key = (get_theme(), template_name, template_dirs and tuple(template_dirs))
+        check_mtime = _check_mtime()
+
+        if key in _template_cache['themed']:
+            cached = _template_cache['themed'][key]
+            if cached is None:
+                if not check_mtime:
+                    raise TemplateDoesNotExist(template_name)
+            elif not check_mtime or _is_fresh(*cached[1:]):
+                return cached[0], None
+
+        loaded_at = time.time()
+        try:
+            template, origin = self.find_template(template_name, template_dirs)
+        except TemplateDoesNotExist:
+            _template_cache['themed'][key] = None
+            raise
+
+        if not hasattr(template, 'render'):
+            try:
+                template = get_template_from_string(template, origin, template_name)
+            except TemplateDoesNotExist:
+                # If compiling the template we found raises TemplateDoesNotExist,
+                # back off to returning the source and display name for the template
+                # we were asked to load. This allows for correct identification (later)
+                # of the actual template that does not exist.
+                return template, origin
+
+        _template_cache['themed'][key] = (template, getattr(origin, 'name', None), loaded_at)
+        return template, None
+
+    def reset(self):
+        reset_template_cache()
+
+
+def _loader_names():
+    """
+    TEMPLATE_LOADERS flattened; the loaders wrapped by
+    CachedLoader are listed in its place.
+    """
+    names = []
+    for loader in settings.TEMPLATE_LOADERS:
+        if isinstance(loader, (tuple, list)):
+            if loader[0] == CACHED_LOADER:
+                names.extend(loader[1])
+                continue
+        names.append(loader)
+    return names
+
 def find_default_template(name, dirs=None):
     """
     Exclude the theme.template_loader
@@ -80,8 +239,8 @@ def find_default_template(name, dirs=None):
     global non_theme_source_loaders
     if non_theme_source_loaders is None:
         loaders = []
-        for loader_name in settings.TEMPLATE_LOADERS:
-            if loader_name != 'theme.template_loaders.load_template_source':
+        for loader_name in _loader_names():
+            if loader_name != THEME_LOADER:
                 loader = find_template_loader(loader_name)
                 if loader is not None:
                     loaders.append(loader)
@@ -98,9 +257,17 @@ def get_default_template(template_name):
     """
     Returns a compiled Template object for the given template name,
     handling template inheritance recursively.
+    Compiled templates are cached, see CachedLoader.
     """
+    _check_version()
+    cached = _template_cache['default'].get(template_name)
+    if cached and (not _check_mtime() or _is_fresh(*cached[1:])):
+        return cached[0]
+
+    loaded_at = time.time()
     template, origin = find_default_template(template_name)
     if not hasattr(template, 'render'):
         # template needs to be compiled
         template = get_template_from_string(template, origin, template_name)
+    _template_cache['default'][template_name] = (template, getattr(origin, 'name', None), loaded_at)
     return template
@@ -10,6 +10,7 @@ from django.utils.translation import ugettext_lazy as _
 
 # local
 from theme.utils import get_theme_root, get_theme, theme_choices
+from theme.template_loaders import reset_template_cache
 from theme_editor.utils import archive_file
 
 THEME_ROOT = get_theme_root()
@@ -41,6 +42,7 @@ class FileForm(forms.Form):
             file = File(f)
             file.write(content)
             file.close()
+            reset_template_cache()
             return True
         else:
             return False
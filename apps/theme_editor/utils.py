@@ -9,6 +9,7 @@ from django.core.urlresolvers import reverse
 from django.core.management import call_command
 
 from theme.utils import get_theme_root
+from theme.template_loaders import reset_template_cache
 from theme_editor.models import ThemeFileVersion
 
 template_directory = "/templates"
@@ -37,6 +38,7 @@ def copy(path_to_file, file, FROM_ROOT=TEMPLATES_ROOT, TO_ROOT=THEME_ROOT, plugi
     if plugin:
         FROM_ROOT = os.path.join(settings.PROJECT_ROOT, "plugins", plugin, 'templates')
     shutil.copy(os.path.join(FROM_ROOT, full_filename), os.path.join(TO_ROOT, "templates", full_filename))
+    reset_template_cache()
 
 def qstr_is_dir(query_string, ROOT_DIR=THEME_ROOT):
     """
@@ -145,3 +147,4 @@ def handle_uploaded_file(f, file_dir="templates", ROOT_DIR=THEME_ROOT):
     for chunk in f.chunks():
         destination.write(chunk)
     destination.close()
+    reset_template_cache()
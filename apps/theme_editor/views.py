@@ -13,6 +13,7 @@ from django.utils import simplejson as json
 
 # local 
 from theme.utils import get_theme
+from theme.template_loaders import reset_template_cache
 from theme_editor.models import ThemeFileVersion
 from theme_editor.forms import FileForm, ThemeSelectForm, UploadForm
 from theme_editor.utils import get_dir_list, get_file_list, get_file_content
@@ -237,6 +238,7 @@ def delete_file(request):
         raise Http404
     
     os.remove(full_filename)
+    reset_template_cache()
     
     messages.add_message(request, messages.INFO, ('Successfully deleted %s/%s.' % (current_dir, chosen_file)))
     
@@ -98,12 +98,17 @@ SECRET_KEY = 's$6*!=m$t0__=51^w@_tbazonjm4+fg@0+ic#bx^3rj)zc$a6i'
 
 # List of callables that know how to import templates from various sources.
 TEMPLATE_LOADERS = (
-    'theme.template_loaders.load_template_source',
-    'django.template.loaders.filesystem.load_template_source',
-    'django.template.loaders.app_directories.load_template_source',
-    #'django.template.loaders.eggs.load_template_source',
+    ('theme.template_loaders.CachedLoader', (
+        'theme.template_loaders.load_template_source',
+        'django.template.loaders.filesystem.load_template_source',
+        'django.template.loaders.app_directories.load_template_source',
+        #'django.template.loaders.eggs.load_template_source',
+    )),
 )
 
+# THEME_TEMPLATE_CACHE_CHECK_MTIME: recompile cached templates that
+# changed on disk. Defaults to DEBUG.
+
 MIDDLEWARE_CLASSES = (
     'django.middleware.common.CommonMiddleware',
     'swfupload.middleware.SWFUploadMiddleware',
@@ -196,6 +201,7 @@ INSTALLED_APPS = (
     'invoices',
     'payments',
     'profiles',
+    'imports',
     'accounts',
     'articles',
     'jobs',